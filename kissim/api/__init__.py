@@ -4,3 +4,4 @@ kissim.api
 
 from .encode import encode
 from .compare import compare
+from .query import query
@@ -5,18 +5,45 @@ Main API for kissim comparison.
 """
 
 import logging
+from pathlib import Path
 
-from kissim.comparison import FeatureDistancesGenerator, FingerprintDistanceGenerator
+import numpy as np
+import pandas as pd
+
+from kissim.comparison import (
+    CondensedDistances,
+    FeatureDistancesArray,
+    FingerprintDistanceGenerator,
+    FingerprintDistanceWriter,
+    FingerprintDuplicates,
+    FingerprintStack,
+    KinaseDistanceAccumulator,
+    KinaseRepresentatives,
+    NearestNeighbors,
+    SparseDistances,
+)
+from kissim.comparison.utils import get_pair_list_tiles
+from kissim.definitions import FEATURE_WEIGHTING_SCHEMES
 
 logger = logging.getLogger(__name__)
 
 
 def compare(
     fingerprint_generator,
-    csv_path=None,
+    output_path=None,
     n_cores=1,
     distance_measure="scaled_euclidean",
     feature_weights="101",
+    kernel="vectorized",
+    min_coverage=None,
+    level="structure",
+    fingerprint_generator2=None,
+    pairs=None,
+    n_neighbors=10,
+    n_representatives=None,
+    collapse_duplicates=False,
+    output_format="csv",
+    max_distance=None,
 ):
     """
     Compare fingerprints (pairwise).
@@ -25,24 +52,955 @@ def compare(
     ----------
     fingerprint_generator : kissim.encoding.FingerprintGenerator
         Fingerprints for KLIFS dataset.
-    csv_path : str
-        TODO
+    output_path : None, str, or pathlib.Path
+        Path to output file. If set, fingerprint distances and coverages are written tile by tile
+        to this file instead of being collected in memory (level "structure"; see
+        kissim.comparison.FingerprintDistanceWriter), or to this npy file (level "condensed",
+        required; sidecar file with structure KLIFS IDs and kinase names is written to the same
+        path with suffix .json; see kissim.comparison.CondensedDistances), or qualifying
+        structure pairs are saved to this npz file (level "sparse"; see
+        kissim.comparison.SparseDistances.to_npz), or kinase pair aggregates are saved to this
+        csv file (level "kinase"; structure pairs behind the minimum and maximum distances, plus
+        one kinase distance matrix file per aggregate), or nearest neighbors are saved to this
+        csv file (level "neighbors"). If multiple distance measures or weighting
+        schemes are given, one file per distance measure and scheme is written (file name
+        extended by distance measure and scheme name).
     n_cores : int
         Number of cores used to generate fingerprint distances.
-    distance_measures : str
-        Distance measures TODO.
-    feature_weights : str
-        Feature weighting scheme.
+    distance_measure : str or list of str
+        Distance measure (scaled_euclidean or scaled_cityblock). If a list of distance measures is
+        given, all distance measures are calculated in a single pass over the fingerprint pairs.
+    feature_weights : str, list of float, or dict of str: list of float
+        Feature weighting scheme: Scheme name (see kissim.definitions.FEATURE_WEIGHTING_SCHEMES)
+        or list of 3 or 15 floats. If a dictionary of multiple schemes (values) by name (keys) is
+        given, fingerprint distances are generated for all schemes in a single pass.
+    kernel : str
+        Kernel used to calculate feature distances: "vectorized" (default) or "blas" (scaled
+        Euclidean distances via matrix multiplication).
+    min_coverage : None or float
+        Minimum fingerprint bit coverage (given the feature weights). If set, fingerprint pairs
+        that do not reach this coverage are skipped before feature distances are calculated. If
+        multiple weighting schemes are given, pairs reaching the minimum coverage for at least one
+        scheme are kept.
+    level : str
+        Comparison level: "structure" (default; fingerprint distances for all structure pairs) or
+        "kinase" (kinase pair aggregates only, updated tile by tile without storing structure
+        pairs; memory scales with the number of kinases squared), or "neighbors" (k nearest
+        neighbors per structure, updated tile by tile without storing structure pairs; memory
+        scales with the number of structures times k), or "condensed" (fingerprint distances
+        and coverages for all structure pairs, written tile by tile to a memory-mapped condensed
+        distance matrix file, see kissim.comparison.CondensedDistances), or "sparse" (only
+        structure pairs with fingerprint distances below or equal to `max_distance`, collected
+        tile by tile as sparse matrix; memory scales with the number of qualifying pairs, see
+        kissim.comparison.SparseDistances).
+    fingerprint_generator2 : None or kissim.encoding.FingerprintGenerator
+        Second set of fingerprints. If set, only fingerprint pairs between both sets are compared
+        (cross-comparison); fingerprint pairs within each set are skipped.
+    pairs : None, str, pathlib.Path, or array-like of int
+        Explicit list of structure pairs to be compared: Either path to a text file (one pair of
+        structure KLIFS IDs per row, separated by whitespace or comma) or array of structure KLIFS
+        ID pairs (pairs x 2). If set, only these pairs are compared; pairs are ordered by
+        fingerprint position (first structure listed first), and self pairs and duplicates
+        (also in reverse order) are skipped.
+    n_neighbors : int
+        Number of nearest neighbors per structure (k; only used for level "neighbors").
+    n_representatives : None or int
+        Maximum number of representative structures per kinase (k medoids based on
+        within-kinase distances, see kissim.comparison.KinaseRepresentatives). If set, only
+        representatives are compared (e.g. for level "kinase"). Representatives are selected
+        based on the first distance measure and weighting scheme.
+    collapse_duplicates : bool
+        Compare identical fingerprints (e.g. from alternate chains or models of the same PDB
+        entry) only once (see kissim.comparison.FingerprintDuplicates); results are expanded to
+        all structures. Default: False.
+    output_format : str
+        Format of output file for level "structure" (only used if `output_path` is set): "csv"
+        (default) or "columnar" (directory with int32 structure indices and float32 distances and
+        coverages as binary columns).
+    max_distance : None or float
+        Distance cutoff (inclusive) for level "sparse".
+
+    Returns
+    -------
+    kissim.comparison.FingerprintDistanceGenerator or pandas.DataFrame or
+    kissim.comparison.KinaseDistanceAccumulator or kissim.comparison.NearestNeighbors or
+    kissim.comparison.CondensedDistances
+        Fingerprint distances (or fingerprint distances per scheme if multiple weighting schemes
+        are given), kinase distance aggregates (or aggregates per scheme) for level "kinase",
+        nearest neighbors (or nearest neighbors per scheme) for level "neighbors", or condensed
+        distances (or condensed distances per scheme) for level "condensed", or sparse
+        distances (or sparse distances per scheme) for level "sparse". If `output_path` is set,
+        writers (or writers per scheme) are returned for level "structure".
+        If a list of distance measures is given, results are returned as dictionary (values) per
+        distance measure (keys).
+    """
+
+    if isinstance(feature_weights, dict):
+        feature_weights = {
+            name: _get_feature_weights(weights) for name, weights in feature_weights.items()
+        }
+    else:
+        feature_weights = _get_feature_weights(feature_weights)
+
+    fingerprint_stack, pair_tiles = _get_fingerprint_stack_and_pair_tiles(
+        fingerprint_generator, fingerprint_generator2, pairs
+    )
+    if n_representatives is not None:
+        if pair_tiles is not None:
+            raise ValueError(
+                "Representatives cannot be combined with cross-comparison or pair list "
+                "comparison."
+            )
+        fingerprint_stack = _get_representatives_stack(
+            fingerprint_stack,
+            n_representatives,
+            n_cores,
+            distance_measure,
+            feature_weights,
+            kernel,
+        )
+    duplicates = None
+    if collapse_duplicates:
+        if pair_tiles is not None:
+            raise ValueError(
+                "Collapsing duplicates cannot be combined with cross-comparison or pair list "
+                "comparison."
+            )
+        duplicates = FingerprintDuplicates.from_fingerprint_stack(fingerprint_stack)
+
+    if level == "kinase":
+        return _compare_kinases(
+            fingerprint_stack,
+            output_path,
+            pair_tiles,
+            n_cores,
+            distance_measure,
+            feature_weights,
+            kernel,
+            min_coverage,
+            duplicates,
+        )
+    elif level == "neighbors":
+        return _compare_neighbors(
+            fingerprint_stack,
+            n_neighbors,
+            output_path,
+            pair_tiles,
+            n_cores,
+            distance_measure,
+            feature_weights,
+            kernel,
+            min_coverage,
+            duplicates,
+        )
+    elif level == "condensed":
+        return _compare_condensed(
+            fingerprint_stack,
+            output_path,
+            pair_tiles,
+            n_cores,
+            distance_measure,
+            feature_weights,
+            kernel,
+            min_coverage,
+            duplicates,
+        )
+    elif level == "sparse":
+        return _compare_sparse(
+            fingerprint_stack,
+            max_distance,
+            output_path,
+            pair_tiles,
+            n_cores,
+            distance_measure,
+            feature_weights,
+            kernel,
+            min_coverage,
+            duplicates,
+        )
+    elif level != "structure":
+        raise ValueError(
+            "Comparison level unknown. "
+            "Choose from: structure, kinase, neighbors, condensed, sparse"
+        )
+    if output_path is not None:
+        return _compare_to_file(
+            fingerprint_stack,
+            output_path,
+            output_format,
+            pair_tiles,
+            n_cores,
+            distance_measure,
+            feature_weights,
+            kernel,
+            min_coverage,
+            duplicates,
+        )
+
+    if duplicates is None:
+        feature_distances_array = FeatureDistancesArray.from_fingerprint_stack(
+            fingerprint_stack,
+            distance_measure,
+            n_cores,
+            kernel=kernel,
+            min_coverage=min_coverage,
+            feature_weights=feature_weights,
+            pair_tiles=pair_tiles,
+        )
+    else:
+        feature_distances_array = duplicates.expand_feature_distances_array(
+            FeatureDistancesArray.from_fingerprint_stack(
+                duplicates.get_fingerprint_stack(fingerprint_stack),
+                distance_measure,
+                n_cores,
+                kernel=kernel,
+                min_coverage=min_coverage,
+                feature_weights=feature_weights,
+                pair_tiles=duplicates.get_pair_tiles(),
+            ),
+            fingerprint_stack,
+        )
+
+    results = {}
+    for measure in feature_distances_array.distance_measures:
+
+        if isinstance(feature_weights, dict):
+            results[measure] = FingerprintDistanceGenerator.sweep_feature_weights(
+                feature_distances_array, feature_weights, measure
+            )
+        else:
+            fingerprint_distance_generator = FingerprintDistanceGenerator()
+            fingerprint_distance_generator.from_feature_distances_array(
+                feature_distances_array, feature_weights, measure
+            )
+            results[measure] = fingerprint_distance_generator
+
+    if isinstance(distance_measure, str):
+        return results[distance_measure]
+    return results
+
+
+def _get_fingerprint_stack_and_pair_tiles(
+    fingerprint_generator, fingerprint_generator2=None, pairs=None
+):
+    """
+    Stack fingerprints and get the fingerprint pairs to be compared.
+
+    Parameters
+    ----------
+    fingerprint_generator : kissim.encoding.FingerprintGenerator
+        Fingerprints.
+    fingerprint_generator2 : None or kissim.encoding.FingerprintGenerator
+        Second set of fingerprints (cross-comparison).
+    pairs : None, str, pathlib.Path, or array-like of int
+        Explicit list of structure KLIFS ID pairs (pair list comparison).
+
+    Returns
+    -------
+    fingerprint_stack : kissim.comparison.FingerprintStack
+        Stacked fingerprints (fingerprints of second set appended to first set).
+    pair_tiles : None or generator of tuple of np.ndarray
+        Fingerprint pairs per tile (None if all possible fingerprint pair combinations are
+        compared).
     """
 
-    print(csv_path)
+    if fingerprint_generator2 is not None and pairs is not None:
+        raise ValueError("Cross-comparison and pair list comparison cannot be combined.")
 
-    feature_distances_generator = FeatureDistancesGenerator()
-    feature_distances_generator.from_fingerprint_generator(fingerprint_generator, distance_measure)
-    # TODO save to file
+    fingerprint_stack = FingerprintStack.from_fingerprint_generator(fingerprint_generator)
+    if pairs is not None:
+        fingerprint_ixs = fingerprint_stack.get_fingerprint_ixs(
+            _get_structure_klifs_id_pairs(pairs)
+        )
+        # Canonical pairs (i < j), each compared once: Duplicates would be counted twice by
+        # accumulators (e.g. as nearest neighbors), self pairs are no structure pairs
+        n_pairs = len(fingerprint_ixs)
+        fingerprint_ixs = np.sort(fingerprint_ixs, axis=1)
+        fingerprint_ixs = np.unique(
+            fingerprint_ixs[fingerprint_ixs[:, 0] != fingerprint_ixs[:, 1]], axis=0
+        )
+        if len(fingerprint_ixs) < n_pairs:
+            logger.info(
+                f"Pairs: {n_pairs - len(fingerprint_ixs)} of {n_pairs} pairs are self pairs or "
+                f"duplicates and are skipped"
+            )
+        pair_tiles = get_pair_list_tiles(fingerprint_ixs[:, 0], fingerprint_ixs[:, 1])
+        return fingerprint_stack, pair_tiles
+    if fingerprint_generator2 is None:
+        return fingerprint_stack, None
 
-    fingerprint_distance_generator = FingerprintDistanceGenerator()
-    fingerprint_distance_generator.from_feature_distances_generator(
-        feature_distances_generator, feature_weights
+    fingerprint_stack2 = FingerprintStack.from_fingerprint_generator(fingerprint_generator2)
+    pair_tiles = FeatureDistancesArray.get_cross_pair_tiles(
+        fingerprint_stack.n_fingerprints, fingerprint_stack2.n_fingerprints
     )
-    # TODO save to file
+    fingerprint_stack = FingerprintStack.concatenate([fingerprint_stack, fingerprint_stack2])
+    return fingerprint_stack, pair_tiles
+
+
+def _get_representatives_stack(
+    fingerprint_stack,
+    n_representatives=1,
+    n_cores=1,
+    distance_measure="scaled_euclidean",
+    feature_weights=None,
+    kernel="vectorized",
+):
+    """
+    Get stacked fingerprints of representative structures per kinase.
+
+    Parameters
+    ----------
+    fingerprint_stack : kissim.comparison.FingerprintStack
+        Stacked fingerprints.
+    n_representatives : int
+        Maximum number of representatives per kinase (k).
+    n_cores : int
+        Number of cores used to generate within-kinase fingerprint distances.
+    distance_measure : str or list of str
+        One or more distance measures (the first one is used).
+    feature_weights : None, list of float, or dict of str: list of float
+        Feature weights (or feature weights per weighting scheme; the first one is used).
+    kernel : str
+        Kernel used to calculate feature distances.
+
+    Returns
+    -------
+    kissim.comparison.FingerprintStack
+        Stacked fingerprints (representatives).
+    """
+
+    if not isinstance(distance_measure, str):
+        distance_measure = distance_measure[0]
+    if isinstance(feature_weights, dict):
+        feature_weights = list(feature_weights.values())[0]
+
+    representatives = KinaseRepresentatives.from_fingerprint_stack(
+        fingerprint_stack,
+        n_representatives,
+        distance_measure,
+        feature_weights,
+        n_cores,
+        kernel,
+    )
+    return representatives.get_fingerprint_stack(fingerprint_stack)
+
+
+def _get_structure_klifs_id_pairs(pairs):
+    """
+    Get structure KLIFS ID pairs from file or array.
+
+    Parameters
+    ----------
+    pairs : str, pathlib.Path, or array-like of int
+        Path to text file (one pair of structure KLIFS IDs per row, separated by whitespace or
+        comma; lines starting with # are skipped) or array of structure KLIFS ID pairs.
+
+    Returns
+    -------
+    np.ndarray of int
+        Structure KLIFS ID pairs (pairs x 2).
+    """
+
+    if isinstance(pairs, (str, Path)):
+        with open(pairs, "r") as f:
+            pairs = [
+                line.replace(",", " ").split()
+                for line in f
+                if line.strip() and not line.startswith("#")
+            ]
+    pairs = np.asarray(pairs, dtype=np.int64)
+    if pairs.size == 0:
+        pairs = pairs.reshape(0, 2)
+    if pairs.ndim != 2 or pairs.shape[1] != 2:
+        raise ValueError("Pairs must be given as pairs x 2 structure KLIFS IDs.")
+    return pairs
+
+
+def _compare_kinases(
+    fingerprint_stack,
+    output_path=None,
+    pair_tiles=None,
+    n_cores=1,
+    distance_measure="scaled_euclidean",
+    feature_weights=None,
+    kernel="vectorized",
+    min_coverage=None,
+    duplicates=None,
+):
+    """
+    Compare fingerprints (pairwise) and aggregate fingerprint distances to kinase pairs tile by
+    tile, without storing fingerprint distances for structure pairs.
+
+    Parameters
+    ----------
+    fingerprint_stack : kissim.comparison.FingerprintStack
+        Stacked fingerprints.
+    output_path : None, str, or pathlib.Path
+        Path to csv file (extended by distance measure and scheme name if multiple distance
+        measures or weighting schemes are given). If set, the structure pairs behind the minimum
+        and maximum distance per kinase pair are written to this file, and the kinase distance
+        matrices (minimum, maximum, mean) to files with the file name extended by the aggregate.
+        If None (default), no file is written.
+    pair_tiles : None or iterable of tuple of np.ndarray
+        Fingerprint pairs per tile (None for all possible fingerprint pair combinations).
+    n_cores : int
+        Number of cores used to generate fingerprint distances.
+    distance_measure : str or list of str
+        One or more distance measures.
+    feature_weights : None, list of float, or dict of str: list of float
+        Feature weights (or feature weights per weighting scheme).
+    kernel : str
+        Kernel used to calculate feature distances.
+    min_coverage : None or float
+        Minimum fingerprint bit coverage.
+    duplicates : None or kissim.comparison.FingerprintDuplicates
+        Identical fingerprints. If set, only unique fingerprints are compared and each tile is
+        expanded to all structures.
+
+    Returns
+    -------
+    kissim.comparison.KinaseDistanceAccumulator or dict
+        Kinase distance aggregates (per weighting scheme if multiple weighting schemes are given;
+        per distance measure if multiple distance measures are given).
+    """
+
+    # Accumulators with their distance measure and scheme name
+    accumulators = []
+
+    def create_accumulator(measure, name):
+        accumulator = KinaseDistanceAccumulator.from_kinase_names(
+            fingerprint_stack.kinase_categories, fingerprint_stack.structure_klifs_ids
+        )
+        accumulators.append((measure, name, accumulator))
+        return accumulator
+
+    results = _accumulate_tiles(
+        create_accumulator,
+        fingerprint_stack,
+        pair_tiles,
+        n_cores,
+        distance_measure,
+        feature_weights,
+        kernel,
+        min_coverage,
+        duplicates,
+    )
+
+    if output_path is not None:
+        for measure, name, accumulator in accumulators:
+            filepath = _get_output_filepath(
+                output_path, measure, name, distance_measure, feature_weights
+            )
+            structure_pairs = pd.concat(
+                [
+                    accumulator.get_structure_pairs(by).assign(by=by)
+                    for by in ["minimum", "maximum"]
+                ],
+                ignore_index=True,
+            )
+            structure_pairs.to_csv(filepath, index=False)
+            for by in ["minimum", "maximum", "mean"]:
+                accumulator.get_matrix(by, fill=True).to_csv(
+                    filepath.with_name(f"{filepath.stem}.{by}{filepath.suffix}")
+                )
+            logger.info(f"Kinase distances are written to: {filepath}")
+
+    return results
+
+
+def _compare_neighbors(
+    fingerprint_stack,
+    n_neighbors=10,
+    output_path=None,
+    pair_tiles=None,
+    n_cores=1,
+    distance_measure="scaled_euclidean",
+    feature_weights=None,
+    kernel="vectorized",
+    min_coverage=None,
+    duplicates=None,
+):
+    """
+    Compare fingerprints (pairwise) and collect the k nearest neighbors per structure tile by
+    tile, without storing fingerprint distances for structure pairs.
+
+    Parameters
+    ----------
+    fingerprint_stack : kissim.comparison.FingerprintStack
+        Stacked fingerprints.
+    n_neighbors : int
+        Number of nearest neighbors per structure (k).
+    output_path : None, str, or pathlib.Path
+        Path to csv file (extended by distance measure and scheme name if multiple distance
+        measures or weighting schemes are given). If set, the nearest neighbors per structure are
+        written to this file (see kissim.comparison.NearestNeighbors.get_neighbors). If None
+        (default), no file is written.
+    pair_tiles : None or iterable of tuple of np.ndarray
+        Fingerprint pairs per tile (None for all possible fingerprint pair combinations).
+    n_cores : int
+        Number of cores used to generate fingerprint distances.
+    distance_measure : str or list of str
+        One or more distance measures.
+    feature_weights : None, list of float, or dict of str: list of float
+        Feature weights (or feature weights per weighting scheme).
+    kernel : str
+        Kernel used to calculate feature distances.
+    min_coverage : None or float
+        Minimum fingerprint bit coverage.
+    duplicates : None or kissim.comparison.FingerprintDuplicates
+        Identical fingerprints. If set, only unique fingerprints are compared and each tile is
+        expanded to all structures.
+
+    Returns
+    -------
+    kissim.comparison.NearestNeighbors or dict
+        Nearest neighbors (per weighting scheme if multiple weighting schemes are given; per
+        distance measure if multiple distance measures are given).
+    """
+
+    # Nearest neighbors with their distance measure and scheme name
+    nearest_neighbors_list = []
+
+    def create_nearest_neighbors(measure, name):
+        nearest_neighbors = NearestNeighbors.from_structure_klifs_ids(
+            fingerprint_stack.structure_klifs_ids, n_neighbors
+        )
+        nearest_neighbors_list.append((measure, name, nearest_neighbors))
+        return nearest_neighbors
+
+    results = _accumulate_tiles(
+        create_nearest_neighbors,
+        fingerprint_stack,
+        pair_tiles,
+        n_cores,
+        distance_measure,
+        feature_weights,
+        kernel,
+        min_coverage,
+        duplicates,
+    )
+
+    if output_path is not None:
+        for measure, name, nearest_neighbors in nearest_neighbors_list:
+            filepath = _get_output_filepath(
+                output_path, measure, name, distance_measure, feature_weights
+            )
+            nearest_neighbors.get_neighbors().to_csv(filepath, index=False)
+            logger.info(f"Nearest neighbors are written to: {filepath}")
+
+    return results
+
+
+def _compare_condensed(
+    fingerprint_stack,
+    output_path,
+    pair_tiles=None,
+    n_cores=1,
+    distance_measure="scaled_euclidean",
+    feature_weights=None,
+    kernel="vectorized",
+    min_coverage=None,
+    duplicates=None,
+):
+    """
+    Compare fingerprints (pairwise) and write fingerprint distances and coverages tile by tile
+    to memory-mapped condensed distance matrix files, without storing fingerprint distances for
+    structure pairs in memory.
+
+    Parameters
+    ----------
+    fingerprint_stack : kissim.comparison.FingerprintStack
+        Stacked fingerprints.
+    output_path : str or pathlib.Path
+        Path to npy file (extended by distance measure and scheme name if multiple distance
+        measures or weighting schemes are given).
+    pair_tiles : None or iterable of tuple of np.ndarray
+        Fingerprint pairs per tile (None for all possible fingerprint pair combinations).
+    n_cores : int
+        Number of cores used to generate fingerprint distances.
+    distance_measure : str or list of str
+        One or more distance measures.
+    feature_weights : None, list of float, or dict of str: list of float
+        Feature weights (or feature weights per weighting scheme).
+    kernel : str
+        Kernel used to calculate feature distances.
+    min_coverage : None or float
+        Minimum fingerprint bit coverage.
+    duplicates : None or kissim.comparison.FingerprintDuplicates
+        Identical fingerprints. If set, only unique fingerprints are compared and each tile is
+        expanded to all structures.
+
+    Returns
+    -------
+    kissim.comparison.CondensedDistances or dict
+        Condensed distances (per weighting scheme if multiple weighting schemes are given; per
+        distance measure if multiple distance measures are given).
+    """
+
+    if output_path is None:
+        raise ValueError('Path to condensed distances file required for level "condensed".')
+
+    def create_condensed_distances(measure, name):
+        return CondensedDistances.from_structure_klifs_ids(
+            _get_output_filepath(output_path, measure, name, distance_measure, feature_weights),
+            fingerprint_stack.structure_klifs_ids,
+            fingerprint_stack.kinase_names,
+            measure,
+            feature_weights[name] if isinstance(feature_weights, dict) else feature_weights,
+        )
+
+    results = _accumulate_tiles(
+        create_condensed_distances,
+        fingerprint_stack,
+        pair_tiles,
+        n_cores,
+        distance_measure,
+        feature_weights,
+        kernel,
+        min_coverage,
+        duplicates,
+    )
+
+    # Write pending changes to disk
+    for condensed_distances in _iter_accumulators(results):
+        condensed_distances.flush()
+
+    return results
+
+
+def _compare_sparse(
+    fingerprint_stack,
+    max_distance,
+    output_path=None,
+    pair_tiles=None,
+    n_cores=1,
+    distance_measure="scaled_euclidean",
+    feature_weights=None,
+    kernel="vectorized",
+    min_coverage=None,
+    duplicates=None,
+):
+    """
+    Compare fingerprints (pairwise) and collect structure pairs with fingerprint distances below
+    or equal to a cutoff tile by tile, without storing fingerprint distances for all structure
+    pairs.
+
+    Parameters
+    ----------
+    fingerprint_stack : kissim.comparison.FingerprintStack
+        Stacked fingerprints.
+    max_distance : float
+        Distance cutoff (inclusive).
+    output_path : None, str, or pathlib.Path
+        Path to npz file (extended by distance measure and scheme name if multiple distance
+        measures or weighting schemes are given). If None (default), no file is written.
+    pair_tiles : None or iterable of tuple of np.ndarray
+        Fingerprint pairs per tile (None for all possible fingerprint pair combinations).
+    n_cores : int
+        Number of cores used to generate fingerprint distances.
+    distance_measure : str or list of str
+        One or more distance measures.
+    feature_weights : None, list of float, or dict of str: list of float
+        Feature weights (or feature weights per weighting scheme).
+    kernel : str
+        Kernel used to calculate feature distances.
+    min_coverage : None or float
+        Minimum fingerprint bit coverage.
+    duplicates : None or kissim.comparison.FingerprintDuplicates
+        Identical fingerprints. If set, only unique fingerprints are compared and each tile is
+        expanded to all structures.
+
+    Returns
+    -------
+    kissim.comparison.SparseDistances or dict
+        Sparse distances (per weighting scheme if multiple weighting schemes are given; per
+        distance measure if multiple distance measures are given).
+    """
+
+    if max_distance is None:
+        raise ValueError('Distance cutoff required for level "sparse".')
+
+    # Sparse distances with their distance measure and scheme name
+    sparse_distances_list = []
+
+    def create_sparse_distances(measure, name):
+        sparse_distances = SparseDistances.from_structure_klifs_ids(
+            fingerprint_stack.structure_klifs_ids, fingerprint_stack.kinase_names, max_distance
+        )
+        sparse_distances_list.append((measure, name, sparse_distances))
+        return sparse_distances
+
+    results = _accumulate_tiles(
+        create_sparse_distances,
+        fingerprint_stack,
+        pair_tiles,
+        n_cores,
+        distance_measure,
+        feature_weights,
+        kernel,
+        min_coverage,
+        duplicates,
+    )
+
+    if output_path is not None:
+        for measure, name, sparse_distances in sparse_distances_list:
+            sparse_distances.to_npz(
+                _get_output_filepath(output_path, measure, name, distance_measure, feature_weights)
+            )
+
+    return results
+
+
+def _compare_to_file(
+    fingerprint_stack,
+    output_path,
+    output_format="csv",
+    pair_tiles=None,
+    n_cores=1,
+    distance_measure="scaled_euclidean",
+    feature_weights=None,
+    kernel="vectorized",
+    min_coverage=None,
+    duplicates=None,
+):
+    """
+    Compare fingerprints (pairwise) and write fingerprint distances and coverages tile by tile
+    to file, without storing fingerprint distances for structure pairs in memory.
+
+    Parameters
+    ----------
+    fingerprint_stack : kissim.comparison.FingerprintStack
+        Stacked fingerprints.
+    output_path : str or pathlib.Path
+        Path to output file (extended by distance measure and scheme name if multiple distance
+        measures or weighting schemes are given).
+    output_format : str
+        Output format: csv (default) or columnar.
+    pair_tiles : None or iterable of tuple of np.ndarray
+        Fingerprint pairs per tile (None for all possible fingerprint pair combinations).
+    n_cores : int
+        Number of cores used to generate fingerprint distances.
+    distance_measure : str or list of str
+        One or more distance measures.
+    feature_weights : None, list of float, or dict of str: list of float
+        Feature weights (or feature weights per weighting scheme).
+    kernel : str
+        Kernel used to calculate feature distances.
+    min_coverage : None or float
+        Minimum fingerprint bit coverage.
+    duplicates : None or kissim.comparison.FingerprintDuplicates
+        Identical fingerprints. If set, only unique fingerprints are compared and each tile is
+        expanded to all structures.
+
+    Returns
+    -------
+    kissim.comparison.FingerprintDistanceWriter or dict
+        Writers (per weighting scheme if multiple weighting schemes are given; per distance
+        measure if multiple distance measures are given).
+    """
+
+    def create_writer(measure, name):
+        return FingerprintDistanceWriter.from_structure_klifs_ids(
+            _get_output_filepath(output_path, measure, name, distance_measure, feature_weights),
+            fingerprint_stack.structure_klifs_ids,
+            fingerprint_stack.kinase_names,
+            output_format,
+        )
+
+    results = _accumulate_tiles(
+        create_writer,
+        fingerprint_stack,
+        pair_tiles,
+        n_cores,
+        distance_measure,
+        feature_weights,
+        kernel,
+        min_coverage,
+        duplicates,
+    )
+
+    for writer in _iter_accumulators(results):
+        writer.close()
+
+    return results
+
+
+def _get_output_filepath(filepath, measure, name, distance_measure, feature_weights):
+    """
+    Get the output file path for one distance measure and weighting scheme: The file name is
+    extended by the distance measure (if multiple distance measures are given) and by the scheme
+    name (if multiple weighting schemes are given).
+
+    Parameters
+    ----------
+    filepath : str or pathlib.Path
+        Output file path.
+    measure : str
+        Distance measure.
+    name : str
+        Weighting scheme name.
+    distance_measure : str or list of str
+        All distance measures.
+    feature_weights : None, list of float, or dict of str: list of float
+        All feature weights.
+
+    Returns
+    -------
+    pathlib.Path
+        Output file path.
+    """
+
+    filepath = Path(filepath)
+    if not isinstance(distance_measure, str):
+        filepath = filepath.with_name(f"{filepath.stem}.{measure}{filepath.suffix}")
+    if isinstance(feature_weights, dict):
+        filepath = filepath.with_name(f"{filepath.stem}.{name}{filepath.suffix}")
+    return filepath
+
+
+def _iter_accumulators(results):
+    """
+    Iterate over accumulators in results nested by distance measure and weighting scheme (see
+    `_accumulate_tiles`).
+
+    Parameters
+    ----------
+    results : object or dict
+        Accumulator (per weighting scheme and/or per distance measure).
+
+    Yields
+    ------
+    object
+        Accumulator.
+    """
+
+    for result in results.values() if isinstance(results, dict) else [results]:
+        yield from result.values() if isinstance(result, dict) else [result]
+
+
+def _accumulate_tiles(
+    create_accumulator,
+    fingerprint_stack,
+    pair_tiles=None,
+    n_cores=1,
+    distance_measure="scaled_euclidean",
+    feature_weights=None,
+    kernel="vectorized",
+    min_coverage=None,
+    duplicates=None,
+):
+    """
+    Compare fingerprints (pairwise) tile by tile and pass each tile to accumulators (one per
+    distance measure and weighting scheme), e.g. kissim.comparison.KinaseDistanceAccumulator or
+    kissim.comparison.NearestNeighbors.
+
+    Parameters
+    ----------
+    create_accumulator : callable
+        Function returning an empty accumulator given the distance measure and the weighting
+        scheme name (empty string if a single weighting scheme is given), which implements
+        `update_from_feature_distances_array(feature_distances_array, feature_weights,
+        distance_measure)`.
+    fingerprint_stack : kissim.comparison.FingerprintStack
+        Stacked fingerprints.
+    pair_tiles : None or iterable of tuple of np.ndarray
+        Fingerprint pairs per tile (None for all possible fingerprint pair combinations).
+    n_cores : int
+        Number of cores used to generate fingerprint distances.
+    distance_measure : str or list of str
+        One or more distance measures.
+    feature_weights : None, list of float, or dict of str: list of float
+        Feature weights (or feature weights per weighting scheme).
+    kernel : str
+        Kernel used to calculate feature distances.
+    min_coverage : None or float
+        Minimum fingerprint bit coverage.
+    duplicates : None or kissim.comparison.FingerprintDuplicates
+        Identical fingerprints. If set, only unique fingerprints are compared and each tile is
+        expanded to all structures.
+
+    Returns
+    -------
+    object or dict
+        Accumulator (per weighting scheme if multiple weighting schemes are given; per distance
+        measure if multiple distance measures are given).
+    """
+
+    if duplicates is None:
+        feature_distances_tiles = FeatureDistancesArray.iter_from_fingerprint_stack(
+            fingerprint_stack,
+            distance_measure,
+            n_cores,
+            kernel=kernel,
+            min_coverage=min_coverage,
+            feature_weights=feature_weights,
+            pair_tiles=pair_tiles,
+        )
+    else:
+        feature_distances_tiles = (
+            duplicates.expand_feature_distances_array(feature_distances_tile, fingerprint_stack)
+            for feature_distances_tile in FeatureDistancesArray.iter_from_fingerprint_stack(
+                duplicates.get_fingerprint_stack(fingerprint_stack),
+                distance_measure,
+                n_cores,
+                kernel=kernel,
+                min_coverage=min_coverage,
+                feature_weights=feature_weights,
+                pair_tiles=duplicates.get_pair_tiles(),
+            )
+        )
+
+    distance_measures = (
+        [distance_measure] if isinstance(distance_measure, str) else distance_measure
+    )
+    feature_weights_dict = (
+        feature_weights if isinstance(feature_weights, dict) else {"": feature_weights}
+    )
+
+    # Running accumulators per distance measure and weighting scheme
+    accumulators = {
+        measure: {name: create_accumulator(measure, name) for name in feature_weights_dict.keys()}
+        for measure in distance_measures
+    }
+    for feature_distances_tile in feature_distances_tiles:
+        for measure in distance_measures:
+            for name, weights in feature_weights_dict.items():
+                accumulators[measure][name].update_from_feature_distances_array(
+                    feature_distances_tile, weights, measure
+                )
+
+    results = {
+        measure: (
+            accumulators_by_name if isinstance(feature_weights, dict) else accumulators_by_name[""]
+        )
+        for measure, accumulators_by_name in accumulators.items()
+    }
+    if isinstance(distance_measure, str):
+        return results[distance_measure]
+    return results
+
+
+def _get_feature_weights(feature_weights):
+    """
+    Get feature weights from a weighting scheme name (or pass through weights).
+
+    Parameters
+    ----------
+    feature_weights : str or None or list of float
+        Scheme name (see kissim.definitions.FEATURE_WEIGHTING_SCHEMES) or feature weights.
+
+    Returns
+    -------
+    None or list of float
+        Feature weights.
+    """
+
+    if isinstance(feature_weights, str):
+        try:
+            feature_weights = FEATURE_WEIGHTING_SCHEMES[feature_weights]
+        except KeyError:
+            raise KeyError(
+                f"Feature weighting scheme unknown. "
+                f'Choose from: {", ".join(FEATURE_WEIGHTING_SCHEMES.keys())}'
+            )
+    return feature_weights
@@ -0,0 +1,330 @@
+"""
+kissim.api.query
+
+Main API for kissim queries against a precomputed fingerprint database.
+"""
+
+import datetime
+import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from kissim.comparison import (
+    FeatureDistancesArray,
+    FingerprintStack,
+    MomentsTree,
+    NearestNeighbors,
+    PrunedSearch,
+    TwoStageSearch,
+)
+from kissim.encoding import FingerprintGenerator
+from kissim.api.compare import _get_feature_weights
+from kissim.api.encode import encode
+
+logger = logging.getLogger(__name__)
+
+QUERY_METHODS = ["exhaustive", "pruned", "tree", "two_stage"]
+
+
+def query(
+    queries,
+    database,
+    n_neighbors=10,
+    distance_measure="scaled_euclidean",
+    feature_weights="101",
+    kernel="vectorized",
+    n_cores=1,
+    local_klifs_session=None,
+    tile_size=2000,
+    method="exhaustive",
+    n_candidates=100,
+    n_recall_samples=None,
+):
+    """
+    Query fingerprints against a precomputed fingerprint database and get the most similar
+    database entries (k nearest neighbors) per query.
+
+    Parameters
+    ----------
+    queries : kissim.encoding.FingerprintGenerator, kissim.comparison.FingerprintStack, or list
+        of int
+        Query fingerprints or structure KLIFS IDs. Structure KLIFS IDs are taken from the
+        database if available, else encoded on the fly.
+    database : kissim.comparison.FingerprintStack, kissim.encoding.FingerprintGenerator, str, or
+        pathlib.Path
+        Fingerprint database: Stacked fingerprints, fingerprints, or path to npz file (see
+        kissim.comparison.FingerprintStack.to_npz) or json file (see
+        kissim.encoding.FingerprintGenerator.to_json).
+    n_neighbors : int
+        Number of most similar database entries per query (k).
+    distance_measure : str
+        Distance measure (scaled_euclidean or scaled_cityblock).
+    feature_weights : str or list of float
+        Feature weighting scheme: Scheme name (see kissim.definitions.FEATURE_WEIGHTING_SCHEMES)
+        or list of 3 or 15 floats.
+    kernel : str
+        Kernel used to calculate feature distances: "vectorized" (default) or "blas".
+    n_cores : int
+        Number of cores used to encode structures and to generate fingerprint distances.
+    local_klifs_session : str or None
+        Path to local KLIFS download (used to encode structures that are not in the database). If
+        None, remote KLIFS session is used.
+    tile_size : int
+        Maximum number of query-database pairs per tile (only used for method "exhaustive").
+    method : str
+        Search method: "exhaustive" (default; all query-database pairs are compared tile by tile)
+        or "pruned" (exact search skipping database entries based on lower bounds of their
+        fingerprint distances, see kissim.comparison.PrunedSearch; for single or few queries),
+        or "tree" (exact search in a vantage-point tree over moments features, see
+        kissim.comparison.MomentsTree; for moments-only feature weights, e.g. scheme 001; other
+        feature weights fall back to method "pruned"), or
+        "two_stage" (approximate search screening all database entries with moments features
+        and re-ranking the best candidates with all features, see
+        kissim.comparison.TwoStageSearch).
+    n_candidates : int
+        Number of candidates re-ranked with all features (only used for method "two_stage").
+    n_recall_samples : None or int
+        Number of database entries sampled as queries to evaluate the recall of the k most
+        similar database entries compared to an exact search (only used for method
+        "two_stage"; see kissim.comparison.TwoStageSearch.get_recall). If set, the recall is
+        logged. If None (default), the recall is not evaluated.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Most similar database entries per query: Query structure KLIFS ID
+        (query_structure_klifs_id), rank (starting at 1), database structure KLIFS ID
+        (structure_klifs_id), kinase name, and fingerprint distance.
+    """
+
+    start = datetime.datetime.now()
+
+    feature_weights = _get_feature_weights(feature_weights)
+    database_stack = _get_database_stack(database)
+    query_stack = _get_query_stack(queries, database_stack, n_cores, local_klifs_session)
+    logger.info(
+        f"Query {query_stack.n_fingerprints} fingerprint(s) against "
+        f"{database_stack.n_fingerprints} database fingerprints"
+    )
+
+    if method == "exhaustive":
+        neighbor_ixs, distances = _query_exhaustive(
+            query_stack,
+            database_stack,
+            n_neighbors,
+            distance_measure,
+            feature_weights,
+            kernel,
+            n_cores,
+            tile_size,
+        )
+    elif method == "pruned":
+        neighbor_ixs, distances = PrunedSearch.from_fingerprint_stack(
+            database_stack, distance_measure, feature_weights
+        ).search(query_stack, n_neighbors)
+    elif method == "tree" and not MomentsTree.is_applicable(feature_weights):
+        logger.warning(
+            "Feature weights are not set for moments features only; use pruned search instead of "
+            "tree search."
+        )
+        neighbor_ixs, distances = PrunedSearch.from_fingerprint_stack(
+            database_stack, distance_measure, feature_weights
+        ).search(query_stack, n_neighbors)
+    elif method == "tree":
+        neighbor_ixs, distances = MomentsTree.from_fingerprint_stack(
+            database_stack, distance_measure, feature_weights
+        ).search(query_stack, n_neighbors)
+    elif method == "two_stage":
+        search = TwoStageSearch.from_fingerprint_stack(
+            database_stack, distance_measure, feature_weights, n_candidates=n_candidates
+        )
+        neighbor_ixs, distances = search.search(query_stack, n_neighbors)
+        if n_recall_samples is not None:
+            recall = search.get_recall(n_neighbors, n_recall_samples)
+            logger.info(f"Two-stage search recall@{n_neighbors}: {recall}")
+    else:
+        raise ValueError(f'Query method unknown. Choose from: {", ".join(QUERY_METHODS)}')
+
+    query_ixs, ranks = np.nonzero(neighbor_ixs >= 0)
+    neighbor_ixs = neighbor_ixs[query_ixs, ranks]
+    results = pd.DataFrame(
+        {
+            "query_structure_klifs_id": np.array(query_stack.structure_klifs_ids)[query_ixs],
+            "rank": ranks + 1,
+            "structure_klifs_id": np.array(database_stack.structure_klifs_ids)[neighbor_ixs],
+            "kinase_name": np.array(database_stack.kinase_names, dtype=object)[neighbor_ixs],
+            "distance": distances[query_ixs, ranks],
+        }
+    )
+
+    end = datetime.datetime.now()
+    logger.info(f"Query runtime: {end - start}")
+
+    return results
+
+
+def _query_exhaustive(
+    query_stack,
+    database_stack,
+    n_neighbors=10,
+    distance_measure="scaled_euclidean",
+    feature_weights=None,
+    kernel="vectorized",
+    n_cores=1,
+    tile_size=2000,
+    block_size=10000,
+):
+    """
+    Get the most similar database entries per query by comparing all query-database pairs tile
+    by tile (query structures found in the database are skipped). The database is processed
+    block by block, i.e. only the queries and one block of database fingerprints are stacked at
+    a time (the database is not copied as a whole).
+
+    Parameters
+    ----------
+    query_stack : kissim.comparison.FingerprintStack
+        Stacked query fingerprints.
+    database_stack : kissim.comparison.FingerprintStack
+        Stacked database fingerprints.
+    n_neighbors : int
+        Number of most similar database entries per query (k).
+    distance_measure : str
+        Distance measure.
+    feature_weights : None or list of float
+        Feature weights.
+    kernel : str
+        Kernel used to calculate feature distances.
+    n_cores : int
+        Number of cores used to generate fingerprint distances.
+    tile_size : int
+        Maximum number of query-database pairs per tile.
+    block_size : int
+        Maximum number of database fingerprints stacked with the queries at a time.
+
+    Returns
+    -------
+    neighbor_ixs : np.ndarray of int
+        Database fingerprint indices of the most similar database entries (queries x k); -1 if
+        not available.
+    distances : np.ndarray
+        Fingerprint distances (queries x k); NaN if not available.
+    """
+
+    n_queries = query_stack.n_fingerprints
+
+    # Neighbors per query; database indices are shifted by the number of queries (database
+    # entries follow the queries), so that they are never mistaken for the query itself
+    nearest_neighbors = NearestNeighbors.from_structure_klifs_ids(
+        query_stack.structure_klifs_ids, n_neighbors
+    )
+    query_structure_klifs_ids = np.array(query_stack.structure_klifs_ids)
+    database_structure_klifs_ids = np.array(database_stack.structure_klifs_ids)
+
+    for block_start in range(0, database_stack.n_fingerprints, block_size):
+        block_ixs = np.arange(
+            block_start, min(block_start + block_size, database_stack.n_fingerprints)
+        )
+
+        # Compare queries (first) with database block entries (second), tile by tile
+        fingerprint_stack = FingerprintStack.concatenate(
+            [query_stack, database_stack.subset(block_ixs)]
+        )
+        pair_tiles = FeatureDistancesArray.get_cross_pair_tiles(
+            n_queries, len(block_ixs), tile_size
+        )
+        feature_distances_tiles = FeatureDistancesArray.iter_tiles(
+            fingerprint_stack, distance_measure, pair_tiles, n_cores, kernel
+        )
+        for feature_distances_tile in feature_distances_tiles:
+            distances = feature_distances_tile.get_fingerprint_distances(
+                feature_weights, distance_measure
+            )
+            query_ixs, database_ixs = feature_distances_tile.pairs.T
+            database_ixs = database_ixs + block_start
+            # Skip query structures found in the database
+            distances[
+                query_structure_klifs_ids[query_ixs]
+                == database_structure_klifs_ids[database_ixs - n_queries]
+            ] = np.nan
+            nearest_neighbors.update(query_ixs, database_ixs, distances, symmetric=False)
+
+    neighbor_ixs = nearest_neighbors.neighbor_ixs
+    neighbor_ixs = np.where(neighbor_ixs >= 0, neighbor_ixs - n_queries, -1)
+    return neighbor_ixs, nearest_neighbors.distances
+
+
+def _get_database_stack(database):
+    """
+    Get stacked fingerprints for a fingerprint database.
+
+    Parameters
+    ----------
+    database : kissim.comparison.FingerprintStack, kissim.encoding.FingerprintGenerator, str, or
+        pathlib.Path
+        Stacked fingerprints, fingerprints, or path to npz or json file.
+
+    Returns
+    -------
+    kissim.comparison.FingerprintStack
+        Stacked fingerprints.
+    """
+
+    if isinstance(database, FingerprintStack):
+        return database
+    if isinstance(database, FingerprintGenerator):
+        return FingerprintStack.from_fingerprint_generator(database)
+    if isinstance(database, (str, Path)):
+        if Path(database).suffix == ".npz":
+            return FingerprintStack.from_npz(database)
+        return FingerprintStack.from_fingerprint_generator(
+            FingerprintGenerator.from_json(database)
+        )
+    raise TypeError(f"Fingerprint database of type {type(database)} is not supported.")
+
+
+def _get_query_stack(queries, database_stack, n_cores=1, local_klifs_session=None):
+    """
+    Get stacked fingerprints for queries. Queries given as structure KLIFS IDs are taken from the
+    database if available, else encoded on the fly.
+
+    Parameters
+    ----------
+    queries : kissim.encoding.FingerprintGenerator, kissim.comparison.FingerprintStack, or list
+        of int
+        Query fingerprints or structure KLIFS IDs.
+    database_stack : kissim.comparison.FingerprintStack
+        Stacked database fingerprints.
+    n_cores : int
+        Number of cores used to encode structures.
+    local_klifs_session : str or None
+        Path to local KLIFS download or None (remote KLIFS session).
+
+    Returns
+    -------
+    kissim.comparison.FingerprintStack
+        Stacked query fingerprints.
+    """
+
+    if isinstance(queries, FingerprintStack):
+        return queries
+    if isinstance(queries, FingerprintGenerator):
+        return FingerprintStack.from_fingerprint_generator(queries)
+
+    structure_klifs_ids = [int(i) for i in np.atleast_1d(queries)]
+    database_ixs = {
+        structure_klifs_id: i
+        for i, structure_klifs_id in enumerate(database_stack.structure_klifs_ids)
+    }
+    missing_structure_klifs_ids = [i for i in structure_klifs_ids if i not in database_ixs]
+    query_stacks = [
+        database_stack.subset([database_ixs[i] for i in structure_klifs_ids if i in database_ixs])
+    ]
+    if missing_structure_klifs_ids:
+        logger.info(f"Encode query structures: {missing_structure_klifs_ids}")
+        fingerprint_generator = encode(
+            missing_structure_klifs_ids, n_cores=n_cores, local_klifs_session=local_klifs_session
+        )
+        query_stacks.append(FingerprintStack.from_fingerprint_generator(fingerprint_generator))
+    return FingerprintStack.concatenate(query_stacks)
@@ -4,3 +4,4 @@ kissim.cli
 
 from .encode import encode_from_cli
 from .compare import compare_from_cli
+from .query import query_from_cli
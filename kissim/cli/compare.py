@@ -6,6 +6,7 @@ Compare encoded structures (fingerprints).
 
 from kissim.api import compare
 from kissim.cli.utils import configure_logger
+from kissim.definitions import FEATURE_WEIGHTING_SCHEMES
 from kissim.encoding import FingerprintGenerator
 
 
@@ -21,31 +22,87 @@ def compare_from_cli(args):
 
     configure_logger(args.output)
     fingerprint_generator = FingerprintGenerator.from_json(args.input)
+    if args.input2 is not None:
+        fingerprint_generator2 = FingerprintGenerator.from_json(args.input2)
+    else:
+        fingerprint_generator2 = None
     weights = _parse_weights(args.weights)
+    distance_measures = _parse_distance_measures(args.distance)
     compare(
         fingerprint_generator,
-        args.output,
-        args.ncores,
-        args.distance,
-        weights,
+        output_path=args.output,
+        n_cores=args.ncores,
+        distance_measure=distance_measures,
+        feature_weights=weights,
+        kernel=args.kernel,
+        min_coverage=args.min_coverage,
+        level=args.level,
+        fingerprint_generator2=fingerprint_generator2,
+        pairs=args.pairs,
+        n_neighbors=args.n_neighbors,
+        n_representatives=args.n_representatives,
+        collapse_duplicates=args.collapse_duplicates,
+        output_format=args.output_format,
+        max_distance=args.max_distance,
     )
 
 
+def _parse_distance_measures(args_distance):
+    """
+    Parse distance measures.
+
+    Parameters
+    ----------
+    args_distance : str or list of str
+        One or more distance measures.
+
+    Returns
+    -------
+    str or list of str
+        Distance measure or list of distance measures (if multiple distance measures are given).
+    """
+
+    if isinstance(args_distance, str):
+        return args_distance
+    if len(args_distance) == 1:
+        return args_distance[0]
+    return list(args_distance)
+
+
 def _parse_weights(args_weights):
     """
-    TODO
+    Parse feature weights.
+
+    Parameters
+    ----------
+    args_weights : str or list of str
+        One or more feature weighting schemes, each given either as scheme name (see
+        kissim.definitions.FEATURE_WEIGHTING_SCHEMES) or as 3 or 15 comma-separated floats.
+        Use "all" to select all named schemes.
+
+    Returns
+    -------
+    list of float or dict of str: list of float
+        Feature weights for a single weighting scheme or feature weights (values) per weighting
+        scheme name (keys) for multiple weighting schemes.
     """
 
-    feature_weighting_schemes = {
-        "100": [1.0, 0.0, 0.0],
-        "010": [0.0, 1.0, 0.0],
-        "001": [0.0, 0.0, 1.0],
-        "110": [0.5, 0.5, 0.0],
-        "101": [0.5, 0.0, 0.5],
-        "011": [0.0, 0.5, 0.5],
-        "111": [1.0 / 3, 1.0 / 3, 1.0 / 3],
-    }
-
-    weights = feature_weighting_schemes[args_weights]
+    if isinstance(args_weights, str):
+        args_weights = [args_weights]
+
+    if "all" in args_weights:
+        args_weights = [i for i in args_weights if i != "all"] + [
+            i for i in FEATURE_WEIGHTING_SCHEMES.keys() if i not in args_weights
+        ]
+
+    weights = {}
+    for args_weight in args_weights:
+        if args_weight in FEATURE_WEIGHTING_SCHEMES:
+            weights[args_weight] = FEATURE_WEIGHTING_SCHEMES[args_weight]
+        else:
+            weights[args_weight] = [float(i) for i in args_weight.split(",")]
+
+    if len(weights) == 1:
+        weights = list(weights.values())[0]
 
     return weights
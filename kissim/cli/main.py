@@ -12,7 +12,7 @@ Special thanks to @jaimergp for the pointers.
 
 import argparse
 
-from kissim.cli import encode_from_cli, compare_from_cli
+from kissim.cli import encode_from_cli, compare_from_cli, query_from_cli
 
 
 def main():
@@ -23,6 +23,7 @@ def main():
     Sub-commands are:
     - encode
     - compare
+    - query
     """
 
     parser = argparse.ArgumentParser()
@@ -30,6 +31,7 @@ def main():
 
     encode_subparser = subparsers.add_parser("encode")
     compare_subparser = subparsers.add_parser("compare")
+    query_subparser = subparsers.add_parser("query")
 
     # Arguments and function to be called for sub-command encode
     encode_subparser.add_argument(
@@ -72,29 +74,123 @@ def main():
         help="Path to json file containing fingerprint data",
         required=True,
     )
+    compare_subparser.add_argument(
+        "-i2",
+        "--input2",
+        type=str,
+        help="Path to json file containing second set of fingerprint data. If set, only pairs "
+        "between both sets are compared (cross-comparison).",
+        required=False,
+        default=None,
+    )
+    compare_subparser.add_argument(
+        "-p",
+        "--pairs",
+        type=str,
+        help="Path to txt file containing structure KLIFS ID pairs (one pair per row). If set, "
+        "only these pairs are compared.",
+        required=False,
+        default=None,
+    )
     compare_subparser.add_argument(
         "-o",
         "--output",
         type=str,
-        help="Path to output csv file containing pairwise fingerprint distances",
+        help="Path to output file: csv file containing pairwise fingerprint distances (structure "
+        "level), kinase pair distances (kinase level), or nearest neighbors (neighbors level), "
+        "npy file (condensed level), or npz file (sparse level)",
         required=True,
     )
     compare_subparser.add_argument(
         "-d",
         "--distance",
+        nargs="+",
         type=str,
-        help="Distance measure (scaled_euclidean or scaled_cityblock).",
+        help="Distance measure (scaled_euclidean or scaled_cityblock). Multiple distance measures "
+        "are calculated in a single pass.",
         required=False,
         default="scaled_euclidean",
     )
     compare_subparser.add_argument(
         "-w",
         "--weights",
+        nargs="+",
         type=str,
-        help="Feature weights.",
+        help="Feature weights: One or more weighting schemes (e.g. 001), 3 or 15 comma-separated "
+        "floats, or all (all weighting schemes). Multiple weighting schemes are compared in a "
+        "single pass.",
         required=False,
         default="001",
     )
+    compare_subparser.add_argument(
+        "-k",
+        "--kernel",
+        type=str,
+        help="Kernel for feature distances (vectorized or blas). The blas kernel calculates "
+        "scaled Euclidean distances via matrix multiplication.",
+        required=False,
+        default="vectorized",
+    )
+    compare_subparser.add_argument(
+        "-m",
+        "--min-coverage",
+        type=float,
+        help="Minimum fingerprint bit coverage. Fingerprint pairs below this coverage are skipped.",
+        required=False,
+        default=None,
+    )
+    compare_subparser.add_argument(
+        "--level",
+        type=str,
+        choices=["structure", "kinase", "neighbors", "condensed", "sparse"],
+        help="Comparison level: structure (all structure pairs), kinase (kinase pair aggregates "
+        "only), neighbors (k nearest neighbors per structure only), condensed (all structure "
+        "pairs written to a memory-mapped condensed distance matrix), or sparse (structure pairs "
+        "below a distance cutoff only, written as sparse matrix npz file); structure pairs are "
+        "not stored in memory for kinase, neighbors, condensed, and sparse levels.",
+        required=False,
+        default="structure",
+    )
+    compare_subparser.add_argument(
+        "-n",
+        "--n-neighbors",
+        type=int,
+        help="Number of nearest neighbors per structure (only used for neighbors level).",
+        required=False,
+        default=10,
+    )
+    compare_subparser.add_argument(
+        "-r",
+        "--n-representatives",
+        type=int,
+        help="Maximum number of representative structures (medoids) per kinase. If set, only "
+        "representatives are compared.",
+        required=False,
+        default=None,
+    )
+    compare_subparser.add_argument(
+        "--collapse-duplicates",
+        action="store_true",
+        help="Compare identical fingerprints only once (results are expanded to all structures).",
+        required=False,
+    )
+    compare_subparser.add_argument(
+        "-f",
+        "--output-format",
+        type=str,
+        choices=["csv", "columnar"],
+        help="Output format for structure level: csv or columnar (directory with binary columns "
+        "of int32 structure indices and float32 distances and coverages).",
+        required=False,
+        default="csv",
+    )
+    compare_subparser.add_argument(
+        "--max-distance",
+        type=float,
+        help="Distance cutoff (inclusive) for sparse level.",
+        required=False,
+        default=None,
+    )
     compare_subparser.add_argument(
         "-c",
         "--ncores",
@@ -105,5 +201,109 @@ def main():
     )
     compare_subparser.set_defaults(func=compare_from_cli)
 
+    # Arguments and function to be called for sub-command query
+    query_subparser.add_argument(
+        "-i",
+        "--input",
+        nargs="+",
+        type=str,
+        help="List of query structure KLIFS IDs, path to txt file containing query structure "
+        "KLIFS IDs, or path to json file containing query fingerprint data",
+        required=True,
+    )
+    query_subparser.add_argument(
+        "-db",
+        "--database",
+        type=str,
+        help="Path to fingerprint database: npz file containing stacked fingerprints or json file "
+        "containing fingerprint data",
+        required=True,
+    )
+    query_subparser.add_argument(
+        "-o",
+        "--output",
+        type=str,
+        help="Path to output csv file containing the most similar database entries per query",
+        required=True,
+    )
+    query_subparser.add_argument(
+        "-n",
+        "--n-neighbors",
+        type=int,
+        help="Number of most similar database entries per query.",
+        required=False,
+        default=10,
+    )
+    query_subparser.add_argument(
+        "-d",
+        "--distance",
+        type=str,
+        help="Distance measure (scaled_euclidean or scaled_cityblock).",
+        required=False,
+        default="scaled_euclidean",
+    )
+    query_subparser.add_argument(
+        "-w",
+        "--weights",
+        type=str,
+        help="Feature weighting scheme (e.g. 001).",
+        required=False,
+        default="001",
+    )
+    query_subparser.add_argument(
+        "-k",
+        "--kernel",
+        type=str,
+        help="Kernel for feature distances (vectorized or blas).",
+        required=False,
+        default="vectorized",
+    )
+    query_subparser.add_argument(
+        "-m",
+        "--method",
+        type=str,
+        choices=["exhaustive", "pruned", "tree", "two_stage"],
+        help="Search method: exhaustive (all query-database pairs), pruned (exact search "
+        "skipping database entries based on lower bounds of their distances), tree (exact "
+        "search in a tree over moments for moments-only weights such as 001, else pruned), or "
+        "two_stage (approximate search screening with moments and re-ranking the best "
+        "candidates).",
+        required=False,
+        default="exhaustive",
+    )
+    query_subparser.add_argument(
+        "--n-candidates",
+        type=int,
+        help="Number of candidates re-ranked with all features (only used for two_stage method).",
+        required=False,
+        default=100,
+    )
+    query_subparser.add_argument(
+        "--n-recall-samples",
+        type=int,
+        help="Number of database entries sampled as queries to log the recall of the two_stage "
+        "method compared to an exact search (only used for two_stage method). If not set, the "
+        "recall is not evaluated.",
+        required=False,
+        default=None,
+    )
+    query_subparser.add_argument(
+        "-l",
+        "--local",
+        type=str,
+        help="Path to KLIFS download folder (used to encode query structures that are not in the "
+        "database). If set local KLIFS data is used, else remote KLIFS data",
+        required=False,
+    )
+    query_subparser.add_argument(
+        "-c",
+        "--ncores",
+        type=int,
+        help="Number of cores. If 1 query in sequence, else in parallel.",
+        required=False,
+        default=1,
+    )
+    query_subparser.set_defaults(func=query_from_cli)
+
     args = parser.parse_args()
     args.func(args)
@@ -0,0 +1,61 @@
+"""
+kissim.cli.query
+
+Query fingerprints against a precomputed fingerprint database from CLI arguments.
+"""
+
+from pathlib import Path
+
+from kissim.api import query
+from kissim.cli.encode import _parse_structure_klifs_ids
+from kissim.cli.utils import configure_logger
+from kissim.encoding import FingerprintGenerator
+
+
+def query_from_cli(args):
+    """
+    Query fingerprints.
+
+    Parameters
+    ----------
+    args : argsparse.Namespace
+        CLI arguments.
+    """
+
+    configure_logger(args.output)
+    queries = _parse_queries(args.input)
+    results = query(
+        queries,
+        args.database,
+        args.n_neighbors,
+        args.distance,
+        args.weights,
+        args.kernel,
+        args.ncores,
+        args.local,
+        method=args.method,
+        n_candidates=args.n_candidates,
+        n_recall_samples=args.n_recall_samples,
+    )
+    results.to_csv(args.output, index=False)
+
+
+def _parse_queries(args_input):
+    """
+    Parse queries.
+
+    Parameters
+    ----------
+    args_input : list of str
+        Either path to json file with query fingerprints, path to txt file with structure KLIFS
+        IDs (one ID per row), or one or more structure KLIFS IDs.
+
+    Returns
+    -------
+    kissim.encoding.FingerprintGenerator or list of int
+        Query fingerprints or structure KLIFS IDs.
+    """
+
+    if len(args_input) == 1 and Path(args_input[0]).suffix == ".json":
+        return FingerprintGenerator.from_json(args_input[0])
+    return _parse_structure_klifs_ids(args_input)
@@ -4,5 +4,20 @@ kissim.comparison
 
 from .feature_distances import FeatureDistances
 from .feature_distances_generator import FeatureDistancesGenerator
+from .fingerprint_stack import FingerprintStack
 from .fingerprint_distance import FingerprintDistance
+from .feature_distances_array import FeatureDistancesArray
+from .kinase_distance_accumulator import KinaseDistanceAccumulator
+from .nearest_neighbors import NearestNeighbors
+from .pruned_search import PrunedSearch
+from .moments_tree import MomentsTree
+from .two_stage_search import TwoStageSearch
+from .fingerprint_embedding import FingerprintEmbedding
+from .lsh_index import LshIndex
+from .clustering import HierarchicalClustering
+from .kinase_representatives import KinaseRepresentatives
+from .fingerprint_duplicates import FingerprintDuplicates
+from .condensed_distances import CondensedDistances
+from .fingerprint_distance_writer import FingerprintDistanceWriter
+from .sparse_distances import SparseDistances
 from .fingerprint_distance_generator import FingerprintDistanceGenerator
@@ -0,0 +1,276 @@
+"""
+kissim.comparison.clustering
+
+Defines the hierarchical clustering of structures or kinases based on condensed distance
+matrices, with export to Newick trees and flat clusters.
+"""
+
+import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy.cluster.hierarchy import fcluster, linkage
+
+logger = logging.getLogger(__name__)
+
+CLUSTERING_METHODS = ["single", "complete", "average", "weighted"]
+
+
+class HierarchicalClustering:
+    """
+    Hierarchical (agglomerative) clustering of structures or kinases, computed directly from a
+    condensed distance matrix (upper triangle in row-major order as used by scipy's `pdist`),
+    i.e. without square distance matrices.
+
+    Attributes
+    ----------
+    labels : list of str or int
+        Leaf labels (e.g. structure KLIFS IDs or kinase names; define the leaf order).
+    method : str
+        Linkage method.
+    linkage_matrix : np.ndarray
+        Linkage matrix as returned by scipy.cluster.hierarchy.linkage ((leaves - 1) x 4).
+    """
+
+    def __init__(self):
+
+        self.labels = None
+        self.method = None
+        self.linkage_matrix = None
+
+    @property
+    def n_leaves(self):
+        """
+        Number of leaves.
+
+        Returns
+        -------
+        int
+            Number of leaves.
+        """
+
+        return len(self.labels)
+
+    @classmethod
+    def from_condensed(cls, condensed, labels, method="average", nan_distance=None):
+        """
+        Cluster leaves based on a condensed distance matrix (e.g. float32 fingerprint distances
+        for all structure pairs).
+
+        Memory: The condensed distances are converted to one float64 vector (no copy if
+        already float64 without NaN values); scipy's linkage (except for method "single") works
+        on one more copy of it. No square matrix is generated.
+
+        Parameters
+        ----------
+        condensed : np.ndarray
+            Condensed distance matrix (leaves x (leaves - 1) / 2), e.g. as generated by
+            kissim.comparison.FingerprintDistanceGenerator.get_structure_distance_condensed.
+        labels : list of str or int
+            Leaf labels (same order as in condensed distance matrix).
+        method : str
+            Linkage method: single, complete, average (default), or weighted.
+        nan_distance : None or float
+            Distance used for leaf pairs without distance (NaN). If None (default), the
+            maximum distance is used.
+
+        Returns
+        -------
+        kissim.comparison.HierarchicalClustering
+            Clustering.
+        """
+
+        if method not in CLUSTERING_METHODS:
+            raise ValueError(f'Method unknown. Choose from: {", ".join(CLUSTERING_METHODS)}')
+        n_leaves = len(labels)
+        if n_leaves < 2 or len(condensed) != n_leaves * (n_leaves - 1) // 2:
+            raise ValueError(
+                f"Condensed distance matrix of length {len(condensed)} does not match "
+                f"{n_leaves} labels (at least 2 labels required)."
+            )
+
+        distances = np.asarray(condensed, dtype=np.float64)
+        is_nan = np.isnan(distances)
+        if is_nan.any():
+            if nan_distance is None:
+                nan_distance = np.nanmax(distances) if not is_nan.all() else 0.0
+            logger.info(f"Set {is_nan.sum()} NaN distances to {nan_distance}")
+            if np.may_share_memory(distances, condensed):
+                distances = distances.copy()
+            distances[is_nan] = nan_distance
+        del is_nan
+
+        clustering = cls()
+        clustering.labels = list(labels)
+        clustering.method = method
+        clustering.linkage_matrix = linkage(distances, method=method)
+        return clustering
+
+    @classmethod
+    def from_fingerprint_distance_generator(
+        cls, fingerprint_distance_generator, method="average", nan_distance=None
+    ):
+        """
+        Cluster structures based on fingerprint distances.
+
+        Parameters
+        ----------
+        fingerprint_distance_generator : kissim.comparison.FingerprintDistanceGenerator
+            Fingerprint distances.
+        method : str
+            Linkage method: single, complete, average (default), or weighted.
+        nan_distance : None or float
+            Distance used for structure pairs without distance (NaN). If None (default), the
+            maximum distance is used.
+
+        Returns
+        -------
+        kissim.comparison.HierarchicalClustering
+            Clustering (leaf labels are molecule codes).
+        """
+
+        return cls.from_condensed(
+            fingerprint_distance_generator.get_structure_distance_condensed(),
+            fingerprint_distance_generator.molecule_codes,
+            method,
+            nan_distance,
+        )
+
+    @classmethod
+    def from_kinase_distance_accumulator(
+        cls, kinase_distance_accumulator, by="minimum", method="average", nan_distance=None
+    ):
+        """
+        Cluster kinases based on kinase distances.
+
+        Parameters
+        ----------
+        kinase_distance_accumulator : kissim.comparison.KinaseDistanceAccumulator
+            Kinase distances.
+        by : str
+            Condition on which the distance value per kinase pair is extracted from the set of
+            distances values per structure pair: minimum (default), maximum, or mean.
+        method : str
+            Linkage method: single, complete, average (default), or weighted.
+        nan_distance : None or float
+            Distance used for kinase pairs without distance (NaN). If None (default), the
+            maximum distance is used.
+
+        Returns
+        -------
+        kissim.comparison.HierarchicalClustering
+            Clustering (leaf labels are kinase names).
+        """
+
+        # Kinase matrices are small (kinases x kinases)
+        kinase_distance_matrix = kinase_distance_accumulator.get_matrix(by)
+        condensed = kinase_distance_matrix.to_numpy()[
+            np.triu_indices(kinase_distance_accumulator.n_kinases, k=1)
+        ]
+        return cls.from_condensed(
+            condensed, kinase_distance_accumulator.kinase_names, method, nan_distance
+        )
+
+    def get_flat_clusters(self, n_clusters=None, distance_threshold=None):
+        """
+        Get flat clusters, either a fixed number of clusters or clusters cut at a distance
+        threshold.
+
+        Parameters
+        ----------
+        n_clusters : None or int
+            Maximum number of clusters.
+        distance_threshold : None or float
+            Maximum cophenetic distance within clusters.
+
+        Returns
+        -------
+        pandas.Series
+            Cluster ID (starting at 1) per leaf label.
+        """
+
+        if (n_clusters is None) == (distance_threshold is None):
+            raise ValueError("Set either the number of clusters or the distance threshold.")
+
+        if n_clusters is not None:
+            cluster_ids = fcluster(self.linkage_matrix, n_clusters, criterion="maxclust")
+        else:
+            cluster_ids = fcluster(self.linkage_matrix, distance_threshold, criterion="distance")
+
+        clusters = pd.Series(cluster_ids, index=self.labels, name="cluster")
+        clusters.index.name = "label"
+        return clusters
+
+    def to_newick(self, filepath=None):
+        """
+        Get the clustering as tree in Newick format (branch lengths are differences in linkage
+        heights). The tree is traversed iteratively, so that deep trees are supported.
+
+        Parameters
+        ----------
+        filepath : None or str or pathlib.Path
+            Path to Newick file. If None (default), no file is written.
+
+        Returns
+        -------
+        str
+            Tree in Newick format.
+        """
+
+        heights = np.concatenate([np.zeros(self.n_leaves), self.linkage_matrix[:, 2]])
+        children = self.linkage_matrix[:, :2].astype(np.int64)
+        labels = [self._format_newick_label(label) for label in self.labels]
+
+        # Stack of nodes (node index, parent height) and text tokens (str)
+        tokens = []
+        root = 2 * self.n_leaves - 2
+        stack = [(root, None)]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, str):
+                tokens.append(item)
+                continue
+            node, parent_height = item
+            branch_length = (
+                "" if parent_height is None else f":{parent_height - heights[node]:.6g}"
+            )
+            if node < self.n_leaves:
+                tokens.append(f"{labels[node]}{branch_length}")
+            else:
+                child1, child2 = children[node - self.n_leaves]
+                tokens.append("(")
+                stack.extend(
+                    [
+                        f"){branch_length}",
+                        (child2, heights[node]),
+                        ",",
+                        (child1, heights[node]),
+                    ]
+                )
+        newick = "".join(tokens) + ";"
+
+        if filepath is not None:
+            Path(filepath).write_text(newick + "\n")
+        return newick
+
+    @staticmethod
+    def _format_newick_label(label):
+        """
+        Format leaf label for Newick format (quoted if label contains special characters).
+
+        Parameters
+        ----------
+        label : str or int
+            Leaf label.
+
+        Returns
+        -------
+        str
+            Formatted leaf label.
+        """
+
+        label = str(label)
+        if any(character in label for character in " ()[]':;,"):
+            label = "'" + label.replace("'", "''") + "'"
+        return label
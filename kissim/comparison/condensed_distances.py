@@ -0,0 +1,359 @@
+"""
+kissim.comparison.condensed_distances
+
+Defines fingerprint distances and coverages for all structure pairs stored as memory-mapped
+condensed distance matrices.
+"""
+
+import json
+import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from . import FingerprintDistance
+from .utils import get_condensed_index, get_square_indices
+
+logger = logging.getLogger(__name__)
+
+
+class CondensedDistances:
+    """
+    Fingerprint distances and coverages for all structure pairs, stored as float32 condensed
+    distance matrices (upper triangle in row-major order as used by scipy's `pdist`) in one
+    memory-mapped npy file (2 x pairs: distances, coverages). Structure KLIFS IDs and kinase names
+    (defining the structure order) are stored in a small json sidecar file next to it (same file
+    name with suffix .json).
+
+    Structure pair distances can be written in chunks (e.g. tile by tile), so that neither
+    the structure pairs nor the matrix need to be held in memory; structure pairs without
+    distance are NaN. Opening the file (`from_file`) does not read the matrix.
+
+    Attributes
+    ----------
+    filepath : pathlib.Path
+        Path to npy file.
+    structure_klifs_ids : list of int
+        Structure KLIFS IDs (define the structure indices).
+    kinase_names : list of str
+        Kinase names (one per structure).
+    distance_measure : None or str
+        Distance measure.
+    feature_weights : None or list of float
+        Feature weights (15 floats).
+    values : np.memmap
+        Fingerprint distances and coverages (2 x pairs).
+    """
+
+    def __init__(self):
+
+        self.filepath = None
+        self.structure_klifs_ids = None
+        self.kinase_names = None
+        self.distance_measure = None
+        self.feature_weights = None
+        self.values = None
+
+    @property
+    def n_structures(self):
+        """
+        Number of structures.
+
+        Returns
+        -------
+        int
+            Number of structures.
+        """
+
+        return len(self.structure_klifs_ids)
+
+    @property
+    def distances(self):
+        """
+        Fingerprint distances (condensed distance matrix).
+
+        Returns
+        -------
+        np.memmap
+            Fingerprint distances (pairs).
+        """
+
+        return self.values[0]
+
+    @property
+    def coverages(self):
+        """
+        Fingerprint coverages (condensed matrix).
+
+        Returns
+        -------
+        np.memmap
+            Fingerprint coverages (pairs).
+        """
+
+        return self.values[1]
+
+    @classmethod
+    def from_structure_klifs_ids(
+        cls,
+        filepath,
+        structure_klifs_ids,
+        kinase_names,
+        distance_measure=None,
+        feature_weights=None,
+    ):
+        """
+        Create files for empty condensed distances (all NaN) for a set of structures.
+
+        Parameters
+        ----------
+        filepath : str or pathlib.Path
+            Path to npy file (sidecar file is written to the same path with suffix .json).
+        structure_klifs_ids : list of int
+            Structure KLIFS IDs; structure indices passed to `update` refer to this list.
+        kinase_names : list of str
+            Kinase names (one per structure).
+        distance_measure : None or str
+            Distance measure (metadata only).
+        feature_weights : None or list of float
+            Feature weights (see kissim.comparison.FingerprintDistance; metadata only).
+
+        Returns
+        -------
+        kissim.comparison.CondensedDistances
+            Empty condensed distances (opened for writing).
+        """
+
+        if len(kinase_names) != len(structure_klifs_ids):
+            raise ValueError("Number of kinase names does not match number of structures.")
+
+        condensed_distances = cls()
+        condensed_distances.filepath = Path(filepath)
+        condensed_distances.structure_klifs_ids = [int(i) for i in structure_klifs_ids]
+        condensed_distances.kinase_names = [str(i) for i in kinase_names]
+        condensed_distances.distance_measure = distance_measure
+        condensed_distances.feature_weights = (
+            FingerprintDistance()._format_weights(feature_weights).tolist()
+        )
+
+        n_structures = condensed_distances.n_structures
+        condensed_distances.values = np.lib.format.open_memmap(
+            condensed_distances.filepath,
+            mode="w+",
+            dtype=np.float32,
+            shape=(2, n_structures * (n_structures - 1) // 2),
+        )
+        condensed_distances.values[:] = np.nan
+        condensed_distances._to_sidecar()
+
+        logger.info(
+            f"Condensed distances for {n_structures} structures: {condensed_distances.filepath}"
+        )
+
+        return condensed_distances
+
+    @classmethod
+    def from_file(cls, filepath, mode="r"):
+        """
+        Open condensed distances from files (memory-mapped, i.e. values are read on access).
+
+        Parameters
+        ----------
+        filepath : str or pathlib.Path
+            Path to npy file (with sidecar json file next to it).
+        mode : str
+            Memory map mode: "r" (default; read-only) or "r+" (read and write).
+
+        Returns
+        -------
+        kissim.comparison.CondensedDistances
+            Condensed distances.
+        """
+
+        filepath = Path(filepath)
+        with open(filepath.with_suffix(".json"), "r") as f:
+            sidecar = json.load(f)
+
+        condensed_distances = cls()
+        condensed_distances.filepath = filepath
+        condensed_distances.structure_klifs_ids = sidecar["structure_klifs_ids"]
+        condensed_distances.kinase_names = sidecar["kinase_names"]
+        condensed_distances.distance_measure = sidecar["distance_measure"]
+        condensed_distances.feature_weights = sidecar["feature_weights"]
+        condensed_distances.values = np.load(filepath, mmap_mode=mode)
+
+        n_structures = condensed_distances.n_structures
+        if condensed_distances.values.shape != (2, n_structures * (n_structures - 1) // 2):
+            raise ValueError("Condensed distances do not match structures in sidecar file.")
+
+        return condensed_distances
+
+    def update_from_feature_distances_array(
+        self, feature_distances_array, feature_weights=None, distance_measure=None
+    ):
+        """
+        Write fingerprint distances and coverages for all fingerprint pairs in feature distances.
+        Structure KLIFS IDs must be the structure KLIFS IDs of the feature distances.
+
+        Parameters
+        ----------
+        feature_distances_array : kissim.comparison.FeatureDistancesArray
+            Feature distances.
+        feature_weights : None or list of float
+            Feature weights (see kissim.comparison.FingerprintDistance).
+        distance_measure : str or None
+            Distance measure. If None (default), the first distance measure is used.
+        """
+
+        if feature_distances_array.structure_klifs_ids != self.structure_klifs_ids:
+            raise ValueError("Structures of feature distances do not match structure KLIFS IDs.")
+
+        distances = feature_distances_array.get_fingerprint_distances(
+            feature_weights, distance_measure
+        )
+        coverages = feature_distances_array.bit_coverages @ FingerprintDistance()._format_weights(
+            feature_weights
+        )
+        self.update(
+            feature_distances_array.pairs[:, 0],
+            feature_distances_array.pairs[:, 1],
+            distances,
+            coverages,
+        )
+
+    def update(self, structure_ixs1, structure_ixs2, distances, coverages):
+        """
+        Write fingerprint distances and coverages for structure pairs (unordered). Self pairs are
+        skipped.
+
+        Parameters
+        ----------
+        structure_ixs1 : np.ndarray of int
+            Structure indices (positions in `structure_klifs_ids`) for first structure per pair.
+        structure_ixs2 : np.ndarray of int
+            Structure indices (positions in `structure_klifs_ids`) for second structure per pair.
+        distances : np.ndarray of float
+            Fingerprint distance per structure pair.
+        coverages : np.ndarray of float
+            Fingerprint coverage per structure pair.
+        """
+
+        structure_ixs1 = np.asarray(structure_ixs1, dtype=np.int64)
+        structure_ixs2 = np.asarray(structure_ixs2, dtype=np.int64)
+        is_pair = structure_ixs1 != structure_ixs2
+
+        condensed_ixs = self.get_condensed_index(structure_ixs1[is_pair], structure_ixs2[is_pair])
+        self.values[0, condensed_ixs] = np.asarray(distances)[is_pair]
+        self.values[1, condensed_ixs] = np.asarray(coverages)[is_pair]
+
+    def flush(self):
+        """
+        Write pending changes of the memory-mapped values to disk.
+        """
+
+        self.values.flush()
+
+    def get_condensed_index(self, structure_ixs1, structure_ixs2):
+        """
+        Get the condensed index for structure pairs (i, j) with i != j.
+
+        Parameters
+        ----------
+        structure_ixs1 : int or np.ndarray of int
+            Structure index (or indices) i.
+        structure_ixs2 : int or np.ndarray of int
+            Structure index (or indices) j.
+
+        Returns
+        -------
+        int or np.ndarray of int
+            Condensed index (or indices).
+        """
+
+        return get_condensed_index(structure_ixs1, structure_ixs2, self.n_structures)
+
+    def get_square_indices(self, condensed_ixs):
+        """
+        Get the structure pairs (i, j) with i < j for condensed indices.
+
+        Parameters
+        ----------
+        condensed_ixs : int or np.ndarray of int
+            Condensed index (or indices).
+
+        Returns
+        -------
+        tuple of (int or np.ndarray of int)
+            Structure index (or indices) i and j.
+        """
+
+        return get_square_indices(condensed_ixs, self.n_structures)
+
+    def get_structure_ixs(self, structure_klifs_ids):
+        """
+        Get structure indices for structure KLIFS IDs.
+
+        Parameters
+        ----------
+        structure_klifs_ids : int or array-like of int
+            Structure KLIFS ID(s).
+
+        Returns
+        -------
+        int or np.ndarray of int
+            Structure index (or indices).
+        """
+
+        structure_ixs = pd.Index(self.structure_klifs_ids).get_indexer(
+            np.atleast_1d(structure_klifs_ids)
+        )
+        if (structure_ixs < 0).any():
+            raise ValueError("Structure KLIFS IDs unknown to condensed distances.")
+        return structure_ixs if np.ndim(structure_klifs_ids) > 0 else int(structure_ixs[0])
+
+    def get_row(self, structure_klifs_id):
+        """
+        Get fingerprint distances and coverages of one structure to all structures (one row of
+        the square distance matrix). Only the values of this row are read from file.
+
+        Parameters
+        ----------
+        structure_klifs_id : int
+            Structure KLIFS ID.
+
+        Returns
+        -------
+        pandas.DataFrame
+            Kinase name, distance, and coverage (rows, NaN for the structure itself) per structure
+            KLIFS ID (index).
+        """
+
+        structure_ix = self.get_structure_ixs(structure_klifs_id)
+        other_ixs = np.delete(np.arange(self.n_structures), structure_ix)
+        condensed_ixs = self.get_condensed_index(structure_ix, other_ixs)
+
+        # Row values (float64; the structure itself is NaN)
+        values = np.full((2, self.n_structures), np.nan)
+        values[:, other_ixs] = self.values[:, condensed_ixs]
+
+        row = pd.DataFrame(
+            {"kinase_name": self.kinase_names, "distance": values[0], "coverage": values[1]},
+            index=pd.Index(self.structure_klifs_ids, name="structure_klifs_id"),
+        )
+        return row
+
+    def _to_sidecar(self):
+        """
+        Write structure KLIFS IDs, kinase names, distance measure, and feature weights to the json
+        sidecar file.
+        """
+
+        sidecar = {
+            "structure_klifs_ids": self.structure_klifs_ids,
+            "kinase_names": self.kinase_names,
+            "distance_measure": self.distance_measure,
+            "feature_weights": self.feature_weights,
+        }
+        with open(self.filepath.with_suffix(".json"), "w") as f:
+            json.dump(sidecar, f)
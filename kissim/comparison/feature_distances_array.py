@@ -0,0 +1,876 @@
+"""
+kissim.comparison.feature_distances_array
+
+Defines the feature distances for multiple fingerprint pairs, stored as arrays and generated in
+vectorized tiles of fingerprint pairs.
+"""
+
+import datetime
+from itertools import chain, repeat
+import logging
+from multiprocessing import Pool
+
+import numpy as np
+
+from . import FingerprintStack, FingerprintDistance
+from .kernels import (
+    calculate_feature_distances,
+    calculate_feature_distances_blas,
+    check_distance_measures,
+    check_kernel,
+)
+from .utils import get_block_pair_tiles, get_condensed_index, get_pair_tiles
+
+logger = logging.getLogger(__name__)
+
+# Fingerprint stack shared with worker processes (set once per worker by the pool initializer)
+_FINGERPRINT_STACK = None
+
+
+class FeatureDistancesArray:
+    """
+    Feature distances and bit coverages for multiple fingerprint pairs, stored as arrays.
+    Feature distances are generated in tiles of fingerprint pairs using vectorized kernels,
+    optionally for multiple distance measures in one pass.
+
+    Attributes
+    ----------
+    distance_measures : list of str
+        Distance measures.
+    structure_klifs_ids : list of int
+        Structure KLIFS IDs; fingerprint pairs refer to structures by their index in this list.
+    structure_kinase_names : list of str
+        Kinase names (one per structure KLIFS ID).
+    structure_kinase_codes : np.ndarray of int
+        Kinase codes (one per structure KLIFS ID), i.e. positions of kinase names in
+        `kinase_categories`.
+    kinase_categories : list of str
+        Unique kinase names of all structures (sorted alphabetically).
+    pairs : np.ndarray
+        Fingerprint pairs as structure indices (pairs x 2).
+    distances : dict of str: np.ndarray
+        Feature distances (pairs x 15 features) per distance measure.
+    bit_numbers : np.ndarray
+        Number of bit pairs free of NaN values, i.e. integer feature bit coverages (pairs x 15
+        features).
+    n_bits : np.ndarray
+        Number of bits per feature (15 features).
+    """
+
+    def __init__(self):
+
+        self.distance_measures = None
+        self.structure_klifs_ids = None
+        self.structure_kinase_names = None
+        self.structure_kinase_codes = None
+        self.kinase_categories = None
+        self.pairs = None
+        self.distances = None
+        self.bit_numbers = None
+        self.n_bits = None
+
+    @property
+    def n_pairs(self):
+        """
+        Number of fingerprint pairs.
+
+        Returns
+        -------
+        int
+            Number of fingerprint pairs.
+        """
+
+        return len(self.pairs)
+
+    @property
+    def bit_coverages(self):
+        """
+        Feature bit coverages, i.e. fraction of bit pairs free of NaN values (rounded to two
+        decimals as in kissim.comparison.FeatureDistances).
+
+        Returns
+        -------
+        np.ndarray
+            Feature bit coverages (pairs x 15 features).
+        """
+
+        if self.bit_numbers is not None:
+            return np.round(self.bit_numbers / self.n_bits, 2)
+
+    @property
+    def molecule_codes(self):
+        """
+        Unique molecule codes associated with all fingerprint pairs (sorted alphabetically).
+
+        Returns
+        -------
+        list of str or int
+            Molecule codes.
+        """
+
+        if self.pairs is not None:
+            structure_ixs = np.unique(self.pairs)
+            return sorted([self.structure_klifs_ids[i] for i in structure_ixs])
+
+    @property
+    def kinase_names(self):
+        """
+        Unique kinase names associated with all fingerprint pairs (sorted alphabetically).
+
+        Returns
+        -------
+        list of str
+            Kinase names.
+        """
+
+        if self.pairs is not None:
+            structure_ixs = np.unique(self.pairs)
+            return sorted(set([self.structure_kinase_names[i] for i in structure_ixs]))
+
+    @property
+    def molecule_pair_codes(self):
+        """
+        Molecule codes for fingerprint pairs.
+
+        Returns
+        -------
+        tuple of np.ndarray
+            Molecule codes for first and second fingerprint per pair.
+        """
+
+        if self.pairs is not None:
+            structure_klifs_ids = np.array(self.structure_klifs_ids, dtype=object)
+            return structure_klifs_ids[self.pairs[:, 0]], structure_klifs_ids[self.pairs[:, 1]]
+
+    @property
+    def kinase_pair_codes(self):
+        """
+        Kinase codes (positions in `kinase_categories`) for fingerprint pairs.
+
+        Returns
+        -------
+        tuple of np.ndarray
+            Kinase codes for first and second fingerprint per pair.
+        """
+
+        if self.pairs is not None:
+            return (
+                self.structure_kinase_codes[self.pairs[:, 0]],
+                self.structure_kinase_codes[self.pairs[:, 1]],
+            )
+
+    def get_fingerprint_distances(self, feature_weights=None, distance_measure=None):
+        """
+        Get fingerprint distances, i.e. weighted sums of feature distances, for all fingerprint
+        pairs.
+
+        Parameters
+        ----------
+        feature_weights : None or list of float
+            Feature weights (see kissim.comparison.FingerprintDistance).
+        distance_measure : str or None
+            Distance measure. If None (default), the first distance measure is used.
+
+        Returns
+        -------
+        np.ndarray
+            Fingerprint distances (pairs).
+        """
+
+        if distance_measure is None:
+            distance_measure = self.distance_measures[0]
+        feature_weights = FingerprintDistance()._format_weights(feature_weights)
+        return self.distances[distance_measure] @ feature_weights
+
+    @classmethod
+    def from_fingerprint_generator(
+        cls,
+        fingerprint_generator,
+        distance_measures="scaled_euclidean",
+        n_cores=1,
+        tile_size=2000,
+        kernel="vectorized",
+        min_coverage=None,
+        feature_weights=None,
+    ):
+        """
+        Calculate feature distances for all possible fingerprint pair combinations, given one or
+        more distance measures.
+
+        Parameters
+        ----------
+        fingerprint_generator : kissim.encoding.FingerprintGenerator
+            Multiple fingerprints.
+        distance_measures : str or list of str
+            One or more distance measures, defaults to scaled Euclidean distance.
+        n_cores : int
+            Number of cores. If 1 tiles are processed in sequence, else in parallel.
+        tile_size : int
+            Maximum number of fingerprint pairs per tile.
+        kernel : str
+            Kernel used to calculate feature distances per tile: "vectorized" (default) or "blas"
+            (scaled Euclidean distances via matrix multiplication; benefits from large tiles and
+            from leaving all cores to BLAS, i.e. n_cores=1).
+        min_coverage : None or float
+            Minimum fingerprint bit coverage. If set, only fingerprint pairs reaching this
+            coverage (given the feature weights) are compared.
+        feature_weights : None, list of float, or dict of str: list of float
+            Feature weights used to calculate the fingerprint bit coverage (only used if
+            `min_coverage` is set). If multiple weighting schemes are given as dictionary,
+            fingerprint pairs reaching the minimum coverage for at least one scheme are compared.
+
+        Returns
+        -------
+        kissim.comparison.FeatureDistancesArray
+            Feature distances.
+        """
+
+        fingerprint_stack = FingerprintStack.from_fingerprint_generator(fingerprint_generator)
+        return cls.from_fingerprint_stack(
+            fingerprint_stack,
+            distance_measures,
+            n_cores,
+            tile_size,
+            kernel,
+            min_coverage,
+            feature_weights,
+        )
+
+    @classmethod
+    def from_fingerprint_generators(
+        cls,
+        fingerprint_generator1,
+        fingerprint_generator2,
+        distance_measures="scaled_euclidean",
+        n_cores=1,
+        tile_size=2000,
+        kernel="vectorized",
+        min_coverage=None,
+        feature_weights=None,
+    ):
+        """
+        Calculate feature distances for all fingerprint pairs between two sets of fingerprints
+        (rectangular block), given one or more distance measures. Fingerprint pairs within each
+        set are not compared.
+
+        Parameters
+        ----------
+        fingerprint_generator1 : kissim.encoding.FingerprintGenerator
+            First set of fingerprints.
+        fingerprint_generator2 : kissim.encoding.FingerprintGenerator
+            Second set of fingerprints.
+        distance_measures : str or list of str
+            One or more distance measures, defaults to scaled Euclidean distance.
+        n_cores : int
+            Number of cores. If 1 tiles are processed in sequence, else in parallel.
+        tile_size : int
+            Maximum number of fingerprint pairs per tile.
+        kernel : str
+            Kernel used to calculate feature distances per tile: "vectorized" (default) or "blas".
+        min_coverage : None or float
+            Minimum fingerprint bit coverage (see `from_fingerprint_stack`).
+        feature_weights : None, list of float, or dict of str: list of float
+            Feature weights used to calculate the fingerprint bit coverage (see
+            `from_fingerprint_stack`).
+
+        Returns
+        -------
+        kissim.comparison.FeatureDistancesArray
+            Feature distances (structures of first set followed by structures of second set;
+            first fingerprint per pair from first set, second fingerprint from second set).
+        """
+
+        fingerprint_stack1 = FingerprintStack.from_fingerprint_generator(fingerprint_generator1)
+        fingerprint_stack2 = FingerprintStack.from_fingerprint_generator(fingerprint_generator2)
+        fingerprint_stack = FingerprintStack.concatenate([fingerprint_stack1, fingerprint_stack2])
+        pair_tiles = cls.get_cross_pair_tiles(
+            fingerprint_stack1.n_fingerprints, fingerprint_stack2.n_fingerprints, tile_size
+        )
+        return cls.from_fingerprint_stack(
+            fingerprint_stack,
+            distance_measures,
+            n_cores,
+            tile_size,
+            kernel,
+            min_coverage,
+            feature_weights,
+            pair_tiles,
+        )
+
+    @staticmethod
+    def get_cross_pair_tiles(n1, n2, tile_size=2000):
+        """
+        Get all fingerprint pairs between two sets of fingerprints stacked one after the other
+        (first set: indices 0 to n1 - 1; second set: indices n1 to n1 + n2 - 1), split into tiles.
+
+        Parameters
+        ----------
+        n1 : int
+            Number of fingerprints in first set.
+        n2 : int
+            Number of fingerprints in second set.
+        tile_size : int
+            Maximum number of fingerprint pairs per tile.
+
+        Yields
+        ------
+        tuple of np.ndarray of int
+            Fingerprint indices i (first set) and j (second set) for pairs in tile.
+        """
+
+        for ixs1, ixs2 in get_block_pair_tiles(n1, n2, tile_size):
+            yield ixs1, ixs2 + n1
+
+    @classmethod
+    def from_fingerprint_stack(
+        cls,
+        fingerprint_stack,
+        distance_measures="scaled_euclidean",
+        n_cores=1,
+        tile_size=2000,
+        kernel="vectorized",
+        min_coverage=None,
+        feature_weights=None,
+        pair_tiles=None,
+    ):
+        """
+        Calculate feature distances for all possible fingerprint pair combinations (in condensed
+        order) or for the given fingerprint pairs, given one or more distance measures.
+
+        Parameters
+        ----------
+        fingerprint_stack : kissim.comparison.FingerprintStack
+            Stacked fingerprints.
+        distance_measures : str or list of str
+            One or more distance measures, defaults to scaled Euclidean distance.
+        n_cores : int
+            Number of cores. If 1 tiles are processed in sequence, else in parallel.
+        tile_size : int
+            Maximum number of fingerprint pairs per tile.
+        kernel : str
+            Kernel used to calculate feature distances per tile: "vectorized" (default) or "blas"
+            (scaled Euclidean distances via matrix multiplication; benefits from large tiles and
+            from leaving all cores to BLAS, i.e. n_cores=1).
+        min_coverage : None or float
+            Minimum fingerprint bit coverage. If set, only fingerprint pairs reaching this
+            coverage (given the feature weights) are compared.
+        feature_weights : None, list of float, or dict of str: list of float
+            Feature weights used to calculate the fingerprint bit coverage (only used if
+            `min_coverage` is set). If multiple weighting schemes are given as dictionary,
+            fingerprint pairs reaching the minimum coverage for at least one scheme are compared.
+        pair_tiles : None or iterable of tuple of np.ndarray
+            Fingerprint pairs per tile, given as fingerprint indices i and j. If None (default),
+            all possible fingerprint pair combinations are used.
+
+        Returns
+        -------
+        kissim.comparison.FeatureDistancesArray
+            Feature distances.
+        """
+
+        start = datetime.datetime.now()
+
+        distance_measures = check_distance_measures(distance_measures)
+        logger.info(f"SIMILARITY: FeatureDistancesArray: {distance_measures}")
+
+        feature_distances_tiles = cls.iter_from_fingerprint_stack(
+            fingerprint_stack,
+            distance_measures,
+            n_cores,
+            tile_size,
+            kernel,
+            min_coverage,
+            feature_weights,
+            pair_tiles,
+        )
+        feature_distances_array = cls.concatenate(
+            list(feature_distances_tiles), fingerprint_stack, distance_measures
+        )
+
+        end = datetime.datetime.now()
+
+        logger.info(f"Number of feature distances: {feature_distances_array.n_pairs}")
+        logger.info(f"Start of feature distances generation: {start}")
+        logger.info(f"End of feature distances generation: {end}")
+
+        return feature_distances_array
+
+    @classmethod
+    def iter_from_fingerprint_stack(
+        cls,
+        fingerprint_stack,
+        distance_measures="scaled_euclidean",
+        n_cores=1,
+        tile_size=2000,
+        kernel="vectorized",
+        min_coverage=None,
+        feature_weights=None,
+        pair_tiles=None,
+    ):
+        """
+        Calculate feature distances for all possible fingerprint pair combinations (in condensed
+        order) or for the given fingerprint pairs tile by tile, without holding all fingerprint
+        pairs in memory.
+
+        Parameters
+        ----------
+        fingerprint_stack : kissim.comparison.FingerprintStack
+            Stacked fingerprints.
+        distance_measures : str or list of str
+            One or more distance measures, defaults to scaled Euclidean distance.
+        n_cores : int
+            Number of cores. If 1 tiles are processed in sequence, else in parallel.
+        tile_size : int
+            Maximum number of fingerprint pairs per tile.
+        kernel : str
+            Kernel used to calculate feature distances per tile: "vectorized" (default) or "blas".
+        min_coverage : None or float
+            Minimum fingerprint bit coverage (see `from_fingerprint_stack`).
+        feature_weights : None, list of float, or dict of str: list of float
+            Feature weights used to calculate the fingerprint bit coverage (see
+            `from_fingerprint_stack`).
+        pair_tiles : None or iterable of tuple of np.ndarray
+            Fingerprint pairs per tile, given as fingerprint indices i and j. If None (default),
+            all possible fingerprint pair combinations are used.
+
+        Yields
+        ------
+        kissim.comparison.FeatureDistancesArray
+            Feature distances for one tile.
+        """
+
+        if min_coverage is not None:
+            pair_tiles = cls._get_pair_tiles_min_coverage(
+                fingerprint_stack, min_coverage, feature_weights, tile_size, pair_tiles
+            )
+        elif pair_tiles is None:
+            pair_tiles = get_pair_tiles(fingerprint_stack.n_fingerprints, tile_size)
+        yield from cls.iter_tiles(
+            fingerprint_stack, distance_measures, pair_tiles, n_cores, kernel
+        )
+
+    @classmethod
+    def iter_tiles(
+        cls, fingerprint_stack, distance_measures, pair_tiles, n_cores=1, kernel="vectorized"
+    ):
+        """
+        Calculate feature distances tile by tile.
+
+        Parameters
+        ----------
+        fingerprint_stack : kissim.comparison.FingerprintStack
+            Stacked fingerprints.
+        distance_measures : str or list of str
+            One or more distance measures.
+        pair_tiles : iterable of tuple of np.ndarray
+            Fingerprint pairs per tile, given as fingerprint indices i and j.
+        n_cores : int
+            Number of cores. If 1 tiles are processed in sequence, else in parallel.
+        kernel : str
+            Kernel used to calculate feature distances per tile: "vectorized" (default) or "blas".
+
+        Yields
+        ------
+        kissim.comparison.FeatureDistancesArray
+            Feature distances for one tile (in input tile order).
+        """
+
+        distance_measures = check_distance_measures(distance_measures)
+        kernel = check_kernel(kernel)
+
+        if n_cores == 1:
+            tiles = (
+                cls._calculate_tile(pair_tile, fingerprint_stack, distance_measures, kernel)
+                for pair_tile in pair_tiles
+            )
+            for tile in tiles:
+                yield cls._from_tile(tile, fingerprint_stack, distance_measures)
+        else:
+            logger.info(f"Number of cores used: {n_cores}")
+            with Pool(
+                processes=n_cores,
+                initializer=_set_fingerprint_stack,
+                initargs=(fingerprint_stack,),
+            ) as pool:
+                tiles = pool.imap(
+                    _calculate_tile_in_worker,
+                    zip(pair_tiles, repeat(distance_measures), repeat(kernel)),
+                )
+                for tile in tiles:
+                    yield cls._from_tile(tile, fingerprint_stack, distance_measures)
+
+    @classmethod
+    def concatenate(cls, feature_distances_arrays, fingerprint_stack, distance_measures):
+        """
+        Concatenate feature distances (e.g. tiles) that refer to the same fingerprint stack.
+
+        Parameters
+        ----------
+        feature_distances_arrays : list of kissim.comparison.FeatureDistancesArray
+            Feature distances.
+        fingerprint_stack : kissim.comparison.FingerprintStack
+            Stacked fingerprints.
+        distance_measures : str or list of str
+            One or more distance measures.
+
+        Returns
+        -------
+        kissim.comparison.FeatureDistancesArray
+            Feature distances.
+        """
+
+        distance_measures = check_distance_measures(distance_measures)
+        n_features = sum([features.shape[1] for features in fingerprint_stack.features])
+
+        pairs = [np.empty((0, 2), dtype=np.int64)]
+        distances = {
+            distance_measure: [np.empty((0, n_features))] for distance_measure in distance_measures
+        }
+        bit_numbers = [np.empty((0, n_features), dtype=np.int16)]
+        for feature_distances_array in feature_distances_arrays:
+            pairs.append(feature_distances_array.pairs)
+            for distance_measure in distance_measures:
+                distances[distance_measure].append(
+                    feature_distances_array.distances[distance_measure]
+                )
+            bit_numbers.append(feature_distances_array.bit_numbers)
+
+        tile = (
+            np.concatenate(pairs),
+            {key: np.concatenate(value) for key, value in distances.items()},
+            np.concatenate(bit_numbers),
+        )
+        return cls._from_tile(tile, fingerprint_stack, distance_measures)
+
+    def add_fingerprints(
+        self,
+        fingerprint_stack,
+        new_fingerprint_stack,
+        removed_structure_klifs_ids=None,
+        n_cores=1,
+        tile_size=2000,
+        kernel="vectorized",
+    ):
+        """
+        Update feature distances incrementally for new fingerprints, i.e. calculate only feature
+        distances for new x old and new x new fingerprint pairs and keep all other feature
+        distances.
+
+        Structures to be removed, and old structures with a new fingerprint (stale structures),
+        are invalidated: Their feature distances are dropped. The updated structure order is the
+        order of the remaining old structures followed by the new structures; fingerprint pairs
+        are sorted in condensed order with respect to the updated structure order.
+
+        Parameters
+        ----------
+        fingerprint_stack : kissim.comparison.FingerprintStack
+            Stacked fingerprints that the feature distances were calculated from.
+        new_fingerprint_stack : kissim.comparison.FingerprintStack
+            Stacked new fingerprints.
+        removed_structure_klifs_ids : None or list of int
+            Structure KLIFS IDs of structures to be removed.
+        n_cores : int
+            Number of cores. If 1 tiles are processed in sequence, else in parallel.
+        tile_size : int
+            Maximum number of fingerprint pairs per tile.
+        kernel : str
+            Kernel used to calculate feature distances per tile: "vectorized" (default) or "blas".
+
+        Returns
+        -------
+        feature_distances_array : kissim.comparison.FeatureDistancesArray
+            Updated feature distances.
+        fingerprint_stack : kissim.comparison.FingerprintStack
+            Updated stacked fingerprints (defines the updated structure order).
+        """
+
+        if fingerprint_stack.structure_klifs_ids != self.structure_klifs_ids:
+            raise ValueError("Fingerprint stack does not match feature distances.")
+
+        # Invalidate removed and stale structures
+        invalid_structure_klifs_ids = set(removed_structure_klifs_ids or []) | set(
+            new_fingerprint_stack.structure_klifs_ids
+        )
+        kept_structure_ixs = np.array(
+            [
+                i
+                for i, structure_klifs_id in enumerate(fingerprint_stack.structure_klifs_ids)
+                if structure_klifs_id not in invalid_structure_klifs_ids
+            ],
+            dtype=np.int64,
+        )
+        n_kept = len(kept_structure_ixs)
+        n_new = new_fingerprint_stack.n_fingerprints
+        logger.info(
+            f"Number of structures kept/invalidated/new: "
+            f"{n_kept}/{fingerprint_stack.n_fingerprints - n_kept}/{n_new}"
+        )
+        fingerprint_stack_updated = FingerprintStack.concatenate(
+            [fingerprint_stack.subset(kept_structure_ixs), new_fingerprint_stack]
+        )
+
+        # Keep feature distances for old pairs of kept structures (remap structure indices)
+        structure_ixs_map = np.full(fingerprint_stack.n_fingerprints, -1, dtype=np.int64)
+        structure_ixs_map[kept_structure_ixs] = np.arange(n_kept)
+        pairs = structure_ixs_map[self.pairs]
+        is_kept = (pairs >= 0).all(axis=1)
+        tile = (
+            pairs[is_kept],
+            {key: value[is_kept] for key, value in self.distances.items()},
+            self.bit_numbers[is_kept],
+        )
+        feature_distances_array_kept = self._from_tile(
+            tile, fingerprint_stack_updated, self.distance_measures
+        )
+
+        # Calculate feature distances for old x new and new x new pairs only
+        pair_tiles = chain(
+            self.get_cross_pair_tiles(n_kept, n_new, tile_size),
+            ((ixs1 + n_kept, ixs2 + n_kept) for ixs1, ixs2 in get_pair_tiles(n_new, tile_size)),
+        )
+        feature_distances_tiles = self.iter_tiles(
+            fingerprint_stack_updated, self.distance_measures, pair_tiles, n_cores, kernel
+        )
+        feature_distances_array = self.concatenate(
+            [feature_distances_array_kept] + list(feature_distances_tiles),
+            fingerprint_stack_updated,
+            self.distance_measures,
+        )
+
+        # Sort pairs in condensed order (w.r.t. updated structure order)
+        condensed_ixs = get_condensed_index(
+            feature_distances_array.pairs[:, 0],
+            feature_distances_array.pairs[:, 1],
+            fingerprint_stack_updated.n_fingerprints,
+        )
+        order = np.argsort(condensed_ixs, kind="stable")
+        tile = (
+            feature_distances_array.pairs[order],
+            {key: value[order] for key, value in feature_distances_array.distances.items()},
+            feature_distances_array.bit_numbers[order],
+        )
+        feature_distances_array = self._from_tile(
+            tile, fingerprint_stack_updated, self.distance_measures
+        )
+
+        logger.info(f"Number of feature distances: {feature_distances_array.n_pairs}")
+
+        return feature_distances_array, fingerprint_stack_updated
+
+    @classmethod
+    def _from_tile(cls, tile, fingerprint_stack, distance_measures):
+        """
+        Initialize feature distances from tile arrays.
+
+        Parameters
+        ----------
+        tile : tuple of (np.ndarray, dict of str: np.ndarray, np.ndarray)
+            Fingerprint pairs, feature distances per distance measure, and bit numbers.
+        fingerprint_stack : kissim.comparison.FingerprintStack
+            Stacked fingerprints.
+        distance_measures : list of str
+            Distance measures.
+
+        Returns
+        -------
+        kissim.comparison.FeatureDistancesArray
+            Feature distances.
+        """
+
+        feature_distances_array = cls()
+        feature_distances_array.distance_measures = distance_measures
+        feature_distances_array.structure_klifs_ids = fingerprint_stack.structure_klifs_ids
+        feature_distances_array.structure_kinase_names = fingerprint_stack.kinase_names
+        feature_distances_array.structure_kinase_codes = fingerprint_stack.kinase_codes
+        feature_distances_array.kinase_categories = fingerprint_stack.kinase_categories
+        feature_distances_array.n_bits = fingerprint_stack.n_bits
+        (
+            feature_distances_array.pairs,
+            feature_distances_array.distances,
+            feature_distances_array.bit_numbers,
+        ) = tile
+        return feature_distances_array
+
+    @staticmethod
+    def _get_pair_tiles_min_coverage(
+        fingerprint_stack, min_coverage, feature_weights=None, tile_size=2000, pair_tiles=None
+    ):
+        """
+        Get fingerprint pairs (in condensed order, or in the order of the given pair tiles)
+        reaching a minimum fingerprint bit coverage, split into tiles.
+
+        Fingerprints that cannot reach the minimum coverage with any other fingerprint are skipped
+        altogether. For the remaining fingerprint pairs, an upper bound of the coverage is
+        calculated from the per-fingerprint number of bits free of NaN values; exact coverages
+        (from packed validity masks) are only calculated for pairs passing this bound.
+
+        Parameters
+        ----------
+        fingerprint_stack : kissim.comparison.FingerprintStack
+            Stacked fingerprints.
+        min_coverage : float
+            Minimum fingerprint bit coverage.
+        feature_weights : None, list of float, or dict of str: list of float
+            Feature weights (or feature weights per weighting scheme).
+        tile_size : int
+            Maximum number of fingerprint pairs per tile (before pruning).
+        pair_tiles : None or iterable of tuple of np.ndarray
+            Fingerprint pairs per tile to be pruned. If None (default), all possible fingerprint
+            pair combinations are used.
+
+        Yields
+        ------
+        tuple of np.ndarray of int
+            Fingerprint indices i and j for pairs in tile.
+        """
+
+        if not isinstance(feature_weights, dict):
+            feature_weights = {"": feature_weights}
+        fingerprint_distance = FingerprintDistance()
+        weights_matrix = np.array(
+            [fingerprint_distance._format_weights(weights) for weights in feature_weights.values()]
+        ).transpose()
+
+        n_bits = fingerprint_stack.n_bits
+        n_valid_bits = fingerprint_stack.n_valid_bits
+
+        def _reaches_min_coverage(bit_numbers):
+            bit_coverages = np.round(bit_numbers / n_bits, 2)
+            return (bit_coverages @ weights_matrix >= min_coverage).any(axis=1)
+
+        # Skip fingerprints that cannot reach the minimum coverage (even with a complete partner)
+        fingerprint_ixs = np.flatnonzero(_reaches_min_coverage(n_valid_bits))
+        logger.info(
+            f"Number of fingerprints reaching minimum coverage {min_coverage}: "
+            f"{len(fingerprint_ixs)}/{fingerprint_stack.n_fingerprints}"
+        )
+
+        is_eligible = np.zeros(fingerprint_stack.n_fingerprints, dtype=bool)
+        is_eligible[fingerprint_ixs] = True
+        if pair_tiles is None:
+            pair_tiles = (
+                (fingerprint_ixs[ixs1], fingerprint_ixs[ixs2])
+                for ixs1, ixs2 in get_pair_tiles(len(fingerprint_ixs), tile_size)
+            )
+
+        for ixs1, ixs2 in pair_tiles:
+            ixs1, ixs2 = np.asarray(ixs1, dtype=np.int64), np.asarray(ixs2, dtype=np.int64)
+
+            # Skip pairs with fingerprints that cannot reach the minimum coverage
+            keep = is_eligible[ixs1] & is_eligible[ixs2]
+            ixs1, ixs2 = ixs1[keep], ixs2[keep]
+
+            # Upper bound from per-fingerprint bit numbers
+            upper_bounds = np.minimum(n_valid_bits[ixs1], n_valid_bits[ixs2])
+            keep = _reaches_min_coverage(upper_bounds)
+            ixs1, ixs2 = ixs1[keep], ixs2[keep]
+
+            # Exact coverages for remaining pairs
+            keep = _reaches_min_coverage(fingerprint_stack.get_bit_numbers(ixs1, ixs2))
+            ixs1, ixs2 = ixs1[keep], ixs2[keep]
+
+            if len(ixs1) > 0:
+                yield ixs1, ixs2
+
+    @staticmethod
+    def _calculate_tile(pair_tile, fingerprint_stack, distance_measures, kernel="vectorized"):
+        """
+        Calculate feature distances and bit numbers for a tile of fingerprint pairs.
+        Bit numbers are calculated from packed validity masks only.
+
+        Parameters
+        ----------
+        pair_tile : tuple of np.ndarray
+            Fingerprint indices i and j for pairs in tile.
+        fingerprint_stack : kissim.comparison.FingerprintStack
+            Stacked fingerprints.
+        distance_measures : list of str
+            Distance measures.
+        kernel : str
+            Kernel used to calculate feature distances: "vectorized" (default) or "blas".
+
+        Returns
+        -------
+        tuple of (np.ndarray, dict of str: np.ndarray, np.ndarray)
+            Fingerprint pairs (pairs x 2), feature distances (pairs x features) per distance
+            measure, and bit numbers (pairs x features).
+        """
+
+        ixs1, ixs2 = pair_tile
+
+        # Use BLAS kernel for scaled Euclidean distances only if the tile is block-shaped enough,
+        # i.e. if the block spanned by the tile's fingerprints is not much larger than the tile
+        blas_block = None
+        if kernel == "blas" and "scaled_euclidean" in distance_measures:
+            ixs1_unique, ixs1_inverse = np.unique(ixs1, return_inverse=True)
+            ixs2_unique, ixs2_inverse = np.unique(ixs2, return_inverse=True)
+            if len(ixs1_unique) * len(ixs2_unique) <= 4 * len(ixs1) + 1024:
+                blas_block = (ixs1_unique, ixs1_inverse, ixs2_unique, ixs2_inverse)
+            else:
+                logger.debug("Tile not block-shaped; use vectorized kernel.")
+
+        distances = {distance_measure: [] for distance_measure in distance_measures}
+        for features in fingerprint_stack.features:
+
+            if blas_block is None:
+                feature_distances, _ = calculate_feature_distances(
+                    features[ixs1], features[ixs2], distance_measures
+                )
+            else:
+                ixs1_unique, ixs1_inverse, ixs2_unique, ixs2_inverse = blas_block
+                block_distances, _ = calculate_feature_distances_blas(
+                    features[ixs1_unique], features[ixs2_unique]
+                )
+                feature_distances = {
+                    "scaled_euclidean": block_distances[ixs1_inverse, ixs2_inverse]
+                }
+                other_distance_measures = [i for i in distance_measures if i != "scaled_euclidean"]
+                if other_distance_measures:
+                    other_feature_distances, _ = calculate_feature_distances(
+                        features[ixs1], features[ixs2], other_distance_measures
+                    )
+                    feature_distances.update(other_feature_distances)
+
+            for distance_measure in distance_measures:
+                distances[distance_measure].append(feature_distances[distance_measure])
+
+        pairs = np.stack([ixs1, ixs2], axis=1).astype(np.int64)
+        distances = {key: np.concatenate(value, axis=1) for key, value in distances.items()}
+        bit_numbers = fingerprint_stack.get_bit_numbers(ixs1, ixs2)
+
+        return pairs, distances, bit_numbers
+
+
+def _set_fingerprint_stack(fingerprint_stack):
+    """
+    Set the fingerprint stack shared within a worker process.
+
+    Parameters
+    ----------
+    fingerprint_stack : kissim.comparison.FingerprintStack
+        Stacked fingerprints.
+    """
+
+    global _FINGERPRINT_STACK
+    _FINGERPRINT_STACK = fingerprint_stack
+
+
+def _calculate_tile_in_worker(pair_tile_and_distance_measures):
+    """
+    Calculate feature distances for a tile of fingerprint pairs within a worker process.
+
+    Parameters
+    ----------
+    pair_tile_and_distance_measures : tuple
+        Fingerprint indices i and j for pairs in tile, distance measures, and kernel.
+
+    Returns
+    -------
+    tuple of (np.ndarray, dict of str: np.ndarray, np.ndarray)
+        Fingerprint pairs, feature distances per distance measure, and bit numbers.
+    """
+
+    pair_tile, distance_measures, kernel = pair_tile_and_distance_measures
+    return FeatureDistancesArray._calculate_tile(
+        pair_tile, _FINGERPRINT_STACK, distance_measures, kernel
+    )
@@ -164,7 +164,7 @@ class FingerprintDistance:
                 )
 
             # Check if sum of weights is 1.0
-            if sum(feature_type_weights) != 1.0:
+            if not np.isclose(sum(feature_type_weights), 1.0):
                 raise ValueError(
                     f"Sum of all weights must be one, but is {sum(feature_type_weights)}."
                 )
@@ -224,7 +224,7 @@ class FingerprintDistance:
                 )
 
             # Check if sum of weights is 1.0
-            if sum(feature_weights) != 1.0:
+            if not np.isclose(sum(feature_weights), 1.0):
                 raise ValueError(f"Sum of all weights must be one, but is {sum(feature_weights)}.")
 
         return np.array(feature_weights)
@@ -12,7 +12,8 @@ from multiprocessing import cpu_count, Pool
 import numpy as np
 import pandas as pd
 
-from . import FingerprintDistance
+from . import FingerprintDistance, FeatureDistancesArray, KinaseDistanceAccumulator
+from .utils import get_condensed_index
 
 logger = logging.getLogger(__name__)
 
@@ -48,6 +49,10 @@ class FingerprintDistanceGenerator:
     data : pandas.DataFrame
         Fingerprint distance and coverage, plus details on both molecule codes associated with
         fingerprint pairs.
+    kinase_codes : None or np.ndarray of int
+        Kinase codes, i.e. positions of kinase names in `kinase_names`, for both fingerprints per
+        fingerprint pair (pairs x 2; same order as `data`). Set if generated from
+        kissim.comparison.FeatureDistancesArray, else kinase names are derived from molecule codes.
     """
 
     def __init__(self):
@@ -57,6 +62,7 @@ class FingerprintDistanceGenerator:
         self.molecule_codes = None
         self.kinase_names = None
         self.data = None
+        self.kinase_codes = None
 
     def from_feature_distances_generator(self, feature_distances_generator, feature_weights=None):
         """
@@ -114,6 +120,169 @@ class FingerprintDistanceGenerator:
         logger.info(f"Start of fingerprint distance generation: {start}")
         logger.info(f"End of fingerprint distance generation: {end}")
 
+    def from_feature_distances_array(
+        self, feature_distances_array, feature_weights=None, distance_measure=None
+    ):
+        """
+        Generate fingerprint distances for multiple fingerprint pairs based on their feature
+        distances (stored as arrays), given a feature weighting scheme.
+        Fingerprint distances for all pairs are calculated in one vectorized step.
+
+        Parameters
+        ----------
+        feature_distances_array : kissim.comparison.FeatureDistancesArray
+            Feature distances for multiple fingerprint pairs.
+        feature_weights : None or list of float
+            Feature weights of the following form:
+            (i) None
+                Default feature weights: All features equally distributed to 1/15
+                (15 features in total).
+            (ii) By feature type (list of 3 floats)
+                Feature types to be set in the following order: physicochemical, distances, and
+                moments.
+            (iii) By feature (list of 15 floats):
+                Features to be set in the following order: size, hbd, hba, charge, aromatic,
+                aliphatic, sco, exposure, distance_to_centroid, distance_to_hinge_region,
+                distance_to_dfg_region, distance_to_front_pocket, moment1, moment2, and moment3.
+            For (ii) and (iii): All floats must sum up to 1.0.
+        distance_measure : str or None
+            Distance measure (must be one of the distance measures in the feature distances).
+            If None (default), the first distance measure is used.
+        """
+
+        start = datetime.datetime.now()
+
+        logger.info(f"SIMILARITY: FingerprintDistanceGenerator: {feature_weights}")
+
+        if distance_measure is None:
+            distance_measure = feature_distances_array.distance_measures[0]
+
+        # Set class attributes
+        self.distance_measure = distance_measure
+        self.feature_weights = feature_weights
+        self.molecule_codes = feature_distances_array.molecule_codes
+        self.kinase_names = feature_distances_array.kinase_names
+
+        # Calculate pairwise fingerprint distances
+        data = self.sweep_feature_weights(
+            feature_distances_array, {"": feature_weights}, distance_measure
+        )
+        data.columns = "molecule_code_1 molecule_code_2 distance coverage".split()
+        self.data = data
+
+        # Kinase codes captured from fingerprints (re-coded to used kinase names only)
+        kinase_codes = np.searchsorted(
+            self.kinase_names, feature_distances_array.kinase_categories
+        )
+        self.kinase_codes = np.stack(
+            [kinase_codes[i] for i in feature_distances_array.kinase_pair_codes], axis=1
+        ).astype(np.int32)
+
+        end = datetime.datetime.now()
+
+        logger.info(f"Start of fingerprint distance generation: {start}")
+        logger.info(f"End of fingerprint distance generation: {end}")
+
+    @staticmethod
+    def sweep_feature_weights(feature_distances, feature_weights, distance_measure=None):
+        """
+        Generate fingerprint distances for multiple fingerprint pairs and multiple feature
+        weighting schemes at once, using a single (pairs x 15) x (15 x schemes) matrix product.
+
+        Parameters
+        ----------
+        feature_distances : kissim.comparison.FeatureDistancesGenerator or
+                            kissim.comparison.FeatureDistancesArray
+            Feature distances for multiple fingerprint pairs.
+        feature_weights : dict of str: (None or list of float)
+            Feature weights (values) per weighting scheme name (keys). Each feature weights entry
+            takes one of the forms described in `from_feature_distances_generator`.
+        distance_measure : str or None
+            Distance measure (only used for kissim.comparison.FeatureDistancesArray input).
+            If None (default), the first distance measure is used.
+
+        Returns
+        -------
+        pandas.DataFrame
+            Fingerprint distance and coverage per weighting scheme (columns "distance.<name>" and
+            "coverage.<name>"), plus details on both molecule codes associated with fingerprint
+            pairs.
+        """
+
+        logger.info(f"SIMILARITY: FingerprintDistanceGenerator: {list(feature_weights.keys())}")
+
+        # Format weights per scheme into a 15 x schemes matrix
+        fingerprint_distance = FingerprintDistance()
+        weights_matrix = np.array(
+            [fingerprint_distance._format_weights(weights) for weights in feature_weights.values()]
+        ).transpose()
+
+        # Get feature distances and bit coverages as pairs x 15 matrices
+        (
+            molecule_codes_1,
+            molecule_codes_2,
+            distances,
+            bit_coverages,
+        ) = FingerprintDistanceGenerator._get_feature_distances_matrices(
+            feature_distances, distance_measure
+        )
+        distances = distances.reshape(-1, weights_matrix.shape[0])
+        bit_coverages = bit_coverages.reshape(-1, weights_matrix.shape[0])
+
+        # Weighted sums for all pairs and schemes
+        fingerprint_distances = distances @ weights_matrix
+        fingerprint_coverages = bit_coverages @ weights_matrix
+
+        data = pd.DataFrame(
+            {"molecule_code_1": molecule_codes_1, "molecule_code_2": molecule_codes_2}
+        )
+        for i, name in enumerate(feature_weights.keys()):
+            data[f"distance.{name}"] = fingerprint_distances[:, i]
+        for i, name in enumerate(feature_weights.keys()):
+            data[f"coverage.{name}"] = fingerprint_coverages[:, i]
+
+        return data
+
+    @staticmethod
+    def _get_feature_distances_matrices(feature_distances, distance_measure=None):
+        """
+        Get molecule codes, feature distances, and feature bit coverages for all fingerprint
+        pairs.
+
+        Parameters
+        ----------
+        feature_distances : kissim.comparison.FeatureDistancesGenerator or
+                            kissim.comparison.FeatureDistancesArray
+            Feature distances for multiple fingerprint pairs.
+        distance_measure : str or None
+            Distance measure (only used for kissim.comparison.FeatureDistancesArray input).
+            If None (default), the first distance measure is used.
+
+        Returns
+        -------
+        tuple of np.ndarray
+            Molecule codes 1 and 2 (pairs), feature distances (pairs x 15), and feature bit
+            coverages (pairs x 15).
+        """
+
+        if isinstance(feature_distances, FeatureDistancesArray):
+            if distance_measure is None:
+                distance_measure = feature_distances.distance_measures[0]
+            molecule_codes_1, molecule_codes_2 = feature_distances.molecule_pair_codes
+            distances = feature_distances.distances[distance_measure]
+            bit_coverages = feature_distances.bit_coverages
+        else:
+            feature_distances_list = list(feature_distances.data.values())
+            molecule_pair_codes = [i.molecule_pair_code for i in feature_distances_list]
+            molecule_codes_1 = [i[0] for i in molecule_pair_codes]
+            molecule_codes_2 = [i[1] for i in molecule_pair_codes]
+            distances = np.array([i.distances for i in feature_distances_list], dtype=float)
+            bit_coverages = np.array(
+                [i.bit_coverages for i in feature_distances_list], dtype=float
+            )
+
+        return molecule_codes_1, molecule_codes_2, distances, bit_coverages
+
     @staticmethod
     def _get_fingerprint_distance_from_list(
         _get_fingerprint_distance, feature_distances_list, feature_weights=None
@@ -231,25 +400,70 @@ class FingerprintDistanceGenerator:
             Structure distance matrix.
         """
 
-        # Initialize matrix
-        structure_distance_matrix = pd.DataFrame(
-            [], columns=self.molecule_codes, index=self.molecule_codes, dtype=float
+        ixs1, ixs2, distances = self._get_structure_pair_indices()
+
+        # Scatter distance values into matrix (if filled, the lower triangle is set per pair right
+        # after the upper triangle)
+        if fill:
+            ixs1, ixs2 = (
+                np.column_stack([ixs1, ixs2]).ravel(),
+                np.column_stack([ixs2, ixs1]).ravel(),
+            )
+            distances = np.repeat(distances, 2)
+        n_structures = len(self.molecule_codes)
+        structure_distance_matrix = np.full((n_structures, n_structures), np.nan)
+        structure_distance_matrix[ixs1, ixs2] = distances
+
+        # Fill values on matrix main diagonal to 0.0
+        np.fill_diagonal(structure_distance_matrix, 0.0)
+
+        return pd.DataFrame(
+            structure_distance_matrix, columns=self.molecule_codes, index=self.molecule_codes
         )
 
-        # Fill matrix with distance values
-        for index, row in self.data.iterrows():
-            structure_distance_matrix.loc[row.molecule_code_1, row.molecule_code_2] = row.distance
+    def get_structure_distance_condensed(self):
+        """
+        Get fingerprint distances for all structure pairs in the form of a condensed distance
+        matrix (upper triangle in row-major order as used by scipy's `pdist`; structures ordered as
+        in `molecule_codes`). Structure pairs without distance value are set to NaN.
 
-            if fill:
-                structure_distance_matrix.loc[
-                    row.molecule_code_2, row.molecule_code_1
-                ] = row.distance
+        Returns
+        -------
+        np.ndarray
+            Condensed structure distance matrix.
+        """
 
-        # Fill values on matrix main diagonal to 0.0
-        for molecule_code in self.molecule_codes:
-            structure_distance_matrix.loc[molecule_code, molecule_code] = 0.0
+        ixs1, ixs2, distances = self._get_structure_pair_indices()
+
+        # Skip self-comparisons (not part of the condensed distance matrix)
+        is_pair = ixs1 != ixs2
+        n_structures = len(self.molecule_codes)
+        structure_distance_condensed = np.full(n_structures * (n_structures - 1) // 2, np.nan)
+        structure_distance_condensed[
+            get_condensed_index(ixs1[is_pair], ixs2[is_pair], n_structures)
+        ] = distances[is_pair]
 
-        return structure_distance_matrix
+        return structure_distance_condensed
+
+    def _get_structure_pair_indices(self):
+        """
+        Get the structure indices (positions in `molecule_codes`) and the distance values for all
+        structure pairs.
+
+        Returns
+        -------
+        tuple of np.ndarray
+            Structure indices for first and second structure per pair, and distance values.
+        """
+
+        molecule_codes = pd.Index(self.molecule_codes)
+        ixs1 = molecule_codes.get_indexer(self.data.molecule_code_1)
+        ixs2 = molecule_codes.get_indexer(self.data.molecule_code_2)
+        if (ixs1 < 0).any() or (ixs2 < 0).any():
+            raise ValueError("Distance data contains molecule codes unknown to this object.")
+        distances = self.data.distance.to_numpy(dtype=float)
+
+        return ixs1, ixs2, distances
 
     def get_kinase_distance_matrix(self, by="minimum", fill=False):
         """
@@ -271,25 +485,54 @@ class FingerprintDistanceGenerator:
             Kinase distance matrix.
         """
 
-        # Initialize matrix
-        kinase_distance_matrix = pd.DataFrame(
-            [], columns=self.kinase_names, index=self.kinase_names, dtype=float
+        kinase_distance_accumulator = self.get_kinase_distance_accumulator()
+        return kinase_distance_accumulator.get_matrix(by, fill)
+
+    def get_kinase_distance_accumulator(self):
+        """
+        Aggregate fingerprint distances for all structure pairs to kinase pairs (minimum, maximum,
+        mean, and size, plus the structure pairs behind minimum and maximum) in one vectorized
+        pass based on integer kinase codes.
+
+        Returns
+        -------
+        kissim.comparison.KinaseDistanceAccumulator
+            Kinase distance aggregates.
+        """
+
+        kinase_codes = self._get_kinase_codes()
+        structure_ixs1, structure_ixs2, distances = self._get_structure_pair_indices()
+
+        kinase_distance_accumulator = KinaseDistanceAccumulator.from_kinase_names(
+            self.kinase_names, self.molecule_codes
         )
+        kinase_distance_accumulator.update(
+            kinase_codes[:, 0], kinase_codes[:, 1], distances, structure_ixs1, structure_ixs2
+        )
+        return kinase_distance_accumulator
 
-        # Fill matrix with distance values
-        for index, row in self._get_kinase_distances(by).iterrows():
-            kinase_distance_matrix.loc[index[0], index[1]] = row.distance
+    def _get_kinase_codes(self):
+        """
+        Get kinase codes (positions in `kinase_names`) for both fingerprints per fingerprint pair.
+        If not captured from the fingerprints, kinase names are derived from the molecule codes.
 
-            if fill:
-                kinase_distance_matrix.loc[index[1], index[0]] = row.distance
+        Returns
+        -------
+        np.ndarray of int
+            Kinase codes (pairs x 2).
+        """
 
-        # Fill values on matrix main diagonal to 0.0 which are NaN
-        # (i.e. kinases that have only one structure representative)
-        for kinase_name in self.kinase_names:
-            if np.isnan(kinase_distance_matrix.loc[kinase_name, kinase_name]):
-                kinase_distance_matrix.loc[kinase_name, kinase_name] = 0.0
+        if self.kinase_codes is not None:
+            return self.kinase_codes
 
-        return kinase_distance_matrix
+        kinase_codes = [
+            pd.Categorical(
+                [i.split("/")[1].split("_")[0] for i in molecule_codes],
+                categories=self.kinase_names,
+            ).codes
+            for molecule_codes in [self.data.molecule_code_1, self.data.molecule_code_2]
+        ]
+        return np.stack(kinase_codes, axis=1).astype(np.int32)
 
     def _get_kinase_distances(self, by="minimum"):
         """
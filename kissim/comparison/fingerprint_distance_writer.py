@@ -0,0 +1,256 @@
+"""
+kissim.comparison.fingerprint_distance_writer
+
+Defines the streaming of fingerprint distances for structure pairs to disk (csv or compact
+binary columns), tile by tile.
+"""
+
+import json
+import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from . import FingerprintDistance
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_FORMATS = ["csv", "columnar"]
+
+# Columns and data types of the columnar format
+COLUMNAR_DTYPES = {
+    "structure_ix_1": np.int32,
+    "structure_ix_2": np.int32,
+    "distance": np.float32,
+    "coverage": np.float32,
+}
+
+
+class FingerprintDistanceWriter:
+    """
+    Fingerprint distances and coverages for structure pairs, appended to disk chunk by chunk
+    (e.g. tile by tile), so that the table of all structure pairs is never held in memory.
+
+    Output formats:
+    - csv: Table with the same columns as kissim.comparison.FingerprintDistanceGenerator.data
+      (molecule_code_1, molecule_code_2, distance, coverage).
+    - columnar: Directory with one raw little-endian binary file per column (structure indices as
+      int32, distances and coverages as float32; see `COLUMNAR_DTYPES`) and a metadata.json file
+      with the structure KLIFS IDs and kinase names the structure indices refer to.
+
+    Attributes
+    ----------
+    filepath : pathlib.Path
+        Path to csv file or columnar directory.
+    output_format : str
+        Output format: csv or columnar.
+    structure_klifs_ids : list of int
+        Structure KLIFS IDs (define the structure indices).
+    kinase_names : list of str
+        Kinase names (one per structure).
+    n_pairs : int
+        Number of structure pairs written.
+    """
+
+    def __init__(self):
+
+        self.filepath = None
+        self.output_format = None
+        self.structure_klifs_ids = None
+        self.kinase_names = None
+        self.n_pairs = None
+
+    @classmethod
+    def from_structure_klifs_ids(
+        cls, filepath, structure_klifs_ids, kinase_names, output_format="csv"
+    ):
+        """
+        Create an empty output (csv file with header only, or columnar directory with empty
+        column files) for a set of structures. Existing output is overwritten.
+
+        Parameters
+        ----------
+        filepath : str or pathlib.Path
+            Path to csv file or columnar directory.
+        structure_klifs_ids : list of int
+            Structure KLIFS IDs; structure indices passed to `update` refer to this list.
+        kinase_names : list of str
+            Kinase names (one per structure).
+        output_format : str
+            Output format: csv (default) or columnar.
+
+        Returns
+        -------
+        kissim.comparison.FingerprintDistanceWriter
+            Writer.
+        """
+
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f'Output format unknown. Choose from: {", ".join(OUTPUT_FORMATS)}')
+
+        writer = cls()
+        writer.filepath = Path(filepath)
+        writer.output_format = output_format
+        writer.structure_klifs_ids = [int(i) for i in structure_klifs_ids]
+        writer.kinase_names = [str(i) for i in kinase_names]
+        writer.n_pairs = 0
+
+        if output_format == "csv":
+            writer.filepath.write_text("molecule_code_1,molecule_code_2,distance,coverage\n")
+        else:
+            writer.filepath.mkdir(parents=True, exist_ok=True)
+            for column in COLUMNAR_DTYPES.keys():
+                (writer.filepath / f"{column}.bin").write_bytes(b"")
+            writer._to_metadata()
+
+        logger.info(f"Fingerprint distances are written to: {writer.filepath} ({output_format})")
+
+        return writer
+
+    def update_from_feature_distances_array(
+        self, feature_distances_array, feature_weights=None, distance_measure=None
+    ):
+        """
+        Append fingerprint distances and coverages for all fingerprint pairs in feature
+        distances. Structure KLIFS IDs must be the structure KLIFS IDs of the feature distances.
+
+        Parameters
+        ----------
+        feature_distances_array : kissim.comparison.FeatureDistancesArray
+            Feature distances.
+        feature_weights : None or list of float
+            Feature weights (see kissim.comparison.FingerprintDistance).
+        distance_measure : str or None
+            Distance measure. If None (default), the first distance measure is used.
+        """
+
+        if feature_distances_array.structure_klifs_ids != self.structure_klifs_ids:
+            raise ValueError("Structures of feature distances do not match structure KLIFS IDs.")
+
+        distances = feature_distances_array.get_fingerprint_distances(
+            feature_weights, distance_measure
+        )
+        coverages = feature_distances_array.bit_coverages @ FingerprintDistance()._format_weights(
+            feature_weights
+        )
+        self.update(
+            feature_distances_array.pairs[:, 0],
+            feature_distances_array.pairs[:, 1],
+            distances,
+            coverages,
+        )
+
+    def update(self, structure_ixs1, structure_ixs2, distances, coverages):
+        """
+        Append fingerprint distances and coverages for structure pairs.
+
+        Parameters
+        ----------
+        structure_ixs1 : np.ndarray of int
+            Structure indices (positions in `structure_klifs_ids`) for first structure per pair.
+        structure_ixs2 : np.ndarray of int
+            Structure indices (positions in `structure_klifs_ids`) for second structure per pair.
+        distances : np.ndarray of float
+            Fingerprint distance per structure pair.
+        coverages : np.ndarray of float
+            Fingerprint coverage per structure pair.
+        """
+
+        if self.output_format == "csv":
+            structure_klifs_ids = np.array(self.structure_klifs_ids, dtype=object)
+            data = pd.DataFrame(
+                {
+                    "molecule_code_1": structure_klifs_ids[np.asarray(structure_ixs1)],
+                    "molecule_code_2": structure_klifs_ids[np.asarray(structure_ixs2)],
+                    "distance": distances,
+                    "coverage": coverages,
+                }
+            )
+            data.to_csv(self.filepath, mode="a", header=False, index=False)
+        else:
+            columns = {
+                "structure_ix_1": structure_ixs1,
+                "structure_ix_2": structure_ixs2,
+                "distance": distances,
+                "coverage": coverages,
+            }
+            for column, values in columns.items():
+                with open(self.filepath / f"{column}.bin", "ab") as f:
+                    np.asarray(values).astype(
+                        np.dtype(COLUMNAR_DTYPES[column]).newbyteorder("<")
+                    ).tofile(f)
+
+        self.n_pairs += len(distances)
+
+    def close(self):
+        """
+        Finalize output, i.e. write the number of structure pairs to the metadata file (columnar
+        format only).
+        """
+
+        if self.output_format == "columnar":
+            self._to_metadata()
+        logger.info(f"Number of fingerprint distances written: {self.n_pairs}")
+
+    @staticmethod
+    def read_columnar(filepath, molecule_codes=True):
+        """
+        Read fingerprint distances from columnar output. Columns are memory-mapped, i.e. only
+        copied when converted to a table.
+
+        Parameters
+        ----------
+        filepath : str or pathlib.Path
+            Path to columnar directory.
+        molecule_codes : bool
+            If True (default), structure indices are converted to structure KLIFS IDs (columns
+            molecule_code_1 and molecule_code_2 as in the csv format), else structure indices are
+            kept (columns structure_ix_1 and structure_ix_2).
+
+        Returns
+        -------
+        pandas.DataFrame
+            Fingerprint distances and coverages for structure pairs.
+        """
+
+        filepath = Path(filepath)
+        with open(filepath / "metadata.json", "r") as f:
+            metadata = json.load(f)
+
+        columns = {}
+        for column, dtype in COLUMNAR_DTYPES.items():
+            dtype = np.dtype(dtype).newbyteorder("<")
+            if metadata["n_pairs"] == 0:
+                columns[column] = np.empty(0, dtype=dtype)
+            else:
+                columns[column] = np.memmap(
+                    filepath / f"{column}.bin", dtype=dtype, mode="r", shape=(metadata["n_pairs"],)
+                )
+
+        if molecule_codes:
+            structure_klifs_ids = np.array(metadata["structure_klifs_ids"])
+            columns = {
+                "molecule_code_1": structure_klifs_ids[columns.pop("structure_ix_1")],
+                "molecule_code_2": structure_klifs_ids[columns.pop("structure_ix_2")],
+                **columns,
+            }
+        return pd.DataFrame(columns)
+
+    def _to_metadata(self):
+        """
+        Write structure KLIFS IDs, kinase names, column data types, and number of structure pairs
+        to the metadata file (columnar format).
+        """
+
+        metadata = {
+            "structure_klifs_ids": self.structure_klifs_ids,
+            "kinase_names": self.kinase_names,
+            "dtypes": {
+                column: np.dtype(dtype).newbyteorder("<").str
+                for column, dtype in COLUMNAR_DTYPES.items()
+            },
+            "n_pairs": self.n_pairs,
+        }
+        with open(self.filepath / "metadata.json", "w") as f:
+            json.dump(metadata, f)
@@ -0,0 +1,308 @@
+"""
+kissim.comparison.fingerprint_duplicates
+
+Defines the collapsing of identical fingerprints (e.g. from alternate chains or models of the
+same PDB entry) to one fingerprint each before comparison, and the expansion of comparison
+results back to all structures.
+"""
+
+import hashlib
+import logging
+
+import numpy as np
+import pandas as pd
+
+from . import FeatureDistancesArray
+from .utils import get_pair_tiles, get_square_indices
+
+logger = logging.getLogger(__name__)
+
+
+class FingerprintDuplicates:
+    """
+    Groups of structures with identical fingerprints (byte-identical values, NaN values at the
+    same positions). Only one fingerprint per group (the first structure of each group) needs to
+    be compared; feature distances for fingerprint pairs of unique fingerprints are expanded to
+    all structure pairs of the respective groups.
+
+    Structure pairs within a group are not compared to each other: Their feature distances (zero)
+    and bit coverages are taken from one self-comparison per group.
+
+    Attributes
+    ----------
+    structure_klifs_ids : list of int
+        Structure KLIFS IDs (all structures; define the structure indices).
+    unique_ixs : np.ndarray of int
+        Structure indices of unique fingerprints, i.e. first structure per group (sorted).
+    group_ixs : np.ndarray of int
+        Group index (position in `unique_ixs`) per structure.
+    """
+
+    def __init__(self):
+
+        self.structure_klifs_ids = None
+        self.unique_ixs = None
+        self.group_ixs = None
+
+    @property
+    def n_unique(self):
+        """
+        Number of unique fingerprints (groups).
+
+        Returns
+        -------
+        int
+            Number of unique fingerprints.
+        """
+
+        return len(self.unique_ixs)
+
+    @property
+    def n_duplicates(self):
+        """
+        Number of structures whose fingerprint is identical to the fingerprint of a structure
+        listed before.
+
+        Returns
+        -------
+        int
+            Number of duplicates.
+        """
+
+        return len(self.structure_klifs_ids) - self.n_unique
+
+    @property
+    def group_sizes(self):
+        """
+        Number of structures per group.
+
+        Returns
+        -------
+        np.ndarray of int
+            Group sizes.
+        """
+
+        return np.bincount(self.group_ixs, minlength=self.n_unique)
+
+    @property
+    def n_structure_pairs(self):
+        """
+        Number of structure pairs compared with and without collapsing duplicates: All structure
+        pairs (full) and unique fingerprint pairs plus one self-comparison per group with
+        duplicates (reduced).
+
+        Returns
+        -------
+        dict of str: int
+            Number of structure pairs (full, reduced).
+        """
+
+        n_structures = len(self.structure_klifs_ids)
+        return {
+            "full": n_structures * (n_structures - 1) // 2,
+            "reduced": self.n_unique * (self.n_unique - 1) // 2
+            + int((self.group_sizes > 1).sum()),
+        }
+
+    @classmethod
+    def from_fingerprint_stack(cls, fingerprint_stack, block_size=10000):
+        """
+        Find identical fingerprints in stacked fingerprints. Fingerprint values are hashed block
+        by block; fingerprints with the same hash are confirmed to be identical by comparing their
+        values.
+
+        Parameters
+        ----------
+        fingerprint_stack : kissim.comparison.FingerprintStack
+            Stacked fingerprints.
+        block_size : int
+            Number of fingerprints whose values are hashed at once.
+
+        Returns
+        -------
+        kissim.comparison.FingerprintDuplicates
+            Groups of identical fingerprints.
+        """
+
+        # Group index and representative values per hash (hash collisions are kept apart)
+        groups = {}
+        unique_ixs = []
+        group_ixs = np.empty(fingerprint_stack.n_fingerprints, dtype=np.int64)
+        for start in range(0, fingerprint_stack.n_fingerprints, block_size):
+            values = cls._get_canonical_values(fingerprint_stack, start, start + block_size)
+            for i, row in enumerate(values, start=start):
+                candidates = groups.setdefault(hashlib.blake2b(row.tobytes()).digest(), [])
+                for group_ix, group_row in candidates:
+                    if np.array_equal(row, group_row, equal_nan=True):
+                        break
+                else:
+                    group_ix = len(unique_ixs)
+                    unique_ixs.append(i)
+                    candidates.append((group_ix, row.copy()))
+                group_ixs[i] = group_ix
+
+        duplicates = cls()
+        duplicates.structure_klifs_ids = list(fingerprint_stack.structure_klifs_ids)
+        duplicates.unique_ixs = np.array(unique_ixs, dtype=np.int64)
+        duplicates.group_ixs = group_ixs
+
+        n_structure_pairs = duplicates.n_structure_pairs
+        logger.info(
+            f"Duplicates: {duplicates.n_duplicates} of {len(group_ixs)} fingerprints are "
+            f"identical to other fingerprints; structure pairs to compare: "
+            f"{n_structure_pairs['reduced']} instead of {n_structure_pairs['full']}"
+        )
+
+        return duplicates
+
+    def get_fingerprint_stack(self, fingerprint_stack):
+        """
+        Get stacked fingerprints of unique fingerprints.
+
+        Parameters
+        ----------
+        fingerprint_stack : kissim.comparison.FingerprintStack
+            Stacked fingerprints (all structures; same as used to find duplicates).
+
+        Returns
+        -------
+        kissim.comparison.FingerprintStack
+            Stacked fingerprints (unique fingerprints).
+        """
+
+        if fingerprint_stack.structure_klifs_ids != self.structure_klifs_ids:
+            raise ValueError("Fingerprints do not match fingerprints used to find duplicates.")
+        return fingerprint_stack.subset(self.unique_ixs)
+
+    def get_pair_tiles(self, tile_size=2000):
+        """
+        Get the fingerprint pairs to be compared for the unique fingerprints (indices refer to the
+        stacked unique fingerprints): One self-comparison per group with duplicates, followed by
+        all unique fingerprint pairs in condensed order, split into tiles.
+
+        Parameters
+        ----------
+        tile_size : int
+            Maximum number of pairs per tile.
+
+        Yields
+        ------
+        tuple of np.ndarray of int
+            Fingerprint indices i and j for pairs in tile.
+        """
+
+        duplicated_group_ixs = np.flatnonzero(self.group_sizes > 1)
+        for start in range(0, len(duplicated_group_ixs), tile_size):
+            group_ixs = duplicated_group_ixs[start : start + tile_size]
+            yield group_ixs, group_ixs
+        yield from get_pair_tiles(self.n_unique, tile_size)
+
+    def expand_feature_distances_array(self, feature_distances_array, fingerprint_stack):
+        """
+        Expand feature distances calculated for unique fingerprints (e.g. a tile generated from
+        `get_pair_tiles`) to all structure pairs of the respective groups.
+
+        Parameters
+        ----------
+        feature_distances_array : kissim.comparison.FeatureDistancesArray
+            Feature distances for pairs of unique fingerprints.
+        fingerprint_stack : kissim.comparison.FingerprintStack
+            Stacked fingerprints (all structures; same as used to find duplicates).
+
+        Returns
+        -------
+        kissim.comparison.FeatureDistancesArray
+            Feature distances for structure pairs (i < j; sorted in condensed order).
+        """
+
+        if fingerprint_stack.structure_klifs_ids != self.structure_klifs_ids:
+            raise ValueError("Fingerprints do not match fingerprints used to find duplicates.")
+
+        # Structure indices sorted by group, and position of the first structure per group
+        member_ixs = np.argsort(self.group_ixs, kind="stable")
+        group_sizes = self.group_sizes
+        group_starts = np.concatenate([[0], np.cumsum(group_sizes)[:-1]])
+
+        # Number of structure pairs per pair of unique fingerprints
+        group_ixs1, group_ixs2 = feature_distances_array.pairs.T
+        sizes1, sizes2 = group_sizes[group_ixs1], group_sizes[group_ixs2]
+        is_self = group_ixs1 == group_ixs2
+        n_pairs = np.where(is_self, sizes1 * (sizes1 - 1) // 2, sizes1 * sizes2)
+
+        # Position of each structure pair within the structure pairs of its unique pair
+        pair_ixs = np.repeat(np.arange(len(n_pairs)), n_pairs)
+        offsets = np.arange(len(pair_ixs)) - np.repeat(np.cumsum(n_pairs) - n_pairs, n_pairs)
+        sizes1, sizes2, is_self = sizes1[pair_ixs], sizes2[pair_ixs], is_self[pair_ixs]
+
+        # Pairs of different groups: all member combinations (row-major)
+        members1 = offsets // np.maximum(sizes2, 1)
+        members2 = offsets % np.maximum(sizes2, 1)
+        # Pairs within a group: all member pairs (condensed order)
+        if is_self.any():
+            members1[is_self], members2[is_self] = get_square_indices(
+                offsets[is_self], sizes1[is_self]
+            )
+
+        ixs1 = member_ixs[group_starts[group_ixs1[pair_ixs]] + members1]
+        ixs2 = member_ixs[group_starts[group_ixs2[pair_ixs]] + members2]
+        ixs1, ixs2 = np.minimum(ixs1, ixs2), np.maximum(ixs1, ixs2)
+
+        # Sort structure pairs in condensed order
+        order = np.lexsort((ixs2, ixs1))
+        pair_ixs = pair_ixs[order]
+        tile = (
+            np.stack([ixs1[order], ixs2[order]], axis=1),
+            {
+                measure: distances[pair_ixs]
+                for measure, distances in feature_distances_array.distances.items()
+            },
+            feature_distances_array.bit_numbers[pair_ixs],
+        )
+        return FeatureDistancesArray._from_tile(
+            tile, fingerprint_stack, feature_distances_array.distance_measures
+        )
+
+    def get_groups(self):
+        """
+        Get the group per structure as table.
+
+        Returns
+        -------
+        pandas.DataFrame
+            Structure KLIFS ID (structure_klifs_id) and structure KLIFS ID of the first structure
+            with an identical fingerprint (unique_structure_klifs_id).
+        """
+
+        structure_klifs_ids = np.array(self.structure_klifs_ids, dtype=object)
+        return pd.DataFrame(
+            {
+                "structure_klifs_id": structure_klifs_ids,
+                "unique_structure_klifs_id": structure_klifs_ids[self.unique_ixs[self.group_ixs]],
+            }
+        )
+
+    @staticmethod
+    def _get_canonical_values(fingerprint_stack, start=0, end=None):
+        """
+        Get fingerprint values with a canonical byte representation, i.e. one NaN representation
+        and no negative zeros.
+
+        Parameters
+        ----------
+        fingerprint_stack : kissim.comparison.FingerprintStack
+            Stacked fingerprints.
+        start : int
+            First fingerprint index.
+        end : int or None
+            Last fingerprint index (excluded).
+
+        Returns
+        -------
+        np.ndarray
+            Values (fingerprints x 1032 bits).
+        """
+
+        values = fingerprint_stack.get_values(start, end).astype(np.float64)
+        values += 0.0
+        values[np.isnan(values)] = np.nan
+        return values
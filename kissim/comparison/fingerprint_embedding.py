@@ -0,0 +1,318 @@
+"""
+kissim.comparison.fingerprint_embedding
+
+Defines a low-dimensional linear embedding (PCA) of stacked fingerprints for fast approximate
+top-k search by Euclidean distance.
+"""
+
+import logging
+
+import numpy as np
+
+from . import FingerprintDistance, PrunedSearch
+from .kernels import check_distance_measures
+from .utils import get_scaled_values, get_search_recall, get_value_means, get_value_scales
+
+logger = logging.getLogger(__name__)
+
+
+class FingerprintEmbedding:
+    """
+    Low-dimensional embedding of fingerprints via a truncated PCA (principal axes of the centered
+    values), fitted on stacked (normalized) fingerprint values and persisted as projection (means,
+    scales, and components).
+
+    Fingerprint values of each feature are scaled by the feature weight divided by the number of
+    bits, so that the Euclidean distance between two fingerprints' scaled values combines the
+    weighted scaled Euclidean feature distances (i.e. features with weight zero are ignored).
+    NaN values are imputed with the mean value per bit of the fitted fingerprints.
+
+    Embedded distances approximate fingerprint distances; search results may miss neighbors
+    (see `get_recall`).
+
+    Attributes
+    ----------
+    distance_measure : str
+        Distance measure of the approximated fingerprint distances.
+    feature_weights : np.ndarray
+        Feature weights (15 features).
+    means : np.ndarray
+        Mean value per bit of the fitted fingerprints (1032 bits: 8 physicochemical and 4
+        distances features x 85 bits, and 3 moments features x 4 bits); used to impute NaN
+        values and to center values.
+    scales : np.ndarray
+        Scale per bit (1032 bits).
+    components : np.ndarray
+        Principal axes (components x 1032 bits).
+    explained_variance_ratio : np.ndarray
+        Fraction of the variance of the fitted (scaled) values explained per component.
+    structure_klifs_ids : list of int
+        Structure KLIFS IDs of the embedded fingerprints (database).
+    embeddings : np.ndarray
+        Embedded fingerprints (database fingerprints x components).
+    """
+
+    def __init__(self):
+
+        self.distance_measure = None
+        self.feature_weights = None
+        self.means = None
+        self.scales = None
+        self.components = None
+        self.explained_variance_ratio = None
+        self.structure_klifs_ids = None
+        self.embeddings = None
+
+    @property
+    def n_components(self):
+        """
+        Number of components (embedding dimensions).
+
+        Returns
+        -------
+        int
+            Number of components.
+        """
+
+        return len(self.components)
+
+    @classmethod
+    def from_fingerprint_stack(
+        cls,
+        fingerprint_stack,
+        distance_measure="scaled_euclidean",
+        feature_weights=None,
+        n_components=32,
+        block_size=10000,
+    ):
+        """
+        Fit the embedding on stacked fingerprints and embed these fingerprints (database).
+
+        Parameters
+        ----------
+        fingerprint_stack : kissim.comparison.FingerprintStack
+            Stacked fingerprints (database).
+        distance_measure : str
+            Distance measure (scaled_euclidean or scaled_cityblock).
+        feature_weights : None or list of float
+            Feature weights (see kissim.comparison.FingerprintDistance).
+        n_components : int
+            Number of components (embedding dimensions; e.g. 16 to 64).
+        block_size : int
+            Number of fingerprints processed at once.
+
+        Returns
+        -------
+        kissim.comparison.FingerprintEmbedding
+            Embedding.
+        """
+
+        n_bits = fingerprint_stack.n_bits
+        if not 1 <= n_components <= n_bits.sum():
+            raise ValueError(f"Number of components must be between 1 and {n_bits.sum()}.")
+
+        embedding = cls()
+        embedding.distance_measure = check_distance_measures(distance_measure)[0]
+        embedding.feature_weights = FingerprintDistance()._format_weights(feature_weights)
+        embedding.scales = get_value_scales(embedding.feature_weights, n_bits)
+        embedding._fit(fingerprint_stack, n_components, block_size)
+        embedding.structure_klifs_ids = list(fingerprint_stack.structure_klifs_ids)
+        embedding.embeddings = embedding.transform(fingerprint_stack, block_size)
+
+        logger.info(
+            f"Embedding with {n_components} components explains "
+            f"{embedding.explained_variance_ratio.sum():.1%} of the variance"
+        )
+
+        return embedding
+
+    @classmethod
+    def from_npz(cls, filepath):
+        """
+        Load the embedding from a numpy npz file (see `to_npz`).
+
+        Parameters
+        ----------
+        filepath : str or pathlib.Path
+            Path to npz file.
+
+        Returns
+        -------
+        kissim.comparison.FingerprintEmbedding
+            Embedding.
+        """
+
+        with np.load(filepath, allow_pickle=False) as data:
+            embedding = cls()
+            embedding.distance_measure = str(data["distance_measure"])
+            embedding.feature_weights = data["feature_weights"]
+            embedding.means = data["means"]
+            embedding.scales = data["scales"]
+            embedding.components = data["components"]
+            embedding.explained_variance_ratio = data["explained_variance_ratio"]
+            embedding.structure_klifs_ids = data["structure_klifs_ids"].tolist()
+            embedding.embeddings = data["embeddings"]
+        return embedding
+
+    def to_npz(self, filepath):
+        """
+        Write the embedding (projection and embedded database fingerprints) to a numpy npz
+        file.
+
+        Parameters
+        ----------
+        filepath : str or pathlib.Path
+            Path to npz file.
+        """
+
+        np.savez(
+            filepath,
+            distance_measure=np.array(self.distance_measure),
+            feature_weights=self.feature_weights,
+            means=self.means,
+            scales=self.scales,
+            components=self.components,
+            explained_variance_ratio=self.explained_variance_ratio,
+            structure_klifs_ids=np.array(self.structure_klifs_ids, dtype=np.int64),
+            embeddings=self.embeddings,
+        )
+
+    def transform(self, fingerprint_stack, block_size=10000):
+        """
+        Embed (project) stacked fingerprints.
+
+        Parameters
+        ----------
+        fingerprint_stack : kissim.comparison.FingerprintStack
+            Stacked fingerprints.
+        block_size : int
+            Number of fingerprints processed at once.
+
+        Returns
+        -------
+        np.ndarray
+            Embedded fingerprints (fingerprints x components).
+        """
+
+        embeddings = np.empty((fingerprint_stack.n_fingerprints, self.n_components))
+        for start in range(0, fingerprint_stack.n_fingerprints, block_size):
+            values = get_scaled_values(
+                fingerprint_stack, self.means, self.scales, start, start + block_size
+            )
+            embeddings[start : start + block_size] = values @ self.components.T
+        return embeddings
+
+    def search(self, query_stack, n_neighbors=10):
+        """
+        Get the k nearest embedded database fingerprints per query fingerprint (Euclidean
+        distance in embedding space). Database fingerprints with the same structure KLIFS ID as
+        the query are skipped.
+
+        Parameters
+        ----------
+        query_stack : kissim.comparison.FingerprintStack
+            Stacked query fingerprints.
+        n_neighbors : int
+            Number of nearest database fingerprints per query (k).
+
+        Returns
+        -------
+        neighbor_ixs : np.ndarray of int
+            Database fingerprint indices of the nearest database fingerprints, sorted by
+            distance (queries x k); -1 if not available.
+        distances : np.ndarray
+            Euclidean distances in embedding space (queries x k); NaN if not available.
+        """
+
+        if n_neighbors < 1:
+            raise ValueError("Number of neighbors must be at least 1.")
+
+        neighbor_ixs = np.full((query_stack.n_fingerprints, n_neighbors), -1, dtype=np.int64)
+        distances = np.full((query_stack.n_fingerprints, n_neighbors), np.nan)
+        structure_klifs_ids = np.array(self.structure_klifs_ids)
+        query_embeddings = self.transform(query_stack)
+
+        for i, query_embedding in enumerate(query_embeddings):
+            query_distances = np.sqrt(np.square(self.embeddings - query_embedding).sum(axis=1))
+            candidate_ixs = np.flatnonzero(
+                structure_klifs_ids != query_stack.structure_klifs_ids[i]
+            )
+            if len(candidate_ixs) > n_neighbors:
+                candidate_ixs = candidate_ixs[
+                    np.argpartition(query_distances[candidate_ixs], n_neighbors - 1)[:n_neighbors]
+                ]
+            order = np.lexsort((candidate_ixs, query_distances[candidate_ixs]))
+            neighbor_ixs[i, : len(order)] = candidate_ixs[order]
+            distances[i, : len(order)] = query_distances[candidate_ixs[order]]
+
+        return neighbor_ixs, distances
+
+    def get_recall(self, fingerprint_stack, n_neighbors=10, n_samples=100, seed=0):
+        """
+        Get the recall of the top-k in embedding space, i.e. the fraction of the exact k most
+        similar fingerprints (fingerprint distances) that are found, for a random sample of
+        database fingerprints used as queries (exact results from
+        kissim.comparison.PrunedSearch).
+
+        Parameters
+        ----------
+        fingerprint_stack : kissim.comparison.FingerprintStack
+            Stacked fingerprints (database; same fingerprints as embedded).
+        n_neighbors : int
+            Number of most similar database fingerprints per query (k).
+        n_samples : int
+            Number of database fingerprints sampled as queries.
+        seed : int
+            Seed for the random sample.
+
+        Returns
+        -------
+        float
+            Recall (mean over sampled queries); NaN if no exact neighbors are available.
+        """
+
+        if fingerprint_stack.structure_klifs_ids != self.structure_klifs_ids:
+            raise ValueError("Fingerprints do not match embedded fingerprints.")
+
+        exact_search = PrunedSearch.from_fingerprint_stack(
+            fingerprint_stack, self.distance_measure, self.feature_weights.tolist()
+        )
+        return get_search_recall(self, exact_search, n_neighbors, n_samples, seed)
+
+    def _fit(self, fingerprint_stack, n_components, block_size):
+        """
+        Fit means and components on stacked fingerprints. The covariance matrix of the scaled
+        values is accumulated block by block, so that the fingerprints x bits value matrix is
+        never held in memory at once.
+
+        Parameters
+        ----------
+        fingerprint_stack : kissim.comparison.FingerprintStack
+            Stacked fingerprints.
+        n_components : int
+            Number of components.
+        block_size : int
+            Number of fingerprints processed at once.
+        """
+
+        # Means ignore NaN values
+        self.means = get_value_means(fingerprint_stack, block_size)
+
+        # Covariance of centered and scaled values (NaN values are imputed with means)
+        n_bits = len(self.means)
+        covariance = np.zeros((n_bits, n_bits))
+        for start in range(0, fingerprint_stack.n_fingerprints, block_size):
+            scaled_values = get_scaled_values(
+                fingerprint_stack, self.means, self.scales, start, start + block_size
+            )
+            covariance += scaled_values.T @ scaled_values
+
+        eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+        order = np.argsort(eigenvalues)[::-1][:n_components]
+        self.components = eigenvectors[:, order].T
+        eigenvalues = np.clip(eigenvalues, 0, None)
+        self.explained_variance_ratio = (
+            eigenvalues[order] / eigenvalues.sum()
+            if eigenvalues.sum() > 0
+            else np.zeros(n_components)
+        )
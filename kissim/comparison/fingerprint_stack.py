@@ -0,0 +1,514 @@
+"""
+kissim.comparison.fingerprint_stack
+
+Defines multiple fingerprints stacked into arrays (one array per feature type).
+"""
+
+import logging
+
+import numpy as np
+
+from .kernels import (
+    calculate_bit_numbers,
+    calculate_feature_distances,
+    count_bits,
+    pack_bit_masks,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class FingerprintStack:
+    """
+    Multiple fingerprints stacked into one array per feature type, enabling the vectorized
+    comparison of many fingerprint pairs at once.
+
+    Attributes
+    ----------
+    structure_klifs_ids : list of int
+        Structure KLIFS IDs (one per fingerprint, defines the fingerprint order).
+    kinase_names : list of str
+        Kinase names (one per fingerprint).
+    kinase_codes : np.ndarray of int
+        Kinase codes (one per fingerprint), i.e. positions of kinase names in `kinase_categories`.
+    kinase_categories : list of str
+        Unique kinase names (sorted alphabetically).
+    physicochemical : np.ndarray
+        Physicochemical features (fingerprints x 8 features x 85 bits).
+    distances : np.ndarray
+        Distances features (fingerprints x 4 features x 85 bits).
+    moments : np.ndarray
+        Moments features (fingerprints x 3 features x 4 bits).
+    bit_masks : list of np.ndarray
+        Validity (non-NaN) masks per feature type, packed into 64-bit words (fingerprints x
+        features x words).
+
+    Notes
+    -----
+    Features are stacked in the same order as used by kissim.comparison.FeatureDistances.
+    """
+
+    def __init__(self):
+
+        self.structure_klifs_ids = None
+        self.kinase_names = None
+        self.kinase_codes = None
+        self.kinase_categories = None
+        self.physicochemical = None
+        self.distances = None
+        self.moments = None
+        self.bit_masks = None
+
+    @property
+    def n_fingerprints(self):
+        """
+        Number of fingerprints.
+
+        Returns
+        -------
+        int
+            Number of fingerprints.
+        """
+
+        return len(self.structure_klifs_ids)
+
+    @property
+    def features(self):
+        """
+        Feature arrays per feature type (physicochemical, distances, and moments).
+
+        Returns
+        -------
+        list of np.ndarray
+            Feature arrays (fingerprints x features x bits).
+        """
+
+        return [self.physicochemical, self.distances, self.moments]
+
+    @property
+    def n_bits(self):
+        """
+        Number of bits per feature (15 features).
+
+        Returns
+        -------
+        np.ndarray
+            Number of bits per feature.
+        """
+
+        return np.concatenate(
+            [np.full(features.shape[1], features.shape[2]) for features in self.features]
+        )
+
+    @property
+    def n_valid_bits(self):
+        """
+        Number of bits free of NaN values per fingerprint and feature (upper bound for the number
+        of bit pairs free of NaN values in any fingerprint pair).
+
+        Returns
+        -------
+        np.ndarray
+            Number of bits free of NaN values (fingerprints x 15 features).
+        """
+
+        return np.concatenate(
+            [count_bits(bit_masks).sum(axis=-1) for bit_masks in self.bit_masks], axis=1
+        ).astype(np.int16)
+
+    def get_bit_numbers(self, fingerprint_ixs1, fingerprint_ixs2):
+        """
+        Get the number of bit pairs free of NaN values for fingerprint pairs, based on packed
+        validity masks only (float feature values are not touched).
+
+        Parameters
+        ----------
+        fingerprint_ixs1 : np.ndarray of int
+            Fingerprint indices for first fingerprint per pair.
+        fingerprint_ixs2 : np.ndarray of int
+            Fingerprint indices for second fingerprint per pair.
+
+        Returns
+        -------
+        np.ndarray
+            Number of bit pairs free of NaN values (pairs x 15 features).
+        """
+
+        return np.concatenate(
+            [
+                calculate_bit_numbers(bit_masks[fingerprint_ixs1], bit_masks[fingerprint_ixs2])
+                for bit_masks in self.bit_masks
+            ],
+            axis=1,
+        )
+
+    def get_feature_distances(
+        self,
+        query_stack,
+        fingerprint_ixs=None,
+        distance_measure="scaled_euclidean",
+        feature_ixs=None,
+        query_ix=0,
+    ):
+        """
+        Get feature distances between one query fingerprint and stacked fingerprints.
+
+        Parameters
+        ----------
+        query_stack : kissim.comparison.FingerprintStack
+            Stacked query fingerprints.
+        fingerprint_ixs : None or np.ndarray of int
+            Fingerprint indices. If None (default), all fingerprints are used.
+        distance_measure : str
+            Distance measure.
+        feature_ixs : None or list of int
+            Feature indices (sorted; 15 features in total). If None (default), all features are
+            used.
+        query_ix : int
+            Query fingerprint index in query stack.
+
+        Returns
+        -------
+        np.ndarray
+            Feature distances (fingerprints x features).
+        """
+
+        if fingerprint_ixs is None:
+            fingerprint_ixs = np.arange(self.n_fingerprints)
+        if feature_ixs is None:
+            feature_ixs = np.arange(len(self.n_bits))
+        feature_ixs = np.asarray(feature_ixs, dtype=int)
+
+        feature_distances = []
+        feature_offset = 0
+        for query_features, features in zip(query_stack.features, self.features):
+            n_features = features.shape[1]
+            block_feature_ixs = (
+                feature_ixs[
+                    (feature_ixs >= feature_offset) & (feature_ixs < feature_offset + n_features)
+                ]
+                - feature_offset
+            )
+            feature_offset += n_features
+            if len(block_feature_ixs) == 0:
+                continue
+            features = features[fingerprint_ixs][:, block_feature_ixs]
+            distances, _ = calculate_feature_distances(
+                np.broadcast_to(query_features[query_ix, block_feature_ixs], features.shape),
+                features,
+                distance_measure,
+            )
+            feature_distances.append(distances[distance_measure])
+        return np.concatenate(feature_distances, axis=1)
+
+    def get_values(self, start=0, end=None):
+        """
+        Get fingerprint values as one 1D array per fingerprint (physicochemical, distances, and
+        moments features in stacking order, i.e. moments are ordered by moment, then subpocket;
+        1032 bits).
+
+        Parameters
+        ----------
+        start : int
+            First fingerprint index.
+        end : int or None
+            Last fingerprint index (excluded). If None (default), values are returned up to the
+            last fingerprint.
+
+        Returns
+        -------
+        np.ndarray
+            Values (fingerprints x 1032 bits).
+        """
+
+        return np.concatenate(
+            [
+                features[start:end].reshape(len(features[start:end]), -1)
+                for features in self.features
+            ],
+            axis=1,
+        )
+
+    def get_fingerprint_ixs(self, structure_klifs_ids):
+        """
+        Get fingerprint indices for structure KLIFS IDs.
+
+        Parameters
+        ----------
+        structure_klifs_ids : array-like of int
+            Structure KLIFS IDs.
+
+        Returns
+        -------
+        np.ndarray of int
+            Fingerprint indices (same shape as input).
+        """
+
+        fingerprint_ixs_by_id = {
+            structure_klifs_id: i for i, structure_klifs_id in enumerate(self.structure_klifs_ids)
+        }
+        structure_klifs_ids = np.asarray(structure_klifs_ids)
+        try:
+            fingerprint_ixs = [
+                fingerprint_ixs_by_id[i] for i in structure_klifs_ids.ravel().tolist()
+            ]
+        except KeyError as e:
+            raise ValueError(f"Structure KLIFS ID not in fingerprints: {e.args[0]}")
+        return np.array(fingerprint_ixs, dtype=np.int64).reshape(structure_klifs_ids.shape)
+
+    @classmethod
+    def from_fingerprint_generator(cls, fingerprint_generator):
+        """
+        Stack fingerprints from a FingerprintGenerator object.
+
+        Parameters
+        ----------
+        fingerprint_generator : kissim.encoding.FingerprintGenerator
+            Multiple fingerprints.
+
+        Returns
+        -------
+        kissim.comparison.FingerprintStack
+            Stacked fingerprints.
+        """
+
+        return cls.from_fingerprints(list(fingerprint_generator.data.values()))
+
+    @classmethod
+    def from_fingerprints(cls, fingerprints):
+        """
+        Stack fingerprints from a list of fingerprints (empty fingerprints are skipped).
+
+        Parameters
+        ----------
+        fingerprints : list of kissim.encoding.FingerprintBase
+            Fingerprints.
+
+        Returns
+        -------
+        kissim.comparison.FingerprintStack
+            Stacked fingerprints.
+        """
+
+        fingerprints = [fingerprint for fingerprint in fingerprints if fingerprint]
+
+        fingerprint_stack = cls()
+        fingerprint_stack.structure_klifs_ids = [i.structure_klifs_id for i in fingerprints]
+        fingerprint_stack.kinase_names = [i.kinase_name for i in fingerprints]
+        (
+            fingerprint_stack.kinase_codes,
+            fingerprint_stack.kinase_categories,
+        ) = cls._get_kinase_codes(fingerprint_stack.kinase_names)
+        fingerprint_stack.physicochemical = cls._stack_features(
+            [list(i.values_dict["physicochemical"].values()) for i in fingerprints], 8, 85
+        )
+        fingerprint_stack.distances = cls._stack_features(
+            [list(i.values_dict["spatial"]["distances"].values()) for i in fingerprints], 4, 85
+        )
+        fingerprint_stack.moments = cls._stack_features(
+            [
+                np.array(list(i.values_dict["spatial"]["moments"].values()), dtype=float).T
+                for i in fingerprints
+            ],
+            3,
+            4,
+        )
+        fingerprint_stack.bit_masks = [pack_bit_masks(i) for i in fingerprint_stack.features]
+
+        logger.info(f"Number of stacked fingerprints: {fingerprint_stack.n_fingerprints}")
+
+        return fingerprint_stack
+
+    @classmethod
+    def from_npz(cls, filepath):
+        """
+        Load stacked fingerprints from a numpy npz file (see `to_npz`).
+
+        Parameters
+        ----------
+        filepath : str or pathlib.Path
+            Path to npz file.
+
+        Returns
+        -------
+        kissim.comparison.FingerprintStack
+            Stacked fingerprints.
+        """
+
+        with np.load(filepath, allow_pickle=False) as data:
+            fingerprint_stack = cls()
+            fingerprint_stack.structure_klifs_ids = data["structure_klifs_ids"].tolist()
+            fingerprint_stack.kinase_names = data["kinase_names"].tolist()
+            fingerprint_stack.physicochemical = data["physicochemical"]
+            fingerprint_stack.distances = data["distances"]
+            fingerprint_stack.moments = data["moments"]
+        (
+            fingerprint_stack.kinase_codes,
+            fingerprint_stack.kinase_categories,
+        ) = cls._get_kinase_codes(fingerprint_stack.kinase_names)
+        fingerprint_stack.bit_masks = [pack_bit_masks(i) for i in fingerprint_stack.features]
+
+        logger.info(f"Number of stacked fingerprints: {fingerprint_stack.n_fingerprints}")
+
+        return fingerprint_stack
+
+    def to_npz(self, filepath):
+        """
+        Write stacked fingerprints to a numpy npz file, e.g. as prebuilt fingerprint database
+        that loads without parsing fingerprint json files.
+
+        Parameters
+        ----------
+        filepath : str or pathlib.Path
+            Path to npz file.
+        """
+
+        np.savez(filepath, **self._get_arrays())
+
+    @classmethod
+    def concatenate(cls, fingerprint_stacks):
+        """
+        Concatenate stacked fingerprints (fingerprint order is kept).
+
+        Parameters
+        ----------
+        fingerprint_stacks : list of kissim.comparison.FingerprintStack
+            Stacked fingerprints.
+
+        Returns
+        -------
+        kissim.comparison.FingerprintStack
+            Stacked fingerprints.
+        """
+
+        fingerprint_stack = cls()
+        fingerprint_stack.structure_klifs_ids = [
+            i for stack in fingerprint_stacks for i in stack.structure_klifs_ids
+        ]
+        fingerprint_stack.kinase_names = [
+            i for stack in fingerprint_stacks for i in stack.kinase_names
+        ]
+        (
+            fingerprint_stack.kinase_codes,
+            fingerprint_stack.kinase_categories,
+        ) = cls._get_kinase_codes(fingerprint_stack.kinase_names)
+        fingerprint_stack.physicochemical = np.concatenate(
+            [stack.physicochemical for stack in fingerprint_stacks]
+        )
+        fingerprint_stack.distances = np.concatenate(
+            [stack.distances for stack in fingerprint_stacks]
+        )
+        fingerprint_stack.moments = np.concatenate([stack.moments for stack in fingerprint_stacks])
+        fingerprint_stack.bit_masks = [
+            np.concatenate([stack.bit_masks[i] for stack in fingerprint_stacks])
+            for i in range(len(fingerprint_stack.features))
+        ]
+
+        return fingerprint_stack
+
+    def subset(self, fingerprint_ixs):
+        """
+        Get a subset of the stacked fingerprints.
+
+        Parameters
+        ----------
+        fingerprint_ixs : list of int or np.ndarray of int
+            Fingerprint indices.
+
+        Returns
+        -------
+        kissim.comparison.FingerprintStack
+            Stacked fingerprints (subset).
+        """
+
+        fingerprint_ixs = np.asarray(fingerprint_ixs, dtype=int)
+
+        fingerprint_stack = self.__class__()
+        fingerprint_stack.structure_klifs_ids = [
+            self.structure_klifs_ids[i] for i in fingerprint_ixs
+        ]
+        fingerprint_stack.kinase_names = [self.kinase_names[i] for i in fingerprint_ixs]
+        fingerprint_stack.kinase_codes = self.kinase_codes[fingerprint_ixs]
+        fingerprint_stack.kinase_categories = self.kinase_categories
+        fingerprint_stack.physicochemical = self.physicochemical[fingerprint_ixs]
+        fingerprint_stack.distances = self.distances[fingerprint_ixs]
+        fingerprint_stack.moments = self.moments[fingerprint_ixs]
+        fingerprint_stack.bit_masks = [bit_masks[fingerprint_ixs] for bit_masks in self.bit_masks]
+
+        return fingerprint_stack
+
+    def _get_arrays(self):
+        """
+        Get the arrays needed to restore stacked fingerprints (see `to_npz` and `from_npz`).
+
+        Returns
+        -------
+        dict of str: np.ndarray
+            Arrays by name.
+        """
+
+        return {
+            "structure_klifs_ids": np.array(self.structure_klifs_ids, dtype=np.int64),
+            "kinase_names": np.array(self.kinase_names, dtype=str),
+            "physicochemical": self.physicochemical,
+            "distances": self.distances,
+            "moments": self.moments,
+        }
+
+    @staticmethod
+    def _get_kinase_codes(kinase_names):
+        """
+        Get categorical kinase codes for kinase names.
+
+        Parameters
+        ----------
+        kinase_names : list of str
+            Kinase names (one per fingerprint).
+
+        Returns
+        -------
+        kinase_codes : np.ndarray of int
+            Kinase codes (one per fingerprint), i.e. positions of kinase names in kinase
+            categories.
+        kinase_categories : list of str
+            Unique kinase names (sorted alphabetically).
+        """
+
+        kinase_categories, kinase_codes = np.unique(
+            np.array(kinase_names, dtype=object).astype(str), return_inverse=True
+        )
+        return kinase_codes.astype(np.int32), kinase_categories.tolist()
+
+    @staticmethod
+    def _stack_features(features, n_features, n_bits):
+        """
+        Stack per-fingerprint features into one array.
+
+        Parameters
+        ----------
+        features : list of array-like
+            Features per fingerprint (features x bits).
+        n_features : int
+            Number of features.
+        n_bits : int
+            Number of bits per feature (default used for empty stacks).
+
+        Returns
+        -------
+        np.ndarray
+            Stacked features (fingerprints x features x bits).
+        """
+
+        if len(features) == 0:
+            return np.empty((0, n_features, n_bits))
+
+        try:
+            features = np.array(features, dtype=float)
+        except ValueError:
+            raise ValueError("Features must have the same number of bits for all fingerprints.")
+        if features.ndim != 3 or features.shape[1] != n_features:
+            raise ValueError(
+                f"Features must have shape ({n_features}, {n_bits}) per fingerprint, "
+                f"but have shape {features.shape[1:]}."
+            )
+        return features
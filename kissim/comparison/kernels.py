@@ -0,0 +1,249 @@
+"""
+kissim.comparison.kernels
+
+Defines vectorized kernels calculating feature distances for many fingerprint pairs at once.
+"""
+
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DISTANCE_MEASURES = ["scaled_euclidean", "scaled_cityblock"]
+KERNELS = ["vectorized", "blas"]
+
+# Number of set bits for each byte value (popcount fallback for numpy < 2.0)
+_BIT_COUNTS_PER_BYTE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def check_distance_measures(distance_measures):
+    """
+    Check and format one or more distance measures.
+
+    Parameters
+    ----------
+    distance_measures : str or list of str
+        One or more distance measures.
+
+    Returns
+    -------
+    list of str
+        Distance measures.
+    """
+
+    if isinstance(distance_measures, str):
+        distance_measures = [distance_measures]
+    for distance_measure in distance_measures:
+        if distance_measure not in DISTANCE_MEASURES:
+            raise ValueError(
+                f'Distance measure unknown. Choose from: {", ".join(DISTANCE_MEASURES)}'
+            )
+    return list(distance_measures)
+
+
+def check_kernel(kernel):
+    """
+    Check kernel name.
+
+    Parameters
+    ----------
+    kernel : str
+        Kernel name: "vectorized" (feature distances calculated per fingerprint pair, any distance
+        measure) or "blas" (scaled Euclidean feature distances calculated per block of
+        fingerprints via matrix multiplication).
+
+    Returns
+    -------
+    str
+        Kernel name.
+    """
+
+    if kernel not in KERNELS:
+        raise ValueError(f'Kernel unknown. Choose from: {", ".join(KERNELS)}')
+    return kernel
+
+
+def pack_bit_masks(features):
+    """
+    Pack the validity (non-NaN) mask of each feature into 64-bit machine words.
+
+    Parameters
+    ----------
+    features : np.ndarray
+        Features (fingerprints x features x bits).
+
+    Returns
+    -------
+    np.ndarray
+        Packed validity masks (fingerprints x features x words) of type uint64.
+    """
+
+    n_fingerprints, n_features, n_bits = features.shape
+    n_words = max(1, -(-n_bits // 64))
+
+    mask = ~np.isnan(features)
+    mask = np.concatenate(
+        [mask, np.zeros((n_fingerprints, n_features, n_words * 64 - n_bits), dtype=bool)],
+        axis=-1,
+    )
+    bit_masks = np.packbits(mask, axis=-1, bitorder="little")
+    return np.ascontiguousarray(bit_masks).view("<u8").astype(np.uint64)
+
+
+def count_bits(words):
+    """
+    Count set bits (popcount) per 64-bit word.
+
+    Parameters
+    ----------
+    words : np.ndarray
+        Words of type uint64.
+
+    Returns
+    -------
+    np.ndarray
+        Number of set bits per word.
+    """
+
+    if hasattr(np, "bitwise_count"):  # numpy >= 2.0
+        return np.bitwise_count(words)
+    bytes_ = words[..., np.newaxis].view(np.uint8)
+    return _BIT_COUNTS_PER_BYTE[bytes_].sum(axis=-1)
+
+
+def calculate_bit_numbers(bit_masks1, bit_masks2):
+    """
+    Calculate the number of bit pairs free of NaN values for many feature pairs at once, based on
+    packed validity masks only (AND plus popcount per word).
+
+    Parameters
+    ----------
+    bit_masks1 : np.ndarray
+        Packed validity masks for fingerprints 1 (pairs x features x words).
+    bit_masks2 : np.ndarray
+        Packed validity masks for fingerprints 2 (pairs x features x words).
+
+    Returns
+    -------
+    np.ndarray
+        Number of bit pairs free of NaN values (pairs x features).
+    """
+
+    return count_bits(bit_masks1 & bit_masks2).sum(axis=-1).astype(np.int16)
+
+
+def calculate_feature_distances(features1, features2, distance_measures="scaled_euclidean"):
+    """
+    Calculate per-feature distances and bit numbers for many feature pairs at once, for one or
+    more distance measures. NaN masks and bit numbers are calculated only once and are shared by
+    all distance measures.
+
+    Parameters
+    ----------
+    features1 : np.ndarray
+        Features for fingerprints 1 (pairs x features x bits).
+    features2 : np.ndarray
+        Features for fingerprints 2 (pairs x features x bits).
+    distance_measures : str or list of str
+        One or more distance measures.
+
+    Returns
+    -------
+    distances : dict of str: np.ndarray
+        Feature distances (pairs x features) per distance measure. Distances are NaN for feature
+        pairs without any bit pair free of NaN values.
+    bit_numbers : np.ndarray
+        Number of bit pairs free of NaN values (pairs x features).
+    """
+
+    distance_measures = check_distance_measures(distance_measures)
+
+    if features1.shape != features2.shape:
+        raise ValueError(f"Features are not of same shape!")
+
+    # NaN mask shared by all distance measures
+    mask = ~(np.isnan(features1) | np.isnan(features2))
+    bit_numbers = mask.sum(axis=-1)
+    differences = np.where(mask, features1 - features2, 0.0)
+
+    distances = {}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for distance_measure in distance_measures:
+            if distance_measure == "scaled_euclidean":
+                distances[distance_measure] = np.sqrt(np.square(differences).sum(axis=-1))
+            elif distance_measure == "scaled_cityblock":
+                distances[distance_measure] = np.abs(differences).sum(axis=-1)
+            distances[distance_measure] = np.where(
+                bit_numbers > 0, distances[distance_measure] / bit_numbers, np.nan
+            )
+
+    return distances, bit_numbers
+
+
+def calculate_feature_distances_blas(features1, features2):
+    """
+    Calculate per-feature scaled Euclidean distances and bit numbers for all combinations of two
+    sets of fingerprints (block) via matrix multiplication, i.e. using BLAS.
+
+    The squared Euclidean distance over bits free of NaN values in both fingerprints is expanded
+    into norm and inner-product terms of masked features x1 and x2 (NaN values set to 0):
+    sum(m1 * m2 * (x1 - x2)^2) = x1^2 @ m2.T + m1 @ x2^2.T - 2 x1 @ x2.T
+    with m1 and m2 being the masks of non-NaN bits. Features are centered per bit beforehand to
+    reduce floating point cancellation.
+
+    Parameters
+    ----------
+    features1 : np.ndarray
+        Features for fingerprints 1 (fingerprints 1 x features x bits).
+    features2 : np.ndarray
+        Features for fingerprints 2 (fingerprints 2 x features x bits).
+
+    Returns
+    -------
+    distances : np.ndarray
+        Scaled Euclidean feature distances (fingerprints 1 x fingerprints 2 x features).
+    bit_numbers : np.ndarray
+        Number of bit pairs free of NaN values (fingerprints 1 x fingerprints 2 x features).
+    """
+
+    if features1.shape[1:] != features2.shape[1:]:
+        raise ValueError(f"Features are not of same shape!")
+
+    n_features = features1.shape[1]
+    distances = np.empty((features1.shape[0], features2.shape[0], n_features))
+    bit_numbers = np.empty((features1.shape[0], features2.shape[0], n_features), dtype=np.int64)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for i in range(n_features):
+
+            values1 = features1[:, i, :]
+            values2 = features2[:, i, :]
+            mask1 = ~np.isnan(values1)
+            mask2 = ~np.isnan(values2)
+
+            # Center bits (bits without any values are set to 0)
+            n_values = mask1.sum(axis=0) + mask2.sum(axis=0)
+            sum_values = np.where(mask1, values1, 0.0).sum(axis=0)
+            sum_values += np.where(mask2, values2, 0.0).sum(axis=0)
+            center = np.where(n_values > 0, sum_values / n_values, 0.0)
+            values1 = np.where(mask1, values1 - center, 0.0)
+            values2 = np.where(mask2, values2 - center, 0.0)
+            mask1 = mask1.astype(float)
+            mask2 = mask2.astype(float)
+
+            squared_distances = (
+                np.square(values1) @ mask2.T
+                + mask1 @ np.square(values2).T
+                - 2.0 * (values1 @ values2.T)
+            )
+            squared_distances = np.maximum(squared_distances, 0.0)
+            bit_numbers[:, :, i] = np.rint(mask1 @ mask2.T)
+
+            distances[:, :, i] = np.where(
+                bit_numbers[:, :, i] > 0,
+                np.sqrt(squared_distances) / bit_numbers[:, :, i],
+                np.nan,
+            )
+
+    return distances, bit_numbers
@@ -0,0 +1,439 @@
+"""
+kissim.comparison.kinase_distance_accumulator
+
+Defines the aggregation of structure pair distances to kinase pair distances.
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+KINASE_DISTANCE_AGGREGATIONS = ["minimum", "maximum", "mean", "size"]
+
+
+class KinaseDistanceAccumulator:
+    """
+    Running per-kinase-pair aggregates (minimum, maximum, sum, and counts) of structure pair
+    distances, stored as kinase x kinase arrays (upper triangle including main diagonal).
+    Structure pair distances can be added in chunks (e.g. tile by tile).
+
+    Attributes
+    ----------
+    kinase_names : list of str
+        Kinase names (define the kinase codes, i.e. kinase positions in arrays).
+    minimum : np.ndarray
+        Minimum distance per kinase pair (kinases x kinases).
+    maximum : np.ndarray
+        Maximum distance per kinase pair (kinases x kinases).
+    sum : np.ndarray
+        Sum of distances per kinase pair (kinases x kinases).
+    count : np.ndarray
+        Number of structure pairs with distance (not NaN) per kinase pair (kinases x kinases).
+    size : np.ndarray
+        Number of structure pairs per kinase pair (kinases x kinases).
+    molecule_codes : None or list of str or int
+        Molecule codes (define the structure indices used in `minimum_pairs` and
+        `maximum_pairs`).
+    minimum_pairs : np.ndarray of int
+        Structure pair (structure indices) with the minimum distance per kinase pair (kinases x
+        kinases x 2); -1 if not available.
+    maximum_pairs : np.ndarray of int
+        Structure pair (structure indices) with the maximum distance per kinase pair (kinases x
+        kinases x 2); -1 if not available.
+    """
+
+    def __init__(self):
+
+        self.kinase_names = None
+        self.minimum = None
+        self.maximum = None
+        self.sum = None
+        self.count = None
+        self.size = None
+        self.molecule_codes = None
+        self.minimum_pairs = None
+        self.maximum_pairs = None
+
+    @property
+    def n_kinases(self):
+        """
+        Number of kinases.
+
+        Returns
+        -------
+        int
+            Number of kinases.
+        """
+
+        return len(self.kinase_names)
+
+    @property
+    def mean(self):
+        """
+        Mean distance per kinase pair.
+
+        Returns
+        -------
+        np.ndarray
+            Mean distance per kinase pair (kinases x kinases).
+        """
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(self.count > 0, self.sum / self.count, np.nan)
+
+    @classmethod
+    def from_kinase_names(cls, kinase_names, molecule_codes=None):
+        """
+        Initialize empty aggregates for a set of kinases.
+
+        Parameters
+        ----------
+        kinase_names : list of str
+            Kinase names.
+        molecule_codes : None or list of str or int
+            Molecule codes; structure indices passed to `update` refer to this list.
+
+        Returns
+        -------
+        kissim.comparison.KinaseDistanceAccumulator
+            Empty kinase distance aggregates.
+        """
+
+        accumulator = cls()
+        accumulator.kinase_names = list(kinase_names)
+        shape = (accumulator.n_kinases, accumulator.n_kinases)
+        accumulator.minimum = np.full(shape, np.nan)
+        accumulator.maximum = np.full(shape, np.nan)
+        accumulator.sum = np.zeros(shape)
+        accumulator.count = np.zeros(shape, dtype=np.int64)
+        accumulator.size = np.zeros(shape, dtype=np.int64)
+        accumulator.molecule_codes = molecule_codes
+        accumulator.minimum_pairs = np.full(shape + (2,), -1, dtype=np.int64)
+        accumulator.maximum_pairs = np.full(shape + (2,), -1, dtype=np.int64)
+        return accumulator
+
+    @classmethod
+    def from_feature_distances_arrays(
+        cls, feature_distances_arrays, feature_weights=None, distance_measure=None
+    ):
+        """
+        Aggregate structure pair distances to kinase pair distances tile by tile, i.e. without
+        holding all structure pairs in memory.
+
+        Parameters
+        ----------
+        feature_distances_arrays : iterable of kissim.comparison.FeatureDistancesArray
+            Feature distances (e.g. tiles as generated by
+            kissim.comparison.FeatureDistancesArray.iter_tiles), referring to the same fingerprint
+            stack.
+        feature_weights : None or list of float
+            Feature weights (see kissim.comparison.FingerprintDistance).
+        distance_measure : str or None
+            Distance measure. If None (default), the first distance measure is used.
+
+        Returns
+        -------
+        kissim.comparison.KinaseDistanceAccumulator or None
+            Kinase distance aggregates (None if no feature distances are given).
+        """
+
+        accumulator = None
+        for feature_distances_array in feature_distances_arrays:
+            if accumulator is None:
+                accumulator = cls.from_kinase_names(
+                    feature_distances_array.kinase_categories,
+                    feature_distances_array.structure_klifs_ids,
+                )
+            accumulator.update_from_feature_distances_array(
+                feature_distances_array, feature_weights, distance_measure
+            )
+        return accumulator
+
+    def update_from_feature_distances_array(
+        self, feature_distances_array, feature_weights=None, distance_measure=None
+    ):
+        """
+        Add fingerprint distances for all fingerprint pairs in feature distances to the kinase
+        pair aggregates. Kinase names must be the kinase categories of the feature distances.
+
+        Parameters
+        ----------
+        feature_distances_array : kissim.comparison.FeatureDistancesArray
+            Feature distances.
+        feature_weights : None or list of float
+            Feature weights (see kissim.comparison.FingerprintDistance).
+        distance_measure : str or None
+            Distance measure. If None (default), the first distance measure is used.
+        """
+
+        if feature_distances_array.kinase_categories != self.kinase_names:
+            raise ValueError("Kinase categories of feature distances do not match kinase names.")
+
+        kinase_codes1, kinase_codes2 = feature_distances_array.kinase_pair_codes
+        distances = feature_distances_array.get_fingerprint_distances(
+            feature_weights, distance_measure
+        )
+        self.update(
+            kinase_codes1,
+            kinase_codes2,
+            distances,
+            feature_distances_array.pairs[:, 0],
+            feature_distances_array.pairs[:, 1],
+        )
+
+    def update(
+        self, kinase_codes1, kinase_codes2, distances, structure_ixs1=None, structure_ixs2=None
+    ):
+        """
+        Add structure pair distances to the kinase pair aggregates.
+
+        Parameters
+        ----------
+        kinase_codes1 : np.ndarray of int
+            Kinase codes (positions in `kinase_names`) for first structure per pair.
+        kinase_codes2 : np.ndarray of int
+            Kinase codes (positions in `kinase_names`) for second structure per pair.
+        distances : np.ndarray of float
+            Distance per structure pair.
+        structure_ixs1 : None or np.ndarray of int
+            Structure indices (positions in `molecule_codes`) for first structure per pair. If
+            None, structure pairs behind minimum and maximum distances are not tracked.
+        structure_ixs2 : None or np.ndarray of int
+            Structure indices (positions in `molecule_codes`) for second structure per pair.
+        """
+
+        kinase_codes1 = np.asarray(kinase_codes1, dtype=np.int64)
+        kinase_codes2 = np.asarray(kinase_codes2, dtype=np.int64)
+        distances = np.asarray(distances, dtype=float)
+
+        # Kinase pairs as flat indices into upper triangle (kinase pairs are unordered)
+        flat_ixs = self._get_flat_indices(kinase_codes1, kinase_codes2)
+        is_valid = ~np.isnan(distances)
+
+        if structure_ixs1 is None or structure_ixs2 is None:
+            structure_pairs = np.full((len(distances), 2), -1, dtype=np.int64)
+        else:
+            structure_pairs = np.stack([structure_ixs1, structure_ixs2], axis=1).astype(np.int64)
+
+        self._update_extremum(
+            self.minimum,
+            self.minimum_pairs,
+            flat_ixs[is_valid],
+            distances[is_valid],
+            structure_pairs[is_valid],
+            largest=False,
+        )
+        self._update_extremum(
+            self.maximum,
+            self.maximum_pairs,
+            flat_ixs[is_valid],
+            distances[is_valid],
+            structure_pairs[is_valid],
+            largest=True,
+        )
+        shape = self.size.shape
+        self.sum += np.bincount(
+            flat_ixs[is_valid], weights=distances[is_valid], minlength=self.sum.size
+        ).reshape(shape)
+        self.count += np.bincount(flat_ixs[is_valid], minlength=self.count.size).reshape(shape)
+        self.size += np.bincount(flat_ixs, minlength=self.size.size).reshape(shape)
+
+    def get_matrix(self, by="minimum", fill=False):
+        """
+        Get kinase distance matrix based on one of the aggregates.
+
+        Parameters
+        ----------
+        by : str
+            Condition on which the distance value per kinase pair is extracted from the set of
+            distances values per structure pair: minimum (default), maximum, mean, or size.
+        fill : bool
+            Fill or fill not (default) lower triangle of distance matrix.
+
+        Returns
+        -------
+        pandas.DataFrame
+            Kinase distance matrix.
+        """
+
+        if by == "minimum":
+            kinase_distance_matrix = self.minimum.copy()
+        elif by == "maximum":
+            kinase_distance_matrix = self.maximum.copy()
+        elif by == "mean":
+            kinase_distance_matrix = self.mean
+        elif by == "size":
+            kinase_distance_matrix = np.where(self.size > 0, self.size, np.nan)
+        else:
+            raise ValueError(
+                f'Condition "by" unknown. Choose from: {", ".join(KINASE_DISTANCE_AGGREGATIONS)}'
+            )
+
+        if fill:
+            lower_triangle = np.tril_indices(self.n_kinases, k=-1)
+            kinase_distance_matrix[lower_triangle] = kinase_distance_matrix.T[lower_triangle]
+
+        # Fill values on matrix main diagonal to 0.0 which are NaN
+        # (i.e. kinases that have only one structure representative)
+        diagonal = np.diagonal(kinase_distance_matrix).copy()
+        np.fill_diagonal(kinase_distance_matrix, np.where(np.isnan(diagonal), 0.0, diagonal))
+
+        return pd.DataFrame(
+            kinase_distance_matrix, columns=self.kinase_names, index=self.kinase_names
+        )
+
+    def get_structure_pair(self, kinase_name1, kinase_name2, by="minimum"):
+        """
+        Get the structure pair behind the minimum or maximum distance of a kinase pair.
+
+        Parameters
+        ----------
+        kinase_name1 : str
+            Kinase name.
+        kinase_name2 : str
+            Kinase name.
+        by : str
+            Minimum (default) or maximum.
+
+        Returns
+        -------
+        tuple or None
+            Molecule codes (or structure indices if no molecule codes are set) of the structure
+            pair; None if no structure pair is available.
+        """
+
+        if by == "minimum":
+            structure_pairs = self.minimum_pairs
+        elif by == "maximum":
+            structure_pairs = self.maximum_pairs
+        else:
+            raise ValueError('Condition "by" unknown. Choose from: minimum, maximum')
+
+        kinase_code1 = self.kinase_names.index(kinase_name1)
+        kinase_code2 = self.kinase_names.index(kinase_name2)
+        kinase_code1, kinase_code2 = sorted([kinase_code1, kinase_code2])
+        structure_ix1, structure_ix2 = structure_pairs[kinase_code1, kinase_code2]
+
+        if structure_ix1 < 0:
+            return None
+        if self.molecule_codes is None:
+            return int(structure_ix1), int(structure_ix2)
+        return self.molecule_codes[structure_ix1], self.molecule_codes[structure_ix2]
+
+    def get_structure_pairs(self, by="minimum"):
+        """
+        Get the structure pairs behind the minimum or maximum distances of all kinase pairs.
+
+        Parameters
+        ----------
+        by : str
+            Minimum (default) or maximum.
+
+        Returns
+        -------
+        pandas.DataFrame
+            Kinase pairs (kinase_1, kinase_2), distance, molecule codes of the structure pair
+            (molecule_code_1, molecule_code_2), and number of structure pairs per kinase pair.
+        """
+
+        if by == "minimum":
+            distances, structure_pairs = self.minimum, self.minimum_pairs
+        elif by == "maximum":
+            distances, structure_pairs = self.maximum, self.maximum_pairs
+        else:
+            raise ValueError('Condition "by" unknown. Choose from: minimum, maximum')
+
+        kinase_codes1, kinase_codes2 = np.nonzero(~np.isnan(distances))
+        structure_ixs1, structure_ixs2 = structure_pairs[kinase_codes1, kinase_codes2].T
+        if self.molecule_codes is None or (structure_ixs1 < 0).any():
+            molecule_codes1, molecule_codes2 = structure_ixs1, structure_ixs2
+        else:
+            molecule_codes = np.array(self.molecule_codes, dtype=object)
+            molecule_codes1 = molecule_codes[structure_ixs1]
+            molecule_codes2 = molecule_codes[structure_ixs2]
+        kinase_names = np.array(self.kinase_names, dtype=object)
+
+        return pd.DataFrame(
+            {
+                "kinase_1": kinase_names[kinase_codes1],
+                "kinase_2": kinase_names[kinase_codes2],
+                "distance": distances[kinase_codes1, kinase_codes2],
+                "molecule_code_1": molecule_codes1,
+                "molecule_code_2": molecule_codes2,
+                "size": self.size[kinase_codes1, kinase_codes2],
+            }
+        )
+
+    @staticmethod
+    def _update_extremum(
+        values, structure_pairs, flat_ixs, distances, new_structure_pairs, largest
+    ):
+        """
+        Update minimum or maximum distances per kinase pair, plus the structure pairs behind them,
+        in place. The extremum per kinase pair within the new distances is found in one pass by
+        sorting by kinase pair and distance (first structure pair wins ties).
+
+        Parameters
+        ----------
+        values : np.ndarray
+            Minimum or maximum distance per kinase pair (kinases x kinases).
+        structure_pairs : np.ndarray of int
+            Structure pair per kinase pair (kinases x kinases x 2).
+        flat_ixs : np.ndarray of int
+            Flat kinase pair indices for new distances (no NaN values).
+        distances : np.ndarray
+            New distances (no NaN values).
+        new_structure_pairs : np.ndarray of int
+            Structure pairs for new distances (pairs x 2).
+        largest : bool
+            Update maximum (True) or minimum (False).
+        """
+
+        if len(distances) == 0:
+            return
+
+        order = np.lexsort((-distances if largest else distances, flat_ixs))
+        flat_ixs_sorted = flat_ixs[order]
+        is_first = np.concatenate([[True], flat_ixs_sorted[1:] != flat_ixs_sorted[:-1]])
+        group_ixs = flat_ixs_sorted[is_first]
+        best = order[is_first]
+
+        candidates = distances[best]
+        current = values.reshape(-1)[group_ixs]
+        if largest:
+            is_better = np.isnan(current) | (candidates > current)
+        else:
+            is_better = np.isnan(current) | (candidates < current)
+
+        values.reshape(-1)[group_ixs[is_better]] = candidates[is_better]
+        structure_pairs.reshape(-1, 2)[group_ixs[is_better]] = new_structure_pairs[best[is_better]]
+
+    def _get_flat_indices(self, kinase_codes1, kinase_codes2):
+        """
+        Get flat indices into the upper triangle of the kinase x kinase arrays for kinase pairs.
+
+        Parameters
+        ----------
+        kinase_codes1 : np.ndarray of int
+            Kinase codes for first structure per pair.
+        kinase_codes2 : np.ndarray of int
+            Kinase codes for second structure per pair.
+
+        Returns
+        -------
+        np.ndarray of int
+            Flat indices.
+        """
+
+        if len(kinase_codes1) > 0 and (
+            min(kinase_codes1.min(), kinase_codes2.min()) < 0
+            or max(kinase_codes1.max(), kinase_codes2.max()) >= self.n_kinases
+        ):
+            raise ValueError("Kinase codes out of range.")
+
+        return np.minimum(kinase_codes1, kinase_codes2) * self.n_kinases + np.maximum(
+            kinase_codes1, kinase_codes2
+        )
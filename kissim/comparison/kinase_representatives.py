@@ -0,0 +1,401 @@
+"""
+kissim.comparison.kinase_representatives
+
+Defines the selection of representative structures (medoids) per kinase, reducing the number of
+structure pairs in cross-kinase comparisons.
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+from . import FeatureDistancesArray
+from .utils import get_pair_list_tiles
+
+logger = logging.getLogger(__name__)
+
+
+class KinaseRepresentatives:
+    """
+    Representative structures per kinase, selected as k medoids of the structures of each
+    kinase based on within-kinase fingerprint distances only (greedy build followed by swaps
+    that reduce the sum of distances of structures to their nearest medoid). Kinases with up to
+    k structures are represented by all their structures.
+
+    Comparing only representatives reduces the number of structure pairs from N x (N - 1) / 2
+    (all structures) to the number of within-kinase pairs plus R x (R - 1) / 2 (representatives).
+
+    Attributes
+    ----------
+    structure_klifs_ids : list of int
+        Structure KLIFS IDs (all structures; define the structure indices).
+    kinase_names : list of str
+        Kinase names (one per structure).
+    n_representatives : int
+        Maximum number of representatives per kinase (k).
+    representative_ixs : np.ndarray of int
+        Structure indices of representatives (sorted).
+    medoid_ixs : np.ndarray of int
+        Structure index of the nearest representative per structure (representatives refer to
+        themselves).
+    n_within_kinase_pairs : int
+        Number of within-kinase structure pairs compared to select representatives.
+    """
+
+    def __init__(self):
+
+        self.structure_klifs_ids = None
+        self.kinase_names = None
+        self.n_representatives = None
+        self.representative_ixs = None
+        self.medoid_ixs = None
+        self.n_within_kinase_pairs = None
+
+    @property
+    def n_structure_pairs(self):
+        """
+        Number of structure pairs compared with and without representatives: All structure pairs
+        (full) and within-kinase pairs plus representative pairs (reduced).
+
+        Returns
+        -------
+        dict of str: int
+            Number of structure pairs (full, reduced).
+        """
+
+        n_structures = len(self.structure_klifs_ids)
+        n_representatives = len(self.representative_ixs)
+        return {
+            "full": n_structures * (n_structures - 1) // 2,
+            "reduced": self.n_within_kinase_pairs
+            + n_representatives * (n_representatives - 1) // 2,
+        }
+
+    @property
+    def speedup(self):
+        """
+        Speed-up estimated as ratio of compared structure pairs without and with representatives.
+
+        Returns
+        -------
+        float
+            Speed-up.
+        """
+
+        n_structure_pairs = self.n_structure_pairs
+        return n_structure_pairs["full"] / max(n_structure_pairs["reduced"], 1)
+
+    @classmethod
+    def from_fingerprint_stack(
+        cls,
+        fingerprint_stack,
+        n_representatives=1,
+        distance_measure="scaled_euclidean",
+        feature_weights=None,
+        n_cores=1,
+        kernel="vectorized",
+        tile_size=2000,
+    ):
+        """
+        Select representatives per kinase from stacked fingerprints.
+
+        Parameters
+        ----------
+        fingerprint_stack : kissim.comparison.FingerprintStack
+            Stacked fingerprints.
+        n_representatives : int
+            Maximum number of representatives per kinase (k).
+        distance_measure : str
+            Distance measure (scaled_euclidean or scaled_cityblock).
+        feature_weights : None or list of float
+            Feature weights (see kissim.comparison.FingerprintDistance).
+        n_cores : int
+            Number of cores used to generate within-kinase fingerprint distances.
+        kernel : str
+            Kernel used to calculate feature distances: "vectorized" (default) or "blas".
+        tile_size : int
+            Maximum number of fingerprint pairs per tile.
+
+        Returns
+        -------
+        kissim.comparison.KinaseRepresentatives
+            Representatives.
+        """
+
+        if n_representatives < 1:
+            raise ValueError("Number of representatives must be at least 1.")
+
+        representatives = cls()
+        representatives.structure_klifs_ids = list(fingerprint_stack.structure_klifs_ids)
+        representatives.kinase_names = list(fingerprint_stack.kinase_names)
+        representatives.n_representatives = n_representatives
+
+        # Structure indices per kinase (sorted by kinase code, then structure index)
+        kinase_codes = fingerprint_stack.kinase_codes
+        structure_ixs = np.argsort(kinase_codes, kind="stable")
+        kinase_starts = np.flatnonzero(
+            np.concatenate([[True], np.diff(kinase_codes[structure_ixs]) != 0])
+        )
+        kinase_structure_ixs = np.split(structure_ixs, kinase_starts[1:])
+
+        # Within-kinase distances, only for kinases with more than k structures
+        kinase_distance_matrices = representatives._get_within_kinase_distances(
+            fingerprint_stack,
+            [ixs for ixs in kinase_structure_ixs if len(ixs) > n_representatives],
+            distance_measure,
+            feature_weights,
+            n_cores,
+            kernel,
+            tile_size,
+        )
+
+        representative_ixs = []
+        medoid_ixs = np.arange(fingerprint_stack.n_fingerprints)
+        for ixs in kinase_structure_ixs:
+            if len(ixs) <= n_representatives:
+                representative_ixs.append(ixs)
+                continue
+            distance_matrix = kinase_distance_matrices[ixs[0]]
+            medoids = cls._get_medoids(distance_matrix, n_representatives)
+            representative_ixs.append(ixs[medoids])
+            medoid_ixs[ixs] = ixs[medoids[np.argmin(distance_matrix[:, medoids], axis=1)]]
+        representatives.representative_ixs = np.sort(np.concatenate(representative_ixs))
+        representatives.medoid_ixs = medoid_ixs
+
+        n_structure_pairs = representatives.n_structure_pairs
+        logger.info(
+            f"Representatives: {len(representatives.representative_ixs)} of "
+            f"{fingerprint_stack.n_fingerprints} structures; structure pairs: "
+            f"{n_structure_pairs['reduced']} instead of {n_structure_pairs['full']} "
+            f"(speed-up: {representatives.speedup:.1f}x)"
+        )
+
+        return representatives
+
+    def get_fingerprint_stack(self, fingerprint_stack):
+        """
+        Get stacked fingerprints of representatives.
+
+        Parameters
+        ----------
+        fingerprint_stack : kissim.comparison.FingerprintStack
+            Stacked fingerprints (all structures; same as used to select representatives).
+
+        Returns
+        -------
+        kissim.comparison.FingerprintStack
+            Stacked fingerprints (representatives).
+        """
+
+        if fingerprint_stack.structure_klifs_ids != self.structure_klifs_ids:
+            raise ValueError("Fingerprints do not match fingerprints used for representatives.")
+        return fingerprint_stack.subset(self.representative_ixs)
+
+    def get_medoids(self):
+        """
+        Get the representative per structure as table.
+
+        Returns
+        -------
+        pandas.DataFrame
+            Structure KLIFS ID (structure_klifs_id), kinase name, and structure KLIFS ID of
+            nearest representative (representative_structure_klifs_id).
+        """
+
+        structure_klifs_ids = np.array(self.structure_klifs_ids, dtype=object)
+        return pd.DataFrame(
+            {
+                "structure_klifs_id": structure_klifs_ids,
+                "kinase_name": self.kinase_names,
+                "representative_structure_klifs_id": structure_klifs_ids[self.medoid_ixs],
+            }
+        )
+
+    @staticmethod
+    def get_kinase_matrix_deviation(
+        kinase_distance_accumulator, kinase_distance_accumulator_full, by="minimum"
+    ):
+        """
+        Get the deviation of a kinase distance matrix based on representatives from the kinase
+        distance matrix based on all structures (kinase pairs with distances in both matrices).
+
+        Parameters
+        ----------
+        kinase_distance_accumulator : kissim.comparison.KinaseDistanceAccumulator
+            Kinase distances based on representatives.
+        kinase_distance_accumulator_full : kissim.comparison.KinaseDistanceAccumulator
+            Kinase distances based on all structures.
+        by : str
+            Condition on which the distance value per kinase pair is extracted from the set of
+            distances values per structure pair: minimum (default), maximum, or mean.
+
+        Returns
+        -------
+        pandas.Series
+            Number of compared kinase pairs (n_kinase_pairs), mean and maximum absolute deviation
+            (mean_absolute_deviation, max_absolute_deviation), and Pearson correlation
+            (correlation).
+        """
+
+        kinase_names = kinase_distance_accumulator.kinase_names
+        matrix = kinase_distance_accumulator.get_matrix(by).to_numpy()
+        matrix_full = (
+            kinase_distance_accumulator_full.get_matrix(by)
+            .loc[kinase_names, kinase_names]
+            .to_numpy()
+        )
+        upper_triangle = np.triu_indices(len(kinase_names))
+        distances = matrix[upper_triangle]
+        distances_full = matrix_full[upper_triangle]
+        is_valid = ~np.isnan(distances) & ~np.isnan(distances_full)
+        distances, distances_full = distances[is_valid], distances_full[is_valid]
+
+        absolute_deviations = np.abs(distances - distances_full)
+        return pd.Series(
+            {
+                "n_kinase_pairs": is_valid.sum(),
+                "mean_absolute_deviation": (
+                    absolute_deviations.mean() if is_valid.any() else np.nan
+                ),
+                "max_absolute_deviation": absolute_deviations.max() if is_valid.any() else np.nan,
+                "correlation": (
+                    np.corrcoef(distances, distances_full)[0, 1] if is_valid.sum() > 1 else np.nan
+                ),
+            }
+        )
+
+    def _get_within_kinase_distances(
+        self,
+        fingerprint_stack,
+        kinase_structure_ixs,
+        distance_measure,
+        feature_weights,
+        n_cores,
+        kernel,
+        tile_size,
+    ):
+        """
+        Get fingerprint distances for all structure pairs within each kinase. NaN distances are
+        set to the maximum distance within the kinase.
+
+        Parameters
+        ----------
+        fingerprint_stack : kissim.comparison.FingerprintStack
+            Stacked fingerprints.
+        kinase_structure_ixs : list of np.ndarray of int
+            Structure indices per kinase.
+        distance_measure : str
+            Distance measure.
+        feature_weights : None or list of float
+            Feature weights.
+        n_cores : int
+            Number of cores.
+        kernel : str
+            Kernel used to calculate feature distances.
+        tile_size : int
+            Maximum number of fingerprint pairs per tile.
+
+        Returns
+        -------
+        dict of int: np.ndarray
+            Distance matrix (structures x structures) per kinase, keyed by the first structure
+            index of the kinase.
+        """
+
+        # Position of each structure within its kinase
+        kinase_keys = np.full(fingerprint_stack.n_fingerprints, -1, dtype=np.int64)
+        positions = np.full(fingerprint_stack.n_fingerprints, -1, dtype=np.int64)
+        pairs = [np.empty((0, 2), dtype=np.int64)]
+        distance_matrices = {}
+        for ixs in kinase_structure_ixs:
+            kinase_keys[ixs] = ixs[0]
+            positions[ixs] = np.arange(len(ixs))
+            ixs1, ixs2 = np.triu_indices(len(ixs), k=1)
+            pairs.append(np.column_stack([ixs[ixs1], ixs[ixs2]]))
+            distance_matrices[ixs[0]] = np.zeros((len(ixs), len(ixs)))
+        pairs = np.concatenate(pairs)
+        self.n_within_kinase_pairs = len(pairs)
+
+        feature_distances_tiles = FeatureDistancesArray.iter_tiles(
+            fingerprint_stack,
+            distance_measure,
+            get_pair_list_tiles(pairs[:, 0], pairs[:, 1], tile_size),
+            n_cores,
+            kernel,
+        )
+        for feature_distances_tile in feature_distances_tiles:
+            distances = feature_distances_tile.get_fingerprint_distances(
+                feature_weights, distance_measure
+            )
+            ixs1, ixs2 = feature_distances_tile.pairs.T
+            for key in np.unique(kinase_keys[ixs1]):
+                is_kinase = kinase_keys[ixs1] == key
+                positions1, positions2 = positions[ixs1[is_kinase]], positions[ixs2[is_kinase]]
+                distance_matrices[key][positions1, positions2] = distances[is_kinase]
+                distance_matrices[key][positions2, positions1] = distances[is_kinase]
+
+        for distance_matrix in distance_matrices.values():
+            is_nan = np.isnan(distance_matrix)
+            if is_nan.any():
+                distance_matrix[is_nan] = np.nanmax(distance_matrix) if not is_nan.all() else 0.0
+        return distance_matrices
+
+    @staticmethod
+    def _get_medoids(distance_matrix, n_medoids, max_iterations=100):
+        """
+        Get k medoids for a distance matrix: Greedy build (add the structure that reduces the sum
+        of distances to the nearest medoid the most), followed by swaps of medoids and
+        non-medoids as long as they reduce the sum of distances (PAM).
+
+        Parameters
+        ----------
+        distance_matrix : np.ndarray
+            Distance matrix (structures x structures).
+        n_medoids : int
+            Number of medoids (k).
+        max_iterations : int
+            Maximum number of swaps.
+
+        Returns
+        -------
+        np.ndarray of int
+            Medoid indices (positions in distance matrix; sorted).
+        """
+
+        n_structures = len(distance_matrix)
+
+        # Build
+        medoids = [int(np.argmin(distance_matrix.sum(axis=1)))]
+        nearest_distances = distance_matrix[medoids[0]].copy()
+        while len(medoids) < n_medoids:
+            gains = np.maximum(nearest_distances - distance_matrix, 0).sum(axis=1)
+            gains[medoids] = -1
+            medoid = int(np.argmax(gains))
+            medoids.append(medoid)
+            nearest_distances = np.minimum(nearest_distances, distance_matrix[medoid])
+
+        # Swap (best swap per iteration)
+        medoids = np.array(medoids)
+        cost = distance_matrix[medoids].min(axis=0).sum()
+        for _ in range(max_iterations):
+            best_cost, best_swap = cost, None
+            for i in range(n_medoids):
+                other_medoids = np.delete(medoids, i)
+                nearest_other = (
+                    distance_matrix[other_medoids].min(axis=0)
+                    if len(other_medoids) > 0
+                    else np.full(n_structures, np.inf)
+                )
+                # Cost per candidate replacing medoid i
+                costs = np.minimum(nearest_other, distance_matrix).sum(axis=1)
+                costs[medoids] = np.inf
+                candidate = int(np.argmin(costs))
+                if costs[candidate] < best_cost - 1e-12:
+                    best_cost, best_swap = costs[candidate], (i, candidate)
+            if best_swap is None:
+                break
+            medoids[best_swap[0]] = best_swap[1]
+            cost = best_cost
+
+        return np.sort(medoids)
@@ -0,0 +1,501 @@
+"""
+kissim.comparison.lsh_index
+
+Defines a locality-sensitive hashing (LSH) index of stacked fingerprints for approximate top-k
+retrieval: Candidates sharing a hash bucket with the query are re-ranked by exact fingerprint
+distances.
+"""
+
+import logging
+
+import numpy as np
+
+from . import FingerprintDistance, FingerprintStack, PrunedSearch
+from .kernels import check_distance_measures
+from .utils import get_scaled_values, get_search_recall, get_value_means, get_value_scales
+
+logger = logging.getLogger(__name__)
+
+
+class LshIndex:
+    """
+    Locality-sensitive hashing index of fingerprints based on random-projection (sign)
+    signatures per feature type (physicochemical, distances, and moments; feature types with
+    zero feature weights are ignored).
+
+    Fingerprint values are centered (NaN values are imputed with mean values per bit of the
+    indexed fingerprints) and scaled by the feature weight divided by the number of bits (see
+    kissim.comparison.FingerprintEmbedding). Each hash table hashes a fingerprint to a bucket
+    key composed of the signs of its projections onto random hyperplanes, drawn separately for
+    each feature type. Fingerprints sharing at least one bucket with the query are candidates,
+    which are re-ranked by their exact fingerprint distances (same as
+    kissim.comparison.FeatureDistances).
+
+    Inserted fingerprints (see `insert`) are kept as chunks and stacked with the indexed
+    fingerprints only when these are accessed (e.g. by `search`), so that consecutive insertions
+    do not copy all indexed fingerprints each.
+
+    Attributes
+    ----------
+    fingerprint_stack : kissim.comparison.FingerprintStack
+        Stacked fingerprints (indexed).
+    distance_measure : str
+        Distance measure.
+    feature_weights : np.ndarray
+        Feature weights (15 features).
+    means : np.ndarray
+        Mean value per bit of the fingerprints used to build the index (1032 bits).
+    scales : np.ndarray
+        Scale per bit (1032 bits).
+    hyperplanes : np.ndarray
+        Random hyperplanes (tables x hyperplanes per table x 1032 bits); each hyperplane is
+        non-zero for the bits of one feature type only.
+    signatures : np.ndarray of int
+        Bucket keys per fingerprint and table (fingerprints x tables).
+    buckets : list of dict of int: np.ndarray of int
+        Fingerprint indices per bucket key (one dictionary per table).
+    """
+
+    def __init__(self):
+
+        self.distance_measure = None
+        self.feature_weights = None
+        self.means = None
+        self.scales = None
+        self.hyperplanes = None
+        self.buckets = None
+        # Indexed fingerprints and signatures as consolidated stack and array, plus chunks
+        # inserted since the last consolidation (avoids restacking per insertion)
+        self._fingerprint_stack = None
+        self._signatures = None
+        self._chunks = []
+        self._structure_klifs_ids = set()
+
+    @property
+    def fingerprint_stack(self):
+        """
+        Stacked fingerprints (indexed).
+
+        Returns
+        -------
+        kissim.comparison.FingerprintStack
+            Stacked fingerprints.
+        """
+
+        return self._get_indexed()[0]
+
+    @property
+    def signatures(self):
+        """
+        Bucket keys per fingerprint and table.
+
+        Returns
+        -------
+        np.ndarray of int
+            Bucket keys (fingerprints x tables).
+        """
+
+        return self._get_indexed()[1]
+
+    @property
+    def n_fingerprints(self):
+        """
+        Number of indexed fingerprints.
+
+        Returns
+        -------
+        int
+            Number of indexed fingerprints.
+        """
+
+        return len(self._structure_klifs_ids)
+
+    @property
+    def n_tables(self):
+        """
+        Number of hash tables.
+
+        Returns
+        -------
+        int
+            Number of hash tables.
+        """
+
+        return len(self.hyperplanes)
+
+    @classmethod
+    def from_fingerprint_stack(
+        cls,
+        fingerprint_stack,
+        distance_measure="scaled_euclidean",
+        feature_weights=None,
+        n_tables=8,
+        n_hyperplanes=4,
+        seed=0,
+    ):
+        """
+        Build the index for stacked fingerprints.
+
+        Parameters
+        ----------
+        fingerprint_stack : kissim.comparison.FingerprintStack
+            Stacked fingerprints.
+        distance_measure : str
+            Distance measure (scaled_euclidean or scaled_cityblock).
+        feature_weights : None or list of float
+            Feature weights (see kissim.comparison.FingerprintDistance).
+        n_tables : int
+            Number of hash tables (more tables give more candidates, i.e. higher recall at
+            higher cost per query).
+        n_hyperplanes : int
+            Number of random hyperplanes per feature type and table (more hyperplanes give
+            smaller buckets, i.e. fewer candidates).
+        seed : int
+            Seed for random hyperplanes.
+
+        Returns
+        -------
+        kissim.comparison.LshIndex
+            Index.
+        """
+
+        if n_tables < 1 or n_hyperplanes < 1:
+            raise ValueError("Number of tables and hyperplanes must be at least 1.")
+
+        index = cls()
+        index.distance_measure = check_distance_measures(distance_measure)[0]
+        index.feature_weights = FingerprintDistance()._format_weights(feature_weights)
+        index.scales = get_value_scales(index.feature_weights, fingerprint_stack.n_bits)
+        index.means = get_value_means(fingerprint_stack)
+        index.hyperplanes = index._get_hyperplanes(
+            fingerprint_stack, n_tables, n_hyperplanes, seed
+        )
+
+        index._fingerprint_stack = fingerprint_stack.subset([])
+        index._signatures = np.empty((0, n_tables), dtype=np.int64)
+        index.buckets = [{} for _ in range(n_tables)]
+        index.insert(fingerprint_stack)
+
+        return index
+
+    @classmethod
+    def from_npz(cls, filepath):
+        """
+        Load the index from a numpy npz file (see `to_npz`).
+
+        Parameters
+        ----------
+        filepath : str or pathlib.Path
+            Path to npz file.
+
+        Returns
+        -------
+        kissim.comparison.LshIndex
+            Index.
+        """
+
+        index = cls()
+        index._fingerprint_stack = FingerprintStack.from_npz(filepath)
+        index._structure_klifs_ids = set(index._fingerprint_stack.structure_klifs_ids)
+        with np.load(filepath, allow_pickle=False) as data:
+            index.distance_measure = str(data["distance_measure"])
+            index.feature_weights = data["feature_weights"]
+            index.means = data["means"]
+            index.scales = data["scales"]
+            index.hyperplanes = data["hyperplanes"]
+            index._signatures = data["signatures"]
+        index.buckets = [{} for _ in range(index.n_tables)]
+        index._add_to_buckets(index._signatures, 0)
+        return index
+
+    def to_npz(self, filepath):
+        """
+        Write the index (indexed fingerprints, hyperplanes, and signatures) to a numpy npz file.
+        The file can also be loaded as stacked fingerprints (see
+        kissim.comparison.FingerprintStack.from_npz).
+
+        Parameters
+        ----------
+        filepath : str or pathlib.Path
+            Path to npz file.
+        """
+
+        np.savez(
+            filepath,
+            **self.fingerprint_stack._get_arrays(),
+            distance_measure=np.array(self.distance_measure),
+            feature_weights=self.feature_weights,
+            means=self.means,
+            scales=self.scales,
+            hyperplanes=self.hyperplanes,
+            signatures=self.signatures,
+        )
+
+    def insert(self, fingerprint_stack):
+        """
+        Add stacked fingerprints (e.g. newly encoded fingerprints) to the index. Means and
+        hyperplanes are kept, i.e. the index is not rebuilt. Fingerprints are kept as chunk
+        (stacked with the indexed fingerprints on the next access), i.e. the cost of an insertion
+        scales with the number of inserted fingerprints.
+
+        Parameters
+        ----------
+        fingerprint_stack : kissim.comparison.FingerprintStack
+            Stacked fingerprints.
+        """
+
+        structure_klifs_ids = set(fingerprint_stack.structure_klifs_ids)
+        if len(structure_klifs_ids) < fingerprint_stack.n_fingerprints or (
+            structure_klifs_ids & self._structure_klifs_ids
+        ):
+            raise ValueError("Structure KLIFS IDs must be unique in index.")
+
+        signatures = self._get_signatures(fingerprint_stack)
+        offset = self.n_fingerprints
+        self._chunks.append((fingerprint_stack, signatures))
+        self._structure_klifs_ids |= structure_klifs_ids
+        self._add_to_buckets(signatures, offset)
+
+        logger.info(
+            f"Number of indexed fingerprints: {self.n_fingerprints} "
+            f"(buckets per table: {[len(buckets) for buckets in self.buckets]})"
+        )
+
+    def get_candidates(self, query_stack, query_ix=0):
+        """
+        Get candidate fingerprints, i.e. indexed fingerprints sharing at least one bucket with
+        a query fingerprint.
+
+        Parameters
+        ----------
+        query_stack : kissim.comparison.FingerprintStack
+            Stacked query fingerprints.
+        query_ix : int
+            Query fingerprint index in query stack.
+
+        Returns
+        -------
+        np.ndarray of int
+            Fingerprint indices of candidates (sorted).
+        """
+
+        query_signatures = self._get_signatures(query_stack.subset([query_ix]))[0]
+        return np.unique(
+            np.concatenate(
+                [np.empty(0, dtype=np.int64)]
+                + [
+                    buckets.get(key, np.empty(0, dtype=np.int64))
+                    for buckets, key in zip(self.buckets, query_signatures.tolist())
+                ]
+            )
+        )
+
+    def search(self, query_stack, n_neighbors=10):
+        """
+        Get the (approximately) k most similar indexed fingerprints per query fingerprint.
+        Indexed fingerprints with the same structure KLIFS ID as the query are skipped, as are
+        indexed fingerprints with NaN fingerprint distances.
+
+        Parameters
+        ----------
+        query_stack : kissim.comparison.FingerprintStack
+            Stacked query fingerprints.
+        n_neighbors : int
+            Number of most similar indexed fingerprints per query (k).
+
+        Returns
+        -------
+        neighbor_ixs : np.ndarray of int
+            Fingerprint indices of the most similar indexed fingerprints, sorted by distance
+            (queries x k); -1 if not available (e.g. less than k candidates).
+        distances : np.ndarray
+            Fingerprint distances to the most similar indexed fingerprints (queries x k); NaN if
+            not available.
+        """
+
+        if n_neighbors < 1:
+            raise ValueError("Number of neighbors must be at least 1.")
+
+        neighbor_ixs = np.full((query_stack.n_fingerprints, n_neighbors), -1, dtype=np.int64)
+        distances = np.full((query_stack.n_fingerprints, n_neighbors), np.nan)
+        structure_klifs_ids = np.array(self.fingerprint_stack.structure_klifs_ids)
+
+        n_candidates = 0
+        for i in range(query_stack.n_fingerprints):
+
+            candidate_ixs = self.get_candidates(query_stack, i)
+            candidate_ixs = candidate_ixs[
+                structure_klifs_ids[candidate_ixs] != query_stack.structure_klifs_ids[i]
+            ]
+            n_candidates += len(candidate_ixs)
+            logger.debug(
+                f"Query {query_stack.structure_klifs_ids[i]}: "
+                f"{len(candidate_ixs)}/{self.n_fingerprints} candidates"
+            )
+            if len(candidate_ixs) == 0:
+                continue
+
+            # Re-rank candidates by exact fingerprint distances
+            candidate_distances = (
+                self.fingerprint_stack.get_feature_distances(
+                    query_stack, candidate_ixs, self.distance_measure, None, i
+                )
+                @ self.feature_weights
+            )
+            is_valid = ~np.isnan(candidate_distances)
+            candidate_ixs, candidate_distances = (
+                candidate_ixs[is_valid],
+                candidate_distances[is_valid],
+            )
+            order = np.lexsort((candidate_ixs, candidate_distances))[:n_neighbors]
+            neighbor_ixs[i, : len(order)] = candidate_ixs[order]
+            distances[i, : len(order)] = candidate_distances[order]
+
+        logger.info(
+            f"Number of queries: {query_stack.n_fingerprints} "
+            f"(mean candidates per query: {n_candidates / max(query_stack.n_fingerprints, 1):.1f}"
+            f"/{self.n_fingerprints})"
+        )
+
+        return neighbor_ixs, distances
+
+    def get_recall(self, n_neighbors=10, n_samples=100, seed=0):
+        """
+        Get the recall of the top-k of the index search, i.e. the fraction of the exact k most
+        similar fingerprints that are found, for a random sample of indexed fingerprints used as
+        queries (exact results from kissim.comparison.PrunedSearch).
+
+        Parameters
+        ----------
+        n_neighbors : int
+            Number of most similar indexed fingerprints per query (k).
+        n_samples : int
+            Number of indexed fingerprints sampled as queries.
+        seed : int
+            Seed for the random sample.
+
+        Returns
+        -------
+        float
+            Recall (mean over sampled queries); NaN if no exact neighbors are available.
+        """
+
+        exact_search = PrunedSearch.from_fingerprint_stack(
+            self.fingerprint_stack, self.distance_measure, self.feature_weights.tolist()
+        )
+        return get_search_recall(self, exact_search, n_neighbors, n_samples, seed)
+
+    def _get_hyperplanes(self, fingerprint_stack, n_tables, n_hyperplanes, seed):
+        """
+        Get random hyperplanes per table, drawn separately per feature type (feature types
+        with zero feature weights are skipped).
+
+        Parameters
+        ----------
+        fingerprint_stack : kissim.comparison.FingerprintStack
+            Stacked fingerprints.
+        n_tables : int
+            Number of hash tables.
+        n_hyperplanes : int
+            Number of random hyperplanes per feature type and table.
+        seed : int
+            Seed for random hyperplanes.
+
+        Returns
+        -------
+        np.ndarray
+            Random hyperplanes (tables x hyperplanes per table x 1032 bits).
+        """
+
+        feature_type_bits = [features[0].size for features in fingerprint_stack.features]
+        feature_type_ends = np.cumsum(feature_type_bits)
+        feature_type_starts = feature_type_ends - feature_type_bits
+        feature_type_ixs = [
+            (start, end)
+            for start, end in zip(feature_type_starts, feature_type_ends)
+            if self.scales[start:end].any()
+        ]
+        # Bucket keys are stored as 64-bit integers
+        if len(feature_type_ixs) * n_hyperplanes > 62:
+            raise ValueError(
+                f"Number of hyperplanes per feature type must be at most "
+                f"{62 // len(feature_type_ixs)}."
+            )
+
+        rng = np.random.default_rng(seed)
+        hyperplanes = np.zeros(
+            (n_tables, len(feature_type_ixs) * n_hyperplanes, feature_type_ends[-1])
+        )
+        for i, (start, end) in enumerate(feature_type_ixs):
+            hyperplanes[:, i * n_hyperplanes : (i + 1) * n_hyperplanes, start:end] = (
+                rng.standard_normal((n_tables, n_hyperplanes, end - start))
+            )
+        return hyperplanes
+
+    def _get_signatures(self, fingerprint_stack, block_size=10000):
+        """
+        Get bucket keys per fingerprint and table.
+
+        Parameters
+        ----------
+        fingerprint_stack : kissim.comparison.FingerprintStack
+            Stacked fingerprints.
+        block_size : int
+            Number of fingerprints processed at once.
+
+        Returns
+        -------
+        np.ndarray of int
+            Bucket keys (fingerprints x tables).
+        """
+
+        powers = np.int64(1) << np.arange(self.hyperplanes.shape[1], dtype=np.int64)
+        signatures = np.empty((fingerprint_stack.n_fingerprints, self.n_tables), dtype=np.int64)
+        for start in range(0, fingerprint_stack.n_fingerprints, block_size):
+            values = get_scaled_values(
+                fingerprint_stack, self.means, self.scales, start, start + block_size
+            )
+            signs = np.einsum("fb,thb->fth", values, self.hyperplanes) > 0
+            signatures[start : start + block_size] = signs.astype(np.int64) @ powers
+        return signatures
+
+    def _get_indexed(self):
+        """
+        Get indexed fingerprints and signatures, i.e. consolidate chunks inserted since the last
+        call.
+
+        Returns
+        -------
+        tuple of (kissim.comparison.FingerprintStack, np.ndarray)
+            Stacked fingerprints and bucket keys (fingerprints x tables).
+        """
+
+        if self._chunks:
+            fingerprint_stacks, signatures = zip(*self._chunks)
+            self._fingerprint_stack = FingerprintStack.concatenate(
+                [self._fingerprint_stack, *fingerprint_stacks]
+            )
+            self._signatures = np.concatenate([self._signatures, *signatures])
+            self._chunks = []
+        return self._fingerprint_stack, self._signatures
+
+    def _add_to_buckets(self, signatures, offset):
+        """
+        Add fingerprints to buckets.
+
+        Parameters
+        ----------
+        signatures : np.ndarray of int
+            Bucket keys (fingerprints x tables).
+        offset : int
+            Fingerprint index of first fingerprint.
+        """
+
+        fingerprint_ixs = np.arange(offset, offset + len(signatures), dtype=np.int64)
+        for buckets, keys in zip(self.buckets, signatures.T):
+            order = np.argsort(keys, kind="stable")
+            unique_keys, starts = np.unique(keys[order], return_index=True)
+            for key, ixs in zip(
+                unique_keys.tolist(), np.split(fingerprint_ixs[order], starts[1:])
+            ):
+                buckets[key] = np.concatenate([buckets[key], ixs]) if key in buckets else ixs
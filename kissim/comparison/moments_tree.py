@@ -0,0 +1,394 @@
+"""
+kissim.comparison.moments_tree
+
+Defines a vantage-point tree over the moments features of stacked fingerprints, enabling
+sub-linear similarity searches for moments-only feature weights.
+"""
+
+import heapq
+import logging
+
+import numpy as np
+
+from . import FingerprintDistance
+from .kernels import calculate_feature_distances, check_distance_measures
+
+logger = logging.getLogger(__name__)
+
+# Indices of the moments features (15 features in total)
+_MOMENTS_FEATURE_IXS = np.arange(12, 15)
+
+
+class MomentsTree:
+    """
+    Vantage-point (VP) tree over the moments features (3 features x 4 bits) of stacked
+    fingerprints (database), answering k nearest neighbor and range queries in sub-linear time.
+
+    For feature weights on the moments features only (e.g. weighting scheme "001"), the
+    fingerprint distance is a weighted sum of per-moment scaled Euclidean (or cityblock)
+    distances over 12 values, i.e. a metric, as long as no moment values are NaN. The tree
+    prunes subtrees via the triangle inequality. Fingerprints with NaN moment values (scaled
+    distances depend on the number of bit pairs free of NaN values, i.e. no metric) are not added
+    to the tree but compared exhaustively with each query (fallback); the same applies to queries
+    with NaN moment values.
+
+    Note that feature distances of features without weights are ignored, i.e. fingerprint pairs
+    are not skipped if such features are NaN.
+
+    Attributes
+    ----------
+    fingerprint_stack : kissim.comparison.FingerprintStack
+        Stacked fingerprints (database).
+    distance_measure : str
+        Distance measure.
+    feature_weights : np.ndarray
+        Feature weights for moments features (3 features).
+    leaf_size : int
+        Maximum number of fingerprints per leaf.
+    vantage_ixs : np.ndarray of int
+        Fingerprint index of the vantage point per node (-1 for leaves).
+    radii : np.ndarray
+        Median distance to the vantage point per node; fingerprints within this distance are
+        in the inside child, all others in the outside child.
+    children : np.ndarray of int
+        Inside and outside child node per node (nodes x 2); -1 for leaves.
+    leaf_ranges : np.ndarray of int
+        Start and end positions in `leaf_ixs` per node (nodes x 2); empty for inner nodes.
+    leaf_ixs : np.ndarray of int
+        Fingerprint indices in leaves.
+    fallback_ixs : np.ndarray of int
+        Fingerprint indices not in the tree (NaN moment values).
+    """
+
+    def __init__(self):
+
+        self.fingerprint_stack = None
+        self.distance_measure = None
+        self.feature_weights = None
+        self.leaf_size = None
+        self.vantage_ixs = None
+        self.radii = None
+        self.children = None
+        self.leaf_ranges = None
+        self.leaf_ixs = None
+        self.fallback_ixs = None
+
+    @property
+    def n_nodes(self):
+        """
+        Number of tree nodes.
+
+        Returns
+        -------
+        int
+            Number of tree nodes.
+        """
+
+        return len(self.vantage_ixs)
+
+    @classmethod
+    def from_fingerprint_stack(
+        cls,
+        fingerprint_stack,
+        distance_measure="scaled_euclidean",
+        feature_weights=None,
+        leaf_size=16,
+        seed=0,
+    ):
+        """
+        Build tree over the moments features of stacked fingerprints.
+
+        Parameters
+        ----------
+        fingerprint_stack : kissim.comparison.FingerprintStack
+            Stacked fingerprints (database).
+        distance_measure : str
+            Distance measure (scaled_euclidean or scaled_cityblock).
+        feature_weights : None or list of float
+            Feature weights (see kissim.comparison.FingerprintDistance); only moments features
+            may have weights, e.g. scheme 001 ([0.0, 0.0, 1.0]). None (all features weighted
+            equally) raises a ValueError.
+        leaf_size : int
+            Maximum number of fingerprints per leaf.
+        seed : int
+            Seed for the random choice of vantage points.
+
+        Returns
+        -------
+        kissim.comparison.MomentsTree
+            Tree.
+        """
+
+        if not cls.is_applicable(feature_weights):
+            raise ValueError(
+                "Feature weights must be set for moments features only (e.g. scheme 001); use "
+                "kissim.comparison.PrunedSearch for other feature weights."
+            )
+        feature_weights = FingerprintDistance()._format_weights(feature_weights)
+
+        tree = cls()
+        tree.fingerprint_stack = fingerprint_stack
+        tree.distance_measure = check_distance_measures(distance_measure)[0]
+        tree.feature_weights = feature_weights[_MOMENTS_FEATURE_IXS]
+        tree.leaf_size = leaf_size
+
+        is_metric = ~np.isnan(fingerprint_stack.moments).any(axis=(1, 2))
+        tree.fallback_ixs = np.flatnonzero(~is_metric)
+        if len(tree.fallback_ixs) > 0:
+            logger.info(
+                f"Fingerprints with NaN moments (compared exhaustively): {len(tree.fallback_ixs)}"
+            )
+        tree._build(np.flatnonzero(is_metric), np.random.default_rng(seed))
+
+        return tree
+
+    @staticmethod
+    def is_applicable(feature_weights):
+        """
+        Check if a tree can be built for feature weights, i.e. if only moments features have
+        weights.
+
+        Parameters
+        ----------
+        feature_weights : None or list of float
+            Feature weights (see kissim.comparison.FingerprintDistance).
+
+        Returns
+        -------
+        bool
+            True if only moments features have weights, else False.
+        """
+
+        feature_weights = FingerprintDistance()._format_weights(feature_weights)
+        return not (feature_weights[: _MOMENTS_FEATURE_IXS[0]] != 0).any()
+
+    def search(self, query_stack, n_neighbors=10):
+        """
+        Get the k most similar fingerprints in the database per query fingerprint. Database
+        fingerprints with the same structure KLIFS ID as the query are skipped.
+
+        Parameters
+        ----------
+        query_stack : kissim.comparison.FingerprintStack
+            Stacked query fingerprints.
+        n_neighbors : int
+            Number of most similar database fingerprints per query (k).
+
+        Returns
+        -------
+        neighbor_ixs : np.ndarray of int
+            Database fingerprint indices of the most similar database fingerprints, sorted by
+            distance (queries x k); -1 if not available.
+        distances : np.ndarray
+            Fingerprint distances to the most similar database fingerprints (queries x k); NaN if
+            not available.
+        """
+
+        if n_neighbors < 1:
+            raise ValueError("Number of neighbors must be at least 1.")
+
+        neighbor_ixs = np.full((query_stack.n_fingerprints, n_neighbors), -1, dtype=np.int64)
+        distances = np.full((query_stack.n_fingerprints, n_neighbors), np.nan)
+        for i in range(query_stack.n_fingerprints):
+            query_neighbor_ixs, query_distances = self._search_query(
+                query_stack, i, n_neighbors=n_neighbors
+            )
+            neighbor_ixs[i, : len(query_neighbor_ixs)] = query_neighbor_ixs
+            distances[i, : len(query_distances)] = query_distances
+        return neighbor_ixs, distances
+
+    def search_radius(self, query_stack, radius):
+        """
+        Get all fingerprints in the database within a distance radius per query fingerprint.
+        Database fingerprints with the same structure KLIFS ID as the query are skipped.
+
+        Parameters
+        ----------
+        query_stack : kissim.comparison.FingerprintStack
+            Stacked query fingerprints.
+        radius : float
+            Maximum fingerprint distance.
+
+        Returns
+        -------
+        list of tuple of np.ndarray
+            Database fingerprint indices and fingerprint distances (sorted by distance) per query.
+        """
+
+        return [
+            self._search_query(query_stack, i, radius=radius)
+            for i in range(query_stack.n_fingerprints)
+        ]
+
+    def _search_query(self, query_stack, query_ix, n_neighbors=None, radius=None):
+        """
+        Get the k most similar fingerprints or all fingerprints within a radius for one query
+        fingerprint (best-first search).
+
+        Parameters
+        ----------
+        query_stack : kissim.comparison.FingerprintStack
+            Stacked query fingerprints.
+        query_ix : int
+            Query fingerprint index.
+        n_neighbors : None or int
+            Number of most similar database fingerprints (k).
+        radius : None or float
+            Maximum fingerprint distance.
+
+        Returns
+        -------
+        neighbor_ixs : np.ndarray of int
+            Database fingerprint indices.
+        distances : np.ndarray
+            Fingerprint distances.
+        """
+
+        query_moments = query_stack.moments[query_ix]
+        excluded_structure_klifs_id = query_stack.structure_klifs_ids[query_ix]
+        structure_klifs_ids = np.array(self.fingerprint_stack.structure_klifs_ids)
+
+        neighbor_ixs = np.empty(0, dtype=np.int64)
+        distances = np.empty(0)
+
+        def add_candidates(candidate_ixs, candidate_distances):
+            nonlocal neighbor_ixs, distances
+            neighbor_ixs = np.concatenate([neighbor_ixs, candidate_ixs])
+            distances = np.concatenate([distances, candidate_distances])
+            is_kept = ~np.isnan(distances) & (
+                structure_klifs_ids[neighbor_ixs] != excluded_structure_klifs_id
+            )
+            if radius is not None:
+                is_kept &= distances <= radius
+            neighbor_ixs, distances = neighbor_ixs[is_kept], distances[is_kept]
+            order = np.lexsort((neighbor_ixs, distances))[:n_neighbors]
+            neighbor_ixs, distances = neighbor_ixs[order], distances[order]
+
+        def get_threshold():
+            if radius is not None:
+                threshold = radius
+            elif len(distances) < n_neighbors:
+                return np.inf
+            else:
+                threshold = distances[-1]
+            # Tolerance for rounding errors
+            return threshold * (1 + 1e-9) + 1e-12
+
+        # Queries with NaN moments are not in metric space: Compare exhaustively
+        if np.isnan(query_moments).any():
+            all_ixs = np.arange(self.fingerprint_stack.n_fingerprints)
+            add_candidates(all_ixs, self._get_distances(query_moments, all_ixs, exact=True))
+            return neighbor_ixs, distances
+
+        add_candidates(
+            self.fallback_ixs, self._get_distances(query_moments, self.fallback_ixs, exact=True)
+        )
+
+        # Best-first search: Nodes by lower bound of distances of their fingerprints
+        nodes = [(0.0, 0)] if self.n_nodes > 0 else []
+        while nodes:
+            lower_bound, node = heapq.heappop(nodes)
+            if lower_bound > get_threshold():
+                break
+            if self.vantage_ixs[node] < 0:
+                start, end = self.leaf_ranges[node]
+                leaf_ixs = self.leaf_ixs[start:end]
+                add_candidates(leaf_ixs, self._get_distances(query_moments, leaf_ixs))
+                continue
+            vantage_ix = self.vantage_ixs[node]
+            distance = self._get_distances(query_moments, np.array([vantage_ix]))
+            add_candidates(np.array([vantage_ix]), distance)
+            distance, radius_node = distance[0], self.radii[node]
+            inside, outside = self.children[node]
+            heapq.heappush(nodes, (max(lower_bound, distance - radius_node, 0.0), inside))
+            heapq.heappush(nodes, (max(lower_bound, radius_node - distance, 0.0), outside))
+
+        return neighbor_ixs, distances
+
+    def _get_distances(self, query_moments, fingerprint_ixs, exact=False):
+        """
+        Get fingerprint distances (moments features only) between one query fingerprint and
+        database fingerprints.
+
+        Parameters
+        ----------
+        query_moments : np.ndarray
+            Query moments (3 features x 4 bits).
+        fingerprint_ixs : np.ndarray of int
+            Database fingerprint indices.
+        exact : bool
+            If True, use the NaN-aware feature distance kernel (for fingerprints with NaN moment
+            values), else assume no NaN values.
+
+        Returns
+        -------
+        np.ndarray
+            Fingerprint distances.
+        """
+
+        moments = self.fingerprint_stack.moments[fingerprint_ixs]
+        if exact:
+            feature_distances, _ = calculate_feature_distances(
+                np.broadcast_to(query_moments, moments.shape), moments, self.distance_measure
+            )
+            return feature_distances[self.distance_measure] @ self.feature_weights
+
+        differences = moments - query_moments
+        if self.distance_measure == "scaled_cityblock":
+            feature_distances = np.abs(differences).sum(axis=-1)
+        else:
+            feature_distances = np.sqrt(np.square(differences).sum(axis=-1))
+        return (feature_distances / moments.shape[-1]) @ self.feature_weights
+
+    def _build(self, fingerprint_ixs, rng):
+        """
+        Build tree nodes (iteratively, root node first).
+
+        Parameters
+        ----------
+        fingerprint_ixs : np.ndarray of int
+            Fingerprint indices (no NaN moment values).
+        rng : numpy.random.Generator
+            Random number generator (choice of vantage points).
+        """
+
+        vantage_ixs, radii, children, leaf_ranges, leaf_ixs = [], [], [], [], []
+        n_leaf_ixs = 0
+
+        def add_node():
+            vantage_ixs.append(-1)
+            radii.append(np.nan)
+            children.append([-1, -1])
+            leaf_ranges.append([0, 0])
+            return len(vantage_ixs) - 1
+
+        tasks = [(add_node(), fingerprint_ixs)] if len(fingerprint_ixs) > 0 else []
+        while tasks:
+            node, ixs = tasks.pop()
+
+            if len(ixs) <= self.leaf_size:
+                leaf_ixs.append(ixs)
+                leaf_ranges[node] = [n_leaf_ixs, n_leaf_ixs + len(ixs)]
+                n_leaf_ixs += len(ixs)
+                continue
+
+            vantage_position = rng.integers(len(ixs))
+            vantage_ix = ixs[vantage_position]
+            ixs = np.delete(ixs, vantage_position)
+            distances = self._get_distances(self.fingerprint_stack.moments[vantage_ix], ixs)
+            radius = np.median(distances)
+            is_inside = distances <= radius
+
+            vantage_ixs[node] = vantage_ix
+            radii[node] = radius
+            children[node] = [add_node(), add_node()]
+            tasks.append((children[node][0], ixs[is_inside]))
+            tasks.append((children[node][1], ixs[~is_inside]))
+
+        self.vantage_ixs = np.array(vantage_ixs, dtype=np.int64)
+        self.radii = np.array(radii)
+        self.children = np.array(children, dtype=np.int64).reshape(-1, 2)
+        self.leaf_ranges = np.array(leaf_ranges, dtype=np.int64).reshape(-1, 2)
+        self.leaf_ixs = (
+            np.concatenate(leaf_ixs).astype(np.int64) if leaf_ixs else np.empty(0, dtype=np.int64)
+        )
@@ -0,0 +1,227 @@
+"""
+kissim.comparison.nearest_neighbors
+
+Defines the k nearest neighbors per structure, collected from structure pair distances.
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class NearestNeighbors:
+    """
+    Running k nearest neighbors (smallest fingerprint distances) per structure, stored as
+    structures x k arrays. Structure pair distances can be added in chunks (e.g. tile by tile);
+    each row acts as a bounded heap keeping only the k best distances, so that memory scales
+    with the number of structures times k (not with the number of structure pairs).
+
+    Attributes
+    ----------
+    structure_klifs_ids : list of int
+        Structure KLIFS IDs (define the structure indices used in `neighbor_ixs`).
+    n_neighbors : int
+        Maximum number of neighbors per structure (k).
+    neighbor_ixs : np.ndarray of int
+        Structure indices of the nearest neighbors per structure, sorted by distance (structures
+        x k); -1 if not available.
+    distances : np.ndarray
+        Distances to the nearest neighbors per structure, sorted by distance (structures x k);
+        NaN if not available.
+    """
+
+    def __init__(self):
+
+        self.structure_klifs_ids = None
+        self.n_neighbors = None
+        self.neighbor_ixs = None
+        self.distances = None
+
+    @property
+    def n_structures(self):
+        """
+        Number of structures.
+
+        Returns
+        -------
+        int
+            Number of structures.
+        """
+
+        return len(self.structure_klifs_ids)
+
+    @classmethod
+    def from_structure_klifs_ids(cls, structure_klifs_ids, n_neighbors=10):
+        """
+        Initialize empty nearest neighbors for a set of structures.
+
+        Parameters
+        ----------
+        structure_klifs_ids : list of int
+            Structure KLIFS IDs; structure indices passed to `update` refer to this list.
+        n_neighbors : int
+            Maximum number of neighbors per structure (k).
+
+        Returns
+        -------
+        kissim.comparison.NearestNeighbors
+            Empty nearest neighbors.
+        """
+
+        if n_neighbors < 1:
+            raise ValueError("Number of neighbors must be at least 1.")
+
+        nearest_neighbors = cls()
+        nearest_neighbors.structure_klifs_ids = list(structure_klifs_ids)
+        nearest_neighbors.n_neighbors = n_neighbors
+        shape = (nearest_neighbors.n_structures, n_neighbors)
+        nearest_neighbors.neighbor_ixs = np.full(shape, -1, dtype=np.int64)
+        nearest_neighbors.distances = np.full(shape, np.nan)
+        return nearest_neighbors
+
+    @classmethod
+    def from_feature_distances_arrays(
+        cls, feature_distances_arrays, n_neighbors=10, feature_weights=None, distance_measure=None
+    ):
+        """
+        Collect the nearest neighbors per structure tile by tile, i.e. without holding all
+        structure pairs in memory.
+
+        Parameters
+        ----------
+        feature_distances_arrays : iterable of kissim.comparison.FeatureDistancesArray
+            Feature distances (e.g. tiles as generated by
+            kissim.comparison.FeatureDistancesArray.iter_tiles), referring to the same fingerprint
+            stack.
+        n_neighbors : int
+            Maximum number of neighbors per structure (k).
+        feature_weights : None or list of float
+            Feature weights (see kissim.comparison.FingerprintDistance).
+        distance_measure : str or None
+            Distance measure. If None (default), the first distance measure is used.
+
+        Returns
+        -------
+        kissim.comparison.NearestNeighbors or None
+            Nearest neighbors (None if no feature distances are given).
+        """
+
+        nearest_neighbors = None
+        for feature_distances_array in feature_distances_arrays:
+            if nearest_neighbors is None:
+                nearest_neighbors = cls.from_structure_klifs_ids(
+                    feature_distances_array.structure_klifs_ids, n_neighbors
+                )
+            nearest_neighbors.update_from_feature_distances_array(
+                feature_distances_array, feature_weights, distance_measure
+            )
+        return nearest_neighbors
+
+    def update_from_feature_distances_array(
+        self, feature_distances_array, feature_weights=None, distance_measure=None
+    ):
+        """
+        Add fingerprint distances for all fingerprint pairs in feature distances to the nearest
+        neighbors. Structure KLIFS IDs must be the structure KLIFS IDs of the feature distances.
+
+        Parameters
+        ----------
+        feature_distances_array : kissim.comparison.FeatureDistancesArray
+            Feature distances.
+        feature_weights : None or list of float
+            Feature weights (see kissim.comparison.FingerprintDistance).
+        distance_measure : str or None
+            Distance measure. If None (default), the first distance measure is used.
+        """
+
+        if len(feature_distances_array.structure_klifs_ids) != self.n_structures:
+            raise ValueError("Structures of feature distances do not match structure KLIFS IDs.")
+
+        distances = feature_distances_array.get_fingerprint_distances(
+            feature_weights, distance_measure
+        )
+        self.update(
+            feature_distances_array.pairs[:, 0], feature_distances_array.pairs[:, 1], distances
+        )
+
+    def update(self, structure_ixs1, structure_ixs2, distances, symmetric=True):
+        """
+        Add structure pair distances to the nearest neighbors. NaN distances and self pairs are
+        skipped.
+
+        Parameters
+        ----------
+        structure_ixs1 : np.ndarray of int
+            Structure indices (positions in `structure_klifs_ids`) for first structure per pair.
+        structure_ixs2 : np.ndarray of int
+            Structure indices (positions in `structure_klifs_ids`) for second structure per pair.
+        distances : np.ndarray of float
+            Distance per structure pair.
+        symmetric : bool
+            If True (default), structure pairs are unordered, i.e. each pair is a neighbor
+            candidate for both structures. If False, each pair is a neighbor candidate for the
+            first structure only (e.g. query vs. database structures).
+        """
+
+        structure_ixs1 = np.asarray(structure_ixs1, dtype=np.int64)
+        structure_ixs2 = np.asarray(structure_ixs2, dtype=np.int64)
+        distances = np.asarray(distances, dtype=float)
+
+        is_valid = ~np.isnan(distances) & (structure_ixs1 != structure_ixs2)
+        rows = structure_ixs1[is_valid]
+        columns = structure_ixs2[is_valid]
+        distances = distances[is_valid]
+        if symmetric:
+            rows, columns = np.concatenate([rows, columns]), np.concatenate([columns, rows])
+            distances = np.tile(distances, 2)
+        if len(rows) == 0:
+            return
+
+        # Merge current neighbors of affected rows with new candidates
+        affected_rows = np.unique(rows)
+        current_columns = self.neighbor_ixs[affected_rows]
+        is_current = current_columns >= 0
+        rows = np.concatenate([np.repeat(affected_rows, is_current.sum(axis=1)), rows])
+        columns = np.concatenate([current_columns[is_current], columns])
+        distances = np.concatenate([self.distances[affected_rows][is_current], distances])
+
+        # Keep the k best candidates per row (ties are broken by smaller structure index)
+        order = np.lexsort((columns, distances, rows))
+        rows, columns, distances = rows[order], columns[order], distances[order]
+        group_starts = np.flatnonzero(np.concatenate([[True], rows[1:] != rows[:-1]]))
+        group_sizes = np.diff(np.append(group_starts, len(rows)))
+        ranks = np.arange(len(rows)) - np.repeat(group_starts, group_sizes)
+        is_kept = ranks < self.n_neighbors
+
+        self.neighbor_ixs[affected_rows] = -1
+        self.distances[affected_rows] = np.nan
+        self.neighbor_ixs[rows[is_kept], ranks[is_kept]] = columns[is_kept]
+        self.distances[rows[is_kept], ranks[is_kept]] = distances[is_kept]
+
+    def get_neighbors(self):
+        """
+        Get the nearest neighbors per structure as table (one row per structure and neighbor).
+
+        Returns
+        -------
+        pandas.DataFrame
+            Structure KLIFS ID (structure_klifs_id), rank of neighbor (rank, starting at 1),
+            neighbor structure KLIFS ID (neighbor_structure_klifs_id), and distance.
+        """
+
+        structure_ixs, ranks = np.nonzero(self.neighbor_ixs >= 0)
+        structure_klifs_ids = np.array(self.structure_klifs_ids, dtype=object)
+
+        return pd.DataFrame(
+            {
+                "structure_klifs_id": structure_klifs_ids[structure_ixs],
+                "rank": ranks + 1,
+                "neighbor_structure_klifs_id": structure_klifs_ids[
+                    self.neighbor_ixs[structure_ixs, ranks]
+                ],
+                "distance": self.distances[structure_ixs, ranks],
+            }
+        )
@@ -0,0 +1,331 @@
+"""
+kissim.comparison.pruned_search
+
+Defines the exact top-k search of query fingerprints in stacked fingerprints, skipping candidates
+based on cheap lower bounds of their fingerprint distances.
+"""
+
+import logging
+
+import numpy as np
+
+from . import FingerprintDistance
+from .kernels import calculate_bit_numbers, calculate_feature_distances, check_distance_measures
+
+logger = logging.getLogger(__name__)
+
+# Indices of the physicochemical and distances features (15 features in total)
+_NORM_FEATURE_IXS = np.arange(12)
+
+
+class PrunedSearch:
+    """
+    Exact top-k search of query fingerprints in stacked fingerprints (database).
+
+    For each candidate a cheap lower bound of the fingerprint distance is calculated: Moment
+    feature distances (3 features x 4 bits) are calculated exactly, all other feature distances
+    are bounded via the triangle inequality on precomputed norms of bit segments,
+    i.e. ||x_s - y_s|| >= | ||x_s|| - ||y_s|| | per segment s. Only segments without NaN values
+    in both fingerprints contribute, and distances are scaled by the number of bits (upper
+    bound of the number of bit pairs free of NaN values), so that bounds are valid for features
+    with NaN values.
+    Candidates are evaluated in order of increasing lower bounds; candidates whose lower bound
+    exceeds the current k-th best distance cannot enter the top-k and are skipped. Results are
+    identical to an exhaustive search.
+
+    Attributes
+    ----------
+    fingerprint_stack : kissim.comparison.FingerprintStack
+        Stacked fingerprints (database).
+    distance_measure : str
+        Distance measure.
+    feature_weights : np.ndarray
+        Feature weights (15 features).
+    n_segments : int
+        Number of bit segments per physicochemical and distances feature.
+    norms : np.ndarray
+        Norms (L2 for scaled Euclidean, L1 for scaled cityblock distances) of bit segments of
+        physicochemical and distances features (fingerprints x 12 features x segments).
+    is_complete : np.ndarray of bool
+        Bit segments without NaN values (fingerprints x 12 features x segments).
+    """
+
+    def __init__(self):
+
+        self.fingerprint_stack = None
+        self.distance_measure = None
+        self.feature_weights = None
+        self.n_segments = None
+        self.norms = None
+        self.is_complete = None
+
+    @classmethod
+    def from_fingerprint_stack(
+        cls,
+        fingerprint_stack,
+        distance_measure="scaled_euclidean",
+        feature_weights=None,
+        n_segments=17,
+    ):
+        """
+        Prepare the search in stacked fingerprints (precompute norms of bit segments).
+
+        Parameters
+        ----------
+        fingerprint_stack : kissim.comparison.FingerprintStack
+            Stacked fingerprints (database).
+        distance_measure : str
+            Distance measure (scaled_euclidean or scaled_cityblock).
+        feature_weights : None or list of float
+            Feature weights (see kissim.comparison.FingerprintDistance).
+        n_segments : int
+            Number of bit segments per physicochemical and distances feature (more segments give
+            tighter bounds at higher cost per bound; 85 segments equal exact distances).
+
+        Returns
+        -------
+        kissim.comparison.PrunedSearch
+            Search.
+        """
+
+        search = cls()
+        search.fingerprint_stack = fingerprint_stack
+        search.distance_measure = check_distance_measures(distance_measure)[0]
+        search.feature_weights = FingerprintDistance()._format_weights(feature_weights)
+        search.n_segments = n_segments
+        search.norms, search.is_complete = search._get_norms(fingerprint_stack)
+        return search
+
+    def search(self, query_stack, n_neighbors=10, batch_size=256):
+        """
+        Get the k most similar fingerprints in the database per query fingerprint. Database
+        fingerprints with the same structure KLIFS ID as the query are skipped, as are database
+        fingerprints with NaN fingerprint distances.
+
+        Parameters
+        ----------
+        query_stack : kissim.comparison.FingerprintStack
+            Stacked query fingerprints.
+        n_neighbors : int
+            Number of most similar database fingerprints per query (k).
+        batch_size : int
+            Number of candidates evaluated at once.
+
+        Returns
+        -------
+        neighbor_ixs : np.ndarray of int
+            Database fingerprint indices of the most similar database fingerprints, sorted by
+            distance (queries x k); -1 if not available.
+        distances : np.ndarray
+            Fingerprint distances to the most similar database fingerprints (queries x k); NaN if
+            not available.
+        """
+
+        if n_neighbors < 1:
+            raise ValueError("Number of neighbors must be at least 1.")
+
+        neighbor_ixs = np.full((query_stack.n_fingerprints, n_neighbors), -1, dtype=np.int64)
+        distances = np.full((query_stack.n_fingerprints, n_neighbors), np.nan)
+        query_norms, query_is_complete = self._get_norms(query_stack)
+
+        for i in range(query_stack.n_fingerprints):
+            query_neighbor_ixs, query_distances, n_evaluated = self._search_query(
+                query_stack.subset([i]),
+                query_norms[i],
+                query_is_complete[i],
+                n_neighbors,
+                batch_size,
+            )
+            neighbor_ixs[i, : len(query_neighbor_ixs)] = query_neighbor_ixs
+            distances[i, : len(query_distances)] = query_distances
+            logger.info(
+                f"Query {query_stack.structure_klifs_ids[i]}: "
+                f"{n_evaluated}/{self.fingerprint_stack.n_fingerprints} candidates evaluated"
+            )
+
+        return neighbor_ixs, distances
+
+    def get_lower_bounds(self, query_stack):
+        """
+        Get lower bounds of the fingerprint distances between one query fingerprint and all
+        database fingerprints.
+
+        Parameters
+        ----------
+        query_stack : kissim.comparison.FingerprintStack
+            Stacked query fingerprint (one fingerprint).
+
+        Returns
+        -------
+        np.ndarray
+            Lower bounds of fingerprint distances (database fingerprints); NaN if fingerprint
+            distance is NaN.
+        """
+
+        query_norms, query_is_complete = self._get_norms(query_stack)
+        return self._get_lower_bounds(query_stack, query_norms[0], query_is_complete[0])
+
+    def _search_query(self, query_stack, query_norms, query_is_complete, n_neighbors, batch_size):
+        """
+        Get the k most similar fingerprints in the database for one query fingerprint.
+
+        Parameters
+        ----------
+        query_stack : kissim.comparison.FingerprintStack
+            Stacked query fingerprint (one fingerprint).
+        query_norms : np.ndarray
+            Query segment norms (12 features x segments).
+        query_is_complete : np.ndarray of bool
+            Query segments without NaN values (12 features x segments).
+        n_neighbors : int
+            Number of most similar database fingerprints (k).
+        batch_size : int
+            Number of candidates evaluated at once.
+
+        Returns
+        -------
+        neighbor_ixs : np.ndarray of int
+            Database fingerprint indices (up to k).
+        distances : np.ndarray
+            Fingerprint distances (up to k).
+        n_evaluated : int
+            Number of candidates with evaluated fingerprint distances.
+        """
+
+        lower_bounds = self._get_lower_bounds(query_stack, query_norms, query_is_complete)
+        is_candidate = ~np.isnan(lower_bounds) & (
+            np.array(self.fingerprint_stack.structure_klifs_ids)
+            != query_stack.structure_klifs_ids[0]
+        )
+        candidate_ixs = np.flatnonzero(is_candidate)
+        candidate_ixs = candidate_ixs[np.argsort(lower_bounds[candidate_ixs], kind="stable")]
+
+        neighbor_ixs = np.empty(0, dtype=np.int64)
+        distances = np.empty(0)
+        n_evaluated = 0
+        for start in range(0, len(candidate_ixs), batch_size):
+            # Stop if no remaining candidate can enter the top-k (tolerance for rounding errors)
+            if len(distances) == n_neighbors:
+                threshold = distances[-1] * (1 + 1e-9) + 1e-12
+                if lower_bounds[candidate_ixs[start]] > threshold:
+                    break
+            batch_ixs = candidate_ixs[start : start + batch_size]
+            batch_distances = self._get_distances(query_stack, batch_ixs)
+            n_evaluated += len(batch_ixs)
+
+            neighbor_ixs = np.concatenate([neighbor_ixs, batch_ixs])
+            distances = np.concatenate([distances, batch_distances])
+            order = np.lexsort((neighbor_ixs, distances))[:n_neighbors]
+            neighbor_ixs, distances = neighbor_ixs[order], distances[order]
+
+        return neighbor_ixs, distances, n_evaluated
+
+    def _get_lower_bounds(self, query_stack, query_norms, query_is_complete):
+        """
+        Get lower bounds of the fingerprint distances between one query fingerprint and all
+        database fingerprints.
+
+        Parameters
+        ----------
+        query_stack : kissim.comparison.FingerprintStack
+            Stacked query fingerprint (one fingerprint).
+        query_norms : np.ndarray
+            Query segment norms (12 features x segments).
+        query_is_complete : np.ndarray of bool
+            Query segments without NaN values (12 features x segments).
+
+        Returns
+        -------
+        np.ndarray
+            Lower bounds of fingerprint distances (database fingerprints); NaN if fingerprint
+            distance is NaN.
+        """
+
+        n_fingerprints = self.fingerprint_stack.n_fingerprints
+        n_bits = self.fingerprint_stack.n_bits
+
+        # Feature pairs without any bit pair free of NaN values result in NaN distances
+        bit_numbers = np.concatenate(
+            [
+                calculate_bit_numbers(np.broadcast_to(query_bit_masks, bit_masks.shape), bit_masks)
+                for query_bit_masks, bit_masks in zip(
+                    query_stack.bit_masks, self.fingerprint_stack.bit_masks
+                )
+            ],
+            axis=1,
+        )
+
+        feature_lower_bounds = np.zeros((n_fingerprints, len(n_bits)))
+        norm_differences = np.where(
+            self.is_complete & query_is_complete, np.abs(self.norms - query_norms), 0.0
+        )
+        if self.distance_measure == "scaled_cityblock":
+            norm_differences = norm_differences.sum(axis=-1)
+        else:
+            norm_differences = np.sqrt(np.square(norm_differences).sum(axis=-1))
+        feature_lower_bounds[:, _NORM_FEATURE_IXS] = norm_differences / n_bits[_NORM_FEATURE_IXS]
+        moments_distances, _ = calculate_feature_distances(
+            np.broadcast_to(query_stack.moments, self.fingerprint_stack.moments.shape),
+            self.fingerprint_stack.moments,
+            self.distance_measure,
+        )
+        feature_lower_bounds[:, _NORM_FEATURE_IXS.size :] = moments_distances[
+            self.distance_measure
+        ]
+        feature_lower_bounds[bit_numbers == 0] = np.nan
+
+        return feature_lower_bounds @ self.feature_weights
+
+    def _get_distances(self, query_stack, fingerprint_ixs):
+        """
+        Get fingerprint distances between one query fingerprint and database fingerprints.
+
+        Parameters
+        ----------
+        query_stack : kissim.comparison.FingerprintStack
+            Stacked query fingerprint (one fingerprint).
+        fingerprint_ixs : np.ndarray of int
+            Database fingerprint indices.
+
+        Returns
+        -------
+        np.ndarray
+            Fingerprint distances.
+        """
+
+        feature_distances = self.fingerprint_stack.get_feature_distances(
+            query_stack, fingerprint_ixs, self.distance_measure
+        )
+        return feature_distances @ self.feature_weights
+
+    def _get_norms(self, fingerprint_stack):
+        """
+        Get norms of bit segments of physicochemical and distances features (NaN values are
+        ignored).
+
+        Parameters
+        ----------
+        fingerprint_stack : kissim.comparison.FingerprintStack
+            Stacked fingerprints.
+
+        Returns
+        -------
+        norms : np.ndarray
+            Segment norms (fingerprints x 12 features x segments).
+        is_complete : np.ndarray of bool
+            Segments without NaN values (fingerprints x 12 features x segments).
+        """
+
+        features = np.concatenate(
+            [fingerprint_stack.physicochemical, fingerprint_stack.distances], axis=1
+        )
+        n_bits = features.shape[-1]
+        n_segments = min(self.n_segments, n_bits)
+        segment_starts = np.arange(n_segments) * n_bits // n_segments
+        values = np.nan_to_num(features, nan=0.0)
+        if self.distance_measure == "scaled_cityblock":
+            norms = np.add.reduceat(np.abs(values), segment_starts, axis=-1)
+        else:
+            norms = np.sqrt(np.add.reduceat(np.square(values), segment_starts, axis=-1))
+        is_complete = ~np.logical_or.reduceat(np.isnan(features), segment_starts, axis=-1)
+        return norms, is_complete
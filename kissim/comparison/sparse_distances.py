@@ -0,0 +1,352 @@
+"""
+kissim.comparison.sparse_distances
+
+Defines fingerprint distances for structure pairs below a distance cutoff, stored as sparse
+matrix.
+"""
+
+import logging
+
+import numpy as np
+from scipy.sparse import coo_matrix
+
+from . import FingerprintDistance
+
+logger = logging.getLogger(__name__)
+
+
+class SparseDistances:
+    """
+    Fingerprint distances and coverages for structure pairs with a fingerprint distance below or
+    equal to a cutoff, stored in coordinate (COO) format. Structure pair distances can be added in
+    chunks (e.g. tile by tile); only qualifying pairs are kept, so that memory scales with the
+    number of close structure pairs (not with the number of structure pairs).
+
+    Sparse matrices store qualifying structure pairs explicitly, i.e. structure pairs with a
+    distance of zero (e.g. identical fingerprints) are stored as explicit zeros, whereas
+    structure pairs above the cutoff (or without distance) are not stored.
+
+    Attributes
+    ----------
+    structure_klifs_ids : list of int
+        Structure KLIFS IDs (define the structure indices, i.e. rows and columns).
+    kinase_names : list of str
+        Kinase names (one per structure).
+    max_distance : float
+        Distance cutoff (inclusive).
+    """
+
+    def __init__(self):
+
+        self.structure_klifs_ids = None
+        self.kinase_names = None
+        self.max_distance = None
+        # Qualifying structure pairs (i, j, distance, coverage) as consolidated arrays, plus
+        # chunks added since the last consolidation (avoids copying all pairs per chunk)
+        self._pairs = None
+        self._pair_chunks = []
+
+    @property
+    def n_structures(self):
+        """
+        Number of structures.
+
+        Returns
+        -------
+        int
+            Number of structures.
+        """
+
+        return len(self.structure_klifs_ids)
+
+    @property
+    def n_pairs(self):
+        """
+        Number of qualifying structure pairs.
+
+        Returns
+        -------
+        int
+            Number of structure pairs.
+        """
+
+        return len(self.distances)
+
+    @property
+    def structure_ixs1(self):
+        """
+        Structure indices i (i < j) of qualifying structure pairs.
+
+        Returns
+        -------
+        np.ndarray of int32
+            Structure indices.
+        """
+
+        return self._get_pairs()[0]
+
+    @property
+    def structure_ixs2(self):
+        """
+        Structure indices j (i < j) of qualifying structure pairs.
+
+        Returns
+        -------
+        np.ndarray of int32
+            Structure indices.
+        """
+
+        return self._get_pairs()[1]
+
+    @property
+    def distances(self):
+        """
+        Fingerprint distances of qualifying structure pairs.
+
+        Returns
+        -------
+        np.ndarray of float32
+            Fingerprint distances.
+        """
+
+        return self._get_pairs()[2]
+
+    @property
+    def coverages(self):
+        """
+        Fingerprint coverages of qualifying structure pairs.
+
+        Returns
+        -------
+        np.ndarray of float32
+            Fingerprint coverages.
+        """
+
+        return self._get_pairs()[3]
+
+    @classmethod
+    def from_structure_klifs_ids(cls, structure_klifs_ids, kinase_names, max_distance):
+        """
+        Initialize empty sparse distances for a set of structures.
+
+        Parameters
+        ----------
+        structure_klifs_ids : list of int
+            Structure KLIFS IDs; structure indices passed to `update` refer to this list.
+        kinase_names : list of str
+            Kinase names (one per structure).
+        max_distance : float
+            Distance cutoff (inclusive).
+
+        Returns
+        -------
+        kissim.comparison.SparseDistances
+            Empty sparse distances.
+        """
+
+        if max_distance is None or np.isnan(max_distance):
+            raise ValueError("Distance cutoff required.")
+        if len(kinase_names) != len(structure_klifs_ids):
+            raise ValueError("Number of kinase names does not match number of structures.")
+
+        sparse_distances = cls()
+        sparse_distances.structure_klifs_ids = [int(i) for i in structure_klifs_ids]
+        sparse_distances.kinase_names = [str(i) for i in kinase_names]
+        sparse_distances.max_distance = float(max_distance)
+        sparse_distances._pairs = (
+            np.empty(0, dtype=np.int32),
+            np.empty(0, dtype=np.int32),
+            np.empty(0, dtype=np.float32),
+            np.empty(0, dtype=np.float32),
+        )
+        return sparse_distances
+
+    @classmethod
+    def from_npz(cls, filepath):
+        """
+        Load sparse distances from a npz file.
+
+        Parameters
+        ----------
+        filepath : str or pathlib.Path
+            Path to npz file.
+
+        Returns
+        -------
+        kissim.comparison.SparseDistances
+            Sparse distances.
+        """
+
+        with np.load(filepath) as npz:
+            sparse_distances = cls()
+            sparse_distances.structure_klifs_ids = npz["structure_klifs_ids"].tolist()
+            sparse_distances.kinase_names = npz["kinase_names"].tolist()
+            sparse_distances.max_distance = float(npz["max_distance"])
+            sparse_distances._pairs = (
+                npz["structure_ixs1"],
+                npz["structure_ixs2"],
+                npz["distances"],
+                npz["coverages"],
+            )
+        return sparse_distances
+
+    def to_npz(self, filepath):
+        """
+        Save sparse distances (COO format) to a npz file.
+
+        Parameters
+        ----------
+        filepath : str or pathlib.Path
+            Path to npz file.
+        """
+
+        np.savez(
+            filepath,
+            structure_klifs_ids=np.array(self.structure_klifs_ids),
+            kinase_names=np.array(self.kinase_names, dtype=str),
+            max_distance=self.max_distance,
+            structure_ixs1=self.structure_ixs1,
+            structure_ixs2=self.structure_ixs2,
+            distances=self.distances,
+            coverages=self.coverages,
+        )
+
+    def update_from_feature_distances_array(
+        self, feature_distances_array, feature_weights=None, distance_measure=None
+    ):
+        """
+        Add fingerprint distances for all fingerprint pairs in feature distances (only pairs
+        below or equal to the cutoff are kept). Structure KLIFS IDs must be the structure KLIFS
+        IDs of the feature distances.
+
+        Parameters
+        ----------
+        feature_distances_array : kissim.comparison.FeatureDistancesArray
+            Feature distances.
+        feature_weights : None or list of float
+            Feature weights (see kissim.comparison.FingerprintDistance).
+        distance_measure : str or None
+            Distance measure. If None (default), the first distance measure is used.
+        """
+
+        if feature_distances_array.structure_klifs_ids != self.structure_klifs_ids:
+            raise ValueError("Structures of feature distances do not match structure KLIFS IDs.")
+
+        distances = feature_distances_array.get_fingerprint_distances(
+            feature_weights, distance_measure
+        )
+        is_kept = distances <= self.max_distance
+        feature_weights = FingerprintDistance()._format_weights(feature_weights)
+        coverages = feature_distances_array.bit_coverages[is_kept] @ feature_weights
+        self.update(
+            feature_distances_array.pairs[is_kept, 0],
+            feature_distances_array.pairs[is_kept, 1],
+            distances[is_kept],
+            coverages,
+        )
+
+    def update(self, structure_ixs1, structure_ixs2, distances, coverages):
+        """
+        Add fingerprint distances for structure pairs (unordered). Structure pairs above the
+        cutoff or without distance (NaN), and self pairs are skipped.
+
+        Parameters
+        ----------
+        structure_ixs1 : np.ndarray of int
+            Structure indices (positions in `structure_klifs_ids`) for first structure per pair.
+        structure_ixs2 : np.ndarray of int
+            Structure indices (positions in `structure_klifs_ids`) for second structure per pair.
+        distances : np.ndarray of float
+            Fingerprint distance per structure pair.
+        coverages : np.ndarray of float
+            Fingerprint coverage per structure pair.
+        """
+
+        structure_ixs1 = np.asarray(structure_ixs1, dtype=np.int64)
+        structure_ixs2 = np.asarray(structure_ixs2, dtype=np.int64)
+        distances = np.asarray(distances, dtype=float)
+        coverages = np.asarray(coverages, dtype=float)
+
+        is_kept = (distances <= self.max_distance) & (structure_ixs1 != structure_ixs2)
+        if not is_kept.any():
+            return
+        structure_ixs1, structure_ixs2 = structure_ixs1[is_kept], structure_ixs2[is_kept]
+        self._pair_chunks.append(
+            (
+                np.minimum(structure_ixs1, structure_ixs2).astype(np.int32),
+                np.maximum(structure_ixs1, structure_ixs2).astype(np.int32),
+                distances[is_kept].astype(np.float32),
+                coverages[is_kept].astype(np.float32),
+            )
+        )
+
+    def get_coo_matrix(self, values="distance", symmetric=False):
+        """
+        Get fingerprint distances or coverages of qualifying structure pairs as sparse matrix in
+        coordinate (COO) format.
+
+        Parameters
+        ----------
+        values : str
+            Matrix values: distance (default) or coverage.
+        symmetric : bool
+            If True, each structure pair is stored twice (i, j) and (j, i), else once as upper
+            triangle (i < j; default).
+
+        Returns
+        -------
+        scipy.sparse.coo_matrix
+            Sparse matrix (structures x structures).
+        """
+
+        if values == "distance":
+            data = self.distances
+        elif values == "coverage":
+            data = self.coverages
+        else:
+            raise ValueError("Matrix values unknown. Choose from: distance, coverage")
+
+        rows, columns = self.structure_ixs1, self.structure_ixs2
+        if symmetric:
+            rows, columns = np.concatenate([rows, columns]), np.concatenate([columns, rows])
+            data = np.tile(data, 2)
+
+        return coo_matrix((data, (rows, columns)), shape=(self.n_structures, self.n_structures))
+
+    def get_csr_matrix(self, values="distance", symmetric=True):
+        """
+        Get fingerprint distances or coverages of qualifying structure pairs as sparse matrix in
+        compressed sparse row (CSR) format, e.g. as adjacency matrix for network analyses.
+
+        Parameters
+        ----------
+        values : str
+            Matrix values: distance (default) or coverage.
+        symmetric : bool
+            If True (default), each structure pair is stored twice (i, j) and (j, i), else once
+            as upper triangle (i < j).
+
+        Returns
+        -------
+        scipy.sparse.csr_matrix
+            Sparse matrix (structures x structures; explicit zeros are kept).
+        """
+
+        return self.get_coo_matrix(values, symmetric).tocsr()
+
+    def _get_pairs(self):
+        """
+        Get qualifying structure pairs, i.e. consolidate chunks added since the last call.
+
+        Returns
+        -------
+        tuple of np.ndarray
+            Structure indices i and j, fingerprint distances, and fingerprint coverages.
+        """
+
+        if self._pair_chunks:
+            self._pairs = tuple(
+                np.concatenate(arrays) for arrays in zip(self._pairs, *self._pair_chunks)
+            )
+            self._pair_chunks = []
+        return self._pairs
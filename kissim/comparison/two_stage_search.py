@@ -0,0 +1,233 @@
+"""
+kissim.comparison.two_stage_search
+
+Defines the approximate top-k search of query fingerprints in stacked fingerprints, screening
+all candidates with a cheap subset of features and re-ranking the best candidates with all
+features.
+"""
+
+from itertools import chain
+import logging
+
+import numpy as np
+
+from . import FingerprintDistance, PrunedSearch
+from .feature_distances import FEATURE_NAMES
+from .kernels import check_distance_measures
+from .utils import get_search_recall
+
+logger = logging.getLogger(__name__)
+
+
+class TwoStageSearch:
+    """
+    Approximate top-k search of query fingerprints in stacked fingerprints (database) in two
+    stages: (1) Screen all candidates by their fingerprint distance based on a cheap subset of
+    features (default: moments features, 12 values per fingerprint) and (2) re-rank the best M
+    candidates by their fingerprint distance based on all features.
+
+    Re-ranked distances are exact; the top-k may miss neighbors that were not among the best M
+    candidates of the screen (see `get_recall`).
+
+    Attributes
+    ----------
+    fingerprint_stack : kissim.comparison.FingerprintStack
+        Stacked fingerprints (database).
+    distance_measure : str
+        Distance measure.
+    feature_weights : np.ndarray
+        Feature weights (15 features).
+    screen_feature_ixs : np.ndarray of int
+        Indices of features used for the screen (15 features in total).
+    screen_feature_weights : np.ndarray
+        Feature weights used for the screen (screen features); feature weights of screen
+        features or, if these are all zero, equal weights.
+    n_candidates : int
+        Number of candidates re-ranked with all features (M).
+    """
+
+    def __init__(self):
+
+        self.fingerprint_stack = None
+        self.distance_measure = None
+        self.feature_weights = None
+        self.screen_feature_ixs = None
+        self.screen_feature_weights = None
+        self.n_candidates = None
+
+    @classmethod
+    def from_fingerprint_stack(
+        cls,
+        fingerprint_stack,
+        distance_measure="scaled_euclidean",
+        feature_weights=None,
+        screen_features="moments",
+        n_candidates=100,
+    ):
+        """
+        Prepare the two-stage search in stacked fingerprints.
+
+        Parameters
+        ----------
+        fingerprint_stack : kissim.comparison.FingerprintStack
+            Stacked fingerprints (database).
+        distance_measure : str
+            Distance measure (scaled_euclidean or scaled_cityblock).
+        feature_weights : None or list of float
+            Feature weights (see kissim.comparison.FingerprintDistance).
+        screen_features : str or list of str or int
+            Features used for the screen: Feature type (physicochemical, distances, or moments),
+            feature name (e.g. size or moment1; see kissim.comparison.feature_distances), or
+            feature index (15 features in total), or a list thereof.
+        n_candidates : int
+            Number of candidates re-ranked with all features (M).
+
+        Returns
+        -------
+        kissim.comparison.TwoStageSearch
+            Search.
+        """
+
+        if n_candidates < 1:
+            raise ValueError("Number of candidates must be at least 1.")
+
+        search = cls()
+        search.fingerprint_stack = fingerprint_stack
+        search.distance_measure = check_distance_measures(distance_measure)[0]
+        search.feature_weights = FingerprintDistance()._format_weights(feature_weights)
+        search.screen_feature_ixs = cls._get_feature_ixs(screen_features)
+        search.screen_feature_weights = search.feature_weights[search.screen_feature_ixs]
+        if not search.screen_feature_weights.any():
+            search.screen_feature_weights = np.ones(len(search.screen_feature_ixs))
+        search.n_candidates = n_candidates
+        return search
+
+    def search(self, query_stack, n_neighbors=10):
+        """
+        Get the (approximately) k most similar fingerprints in the database per query
+        fingerprint. Database fingerprints with the same structure KLIFS ID as the query are
+        skipped, as are database fingerprints with NaN fingerprint distances.
+
+        Parameters
+        ----------
+        query_stack : kissim.comparison.FingerprintStack
+            Stacked query fingerprints.
+        n_neighbors : int
+            Number of most similar database fingerprints per query (k).
+
+        Returns
+        -------
+        neighbor_ixs : np.ndarray of int
+            Database fingerprint indices of the most similar database fingerprints, sorted by
+            distance (queries x k); -1 if not available.
+        distances : np.ndarray
+            Fingerprint distances to the most similar database fingerprints (queries x k); NaN if
+            not available.
+        """
+
+        if n_neighbors < 1:
+            raise ValueError("Number of neighbors must be at least 1.")
+
+        neighbor_ixs = np.full((query_stack.n_fingerprints, n_neighbors), -1, dtype=np.int64)
+        distances = np.full((query_stack.n_fingerprints, n_neighbors), np.nan)
+        structure_klifs_ids = np.array(self.fingerprint_stack.structure_klifs_ids)
+
+        for i in range(query_stack.n_fingerprints):
+
+            # Screen: Rank all candidates with screen features
+            screen_distances = (
+                self.fingerprint_stack.get_feature_distances(
+                    query_stack, None, self.distance_measure, self.screen_feature_ixs, i
+                )
+                @ self.screen_feature_weights
+            )
+            is_candidate = ~np.isnan(screen_distances) & (
+                structure_klifs_ids != query_stack.structure_klifs_ids[i]
+            )
+            candidate_ixs = np.flatnonzero(is_candidate)
+            candidate_ixs = candidate_ixs[
+                np.argsort(screen_distances[candidate_ixs], kind="stable")[: self.n_candidates]
+            ]
+
+            # Re-rank: Best candidates with all features
+            candidate_distances = (
+                self.fingerprint_stack.get_feature_distances(
+                    query_stack, candidate_ixs, self.distance_measure, None, i
+                )
+                @ self.feature_weights
+            )
+            is_valid = ~np.isnan(candidate_distances)
+            candidate_ixs, candidate_distances = (
+                candidate_ixs[is_valid],
+                candidate_distances[is_valid],
+            )
+            order = np.lexsort((candidate_ixs, candidate_distances))[:n_neighbors]
+            neighbor_ixs[i, : len(order)] = candidate_ixs[order]
+            distances[i, : len(order)] = candidate_distances[order]
+
+        return neighbor_ixs, distances
+
+    def get_recall(self, n_neighbors=10, n_samples=100, seed=0):
+        """
+        Get the recall of the top-k of the two-stage search, i.e. the fraction of the exact k
+        most similar fingerprints that are found, for a random sample of database fingerprints
+        used as queries (exact results from kissim.comparison.PrunedSearch).
+
+        Parameters
+        ----------
+        n_neighbors : int
+            Number of most similar database fingerprints per query (k).
+        n_samples : int
+            Number of database fingerprints sampled as queries.
+        seed : int
+            Seed for the random sample.
+
+        Returns
+        -------
+        float
+            Recall (mean over sampled queries); NaN if no exact neighbors are available.
+        """
+
+        exact_search = PrunedSearch.from_fingerprint_stack(
+            self.fingerprint_stack, self.distance_measure, self.feature_weights.tolist()
+        )
+        return get_search_recall(self, exact_search, n_neighbors, n_samples, seed)
+
+    @staticmethod
+    def _get_feature_ixs(features):
+        """
+        Get feature indices for feature types, feature names, or feature indices.
+
+        Parameters
+        ----------
+        features : str or int or list of str or int
+            Feature types, feature names, or feature indices.
+
+        Returns
+        -------
+        np.ndarray of int
+            Feature indices (sorted).
+        """
+
+        if isinstance(features, (str, int)):
+            features = [features]
+
+        feature_types = list(
+            chain.from_iterable([[key] * len(value) for key, value in FEATURE_NAMES.items()])
+        )
+        feature_names = list(chain.from_iterable(FEATURE_NAMES.values()))
+
+        feature_ixs = []
+        for feature in features:
+            if isinstance(feature, str) and feature in FEATURE_NAMES:
+                feature_ixs.extend([i for i, j in enumerate(feature_types) if j == feature])
+            elif isinstance(feature, str) and feature in feature_names:
+                feature_ixs.append(feature_names.index(feature))
+            elif not isinstance(feature, str) and 0 <= feature < len(feature_names):
+                feature_ixs.append(int(feature))
+            else:
+                raise ValueError(
+                    f"Feature unknown: {feature}. Choose from feature types "
+                    f'({", ".join(FEATURE_NAMES.keys())}), feature names, or feature indices.'
+                )
+        return np.unique(feature_ixs)
@@ -0,0 +1,322 @@
+"""
+kissim.comparison.utils
+
+Utilities for pairwise comparison, i.e. conversions between square (i, j) and condensed indices
+of a symmetric distance matrix, the generation of fingerprint pair tiles, the centering and
+scaling of fingerprint values, and the evaluation of approximate nearest neighbors.
+"""
+
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def get_condensed_index(i, j, n):
+    """
+    Get the condensed index (upper triangle, row-major order as used by scipy's `pdist`) for
+    square matrix indices (i, j) with i != j.
+
+    Parameters
+    ----------
+    i : int or np.ndarray of int
+        Row index (or indices).
+    j : int or np.ndarray of int
+        Column index (or indices).
+    n : int
+        Number of rows in square matrix.
+
+    Returns
+    -------
+    int or np.ndarray of int
+        Condensed index (or indices).
+    """
+
+    i, j = np.minimum(i, j), np.maximum(i, j)
+    i = np.asarray(i, dtype=np.int64)
+    j = np.asarray(j, dtype=np.int64)
+    if np.any(i == j):
+        raise ValueError("Condensed indices are not defined for diagonal elements (i == j).")
+    k = n * i - i * (i + 1) // 2 + j - i - 1
+    return k if k.ndim > 0 else int(k)
+
+
+def get_square_indices(k, n):
+    """
+    Get the square matrix indices (i, j) with i < j for condensed indices (upper triangle,
+    row-major order as used by scipy's `pdist`).
+
+    Parameters
+    ----------
+    k : int or np.ndarray of int
+        Condensed index (or indices).
+    n : int
+        Number of rows in square matrix.
+
+    Returns
+    -------
+    tuple of (int or np.ndarray of int)
+        Row and column index (or indices).
+    """
+
+    k = np.asarray(k, dtype=np.int64)
+    if np.any(k < 0) or np.any(k >= n * (n - 1) // 2):
+        raise ValueError(f"Condensed index out of range for {n} rows.")
+
+    # Estimate row index (floating point) and correct estimate by exact integer arithmetic
+    i = np.floor(((2 * n - 1) - np.sqrt((2 * n - 1) ** 2 - 8 * k.astype(float))) / 2)
+    i = np.clip(i.astype(np.int64), 0, n - 2)
+    i = np.where(_get_row_start(i, n) > k, i - 1, i)
+    i = np.where(_get_row_start(i + 1, n) <= k, i + 1, i)
+    j = k - _get_row_start(i, n) + i + 1
+
+    if k.ndim == 0:
+        return int(i), int(j)
+    return i, j
+
+
+def get_pair_tiles(n, tile_size=2000):
+    """
+    Get all pairs (i, j) with i < j of n fingerprints in condensed order, split into tiles.
+
+    Parameters
+    ----------
+    n : int
+        Number of fingerprints.
+    tile_size : int
+        Maximum number of pairs per tile.
+
+    Yields
+    ------
+    tuple of np.ndarray of int
+        Fingerprint indices i and j for pairs in tile.
+    """
+
+    n_pairs = n * (n - 1) // 2
+    for start in range(0, n_pairs, tile_size):
+        stop = min(start + tile_size, n_pairs)
+        yield get_square_indices(np.arange(start, stop), n)
+
+
+def get_block_pair_tiles(n1, n2, tile_size=2000):
+    """
+    Get all pairs (i, j) between two sets of n1 and n2 fingerprints (rectangular block, row-major
+    order), split into tiles.
+
+    Parameters
+    ----------
+    n1 : int
+        Number of fingerprints in first set.
+    n2 : int
+        Number of fingerprints in second set.
+    tile_size : int
+        Maximum number of pairs per tile.
+
+    Yields
+    ------
+    tuple of np.ndarray of int
+        Fingerprint indices i (first set) and j (second set) for pairs in tile.
+    """
+
+    n_pairs = n1 * n2
+    for start in range(0, n_pairs, tile_size):
+        stop = min(start + tile_size, n_pairs)
+        yield np.divmod(np.arange(start, stop, dtype=np.int64), n2)
+
+
+def get_pair_list_tiles(ixs1, ixs2, tile_size=2000):
+    """
+    Split an explicit list of pairs (i, j) into tiles (pair order is kept).
+
+    Parameters
+    ----------
+    ixs1 : array-like of int
+        Fingerprint indices i.
+    ixs2 : array-like of int
+        Fingerprint indices j.
+    tile_size : int
+        Maximum number of pairs per tile.
+
+    Yields
+    ------
+    tuple of np.ndarray of int
+        Fingerprint indices i and j for pairs in tile.
+    """
+
+    ixs1 = np.asarray(ixs1, dtype=np.int64)
+    ixs2 = np.asarray(ixs2, dtype=np.int64)
+    if ixs1.shape != ixs2.shape:
+        raise ValueError("Fingerprint indices i and j must have the same length.")
+    for start in range(0, len(ixs1), tile_size):
+        yield ixs1[start : start + tile_size], ixs2[start : start + tile_size]
+
+
+def get_value_means(fingerprint_stack, block_size=10000):
+    """
+    Get mean fingerprint values per bit (NaN values are ignored; zero if all values are NaN),
+    block by block.
+
+    Parameters
+    ----------
+    fingerprint_stack : kissim.comparison.FingerprintStack
+        Stacked fingerprints.
+    block_size : int
+        Number of fingerprints processed at once.
+
+    Returns
+    -------
+    np.ndarray
+        Mean values (1032 bits).
+    """
+
+    n_bits = fingerprint_stack.n_bits.sum()
+    sum_values = np.zeros(n_bits)
+    n_values = np.zeros(n_bits)
+    for start in range(0, fingerprint_stack.n_fingerprints, block_size):
+        values = fingerprint_stack.get_values(start, start + block_size)
+        sum_values += np.nansum(values, axis=0)
+        n_values += (~np.isnan(values)).sum(axis=0)
+    return np.divide(sum_values, n_values, out=np.zeros(n_bits), where=n_values > 0)
+
+
+def get_value_scales(feature_weights, n_bits):
+    """
+    Get scales per bit, i.e. the feature weight divided by the number of bits per feature, so
+    that the Euclidean distance between two fingerprints' scaled values combines the weighted
+    scaled Euclidean feature distances.
+
+    Parameters
+    ----------
+    feature_weights : np.ndarray
+        Feature weights (15 features).
+    n_bits : np.ndarray of int
+        Number of bits per feature (15 features).
+
+    Returns
+    -------
+    np.ndarray
+        Scales (1032 bits).
+    """
+
+    return np.repeat(feature_weights / n_bits, n_bits)
+
+
+def get_scaled_values(fingerprint_stack, means, scales, start=0, end=None):
+    """
+    Get centered and scaled fingerprint values (NaN values are imputed with means).
+
+    Parameters
+    ----------
+    fingerprint_stack : kissim.comparison.FingerprintStack
+        Stacked fingerprints.
+    means : np.ndarray
+        Mean values per bit (1032 bits; see `get_value_means`).
+    scales : np.ndarray
+        Scales per bit (1032 bits; see `get_value_scales`).
+    start : int
+        First fingerprint index.
+    end : int or None
+        Last fingerprint index (excluded).
+
+    Returns
+    -------
+    np.ndarray
+        Scaled values (fingerprints x 1032 bits).
+    """
+
+    values = fingerprint_stack.get_values(start, end)
+    values = np.where(np.isnan(values), means, values)
+    return (values - means) * scales
+
+
+def get_neighbor_recall(neighbor_ixs, neighbor_ixs_exact):
+    """
+    Get the recall of approximate nearest neighbors, i.e. the fraction of exact nearest
+    neighbors that are found.
+
+    Parameters
+    ----------
+    neighbor_ixs : np.ndarray of int
+        Approximate nearest neighbor indices (queries x k); -1 if not available.
+    neighbor_ixs_exact : np.ndarray of int
+        Exact nearest neighbor indices (queries x k); -1 if not available.
+
+    Returns
+    -------
+    float
+        Recall; NaN if no exact nearest neighbors are available.
+    """
+
+    n_found = sum(
+        len(np.intersect1d(ixs[ixs >= 0], ixs_exact[ixs_exact >= 0]))
+        for ixs, ixs_exact in zip(neighbor_ixs, neighbor_ixs_exact)
+    )
+    n_exact = (np.asarray(neighbor_ixs_exact) >= 0).sum()
+    return n_found / n_exact if n_exact > 0 else np.nan
+
+
+def get_search_recall(search, exact_search, n_neighbors=10, n_samples=100, seed=0):
+    """
+    Get the recall of the top-k of an approximate search, i.e. the fraction of the exact k most
+    similar fingerprints that are found, for a random sample of database fingerprints used as
+    queries.
+
+    Parameters
+    ----------
+    search : object
+        Approximate search over the database fingerprints of the exact search (e.g.
+        kissim.comparison.TwoStageSearch), which implements `search(query_stack, n_neighbors)`.
+    exact_search : kissim.comparison.PrunedSearch
+        Exact search (defines the database fingerprints, distance measure, and feature weights).
+    n_neighbors : int
+        Number of most similar database fingerprints per query (k).
+    n_samples : int
+        Number of database fingerprints sampled as queries.
+    seed : int
+        Seed for the random sample.
+
+    Returns
+    -------
+    float
+        Recall (mean over sampled queries); NaN if no exact neighbors are available.
+    """
+
+    fingerprint_stack = exact_search.fingerprint_stack
+    rng = np.random.default_rng(seed)
+    query_ixs = rng.choice(
+        fingerprint_stack.n_fingerprints,
+        min(n_samples, fingerprint_stack.n_fingerprints),
+        replace=False,
+    )
+    query_stack = fingerprint_stack.subset(np.sort(query_ixs))
+
+    neighbor_ixs, _ = search.search(query_stack, n_neighbors)
+    neighbor_ixs_exact, _ = exact_search.search(query_stack, n_neighbors)
+
+    recall = get_neighbor_recall(neighbor_ixs, neighbor_ixs_exact)
+    logger.info(
+        f"Recall@{n_neighbors} of {type(search).__name__} ({len(query_ixs)} sampled queries): "
+        f"{recall}"
+    )
+    return recall
+
+
+def _get_row_start(i, n):
+    """
+    Get the condensed index of the first element in row i of the upper triangle.
+
+    Parameters
+    ----------
+    i : int or np.ndarray of int
+        Row index (or indices).
+    n : int
+        Number of rows in square matrix.
+
+    Returns
+    -------
+    int or np.ndarray of int
+        Condensed index (or indices).
+    """
+
+    return i * (2 * n - i - 1) // 2
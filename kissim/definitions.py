@@ -83,3 +83,13 @@ MOMENT_CUTOFFS = {  # 99% percentile of all moments
     2: (3.29, 5.29),
     3: (-1.47, 4.66),
 }
+
+FEATURE_WEIGHTING_SCHEMES = {  # Weights per feature type: physicochemical, distances, moments
+    "100": [1.0, 0.0, 0.0],
+    "010": [0.0, 1.0, 0.0],
+    "001": [0.0, 0.0, 1.0],
+    "110": [0.5, 0.5, 0.0],
+    "101": [0.5, 0.0, 0.5],
+    "011": [0.0, 0.5, 0.5],
+    "111": [1.0 / 3, 1.0 / 3, 1.0 / 3],
+}
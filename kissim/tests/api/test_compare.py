@@ -2,10 +2,323 @@
 Unit and regression test for the kissim.api.compare module.
 """
 
+import copy
 from pathlib import Path
 
+import numpy as np
+import pandas as pd
 import pytest
 
 from kissim.api import compare
+from kissim.comparison import (
+    CondensedDistances,
+    FingerprintDistanceWriter,
+    KinaseDistanceAccumulator,
+    NearestNeighbors,
+    SparseDistances,
+)
+from kissim.encoding import FingerprintGenerator
+from kissim.utils import enter_temp_directory
+from kissim.tests.comparison.fixures import fingerprint_generator_dummy
 
 PATH_TEST_DATA = Path(__name__).parent / "kissim/tests/data/KLIFS_download"
+
+
+@pytest.mark.parametrize(
+    "distance_measure, feature_weights",
+    [
+        ("scaled_euclidean", "101"),
+        (["scaled_euclidean", "scaled_cityblock"], {"100": "100", "111": [1 / 3, 1 / 3, 1 / 3]}),
+    ],
+)
+def test_compare_kinase_level(fingerprint_generator_dummy, distance_measure, feature_weights):
+    """
+    Test if kinase pair aggregates (streamed tile by tile) match the kinase distance matrix from
+    all structure pairs.
+    """
+
+    results_kinase = compare(
+        fingerprint_generator_dummy,
+        distance_measure=distance_measure,
+        feature_weights=feature_weights,
+        level="kinase",
+    )
+    if isinstance(distance_measure, str):
+        results_kinase = {distance_measure: results_kinase}
+    if not isinstance(feature_weights, dict):
+        results_kinase = {key: {"": value} for key, value in results_kinase.items()}
+        feature_weights = {"": feature_weights}
+
+    for measure, accumulators in results_kinase.items():
+        for name, accumulator in accumulators.items():
+            assert isinstance(accumulator, KinaseDistanceAccumulator)
+            fingerprint_distance_generator = compare(
+                fingerprint_generator_dummy,
+                distance_measure=measure,
+                feature_weights=feature_weights[name],
+            )
+            assert np.allclose(
+                accumulator.get_matrix("mean", fill=True).to_numpy(),
+                fingerprint_distance_generator.get_kinase_distance_matrix(
+                    "mean", fill=True
+                ).to_numpy(),
+                equal_nan=True,
+            )
+
+
+def test_compare_valueerror(fingerprint_generator_dummy):
+    """
+    Test if unknown comparison level raises ValueError.
+    """
+
+    with pytest.raises(ValueError):
+        compare(fingerprint_generator_dummy, level="xxx")
+
+
+def test_compare_cross(fingerprint_generator_dummy):
+    """
+    Test if cross-comparison only compares fingerprint pairs between both sets.
+    """
+
+    fingerprint = copy.deepcopy(fingerprint_generator_dummy.data[1])
+    fingerprint.structure_klifs_id = 8
+    fingerprint_generator2 = FingerprintGenerator()
+    fingerprint_generator2.structure_klifs_ids = [8]
+    fingerprint_generator2.data = {8: fingerprint}
+
+    fingerprint_distance_generator = compare(
+        fingerprint_generator_dummy, fingerprint_generator2=fingerprint_generator2
+    )
+
+    assert fingerprint_distance_generator.data.shape[0] == 7
+    assert fingerprint_distance_generator.data.molecule_code_2.to_list() == [8] * 7
+    assert fingerprint_distance_generator.data.distance.iloc[0] == 0.0
+
+    accumulator = compare(
+        fingerprint_generator_dummy, fingerprint_generator2=fingerprint_generator2, level="kinase"
+    )
+    assert accumulator.size.sum() == 7
+
+
+@pytest.mark.parametrize(
+    "pairs, pairs_compared",
+    [
+        ([[1, 2], [7, 3], [2, 1], [3, 3]], [(1, 2), (3, 7)]),
+        ("1 2\n# comment\n7,3\n", [(1, 2), (3, 7)]),
+    ],
+)
+def test_compare_pairs(fingerprint_generator_dummy, pairs, pairs_compared):
+    """
+    Test if only given structure pairs are compared (pairs given as array or file), each once.
+    """
+
+    with enter_temp_directory():
+        if isinstance(pairs, str):
+            Path("pairs.txt").write_text(pairs)
+            pairs = "pairs.txt"
+        fingerprint_distance_generator = compare(fingerprint_generator_dummy, pairs=pairs)
+
+    data = fingerprint_distance_generator.data
+    assert list(zip(data.molecule_code_1, data.molecule_code_2)) == pairs_compared
+
+    # Duplicates and self pairs are not counted as neighbors or sparse distances
+    nearest_neighbors = compare(
+        fingerprint_generator_dummy,
+        level="neighbors",
+        n_neighbors=3,
+        pairs=[[1, 2], [2, 1], [1, 1]],
+    )
+    assert nearest_neighbors.get_neighbors().neighbor_structure_klifs_id.tolist() == [2, 1]
+    sparse_distances = compare(
+        fingerprint_generator_dummy, level="sparse", max_distance=1.0, pairs=[[1, 2], [2, 1]]
+    )
+    assert sparse_distances.n_pairs == 1
+
+
+@pytest.mark.parametrize("pairs", [[[1, 8]], [[1, 2, 3]]])
+def test_compare_pairs_valueerror(fingerprint_generator_dummy, pairs):
+    """
+    Test if unknown structure KLIFS IDs or wrongly shaped pairs raise ValueError.
+    """
+
+    with pytest.raises(ValueError):
+        compare(fingerprint_generator_dummy, pairs=pairs)
+
+
+def test_compare_neighbors_level(fingerprint_generator_dummy):
+    """
+    Test if nearest neighbors (streamed tile by tile) match the fingerprint distances of all
+    structure pairs.
+    """
+
+    nearest_neighbors = compare(fingerprint_generator_dummy, level="neighbors", n_neighbors=3)
+    assert isinstance(nearest_neighbors, NearestNeighbors)
+    assert nearest_neighbors.neighbor_ixs.shape == (7, 3)
+
+    data = compare(fingerprint_generator_dummy).data
+    for structure_klifs_id, neighbors in nearest_neighbors.get_neighbors().groupby(
+        "structure_klifs_id"
+    ):
+        is_structure = (data.molecule_code_1 == structure_klifs_id) | (
+            data.molecule_code_2 == structure_klifs_id
+        )
+        expected = np.sort(data[is_structure].distance.to_numpy())[:3]
+        assert np.allclose(neighbors.distance.to_numpy(), expected)
+
+
+def test_compare_representatives(fingerprint_generator_dummy):
+    """
+    Test if only representative structures per kinase are compared.
+    """
+
+    results = compare(fingerprint_generator_dummy, n_representatives=1)
+    # 4 kinases with 3, 2, 1, and 1 structures
+    assert len(results.molecule_codes) == 4
+    assert len(results.data) == 6
+
+    with pytest.raises(ValueError):
+        compare(fingerprint_generator_dummy, pairs=[[1, 2]], n_representatives=1)
+
+
+@pytest.mark.parametrize("level", ["structure", "kinase", "neighbors"])
+def test_compare_collapse_duplicates(fingerprint_generator_dummy, level):
+    """
+    Test if collapsing identical fingerprints gives the same results as comparing all
+    fingerprints.
+    """
+
+    fingerprint_generator = FingerprintGenerator()
+    fingerprint_generator.structure_klifs_ids = fingerprint_generator_dummy.structure_klifs_ids + [
+        8,
+        9,
+    ]
+    fingerprint_generator.data = dict(fingerprint_generator_dummy.data)
+    for structure_klifs_id, structure_klifs_id_copy in [(1, 8), (4, 9)]:
+        fingerprint = copy.deepcopy(fingerprint_generator_dummy.data[structure_klifs_id])
+        fingerprint.structure_klifs_id = structure_klifs_id_copy
+        fingerprint_generator.data[structure_klifs_id_copy] = fingerprint
+
+    results = compare(fingerprint_generator, level=level, collapse_duplicates=True)
+    results_full = compare(fingerprint_generator, level=level)
+
+    if level == "structure":
+        assert results.molecule_codes == results_full.molecule_codes
+        assert np.array_equal(
+            results.data[["molecule_code_1", "molecule_code_2"]].to_numpy(),
+            results_full.data[["molecule_code_1", "molecule_code_2"]].to_numpy(),
+        )
+        assert np.allclose(results.data.distance, results_full.data.distance, equal_nan=True)
+        assert np.allclose(results.data.coverage, results_full.data.coverage)
+    elif level == "kinase":
+        assert np.allclose(results.get_matrix(), results_full.get_matrix(), equal_nan=True)
+        assert np.array_equal(results.size, results_full.size)
+    else:
+        assert np.allclose(results.distances, results_full.distances, equal_nan=True)
+
+    with pytest.raises(ValueError):
+        compare(fingerprint_generator, pairs=[[1, 2]], collapse_duplicates=True)
+
+
+@pytest.mark.parametrize(
+    "distance_measure, feature_weights, filenames",
+    [
+        ("scaled_euclidean", "101", ["distances.npy"]),
+        (
+            ["scaled_euclidean", "scaled_cityblock"],
+            {"100": "100", "101": "101"},
+            [
+                "distances.scaled_euclidean.100.npy",
+                "distances.scaled_euclidean.101.npy",
+                "distances.scaled_cityblock.100.npy",
+                "distances.scaled_cityblock.101.npy",
+            ],
+        ),
+    ],
+)
+def test_compare_condensed(
+    fingerprint_generator_dummy, tmp_path, distance_measure, feature_weights, filenames
+):
+    """
+    Test if condensed distances written to file match fingerprint distances for all structure
+    pairs.
+    """
+
+    results = compare(
+        fingerprint_generator_dummy,
+        distance_measure=distance_measure,
+        feature_weights=feature_weights,
+        level="condensed",
+        output_path=tmp_path / "distances.npy",
+    )
+    results_full = compare(
+        fingerprint_generator_dummy,
+        distance_measure=distance_measure,
+        feature_weights=feature_weights,
+    )
+
+    assert sorted(path.name for path in tmp_path.glob("*.npy")) == sorted(filenames)
+    if isinstance(distance_measure, str):
+        results, results_full = {"": {"": results}}, {"": results_full}
+    for measure, condensed_distances_by_name in results.items():
+        for name, condensed_distances in condensed_distances_by_name.items():
+            data = results_full[measure]
+            distance_column = f"distance.{name}" if name else "distance"
+            if not name:
+                data = data.data
+            condensed_distances = CondensedDistances.from_file(condensed_distances.filepath)
+            assert condensed_distances.structure_klifs_ids == [1, 2, 3, 4, 5, 6, 7]
+            assert np.allclose(
+                condensed_distances.distances, data[distance_column], equal_nan=True
+            )
+
+    with pytest.raises(ValueError):
+        compare(fingerprint_generator_dummy, level="condensed")
+
+
+@pytest.mark.parametrize("output_format", ["csv", "columnar"])
+def test_compare_to_file(fingerprint_generator_dummy, tmp_path, output_format):
+    """
+    Test if fingerprint distances written to file match fingerprint distances in memory.
+    """
+
+    filepath = tmp_path / "distances.csv"
+    writer = compare(fingerprint_generator_dummy, filepath, output_format=output_format)
+    data_expected = compare(fingerprint_generator_dummy).data
+
+    if output_format == "csv":
+        data = pd.read_csv(filepath)
+    else:
+        data = FingerprintDistanceWriter.read_columnar(filepath)
+    assert isinstance(writer, FingerprintDistanceWriter)
+    assert data.molecule_code_1.tolist() == data_expected.molecule_code_1.tolist()
+    assert data.molecule_code_2.tolist() == data_expected.molecule_code_2.tolist()
+    assert np.allclose(data.distance, data_expected.distance, atol=1e-6, equal_nan=True)
+
+    writers = compare(
+        fingerprint_generator_dummy,
+        tmp_path / "distances.csv",
+        feature_weights={"100": "100", "101": "101"},
+    )
+    assert sorted(writers.keys()) == ["100", "101"]
+    assert (tmp_path / "distances.100.csv").exists()
+
+
+def test_compare_sparse(fingerprint_generator_dummy, tmp_path):
+    """
+    Test if only structure pairs below or equal to the distance cutoff are kept (and saved).
+    """
+
+    data = compare(fingerprint_generator_dummy).data
+    max_distance = data.distance.median()
+    filepath = tmp_path / "sparse.npz"
+
+    sparse_distances = compare(
+        fingerprint_generator_dummy, filepath, level="sparse", max_distance=max_distance
+    )
+
+    assert isinstance(sparse_distances, SparseDistances)
+    assert sparse_distances.n_pairs == (data.distance <= max_distance).sum()
+    assert SparseDistances.from_npz(filepath).n_pairs == sparse_distances.n_pairs
+
+    with pytest.raises(ValueError):
+        compare(fingerprint_generator_dummy, level="sparse")
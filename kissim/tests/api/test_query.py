@@ -0,0 +1,192 @@
+"""
+Unit and regression test for the kissim.api.query module.
+"""
+
+import copy
+import logging
+
+import numpy as np
+import pytest
+
+from kissim.api import compare, query
+from kissim.api.query import _query_exhaustive
+from kissim.comparison import FingerprintStack
+from kissim.encoding import FingerprintGenerator
+from kissim.utils import enter_temp_directory
+from kissim.tests.comparison.fixures import fingerprint_generator_dummy
+
+
+@pytest.mark.parametrize("queries, n_neighbors", [([2], 3), ([5, 1], 2), ([1, 2, 3], 10)])
+def test_query(fingerprint_generator_dummy, queries, n_neighbors):
+    """
+    Test if most similar database entries per query match all-vs-all fingerprint distances
+    (queries given as structure KLIFS IDs in the database).
+    """
+
+    results = query(queries, fingerprint_generator_dummy, n_neighbors, feature_weights="100")
+    assert results.columns.to_list() == [
+        "query_structure_klifs_id",
+        "rank",
+        "structure_klifs_id",
+        "kinase_name",
+        "distance",
+    ]
+
+    data = compare(fingerprint_generator_dummy, feature_weights="100").data
+    for structure_klifs_id in queries:
+        results_query = results[results.query_structure_klifs_id == structure_klifs_id]
+        is_structure = (data.molecule_code_1 == structure_klifs_id) | (
+            data.molecule_code_2 == structure_klifs_id
+        )
+        expected = data[is_structure].distance.dropna().sort_values().to_numpy()[:n_neighbors]
+        assert results_query["rank"].to_list() == list(range(1, len(expected) + 1))
+        assert np.allclose(results_query.distance.to_numpy(), expected)
+        assert structure_klifs_id not in results_query.structure_klifs_id.to_list()
+
+
+def test_query_fingerprints(fingerprint_generator_dummy):
+    """
+    Test query with fingerprints (not in database) against database saved as npz file.
+    """
+
+    fingerprint = copy.deepcopy(fingerprint_generator_dummy.data[1])
+    fingerprint.structure_klifs_id = 8
+    queries = FingerprintGenerator()
+    queries.data = {8: fingerprint}
+    queries.structure_klifs_ids = [8]
+
+    with enter_temp_directory():
+        FingerprintStack.from_fingerprint_generator(fingerprint_generator_dummy).to_npz("db.npz")
+        results = query(queries, "db.npz", 3)
+
+    assert results.query_structure_klifs_id.to_list() == [8, 8, 8]
+    assert results.structure_klifs_id.iloc[0] == 1
+    assert results.distance.iloc[0] == 0.0
+    assert results.distance.is_monotonic_increasing
+
+
+@pytest.mark.parametrize("feature_weights", ["100", "101", [0.2] * 3 + [0.4 / 12] * 12])
+def test_query_pruned(fingerprint_generator_dummy, feature_weights):
+    """
+    Test if pruned search results match exhaustive search results.
+    """
+
+    results = query([1, 4], fingerprint_generator_dummy, 3, feature_weights=feature_weights)
+    results_pruned = query(
+        [1, 4], fingerprint_generator_dummy, 3, feature_weights=feature_weights, method="pruned"
+    )
+    assert results_pruned.drop(columns="distance").equals(results.drop(columns="distance"))
+    assert np.allclose(results_pruned.distance, results.distance)
+
+
+@pytest.mark.parametrize("block_size, tile_size", [(1, 2000), (3, 2), (10000, 2000)])
+def test_query_exhaustive(fingerprint_generator_dummy, block_size, tile_size):
+    """
+    Test if exhaustive search results do not depend on how the database is split into blocks
+    and tiles (neighbors are collected for the queries only).
+    """
+
+    database_stack = FingerprintStack.from_fingerprint_generator(fingerprint_generator_dummy)
+    query_stack = database_stack.subset([4, 0])
+    neighbor_ixs, distances = _query_exhaustive(query_stack, database_stack, 3)
+    neighbor_ixs_blocks, distances_blocks = _query_exhaustive(
+        query_stack, database_stack, 3, tile_size=tile_size, block_size=block_size
+    )
+
+    assert neighbor_ixs.shape == (2, 3)
+    assert (neighbor_ixs[0] != 4).all() and (neighbor_ixs[1] != 0).all()
+    assert (neighbor_ixs_blocks == neighbor_ixs).all()
+    assert np.allclose(distances_blocks, distances, equal_nan=True)
+
+
+def test_query_valueerror(fingerprint_generator_dummy):
+    """
+    Test if unknown query method raises ValueError.
+    """
+
+    with pytest.raises(ValueError):
+        query([1], fingerprint_generator_dummy, method="xxx")
+
+
+def test_query_tree(fingerprint_generator_dummy):
+    """
+    Test if tree search results match pruned search results (moments-only feature weights;
+    database without fingerprint with NaN physicochemical features).
+    """
+
+    database = FingerprintGenerator()
+    database.data = {
+        key: value for key, value in fingerprint_generator_dummy.data.items() if key != 7
+    }
+    database.structure_klifs_ids = list(database.data.keys())
+
+    results = query([1, 4], database, 3, feature_weights="001", method="tree")
+    results_pruned = query([1, 4], database, 3, feature_weights="001", method="pruned")
+    assert results.drop(columns="distance").equals(results_pruned.drop(columns="distance"))
+    assert np.allclose(results.distance, results_pruned.distance)
+
+
+def test_query_tree_default_weights(fingerprint_generator_dummy):
+    """
+    Test if tree search results match exhaustive search results for default feature weights
+    (None, i.e. all features weighted equally).
+    """
+
+    results = query([1, 4], fingerprint_generator_dummy, 3, feature_weights=None, method="tree")
+    results_exhaustive = query(
+        [1, 4], fingerprint_generator_dummy, 3, feature_weights=None, method="exhaustive"
+    )
+    assert results.drop(columns="distance").equals(results_exhaustive.drop(columns="distance"))
+    assert np.allclose(results.distance, results_exhaustive.distance)
+
+
+@pytest.mark.parametrize("feature_weights", ["101", "111", [0.2] * 3 + [0.4 / 12] * 12])
+def test_query_tree_fallback(fingerprint_generator_dummy, caplog, feature_weights):
+    """
+    Test if tree search falls back to pruned search (with a warning) for feature weights that
+    are not set for moments features only.
+    """
+
+    results = query(
+        [1, 4], fingerprint_generator_dummy, 3, feature_weights=feature_weights, method="tree"
+    )
+    results_pruned = query(
+        [1, 4], fingerprint_generator_dummy, 3, feature_weights=feature_weights, method="pruned"
+    )
+    assert "use pruned search instead of tree search" in caplog.text
+    assert results.drop(columns="distance").equals(results_pruned.drop(columns="distance"))
+    assert np.allclose(results.distance, results_pruned.distance)
+
+
+def test_query_two_stage(fingerprint_generator_dummy):
+    """
+    Test if two-stage search results match exhaustive search results if all candidates are
+    re-ranked.
+    """
+
+    results = query([1, 4], fingerprint_generator_dummy, 3)
+    results_two_stage = query(
+        [1, 4], fingerprint_generator_dummy, 3, method="two_stage", n_candidates=10
+    )
+    assert results_two_stage.drop(columns="distance").equals(results.drop(columns="distance"))
+    assert np.allclose(results_two_stage.distance, results.distance)
+
+
+def test_query_two_stage_recall(fingerprint_generator_dummy, caplog):
+    """
+    Test if recall of the two-stage search is logged on request only.
+    """
+
+    caplog.set_level(logging.INFO)
+    query([1, 4], fingerprint_generator_dummy, 3, method="two_stage", n_candidates=2)
+    assert "recall@3" not in caplog.text
+
+    query(
+        [1, 4],
+        fingerprint_generator_dummy,
+        3,
+        method="two_stage",
+        n_candidates=10,
+        n_recall_samples=5,
+    )
+    assert "Two-stage search recall@3: 1.0" in caplog.text
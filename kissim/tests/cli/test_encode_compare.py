@@ -3,10 +3,15 @@ Unit and regression test for the kissim.cli.encode/compare module.
 """
 
 from argparse import Namespace
+
+import pandas as pd
 import pytest
 
 from kissim.utils import enter_temp_directory
 from kissim.cli import encode_from_cli, compare_from_cli
+from kissim.cli.compare import _parse_weights
+from kissim.definitions import FEATURE_WEIGHTING_SCHEMES
+from kissim.tests.comparison.fixures import fingerprint_generator_dummy
 
 
 @pytest.mark.parametrize(
@@ -16,10 +21,20 @@ from kissim.cli import encode_from_cli, compare_from_cli
             Namespace(input=["12347"], output="fps.json", local=None, ncores=1),
             Namespace(
                 input="fps.json",
+                input2=None,
+                pairs=None,
+                n_neighbors=10,
+                n_representatives=None,
+                collapse_duplicates=False,
+                output_format="csv",
+                max_distance=None,
                 output="matrix.csv",
                 distance="scaled_euclidean",
                 weights="001",
                 ncores=1,
+                kernel="vectorized",
+                min_coverage=None,
+                level="structure",
             ),
         )
     ],
@@ -29,3 +44,90 @@ def ttest_encode_from_cli(encode_args, compare_args):
     with enter_temp_directory():
         encode_from_cli(encode_args)
         compare_from_cli(compare_args)
+
+
+def test_compare_from_cli_kinase_level(fingerprint_generator_dummy, tmp_path):
+    """
+    Test if kinase level results are written to the output file.
+    """
+
+    fingerprint_generator_dummy.to_json(tmp_path / "fps.json")
+    compare_from_cli(
+        Namespace(
+            input=str(tmp_path / "fps.json"),
+            input2=None,
+            pairs=None,
+            n_neighbors=10,
+            n_representatives=None,
+            collapse_duplicates=False,
+            output_format="csv",
+            max_distance=None,
+            output=str(tmp_path / "kinases.csv"),
+            distance="scaled_euclidean",
+            weights="101",
+            ncores=1,
+            kernel="vectorized",
+            min_coverage=None,
+            level="kinase",
+        )
+    )
+
+    structure_pairs = pd.read_csv(tmp_path / "kinases.csv")
+    assert sorted(structure_pairs.by.unique()) == ["maximum", "minimum"]
+    assert structure_pairs.molecule_code_1.isin(range(1, 8)).all()
+    for by in ["minimum", "maximum", "mean"]:
+        matrix = pd.read_csv(tmp_path / f"kinases.{by}.csv", index_col=0)
+        assert matrix.shape == (4, 4)
+
+
+def test_compare_from_cli_neighbors_level(fingerprint_generator_dummy, tmp_path):
+    """
+    Test if neighbors level results are written to the output file.
+    """
+
+    fingerprint_generator_dummy.to_json(tmp_path / "fps.json")
+    compare_from_cli(
+        Namespace(
+            input=str(tmp_path / "fps.json"),
+            input2=None,
+            pairs=None,
+            n_neighbors=2,
+            n_representatives=None,
+            collapse_duplicates=False,
+            output_format="csv",
+            max_distance=None,
+            output=str(tmp_path / "neighbors.csv"),
+            distance="scaled_euclidean",
+            weights="101",
+            ncores=1,
+            kernel="vectorized",
+            min_coverage=None,
+            level="neighbors",
+        )
+    )
+
+    neighbors = pd.read_csv(tmp_path / "neighbors.csv")
+    assert neighbors.structure_klifs_id.isin(range(1, 8)).all()
+    assert neighbors["rank"].isin([1, 2]).all()
+    assert neighbors.columns.tolist() == [
+        "structure_klifs_id",
+        "rank",
+        "neighbor_structure_klifs_id",
+        "distance",
+    ]
+    assert (neighbors.structure_klifs_id != neighbors.neighbor_structure_klifs_id).all()
+
+
+@pytest.mark.parametrize(
+    "args_weights, weights",
+    [
+        ("001", [0.0, 0.0, 1.0]),
+        (["001"], [0.0, 0.0, 1.0]),
+        (["0.5,0.5,0.0"], [0.5, 0.5, 0.0]),
+        (["001", "0.5,0.5,0.0"], {"001": [0.0, 0.0, 1.0], "0.5,0.5,0.0": [0.5, 0.5, 0.0]}),
+        (["all"], FEATURE_WEIGHTING_SCHEMES),
+    ],
+)
+def test_parse_weights(args_weights, weights):
+
+    assert _parse_weights(args_weights) == weights
@@ -22,4 +22,9 @@ kissim encode -i 109 110 -o "kissim/tests/data/fingerprints.json" -l "kissim/tes
 # COMPARE
 kissim compare
 kissim compare -i "kissim/tests/data/fingerprints.json" -o "kissim/tests/data/distances.csv" 
+
+# QUERY
+kissim query
+kissim query -i 12347 -db "kissim/tests/data/fingerprints.json" -o "kissim/tests/data/neighbors.csv"
+kissim query -i 12347 109 -db "kissim/tests/data/fingerprints.json" -o "kissim/tests/data/neighbors.csv" -n 5 -w 100
 """
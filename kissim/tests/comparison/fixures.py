@@ -9,12 +9,15 @@ import pandas as pd
 import pytest
 
 from kissim.api import encode
+from kissim.encoding import Fingerprint, FingerprintGenerator
 from kissim.comparison import (
     FeatureDistances,
     FingerprintDistance,
     FeatureDistancesGenerator,
     FingerprintDistanceGenerator,
+    FingerprintStack,
 )
+from kissim.comparison.kernels import pack_bit_masks
 
 PATH_TEST_DATA = Path(__name__).parent / "kissim" / "tests" / "data"
 
@@ -41,6 +44,102 @@ def fingerprint_generator():
     return fingerprint_generator
 
 
+@pytest.fixture(scope="package")
+def fingerprint_generator_dummy():
+    """
+    Get FingerprintGenerator instance with dummy data, i.e. multiple fingerprints with random
+    feature values (including NaN values).
+
+    Returns
+    -------
+    kissim.encoding.FingerprintGenerator
+        Fingerprints.
+    """
+
+    rng = np.random.default_rng(42)
+
+    def random_values(n_bits):
+        values = rng.random(n_bits)
+        values[rng.random(n_bits) < 0.1] = np.nan
+        return values.tolist()
+
+    kinase_names = "kinase1 kinase1 kinase1 kinase2 kinase2 kinase3 kinase4".split()
+    data = {}
+    for structure_klifs_id, kinase_name in enumerate(kinase_names, 1):
+        fingerprint = Fingerprint()
+        fingerprint.structure_klifs_id = structure_klifs_id
+        fingerprint.kinase_name = kinase_name
+        fingerprint.residue_ids = list(range(1, 86))
+        fingerprint.residue_ixs = list(range(1, 86))
+        fingerprint.values_dict = {
+            "physicochemical": {
+                name: random_values(85)
+                for name in "size hbd hba charge aromatic aliphatic sco exposure".split()
+            },
+            "spatial": {
+                "distances": {
+                    name: random_values(85)
+                    for name in "hinge_region dfg_region front_pocket center".split()
+                },
+                "moments": {
+                    name: random_values(3)
+                    for name in "hinge_region dfg_region front_pocket center".split()
+                },
+            },
+        }
+        data[structure_klifs_id] = fingerprint
+
+    # Fingerprint with all physicochemical bits missing
+    for values in data[7].values_dict["physicochemical"].values():
+        values[:] = [np.nan] * 85
+
+    fingerprint_generator = FingerprintGenerator()
+    fingerprint_generator.data = data
+    fingerprint_generator.structure_klifs_ids = list(data.keys())
+
+    return fingerprint_generator
+
+
+@pytest.fixture(scope="package")
+def fingerprint_stack_dummy():
+    """
+    Get FingerprintStack instance with dummy data, i.e. 60 stacked fingerprints for 6 kinases
+    with random feature values scattered around one center per kinase (few NaN values).
+
+    Returns
+    -------
+    kissim.comparison.FingerprintStack
+        Stacked fingerprints.
+    """
+
+    rng = np.random.default_rng(7)
+    n_kinases, n_structures_per_kinase = 6, 10
+    kinase_codes = np.repeat(np.arange(n_kinases), n_structures_per_kinase)
+
+    def random_features(n_features, n_bits):
+        centers = rng.random((n_kinases, n_features, n_bits))
+        return centers[kinase_codes] + 0.1 * rng.standard_normal(
+            (len(kinase_codes), n_features, n_bits)
+        )
+
+    fingerprint_stack = FingerprintStack()
+    fingerprint_stack.structure_klifs_ids = list(range(1001, 1001 + len(kinase_codes)))
+    fingerprint_stack.kinase_names = [f"kinase{i}" for i in kinase_codes]
+    fingerprint_stack.kinase_codes = kinase_codes.astype(np.int32)
+    fingerprint_stack.kinase_categories = [f"kinase{i}" for i in range(n_kinases)]
+    fingerprint_stack.physicochemical = random_features(8, 85)
+    fingerprint_stack.distances = random_features(4, 85)
+    fingerprint_stack.moments = random_features(3, 4)
+
+    # Missing residues (physicochemical and distances features) and moments in some structures
+    fingerprint_stack.physicochemical[::7, :, 10:13] = np.nan
+    fingerprint_stack.distances[::7, :, 10:13] = np.nan
+    fingerprint_stack.moments[::11, 1, 2] = np.nan
+    fingerprint_stack.bit_masks = [pack_bit_masks(i) for i in fingerprint_stack.features]
+
+    return fingerprint_stack
+
+
 @pytest.fixture(scope="module")
 def feature_distances():
     """
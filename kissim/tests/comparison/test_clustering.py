@@ -0,0 +1,151 @@
+"""
+Unit and regression test for the kissim.comparison.HierarchicalClustering class.
+"""
+
+import numpy as np
+import pytest
+from scipy.cluster.hierarchy import linkage
+from scipy.spatial.distance import pdist
+
+from kissim.comparison import HierarchicalClustering
+from kissim.tests.comparison.fixures import fingerprint_distance_generator
+
+
+def _get_condensed(n_leaves, seed=0):
+    """
+    Get condensed Euclidean distances of random points.
+    """
+
+    rng = np.random.default_rng(seed)
+    return pdist(rng.random((n_leaves, 3)))
+
+
+class TestsHierarchicalClustering:
+    """
+    Test HierarchicalClustering class methods.
+    """
+
+    @pytest.mark.parametrize("method", ["single", "complete", "average", "weighted"])
+    def test_from_condensed(self, method):
+        """
+        Test if linkage matrix matches scipy's linkage (float32 input is accepted).
+
+        Parameters
+        ----------
+        method : str
+            Linkage method.
+        """
+
+        condensed = _get_condensed(20)
+        clustering = HierarchicalClustering.from_condensed(
+            condensed.astype(np.float32), list(range(20)), method
+        )
+
+        assert clustering.n_leaves == 20
+        assert clustering.linkage_matrix.shape == (19, 4)
+        assert np.allclose(
+            clustering.linkage_matrix,
+            linkage(condensed.astype(np.float32).astype(np.float64), method),
+        )
+
+    def test_from_condensed_nan(self):
+        """
+        Test if NaN distances are set to the maximum distance (or the given distance) without
+        modifying the input.
+        """
+
+        condensed = _get_condensed(5)
+        condensed[[1, 4]] = np.nan
+        condensed_filled = np.where(np.isnan(condensed), np.nanmax(condensed), condensed)
+
+        clustering = HierarchicalClustering.from_condensed(condensed, list("abcde"))
+        assert np.allclose(clustering.linkage_matrix, linkage(condensed_filled, "average"))
+        assert np.isnan(condensed[[1, 4]]).all()
+
+        clustering = HierarchicalClustering.from_condensed(condensed, list("abcde"), "single", 0)
+        assert clustering.linkage_matrix[0, 2] == 0
+
+    @pytest.mark.parametrize(
+        "n_condensed, labels, method",
+        [(10, list("abcde"), "ward"), (9, list("abcde"), "average"), (0, ["a"], "average")],
+    )
+    def test_from_condensed_valueerror(self, n_condensed, labels, method):
+        """
+        Test if unknown methods and condensed distances not matching labels raise ValueError.
+        """
+
+        with pytest.raises(ValueError):
+            HierarchicalClustering.from_condensed(np.ones(n_condensed), labels, method)
+
+    def test_from_fingerprint_distance_generator(self, fingerprint_distance_generator):
+        """
+        Test clustering of structures (molecule codes).
+        """
+
+        clustering = HierarchicalClustering.from_fingerprint_distance_generator(
+            fingerprint_distance_generator
+        )
+
+        assert clustering.labels == fingerprint_distance_generator.molecule_codes
+        # Structures of kinase1 are merged first
+        assert clustering.linkage_matrix[0, :3].tolist() == [0, 1, 0.5]
+        assert clustering.get_flat_clusters(n_clusters=2).tolist() == [1, 1, 2]
+
+    def test_from_kinase_distance_accumulator(self, fingerprint_distance_generator):
+        """
+        Test clustering of kinases (kinase names).
+        """
+
+        clustering = HierarchicalClustering.from_kinase_distance_accumulator(
+            fingerprint_distance_generator.get_kinase_distance_accumulator()
+        )
+
+        assert clustering.labels == ["kinase1", "kinase2"]
+        assert clustering.linkage_matrix[0, 2] == 0.75
+
+    @pytest.mark.parametrize(
+        "n_clusters, distance_threshold, cluster_ids",
+        [(2, None, [1, 1, 2, 2]), (None, 0.5, [1, 1, 2, 2]), (None, 20, [1, 1, 1, 1])],
+    )
+    def test_get_flat_clusters(self, n_clusters, distance_threshold, cluster_ids):
+        """
+        Test flat clusters by number of clusters or distance threshold.
+        """
+
+        # Points on a line at 0, 0.1, 10, and 10.2
+        condensed = pdist(np.array([[0.0], [0.1], [10.0], [10.2]]))
+        clustering = HierarchicalClustering.from_condensed(condensed, [1, 2, 3, 4], "single")
+        clusters = clustering.get_flat_clusters(n_clusters, distance_threshold)
+
+        assert clusters.index.tolist() == [1, 2, 3, 4]
+        assert clusters.tolist() == cluster_ids
+
+        with pytest.raises(ValueError):
+            clustering.get_flat_clusters()
+
+    def test_to_newick(self, tmp_path):
+        """
+        Test Newick tree (branch lengths, quoted labels, and file output).
+        """
+
+        condensed = pdist(np.array([[0.0], [0.1], [10.0]]))
+        clustering = HierarchicalClustering.from_condensed(condensed, ["a", "b c", 3], "single")
+        filepath = tmp_path / "tree.nwk"
+        newick = clustering.to_newick(filepath)
+
+        assert newick == "(3:9.9,(a:0.1,'b c':0.1):9.8);"
+        assert filepath.read_text() == newick + "\n"
+
+    def test_to_newick_deep(self):
+        """
+        Test Newick tree for a deep tree (chain of 3000 leaves).
+        """
+
+        n_leaves = 3000
+        condensed = pdist(np.exp(np.arange(n_leaves) / 1000)[:, None])
+        clustering = HierarchicalClustering.from_condensed(condensed, range(n_leaves), "single")
+        newick = clustering.to_newick()
+
+        assert newick.count("(") == newick.count(")") == n_leaves - 1
+        assert newick.count(",") == n_leaves - 1
+        assert newick.endswith(";")
@@ -0,0 +1,142 @@
+"""
+Unit and regression test for the kissim.comparison.CondensedDistances class.
+"""
+
+import numpy as np
+import pytest
+
+from kissim.comparison import (
+    CondensedDistances,
+    FeatureDistancesArray,
+    FingerprintDistanceGenerator,
+)
+from kissim.tests.comparison.fixures import fingerprint_stack_dummy
+
+
+class TestsCondensedDistances:
+    """
+    Test CondensedDistances class methods.
+    """
+
+    @pytest.mark.parametrize("feature_weights", [None, [0.5, 0.5, 0.0]])
+    def test_update_from_feature_distances_array(
+        self, fingerprint_stack_dummy, tmp_path, feature_weights
+    ):
+        """
+        Test if condensed distances written tile by tile match the fingerprint distances for all
+        structure pairs (also after reopening the files).
+
+        Parameters
+        ----------
+        feature_weights : None or list of float
+            Feature weights.
+        """
+
+        filepath = tmp_path / "distances.npy"
+        condensed_distances = CondensedDistances.from_structure_klifs_ids(
+            filepath,
+            fingerprint_stack_dummy.structure_klifs_ids,
+            fingerprint_stack_dummy.kinase_names,
+            "scaled_euclidean",
+            feature_weights,
+        )
+        for tile in FeatureDistancesArray.iter_from_fingerprint_stack(
+            fingerprint_stack_dummy, "scaled_euclidean", tile_size=100
+        ):
+            condensed_distances.update_from_feature_distances_array(tile, feature_weights)
+        condensed_distances.flush()
+
+        fingerprint_distance_generator = FingerprintDistanceGenerator()
+        fingerprint_distance_generator.from_feature_distances_array(
+            FeatureDistancesArray.from_fingerprint_stack(fingerprint_stack_dummy), feature_weights
+        )
+
+        condensed_distances = CondensedDistances.from_file(filepath)
+        assert (tmp_path / "distances.json").exists()
+        assert condensed_distances.values.dtype == np.float32
+        assert isinstance(condensed_distances.values, np.memmap)
+        assert condensed_distances.structure_klifs_ids == (
+            fingerprint_stack_dummy.structure_klifs_ids
+        )
+        assert condensed_distances.kinase_names == fingerprint_stack_dummy.kinase_names
+        assert condensed_distances.distance_measure == "scaled_euclidean"
+        assert len(condensed_distances.feature_weights) == 15
+        assert np.allclose(
+            condensed_distances.distances,
+            fingerprint_distance_generator.get_structure_distance_condensed(),
+            atol=1e-6,
+        )
+        assert np.allclose(
+            condensed_distances.coverages,
+            fingerprint_distance_generator.data.coverage,
+            atol=1e-6,
+        )
+
+    def test_update(self, tmp_path):
+        """
+        Test if structure pairs are written in any order, self pairs are skipped, and missing
+        structure pairs are NaN.
+        """
+
+        condensed_distances = CondensedDistances.from_structure_klifs_ids(
+            tmp_path / "distances.npy", [11, 12, 13, 14], ["a", "a", "b", "c"]
+        )
+        condensed_distances.update([2, 0, 1], [0, 3, 1], [0.5, 0.25, 0.0], [1.0, 0.75, 1.0])
+
+        assert np.allclose(
+            condensed_distances.distances,
+            [np.nan, 0.5, 0.25, np.nan, np.nan, np.nan],
+            equal_nan=True,
+        )
+        assert np.allclose(
+            condensed_distances.coverages,
+            [np.nan, 1.0, 0.75, np.nan, np.nan, np.nan],
+            equal_nan=True,
+        )
+
+    def test_indices(self, tmp_path):
+        """
+        Test conversions between structure pairs, condensed indices, and structure KLIFS IDs.
+        """
+
+        condensed_distances = CondensedDistances.from_structure_klifs_ids(
+            tmp_path / "distances.npy", [11, 12, 13, 14], ["a", "a", "b", "c"]
+        )
+
+        assert condensed_distances.get_condensed_index(3, 1) == 4
+        assert condensed_distances.get_square_indices(4) == (1, 3)
+        assert condensed_distances.get_structure_ixs(13) == 2
+        assert condensed_distances.get_structure_ixs([14, 11]).tolist() == [3, 0]
+        with pytest.raises(ValueError):
+            condensed_distances.get_structure_ixs(15)
+
+    def test_get_row(self, tmp_path):
+        """
+        Test if row of square matrix is extracted from condensed distances.
+        """
+
+        condensed_distances = CondensedDistances.from_structure_klifs_ids(
+            tmp_path / "distances.npy", [11, 12, 13, 14], ["a", "a", "b", "c"]
+        )
+        condensed_distances.values[0] = np.arange(6)
+        condensed_distances.values[1] = 1.0
+
+        row = condensed_distances.get_row(13)
+        assert row.index.tolist() == [11, 12, 13, 14]
+        assert row.kinase_name.tolist() == ["a", "a", "b", "c"]
+        assert np.allclose(row.distance, [1, 3, np.nan, 5], equal_nan=True)
+        assert np.allclose(row.coverage, [1, 1, np.nan, 1], equal_nan=True)
+
+    def test_from_file_valueerror(self, tmp_path):
+        """
+        Test if sidecar file not matching the condensed distances raises ValueError.
+        """
+
+        condensed_distances = CondensedDistances.from_structure_klifs_ids(
+            tmp_path / "distances.npy", [11, 12, 13], ["a", "a", "b"]
+        )
+        condensed_distances.structure_klifs_ids = [11, 12]
+        condensed_distances._to_sidecar()
+
+        with pytest.raises(ValueError):
+            CondensedDistances.from_file(tmp_path / "distances.npy")
@@ -0,0 +1,317 @@
+"""
+Unit and regression test for the kissim.comparison.FeatureDistancesArray class.
+"""
+
+from itertools import combinations, product
+
+import numpy as np
+import pytest
+
+from kissim.comparison import (
+    FeatureDistances,
+    FeatureDistancesArray,
+    FingerprintDistance,
+    FingerprintStack,
+)
+from kissim.encoding import FingerprintGenerator
+from kissim.tests.comparison.fixures import fingerprint_generator_dummy
+
+
+class TestsFeatureDistancesArray:
+    """
+    Test FeatureDistancesArray class methods.
+    """
+
+    @pytest.mark.parametrize(
+        "distance_measures, n_cores, tile_size, kernel",
+        [
+            ("scaled_euclidean", 1, 2000, "vectorized"),
+            (["scaled_euclidean", "scaled_cityblock"], 1, 4, "vectorized"),
+            (["scaled_cityblock", "scaled_euclidean"], 2, 5, "vectorized"),
+            ("scaled_euclidean", 1, 2000, "blas"),
+            (["scaled_cityblock", "scaled_euclidean"], 2, 5, "blas"),
+        ],
+    )
+    def test_from_fingerprint_generator(
+        self, fingerprint_generator_dummy, distance_measures, n_cores, tile_size, kernel
+    ):
+        """
+        Test if feature distances (calculated in tiles) are the same as feature distances
+        calculated per fingerprint pair.
+
+        Parameters
+        ----------
+        fingerprint_generator_dummy : kissim.encoding.FingerprintGenerator
+            Fingerprints.
+        distance_measures : str or list of str
+            Distance measures.
+        n_cores : int
+            Number of cores.
+        tile_size : int
+            Maximum number of fingerprint pairs per tile.
+        kernel : str
+            Kernel name.
+        """
+
+        feature_distances_array = FeatureDistancesArray.from_fingerprint_generator(
+            fingerprint_generator_dummy, distance_measures, n_cores, tile_size, kernel
+        )
+        if isinstance(distance_measures, str):
+            distance_measures = [distance_measures]
+
+        fingerprints = fingerprint_generator_dummy.data
+        pairs = list(combinations(fingerprints.keys(), 2))
+        n_pairs = len(pairs)
+
+        assert feature_distances_array.distance_measures == distance_measures
+        assert feature_distances_array.n_pairs == n_pairs
+        assert feature_distances_array.bit_coverages.shape == (n_pairs, 15)
+        assert feature_distances_array.bit_numbers.dtype == np.int16
+        assert feature_distances_array.molecule_codes == sorted(fingerprints.keys())
+        assert feature_distances_array.kinase_names == "kinase1 kinase2 kinase3 kinase4".split()
+
+        molecule_codes_1, molecule_codes_2 = feature_distances_array.molecule_pair_codes
+        assert list(zip(molecule_codes_1, molecule_codes_2)) == pairs
+
+        for distance_measure in distance_measures:
+            for i, (code1, code2) in enumerate(pairs):
+                feature_distances = FeatureDistances()
+                feature_distances.from_fingerprints(
+                    fingerprints[code1], fingerprints[code2], distance_measure
+                )
+                assert np.allclose(
+                    feature_distances_array.distances[distance_measure][i],
+                    feature_distances.distances,
+                    atol=1e-7,
+                    equal_nan=True,
+                )
+                assert np.allclose(
+                    feature_distances_array.bit_coverages[i], feature_distances.bit_coverages
+                )
+
+    def test_from_fingerprint_generator_valueerror(self, fingerprint_generator_dummy):
+        """
+        Test if unknown distance measure raises ValueError.
+        """
+
+        with pytest.raises(ValueError):
+            FeatureDistancesArray.from_fingerprint_generator(fingerprint_generator_dummy, "xxx")
+
+    @pytest.mark.parametrize(
+        "min_coverage, feature_weights, tile_size",
+        [
+            (0.0, None, 2000),
+            (0.9, None, 2000),
+            (0.9, [1.0, 0.0, 0.0], 3),
+            (0.9, {"100": [1.0, 0.0, 0.0], "010": [0.0, 1.0, 0.0]}, 2000),
+            (1.1, None, 2000),
+        ],
+    )
+    def test_from_fingerprint_generator_min_coverage(
+        self, fingerprint_generator_dummy, min_coverage, feature_weights, tile_size
+    ):
+        """
+        Test if pruning by minimum coverage keeps exactly the fingerprint pairs reaching the
+        minimum coverage.
+
+        Parameters
+        ----------
+        min_coverage : float
+            Minimum fingerprint bit coverage.
+        feature_weights : None, list of float, or dict of str: list of float
+            Feature weights.
+        tile_size : int
+            Maximum number of fingerprint pairs per tile.
+        """
+
+        feature_distances_array = FeatureDistancesArray.from_fingerprint_generator(
+            fingerprint_generator_dummy, tile_size=tile_size
+        )
+        feature_distances_array_pruned = FeatureDistancesArray.from_fingerprint_generator(
+            fingerprint_generator_dummy,
+            tile_size=tile_size,
+            min_coverage=min_coverage,
+            feature_weights=feature_weights,
+        )
+
+        if not isinstance(feature_weights, dict):
+            feature_weights = {"": feature_weights}
+        coverages = np.array(
+            [
+                [
+                    FingerprintDistance()._format_weights(weights) @ bit_coverages
+                    for weights in feature_weights.values()
+                ]
+                for bit_coverages in feature_distances_array.bit_coverages
+            ]
+        )
+        keep = (coverages >= min_coverage).any(axis=1)
+
+        assert np.array_equal(
+            feature_distances_array_pruned.pairs, feature_distances_array.pairs[keep]
+        )
+        assert np.array_equal(
+            feature_distances_array_pruned.distances["scaled_euclidean"],
+            feature_distances_array.distances["scaled_euclidean"][keep],
+            equal_nan=True,
+        )
+        assert np.array_equal(
+            feature_distances_array_pruned.bit_numbers, feature_distances_array.bit_numbers[keep]
+        )
+
+    @pytest.mark.parametrize(
+        "old_ixs, new_ixs, removed_structure_klifs_ids, structure_klifs_ids",
+        [
+            ([0, 1, 2, 3, 4], [5, 6], None, [1, 2, 3, 4, 5, 6, 7]),
+            ([0, 1, 2, 3, 4], [1, 5, 6], [3], [1, 4, 5, 2, 6, 7]),
+            ([0, 1, 2], [], [1], [2, 3]),
+            ([], [0, 1, 2], None, [1, 2, 3]),
+        ],
+    )
+    def test_add_fingerprints(
+        self,
+        fingerprint_generator_dummy,
+        old_ixs,
+        new_ixs,
+        removed_structure_klifs_ids,
+        structure_klifs_ids,
+    ):
+        """
+        Test if incrementally updated feature distances are the same as feature distances
+        calculated from scratch (incl. removed and stale structures).
+
+        Parameters
+        ----------
+        old_ixs : list of int
+            Fingerprint indices of old fingerprints.
+        new_ixs : list of int
+            Fingerprint indices of new fingerprints.
+        removed_structure_klifs_ids : None or list of int
+            Structure KLIFS IDs of structures to be removed.
+        structure_klifs_ids : list of int
+            Updated structure KLIFS IDs.
+        """
+
+        fingerprint_stack = FingerprintStack.from_fingerprint_generator(
+            fingerprint_generator_dummy
+        )
+        fingerprint_stack_old = fingerprint_stack.subset(old_ixs)
+        feature_distances_array_old = FeatureDistancesArray.from_fingerprint_stack(
+            fingerprint_stack_old, ["scaled_euclidean", "scaled_cityblock"]
+        )
+
+        (
+            feature_distances_array,
+            fingerprint_stack_updated,
+        ) = feature_distances_array_old.add_fingerprints(
+            fingerprint_stack_old,
+            fingerprint_stack.subset(new_ixs),
+            removed_structure_klifs_ids,
+            tile_size=2,
+        )
+        feature_distances_array_expected = FeatureDistancesArray.from_fingerprint_stack(
+            fingerprint_stack_updated, ["scaled_euclidean", "scaled_cityblock"]
+        )
+
+        assert fingerprint_stack_updated.structure_klifs_ids == structure_klifs_ids
+        assert feature_distances_array.structure_klifs_ids == structure_klifs_ids
+        assert np.array_equal(
+            feature_distances_array.pairs, feature_distances_array_expected.pairs
+        )
+        for distance_measure in ["scaled_euclidean", "scaled_cityblock"]:
+            assert np.allclose(
+                feature_distances_array.distances[distance_measure],
+                feature_distances_array_expected.distances[distance_measure],
+                equal_nan=True,
+            )
+        assert np.array_equal(
+            feature_distances_array.bit_numbers, feature_distances_array_expected.bit_numbers
+        )
+
+    def test_add_fingerprints_valueerror(self, fingerprint_generator_dummy):
+        """
+        Test if fingerprint stack not matching the feature distances raises ValueError.
+        """
+
+        fingerprint_stack = FingerprintStack.from_fingerprint_generator(
+            fingerprint_generator_dummy
+        )
+        feature_distances_array = FeatureDistancesArray.from_fingerprint_stack(fingerprint_stack)
+
+        with pytest.raises(ValueError):
+            feature_distances_array.add_fingerprints(
+                fingerprint_stack.subset([0, 1]), fingerprint_stack.subset([2])
+            )
+
+    @pytest.mark.parametrize(
+        "structure_klifs_ids1, structure_klifs_ids2, min_coverage, n_cores",
+        [
+            ([1, 2], [3, 4, 5, 6, 7], None, 1),
+            ([1, 2], [3, 4, 5, 6, 7], None, 2),
+            ([7, 1], [2, 3, 4, 5], 0.78, 1),
+            ([1], [], None, 1),
+        ],
+    )
+    def test_from_fingerprint_generators(
+        self,
+        fingerprint_generator_dummy,
+        structure_klifs_ids1,
+        structure_klifs_ids2,
+        min_coverage,
+        n_cores,
+    ):
+        """
+        Test cross-comparison of two sets of fingerprints against feature distances calculated
+        per fingerprint pair.
+
+        Parameters
+        ----------
+        structure_klifs_ids1 : list of int
+            Structure KLIFS IDs for first set.
+        structure_klifs_ids2 : list of int
+            Structure KLIFS IDs for second set.
+        min_coverage : None or float
+            Minimum fingerprint bit coverage.
+        n_cores : int
+            Number of cores.
+        """
+
+        fingerprint_generators = []
+        for structure_klifs_ids in [structure_klifs_ids1, structure_klifs_ids2]:
+            fingerprint_generator = FingerprintGenerator()
+            fingerprint_generator.structure_klifs_ids = structure_klifs_ids
+            fingerprint_generator.data = {
+                i: fingerprint_generator_dummy.data[i] for i in structure_klifs_ids
+            }
+            fingerprint_generators.append(fingerprint_generator)
+
+        feature_distances_array = FeatureDistancesArray.from_fingerprint_generators(
+            *fingerprint_generators, n_cores=n_cores, tile_size=3, min_coverage=min_coverage
+        )
+
+        assert feature_distances_array.structure_klifs_ids == (
+            structure_klifs_ids1 + structure_klifs_ids2
+        )
+        pairs = list(zip(*feature_distances_array.molecule_pair_codes))
+        pairs_expected = []
+        for code1, code2 in product(structure_klifs_ids1, structure_klifs_ids2):
+            feature_distances = FeatureDistances()
+            feature_distances.from_fingerprints(
+                fingerprint_generator_dummy.data[code1], fingerprint_generator_dummy.data[code2]
+            )
+            fingerprint_distance = FingerprintDistance()
+            fingerprint_distance.from_feature_distances(feature_distances)
+            if min_coverage is None or fingerprint_distance.bit_coverage >= min_coverage:
+                pairs_expected.append((code1, code2))
+        assert pairs == pairs_expected
+
+        for i, (code1, code2) in enumerate(pairs):
+            feature_distances = FeatureDistances()
+            feature_distances.from_fingerprints(
+                fingerprint_generator_dummy.data[code1], fingerprint_generator_dummy.data[code2]
+            )
+            assert np.allclose(
+                feature_distances_array.distances["scaled_euclidean"][i],
+                feature_distances.distances,
+                equal_nan=True,
+            )
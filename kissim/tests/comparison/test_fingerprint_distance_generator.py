@@ -8,11 +8,17 @@ import numpy as np
 import pandas as pd
 import pytest
 
-from kissim.comparison import FingerprintDistance, FingerprintDistanceGenerator
+from kissim.comparison import (
+    FeatureDistances,
+    FeatureDistancesArray,
+    FingerprintDistance,
+    FingerprintDistanceGenerator,
+)
 from kissim.tests.comparison.fixures import (
     feature_distances,
     feature_distances_generator,
     fingerprint_distance_generator,
+    fingerprint_generator_dummy,
 )
 
 PATH_TEST_DATA = Path(__name__).parent / "kissim" / "tests" / "data"
@@ -126,6 +132,94 @@ class TestsFingerprintDistanceGenerator:
         data_columns = "molecule_code_1 molecule_code_2 distance coverage".split()
         assert list(fingerprint_distance_generator.data.columns) == data_columns
 
+    @pytest.mark.parametrize(
+        "distance_measure, feature_weights",
+        [("scaled_euclidean", None), ("scaled_cityblock", [0.5, 0.0, 0.5])],
+    )
+    def test_from_feature_distances_array(
+        self, fingerprint_generator_dummy, distance_measure, feature_weights
+    ):
+        """
+        Test if fingerprint distances based on feature distance arrays are the same as
+        fingerprint distances calculated per fingerprint pair.
+
+        Parameters
+        ----------
+        fingerprint_generator_dummy : kissim.encoding.FingerprintGenerator
+            Fingerprints.
+        distance_measure : str
+            Distance measure.
+        feature_weights : None or list of float
+            Feature weights.
+        """
+
+        feature_distances_array = FeatureDistancesArray.from_fingerprint_generator(
+            fingerprint_generator_dummy, ["scaled_euclidean", "scaled_cityblock"]
+        )
+        fingerprint_distance_generator = FingerprintDistanceGenerator()
+        fingerprint_distance_generator.from_feature_distances_array(
+            feature_distances_array, feature_weights, distance_measure
+        )
+
+        assert fingerprint_distance_generator.distance_measure == distance_measure
+        assert fingerprint_distance_generator.molecule_codes == [1, 2, 3, 4, 5, 6, 7]
+        data_columns = "molecule_code_1 molecule_code_2 distance coverage".split()
+        assert list(fingerprint_distance_generator.data.columns) == data_columns
+
+        fingerprints = fingerprint_generator_dummy.data
+        for _, row in fingerprint_distance_generator.data.iterrows():
+            feature_distances = FeatureDistances()
+            feature_distances.from_fingerprints(
+                fingerprints[row.molecule_code_1],
+                fingerprints[row.molecule_code_2],
+                distance_measure,
+            )
+            fingerprint_distance = FingerprintDistance()
+            fingerprint_distance.from_feature_distances(feature_distances, feature_weights)
+            assert np.isclose(row.distance, fingerprint_distance.distance, equal_nan=True)
+            assert np.isclose(row.coverage, fingerprint_distance.bit_coverage)
+
+    @pytest.mark.parametrize(
+        "feature_weights, distances, coverages",
+        [
+            (
+                {"100": [1.0, 0.0, 0.0], "111": None, "custom": [1.0] + [0.0] * 14},
+                [1.0, 0.0, 0.0],
+                [1.0, 1.0, 0.0],
+            )
+        ],
+    )
+    def test_sweep_feature_weights(
+        self, feature_distances_generator, feature_weights, distances, coverages
+    ):
+        """
+        Test fingerprint distances for multiple feature weighting schemes.
+
+        Parameters
+        ----------
+        feature_distances_generator : FeatureDistancesGenerator
+            Feature distances for multiple fingerprints.
+        feature_weights : dict of str: (None or list of float)
+            Feature weights per weighting scheme name.
+        distances : list of float
+            Fingerprint distances per pair (identical for all weighting schemes).
+        coverages : list of float
+            Fingerprint coverages per pair (identical for all weighting schemes).
+        """
+
+        data = FingerprintDistanceGenerator.sweep_feature_weights(
+            feature_distances_generator, feature_weights
+        )
+
+        data_columns = ["molecule_code_1", "molecule_code_2"]
+        data_columns += [f"distance.{name}" for name in feature_weights.keys()]
+        data_columns += [f"coverage.{name}" for name in feature_weights.keys()]
+        assert list(data.columns) == data_columns
+
+        for name in feature_weights.keys():
+            assert np.allclose(data[f"distance.{name}"], distances)
+            assert np.allclose(data[f"coverage.{name}"], coverages)
+
     @pytest.mark.parametrize(
         "fill, structure_distance_matrix",
         [
@@ -168,6 +262,29 @@ class TestsFingerprintDistanceGenerator:
 
         assert structure_distance_matrix_calculated.equals(structure_distance_matrix)
 
+    def test_get_structure_distance_condensed(self, fingerprint_distance_generator):
+        """
+        Test if condensed structure distance matrix matches the (filled) structure distance matrix.
+
+        Parameters
+        ----------
+        fingerprint_distance_generator : FingerprintDistanceGenerator
+            Fingerprint distance for multiple fingerprint pairs.
+        """
+
+        structure_distance_condensed = (
+            fingerprint_distance_generator.get_structure_distance_condensed()
+        )
+        structure_distance_matrix = fingerprint_distance_generator.get_structure_distance_matrix(
+            fill=True
+        )
+
+        assert np.allclose(structure_distance_condensed, [0.5, 0.75, 1.0])
+        assert np.allclose(
+            structure_distance_condensed,
+            structure_distance_matrix.to_numpy()[np.triu_indices(3, k=1)],
+        )
+
     @pytest.mark.parametrize(
         "by, fill, structure_distance_matrix",
         [
@@ -0,0 +1,102 @@
+"""
+Unit and regression test for the kissim.comparison.FingerprintDistanceWriter class.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from kissim.comparison import (
+    FeatureDistancesArray,
+    FingerprintDistanceGenerator,
+    FingerprintDistanceWriter,
+)
+from kissim.tests.comparison.fixures import fingerprint_stack_dummy
+
+
+class TestsFingerprintDistanceWriter:
+    """
+    Test FingerprintDistanceWriter class methods.
+    """
+
+    @pytest.mark.parametrize("output_format", ["csv", "columnar"])
+    def test_update_from_feature_distances_array(
+        self, fingerprint_stack_dummy, tmp_path, output_format
+    ):
+        """
+        Test if fingerprint distances written tile by tile match the fingerprint distances for all
+        structure pairs.
+
+        Parameters
+        ----------
+        output_format : str
+            Output format.
+        """
+
+        filepath = tmp_path / "distances"
+        feature_weights = [0.5, 0.5, 0.0]
+        writer = FingerprintDistanceWriter.from_structure_klifs_ids(
+            filepath,
+            fingerprint_stack_dummy.structure_klifs_ids,
+            fingerprint_stack_dummy.kinase_names,
+            output_format,
+        )
+        for tile in FeatureDistancesArray.iter_from_fingerprint_stack(
+            fingerprint_stack_dummy, "scaled_euclidean", tile_size=100
+        ):
+            writer.update_from_feature_distances_array(tile, feature_weights)
+        writer.close()
+
+        fingerprint_distance_generator = FingerprintDistanceGenerator()
+        fingerprint_distance_generator.from_feature_distances_array(
+            FeatureDistancesArray.from_fingerprint_stack(fingerprint_stack_dummy), feature_weights
+        )
+        data_expected = fingerprint_distance_generator.data
+
+        if output_format == "csv":
+            data = pd.read_csv(filepath)
+        else:
+            data = FingerprintDistanceWriter.read_columnar(filepath)
+            assert data.distance.dtype == np.float32
+        assert writer.n_pairs == len(data_expected) == 1770
+        assert data.columns.tolist() == data_expected.columns.tolist()
+        assert data.molecule_code_1.tolist() == data_expected.molecule_code_1.tolist()
+        assert data.molecule_code_2.tolist() == data_expected.molecule_code_2.tolist()
+        assert np.allclose(data.distance, data_expected.distance, atol=1e-6, equal_nan=True)
+        assert np.allclose(data.coverage, data_expected.coverage, atol=1e-6)
+
+    def test_read_columnar(self, tmp_path):
+        """
+        Test columnar output (structure indices and empty output).
+        """
+
+        filepath = tmp_path / "distances"
+        writer = FingerprintDistanceWriter.from_structure_klifs_ids(
+            filepath, [11, 12, 13], ["a", "a", "b"], "columnar"
+        )
+        writer.close()
+        assert FingerprintDistanceWriter.read_columnar(filepath).shape == (0, 4)
+
+        writer.update([0, 1], [2, 2], [0.5, 0.25], [1.0, 0.75])
+        writer.update([0], [1], [np.nan], [0.0])
+        writer.close()
+
+        data = FingerprintDistanceWriter.read_columnar(filepath, molecule_codes=False)
+        assert data.structure_ix_1.tolist() == [0, 1, 0]
+        assert data.structure_ix_2.tolist() == [2, 2, 1]
+        assert data.structure_ix_1.dtype == np.int32
+        assert np.allclose(data.distance, [0.5, 0.25, np.nan], equal_nan=True)
+        assert (filepath / "distance.bin").stat().st_size == 3 * 4
+
+        data = FingerprintDistanceWriter.read_columnar(filepath)
+        assert data.molecule_code_1.tolist() == [11, 12, 11]
+
+    def test_from_structure_klifs_ids_valueerror(self, tmp_path):
+        """
+        Test if unknown output format raises ValueError.
+        """
+
+        with pytest.raises(ValueError):
+            FingerprintDistanceWriter.from_structure_klifs_ids(
+                tmp_path / "distances", [11, 12], ["a", "b"], "parquet"
+            )
@@ -0,0 +1,112 @@
+"""
+Unit and regression test for the kissim.comparison.FingerprintDuplicates class.
+"""
+
+import numpy as np
+import pytest
+
+from kissim.comparison import FeatureDistancesArray, FingerprintDuplicates, FingerprintStack
+from kissim.tests.comparison.fixures import fingerprint_stack_dummy
+
+
+@pytest.fixture(scope="module")
+def fingerprint_stack_duplicates(fingerprint_stack_dummy):
+    """
+    Get FingerprintStack instance with 20 dummy fingerprints followed by 4 copies of dummy
+    fingerprints 0, 7 (twice; with NaN values), and 15.
+
+    Returns
+    -------
+    kissim.comparison.FingerprintStack
+        Stacked fingerprints.
+    """
+
+    fingerprint_stack_copies = fingerprint_stack_dummy.subset([0, 7, 7, 15])
+    fingerprint_stack_copies.structure_klifs_ids = [2001, 2002, 2003, 2004]
+    # Negative zeros are identical to zeros
+    fingerprint_stack_copies.moments = fingerprint_stack_copies.moments.copy()
+    fingerprint_stack_copies.moments[0, 0, 0] = -0.0
+    fingerprint_stack = fingerprint_stack_dummy.subset(range(20))
+    fingerprint_stack.moments = fingerprint_stack.moments.copy()
+    fingerprint_stack.moments[0, 0, 0] = 0.0
+    return FingerprintStack.concatenate([fingerprint_stack, fingerprint_stack_copies])
+
+
+class TestsFingerprintDuplicates:
+    """
+    Test FingerprintDuplicates class methods.
+    """
+
+    def test_from_fingerprint_stack(self, fingerprint_stack_duplicates):
+        """
+        Test groups of identical fingerprints (also if hashed in multiple blocks).
+        """
+
+        for block_size in [5, 10000]:
+            duplicates = FingerprintDuplicates.from_fingerprint_stack(
+                fingerprint_stack_duplicates, block_size
+            )
+            assert duplicates.unique_ixs.tolist() == list(range(20))
+            assert duplicates.group_ixs.tolist() == list(range(20)) + [0, 7, 7, 15]
+            assert duplicates.n_duplicates == 4
+            assert duplicates.n_structure_pairs == {"full": 276, "reduced": 193}
+
+        groups = duplicates.get_groups()
+        assert groups.unique_structure_klifs_id.tolist()[-4:] == [1001, 1008, 1008, 1016]
+
+        fingerprint_stack = duplicates.get_fingerprint_stack(fingerprint_stack_duplicates)
+        assert fingerprint_stack.n_fingerprints == 20
+        with pytest.raises(ValueError):
+            duplicates.get_fingerprint_stack(fingerprint_stack)
+
+    def test_get_pair_tiles(self, fingerprint_stack_duplicates):
+        """
+        Test if self-comparisons of groups with duplicates precede all unique pairs.
+        """
+
+        duplicates = FingerprintDuplicates.from_fingerprint_stack(fingerprint_stack_duplicates)
+        pair_tiles = list(duplicates.get_pair_tiles(tile_size=2))
+
+        assert [ixs.tolist() for ixs in pair_tiles[0]] == [[0, 7], [0, 7]]
+        assert [ixs.tolist() for ixs in pair_tiles[1]] == [[15], [15]]
+        assert sum(len(ixs1) for ixs1, _ in pair_tiles) == 193
+
+    @pytest.mark.parametrize(
+        "distance_measures", ["scaled_euclidean", ["scaled_euclidean", "scaled_cityblock"]]
+    )
+    def test_expand_feature_distances_array(self, fingerprint_stack_duplicates, distance_measures):
+        """
+        Test if expanded feature distances match feature distances for all structure pairs.
+        """
+
+        duplicates = FingerprintDuplicates.from_fingerprint_stack(fingerprint_stack_duplicates)
+        feature_distances_array = duplicates.expand_feature_distances_array(
+            FeatureDistancesArray.from_fingerprint_stack(
+                duplicates.get_fingerprint_stack(fingerprint_stack_duplicates),
+                distance_measures,
+                pair_tiles=duplicates.get_pair_tiles(tile_size=7),
+            ),
+            fingerprint_stack_duplicates,
+        )
+        feature_distances_array_full = FeatureDistancesArray.from_fingerprint_stack(
+            fingerprint_stack_duplicates, distance_measures
+        )
+
+        assert feature_distances_array.structure_klifs_ids == (
+            fingerprint_stack_duplicates.structure_klifs_ids
+        )
+        assert np.array_equal(feature_distances_array.pairs, feature_distances_array_full.pairs)
+        assert np.array_equal(
+            feature_distances_array.bit_numbers, feature_distances_array_full.bit_numbers
+        )
+        for measure in feature_distances_array_full.distance_measures:
+            assert np.allclose(
+                feature_distances_array.distances[measure],
+                feature_distances_array_full.distances[measure],
+                equal_nan=True,
+            )
+
+        # Duplicates of fingerprint 7 (with NaN values) have zero distance where defined
+        is_pair = (feature_distances_array.pairs == [21, 22]).all(axis=1)
+        distances = feature_distances_array.distances["scaled_euclidean"][is_pair]
+        assert np.nanmax(distances) == 0
@@ -0,0 +1,119 @@
+"""
+Unit and regression test for the kissim.comparison.FingerprintEmbedding class.
+"""
+
+import numpy as np
+import pytest
+
+from kissim.comparison import FingerprintEmbedding
+from kissim.tests.comparison.fixures import fingerprint_stack_dummy
+
+
+class TestsFingerprintEmbedding:
+    """
+    Test FingerprintEmbedding class methods.
+    """
+
+    @pytest.mark.parametrize("n_components", [1, 16, 32])
+    def test_from_fingerprint_stack(self, fingerprint_stack_dummy, n_components):
+        """
+        Test embedding attributes.
+
+        Parameters
+        ----------
+        n_components : int
+            Number of components.
+        """
+
+        embedding = FingerprintEmbedding.from_fingerprint_stack(
+            fingerprint_stack_dummy, n_components=n_components, block_size=7
+        )
+        assert embedding.n_components == n_components
+        assert embedding.components.shape == (n_components, 1032)
+        assert embedding.embeddings.shape == (fingerprint_stack_dummy.n_fingerprints, n_components)
+        assert not np.isnan(embedding.embeddings).any()
+        # Orthonormal components, sorted by explained variance
+        assert np.allclose(embedding.components @ embedding.components.T, np.eye(n_components))
+        assert np.all(np.diff(embedding.explained_variance_ratio) <= 1e-12)
+        assert embedding.explained_variance_ratio.sum() <= 1.0 + 1e-9
+
+    @pytest.mark.parametrize("n_components", [0, 1033])
+    def test_from_fingerprint_stack_valueerror(self, fingerprint_stack_dummy, n_components):
+        """
+        Test if invalid number of components raises ValueError.
+        """
+
+        with pytest.raises(ValueError):
+            FingerprintEmbedding.from_fingerprint_stack(
+                fingerprint_stack_dummy, n_components=n_components
+            )
+
+    def test_transform_all_components(self, fingerprint_stack_dummy):
+        """
+        Test if embedded distances with all components equal distances between scaled values,
+        i.e. moments-only embedded distances equal scaled Euclidean moments distances.
+        """
+
+        embedding = FingerprintEmbedding.from_fingerprint_stack(
+            fingerprint_stack_dummy, feature_weights=[0.0, 0.0, 1.0], n_components=1032
+        )
+        # Fingerprints without NaN moments
+        fingerprint_ixs = [1, 2]
+        embedded_distance = np.linalg.norm(np.subtract(*embedding.embeddings[fingerprint_ixs]))
+        moments_distances = fingerprint_stack_dummy.get_feature_distances(
+            fingerprint_stack_dummy.subset([fingerprint_ixs[0]]),
+            [fingerprint_ixs[1]],
+            feature_ixs=[12, 13, 14],
+        )
+        assert np.isclose(embedded_distance, np.linalg.norm(moments_distances / 3))
+
+    def test_search(self, fingerprint_stack_dummy):
+        """
+        Test if search results are sorted by embedded distances and skip the query structure.
+        """
+
+        embedding = FingerprintEmbedding.from_fingerprint_stack(fingerprint_stack_dummy)
+        query_stack = fingerprint_stack_dummy.subset([0, 7])
+        neighbor_ixs, distances = embedding.search(query_stack, 5)
+
+        assert neighbor_ixs.shape == distances.shape == (2, 5)
+        assert 0 not in neighbor_ixs[0] and 7 not in neighbor_ixs[1]
+        assert np.all(np.diff(distances, axis=1) >= 0)
+        query_embeddings = embedding.transform(query_stack)
+        assert np.allclose(
+            distances[0],
+            np.linalg.norm(embedding.embeddings[neighbor_ixs[0]] - query_embeddings[0], axis=1),
+        )
+
+    def test_get_recall(self, fingerprint_stack_dummy):
+        """
+        Test recall (fingerprints of the same kinase are close in all features).
+        """
+
+        embedding = FingerprintEmbedding.from_fingerprint_stack(fingerprint_stack_dummy)
+        recall = embedding.get_recall(fingerprint_stack_dummy, n_neighbors=5, n_samples=20)
+        assert 0.5 < recall <= 1.0
+
+        with pytest.raises(ValueError):
+            embedding.get_recall(fingerprint_stack_dummy.subset([0, 1]))
+
+    def test_to_from_npz(self, fingerprint_stack_dummy, tmp_path):
+        """
+        Test if embedding is the same after saving and loading (and projects new fingerprints
+        identically).
+        """
+
+        embedding = FingerprintEmbedding.from_fingerprint_stack(
+            fingerprint_stack_dummy, "scaled_cityblock", n_components=16
+        )
+        filepath = tmp_path / "embedding.npz"
+        embedding.to_npz(filepath)
+        embedding_loaded = FingerprintEmbedding.from_npz(filepath)
+
+        assert embedding_loaded.distance_measure == "scaled_cityblock"
+        assert embedding_loaded.structure_klifs_ids == embedding.structure_klifs_ids
+        assert np.array_equal(embedding_loaded.embeddings, embedding.embeddings)
+        query_stack = fingerprint_stack_dummy.subset([3, 4])
+        assert np.allclose(
+            embedding_loaded.transform(query_stack), embedding.transform(query_stack)
+        )
@@ -0,0 +1,208 @@
+"""
+Unit and regression test for the kissim.comparison.FingerprintStack class.
+"""
+
+import numpy as np
+import pytest
+
+from kissim.utils import enter_temp_directory
+from kissim.comparison import FingerprintStack
+from kissim.tests.comparison.fixures import fingerprint_generator_dummy
+
+
+class TestsFingerprintStack:
+    """
+    Test FingerprintStack class methods.
+    """
+
+    def test_from_fingerprint_generator(self, fingerprint_generator_dummy):
+        """
+        Test shapes and values of stacked fingerprints.
+
+        Parameters
+        ----------
+        fingerprint_generator_dummy : kissim.encoding.FingerprintGenerator
+            Fingerprints.
+        """
+
+        fingerprint_stack = FingerprintStack.from_fingerprint_generator(
+            fingerprint_generator_dummy
+        )
+        n = len(fingerprint_generator_dummy.data)
+
+        assert fingerprint_stack.n_fingerprints == n
+        assert fingerprint_stack.structure_klifs_ids == list(
+            fingerprint_generator_dummy.data.keys()
+        )
+        assert fingerprint_stack.physicochemical.shape == (n, 8, 85)
+        assert fingerprint_stack.distances.shape == (n, 4, 85)
+        assert fingerprint_stack.moments.shape == (n, 3, 4)
+        assert fingerprint_stack.kinase_categories == "kinase1 kinase2 kinase3 kinase4".split()
+        assert np.array_equal(fingerprint_stack.kinase_codes, [0, 0, 0, 1, 1, 2, 3])
+
+        # Moments per feature (moment 1, 2, 3) over subpockets
+        fingerprint = fingerprint_generator_dummy.data[1]
+        assert np.allclose(
+            fingerprint_stack.moments[0],
+            fingerprint.moments.to_numpy(),
+            equal_nan=True,
+        )
+
+    def test_subset(self, fingerprint_generator_dummy):
+        """
+        Test subset of stacked fingerprints.
+        """
+
+        fingerprint_stack = FingerprintStack.from_fingerprint_generator(
+            fingerprint_generator_dummy
+        )
+        fingerprint_stack_subset = fingerprint_stack.subset([2, 0])
+
+        assert fingerprint_stack_subset.structure_klifs_ids == [3, 1]
+        assert np.array_equal(
+            fingerprint_stack_subset.distances[1], fingerprint_stack.distances[0], equal_nan=True
+        )
+
+    def test_get_bit_numbers(self, fingerprint_generator_dummy):
+        """
+        Test bit numbers from packed validity masks against bit numbers from feature values.
+        """
+
+        fingerprint_stack = FingerprintStack.from_fingerprint_generator(
+            fingerprint_generator_dummy
+        )
+        ixs1, ixs2 = np.array([0, 0, 3, 6]), np.array([1, 6, 4, 5])
+        bit_numbers = fingerprint_stack.get_bit_numbers(ixs1, ixs2)
+
+        assert bit_numbers.shape == (4, 15)
+        assert np.array_equal(fingerprint_stack.n_bits, [85] * 12 + [4] * 3)
+        bit_numbers_calculated = np.concatenate(
+            [
+                (~np.isnan(features[ixs1]) & ~np.isnan(features[ixs2])).sum(axis=-1)
+                for features in fingerprint_stack.features
+            ],
+            axis=1,
+        )
+        assert np.array_equal(bit_numbers, bit_numbers_calculated)
+        # Fingerprint 7 has no physicochemical bits
+        assert np.all(bit_numbers[1, :8] == 0)
+
+    def test_n_valid_bits(self, fingerprint_generator_dummy):
+        """
+        Test number of bits free of NaN values per fingerprint and feature.
+        """
+
+        fingerprint_stack = FingerprintStack.from_fingerprint_generator(
+            fingerprint_generator_dummy
+        )
+        n_valid_bits = fingerprint_stack.n_valid_bits
+
+        assert n_valid_bits.shape == (fingerprint_stack.n_fingerprints, 15)
+        assert np.array_equal(
+            n_valid_bits,
+            np.concatenate(
+                [(~np.isnan(features)).sum(axis=-1) for features in fingerprint_stack.features],
+                axis=1,
+            ),
+        )
+
+    def test_concatenate(self, fingerprint_generator_dummy):
+        """
+        Test concatenation of stacked fingerprints.
+        """
+
+        fingerprint_stack = FingerprintStack.from_fingerprint_generator(
+            fingerprint_generator_dummy
+        )
+        fingerprint_stack_concatenated = FingerprintStack.concatenate(
+            [fingerprint_stack.subset([5, 6]), fingerprint_stack.subset([0, 3])]
+        )
+
+        assert fingerprint_stack_concatenated.structure_klifs_ids == [6, 7, 1, 4]
+        assert fingerprint_stack_concatenated.kinase_categories == [
+            "kinase1",
+            "kinase2",
+            "kinase3",
+            "kinase4",
+        ]
+        assert np.array_equal(fingerprint_stack_concatenated.kinase_codes, [2, 3, 0, 1])
+        assert np.array_equal(
+            fingerprint_stack_concatenated.moments,
+            fingerprint_stack.moments[[5, 6, 0, 3]],
+            equal_nan=True,
+        )
+        for bit_masks, bit_masks_concatenated in zip(
+            fingerprint_stack.bit_masks, fingerprint_stack_concatenated.bit_masks
+        ):
+            assert np.array_equal(bit_masks_concatenated, bit_masks[[5, 6, 0, 3]])
+
+    def test_to_from_npz(self, fingerprint_generator_dummy):
+        """
+        Test if stacked fingerprints are the same after writing to and reading from npz file.
+        """
+
+        fingerprint_stack = FingerprintStack.from_fingerprint_generator(
+            fingerprint_generator_dummy
+        )
+        with enter_temp_directory():
+            fingerprint_stack.to_npz("fingerprints.npz")
+            fingerprint_stack_npz = FingerprintStack.from_npz("fingerprints.npz")
+
+        assert fingerprint_stack_npz.structure_klifs_ids == fingerprint_stack.structure_klifs_ids
+        assert fingerprint_stack_npz.kinase_names == fingerprint_stack.kinase_names
+        assert np.array_equal(fingerprint_stack_npz.kinase_codes, fingerprint_stack.kinase_codes)
+        for features_npz, features in zip(
+            fingerprint_stack_npz.features, fingerprint_stack.features
+        ):
+            assert np.array_equal(features_npz, features, equal_nan=True)
+        for bit_masks_npz, bit_masks in zip(
+            fingerprint_stack_npz.bit_masks, fingerprint_stack.bit_masks
+        ):
+            assert np.array_equal(bit_masks_npz, bit_masks)
+
+    def test_get_fingerprint_ixs(self, fingerprint_generator_dummy):
+        """
+        Test fingerprint indices for structure KLIFS IDs (unknown IDs raise ValueError).
+        """
+
+        fingerprint_stack = FingerprintStack.from_fingerprint_generator(
+            fingerprint_generator_dummy
+        )
+
+        assert np.array_equal(
+            fingerprint_stack.get_fingerprint_ixs([[7, 1], [2, 3]]), [[6, 0], [1, 2]]
+        )
+        with pytest.raises(ValueError):
+            fingerprint_stack.get_fingerprint_ixs([1, 8])
+
+    def test_get_values(self, fingerprint_generator_dummy):
+        """
+        Test fingerprint values per fingerprint (physicochemical and distances features in the
+        same order as the fingerprint values array, followed by moments features).
+        """
+
+        fingerprint_stack = FingerprintStack.from_fingerprint_generator(
+            fingerprint_generator_dummy
+        )
+        values = fingerprint_stack.get_values(1, 3)
+
+        assert values.shape == (2, 1032)
+        for value, fingerprint, moments in zip(
+            values,
+            list(fingerprint_generator_dummy.data.values())[1:3],
+            fingerprint_stack.moments[1:3],
+        ):
+            assert np.array_equal(
+                value[:1020], fingerprint.values_array(True, True, False), equal_nan=True
+            )
+            assert np.array_equal(value[1020:], moments.flatten(), equal_nan=True)
+
+    def test_from_fingerprints_empty(self):
+        """
+        Test stacking of empty fingerprint list (empty fingerprints are skipped).
+        """
+
+        fingerprint_stack = FingerprintStack.from_fingerprints([None])
+
+        assert fingerprint_stack.n_fingerprints == 0
+        assert fingerprint_stack.physicochemical.shape == (0, 8, 85)
@@ -0,0 +1,139 @@
+"""
+Unit and regression test for the kissim.comparison.kernels module.
+"""
+
+import numpy as np
+import pytest
+
+from kissim.comparison import FeatureDistances
+from kissim.comparison.kernels import (
+    calculate_bit_numbers,
+    calculate_feature_distances,
+    calculate_feature_distances_blas,
+    check_distance_measures,
+    check_kernel,
+    pack_bit_masks,
+)
+
+
+@pytest.mark.parametrize(
+    "distance_measures, distance_measures_formatted",
+    [
+        ("scaled_euclidean", ["scaled_euclidean"]),
+        (["scaled_euclidean", "scaled_cityblock"], ["scaled_euclidean", "scaled_cityblock"]),
+    ],
+)
+def test_check_distance_measures(distance_measures, distance_measures_formatted):
+
+    assert check_distance_measures(distance_measures) == distance_measures_formatted
+
+
+@pytest.mark.parametrize("distance_measures", ["xxx", ["scaled_euclidean", "xxx"]])
+def test_check_distance_measures_valueerror(distance_measures):
+
+    with pytest.raises(ValueError):
+        check_distance_measures(distance_measures)
+
+
+@pytest.mark.parametrize("kernel", ["xxx"])
+def test_check_kernel_valueerror(kernel):
+
+    with pytest.raises(ValueError):
+        check_kernel(kernel)
+
+
+def test_calculate_feature_distances():
+    """
+    Test if vectorized feature distances for multiple distance measures are the same as
+    feature distances calculated per feature pair.
+    """
+
+    rng = np.random.default_rng(0)
+    features1 = rng.random((20, 3, 10))
+    features2 = rng.random((20, 3, 10))
+    features1[rng.random(features1.shape) < 0.2] = np.nan
+    features2[rng.random(features2.shape) < 0.2] = np.nan
+    features1[0, 0, :] = np.nan  # Feature pair without any bits
+
+    distance_measures = ["scaled_euclidean", "scaled_cityblock"]
+    distances, bit_numbers = calculate_feature_distances(features1, features2, distance_measures)
+
+    feature_distances = FeatureDistances()
+    for distance_measure in distance_measures:
+        assert distances[distance_measure].shape == (20, 3)
+        for i in range(20):
+            for j in range(3):
+                distance, bit_coverage = feature_distances.from_features(
+                    features1[i, j], features2[i, j], distance_measure
+                )
+                assert np.isclose(
+                    distances[distance_measure][i, j], distance, rtol=1e-10, equal_nan=True
+                )
+                assert np.isclose(round(bit_numbers[i, j] / 10, 2), bit_coverage)
+
+
+def test_calculate_feature_distances_valueerror():
+
+    with pytest.raises(ValueError):
+        calculate_feature_distances(np.zeros((2, 3, 4)), np.zeros((2, 3, 5)))
+
+
+@pytest.mark.parametrize("offset", [0.0, 100.0])
+def test_calculate_feature_distances_blas(offset):
+    """
+    Test if scaled Euclidean feature distances calculated via matrix multiplication (block) are
+    the same as feature distances calculated per feature pair (also for large feature values).
+
+    Parameters
+    ----------
+    offset : float
+        Offset added to all feature values.
+    """
+
+    rng = np.random.default_rng(1)
+    features1 = rng.random((6, 3, 10)) + offset
+    features2 = rng.random((5, 3, 10)) + offset
+    features1[rng.random(features1.shape) < 0.3] = np.nan
+    features2[rng.random(features2.shape) < 0.3] = np.nan
+    features1[0, 0, :] = np.nan  # Feature pairs without any bits
+    features2[1] = features1[1]  # Identical features
+
+    distances, bit_numbers = calculate_feature_distances_blas(features1, features2)
+    assert distances.shape == (6, 5, 3)
+
+    for i in range(6):
+        distances_pairwise, bit_numbers_pairwise = calculate_feature_distances(
+            np.repeat(features1[[i]], 5, axis=0), features2
+        )
+        assert np.allclose(
+            distances[i], distances_pairwise["scaled_euclidean"], atol=1e-7, equal_nan=True
+        )
+        assert np.array_equal(bit_numbers[i], bit_numbers_pairwise)
+
+
+@pytest.mark.parametrize("n_bits", [4, 64, 85, 130])
+def test_calculate_bit_numbers(n_bits):
+    """
+    Test if bit numbers calculated from packed validity masks are the same as bit numbers
+    calculated from feature values.
+
+    Parameters
+    ----------
+    n_bits : int
+        Number of bits per feature.
+    """
+
+    rng = np.random.default_rng(2)
+    features1 = rng.random((5, 3, n_bits))
+    features2 = rng.random((5, 3, n_bits))
+    features1[rng.random(features1.shape) < 0.3] = np.nan
+    features2[rng.random(features2.shape) < 0.3] = np.nan
+    features1[0] = np.nan  # Fingerprint without any bits
+
+    bit_masks1 = pack_bit_masks(features1)
+    assert bit_masks1.dtype == np.uint64
+    assert bit_masks1.shape == (5, 3, -(-n_bits // 64))
+
+    bit_numbers = calculate_bit_numbers(bit_masks1, pack_bit_masks(features2))
+    _, bit_numbers_calculated = calculate_feature_distances(features1, features2)
+    assert np.array_equal(bit_numbers, bit_numbers_calculated)
@@ -0,0 +1,170 @@
+"""
+Unit and regression test for the kissim.comparison.KinaseDistanceAccumulator class.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from kissim.comparison import (
+    FeatureDistancesArray,
+    FingerprintDistanceGenerator,
+    FingerprintStack,
+    KinaseDistanceAccumulator,
+)
+from kissim.comparison.utils import get_pair_tiles
+from kissim.tests.comparison.fixures import (
+    fingerprint_distance_generator,
+    fingerprint_generator_dummy,
+)
+
+
+class TestsKinaseDistanceAccumulator:
+    """
+    Test KinaseDistanceAccumulator class methods.
+    """
+
+    @pytest.mark.parametrize("n_chunks", [1, 3])
+    def test_update(self, n_chunks):
+        """
+        Test if kinase pair aggregates (added in one or multiple chunks) match the aggregates
+        calculated with pandas.
+
+        Parameters
+        ----------
+        n_chunks : int
+            Number of chunks in which structure pair distances are added.
+        """
+
+        rng = np.random.default_rng(3)
+        kinase_codes1 = rng.integers(0, 4, 50)
+        kinase_codes2 = rng.integers(0, 4, 50)
+        distances = rng.random(50)
+        distances[[3, 10]] = np.nan
+
+        structure_ixs = np.arange(50)
+
+        accumulator = KinaseDistanceAccumulator.from_kinase_names(list("abcd"))
+        for chunk in np.array_split(np.arange(50), n_chunks):
+            accumulator.update(
+                kinase_codes1[chunk],
+                kinase_codes2[chunk],
+                distances[chunk],
+                structure_ixs[chunk],
+                structure_ixs[chunk] + 100,
+            )
+
+        grouped = pd.DataFrame(
+            {
+                "kinase_1": np.minimum(kinase_codes1, kinase_codes2),
+                "kinase_2": np.maximum(kinase_codes1, kinase_codes2),
+                "distance": distances,
+            }
+        ).groupby(["kinase_1", "kinase_2"])["distance"]
+        for (i, j), value in grouped.min().items():
+            assert np.isclose(accumulator.minimum[i, j], value)
+        for (i, j), value in grouped.max().items():
+            assert np.isclose(accumulator.maximum[i, j], value)
+        for (i, j), value in grouped.mean().items():
+            assert np.isclose(accumulator.mean[i, j], value)
+        for (i, j), value in grouped.size().items():
+            assert accumulator.size[i, j] == value
+        for (i, j), value in grouped.idxmin().items():
+            assert np.array_equal(accumulator.minimum_pairs[i, j], [value, value + 100])
+        for (i, j), value in grouped.idxmax().items():
+            assert np.array_equal(accumulator.maximum_pairs[i, j], [value, value + 100])
+        assert accumulator.size.sum() == 50
+        assert np.isnan(np.tril(accumulator.minimum, k=-1)[np.tril_indices(4, k=-1)]).all()
+
+    @pytest.mark.parametrize(
+        "by, kinase_names, structure_pair",
+        [
+            ("minimum", ("kinase2", "kinase1"), ("HUMAN/kinase1_pdb1", "HUMAN/kinase2_pdb1")),
+            ("maximum", ("kinase1", "kinase2"), ("HUMAN/kinase1_pdb2", "HUMAN/kinase2_pdb1")),
+            ("minimum", ("kinase1", "kinase1"), ("HUMAN/kinase1_pdb1", "HUMAN/kinase1_pdb2")),
+            ("minimum", ("kinase2", "kinase2"), None),
+        ],
+    )
+    def test_get_structure_pair(
+        self, fingerprint_distance_generator, by, kinase_names, structure_pair
+    ):
+        """
+        Test structure pair behind minimum or maximum kinase pair distance.
+
+        Parameters
+        ----------
+        by : str
+            Minimum or maximum.
+        kinase_names : tuple of str
+            Kinase pair.
+        structure_pair : tuple of str or None
+            Structure pair.
+        """
+
+        accumulator = fingerprint_distance_generator.get_kinase_distance_accumulator()
+
+        assert accumulator.get_structure_pair(*kinase_names, by=by) == structure_pair
+
+        structure_pairs = accumulator.get_structure_pairs(by)
+        assert structure_pairs.columns.to_list() == [
+            "kinase_1",
+            "kinase_2",
+            "distance",
+            "molecule_code_1",
+            "molecule_code_2",
+            "size",
+        ]
+        assert structure_pairs["size"].to_list() == [1, 2]
+
+    def test_update_valueerror(self):
+        """
+        Test if kinase codes out of range raise ValueError.
+        """
+
+        accumulator = KinaseDistanceAccumulator.from_kinase_names(list("ab"))
+        with pytest.raises(ValueError):
+            accumulator.update([0], [2], [0.1])
+
+    def test_get_matrix_valueerror(self):
+        """
+        Test if unknown aggregation raises ValueError.
+        """
+
+        accumulator = KinaseDistanceAccumulator.from_kinase_names(list("ab"))
+        with pytest.raises(ValueError):
+            accumulator.get_matrix("xxx")
+
+    @pytest.mark.parametrize("by", ["minimum", "maximum", "mean", "size"])
+    def test_from_feature_distances_arrays(self, fingerprint_generator_dummy, by):
+        """
+        Test if kinase distance matrix aggregated tile by tile matches the kinase distance matrix
+        from all structure pair distances.
+
+        Parameters
+        ----------
+        by : str
+            Aggregation.
+        """
+
+        fingerprint_stack = FingerprintStack.from_fingerprint_generator(
+            fingerprint_generator_dummy
+        )
+        tiles = FeatureDistancesArray.iter_tiles(
+            fingerprint_stack, "scaled_euclidean", get_pair_tiles(7, 4)
+        )
+        accumulator = KinaseDistanceAccumulator.from_feature_distances_arrays(tiles, [0.5, 0.5, 0])
+
+        fingerprint_distance_generator = FingerprintDistanceGenerator()
+        fingerprint_distance_generator.from_feature_distances_array(
+            FeatureDistancesArray.from_fingerprint_stack(fingerprint_stack), [0.5, 0.5, 0]
+        )
+        kinase_distance_matrix = fingerprint_distance_generator.get_kinase_distance_matrix(
+            by, fill=True
+        )
+
+        assert accumulator.kinase_names == "kinase1 kinase2 kinase3 kinase4".split()
+        assert np.allclose(
+            accumulator.get_matrix(by, fill=True).to_numpy(),
+            kinase_distance_matrix.to_numpy(),
+            equal_nan=True,
+        )
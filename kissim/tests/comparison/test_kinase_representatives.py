@@ -0,0 +1,134 @@
+"""
+Unit and regression test for the kissim.comparison.KinaseRepresentatives class.
+"""
+
+from itertools import combinations
+
+import numpy as np
+import pytest
+
+from kissim.comparison import (
+    FeatureDistancesArray,
+    KinaseDistanceAccumulator,
+    KinaseRepresentatives,
+)
+from kissim.tests.comparison.fixures import fingerprint_stack_dummy
+
+
+def _get_kinase_distance_accumulator(fingerprint_stack):
+    """
+    Get kinase distances for all structure pairs of stacked fingerprints.
+    """
+
+    return KinaseDistanceAccumulator.from_feature_distances_arrays(
+        FeatureDistancesArray.iter_from_fingerprint_stack(fingerprint_stack)
+    )
+
+
+class TestsKinaseRepresentatives:
+    """
+    Test KinaseRepresentatives class methods.
+    """
+
+    @pytest.mark.parametrize(
+        "n_representatives, n_selected, n_within_kinase_pairs",
+        [(1, 6, 270), (3, 18, 270), (10, 60, 0)],
+    )
+    def test_from_fingerprint_stack(
+        self, fingerprint_stack_dummy, n_representatives, n_selected, n_within_kinase_pairs
+    ):
+        """
+        Test representatives per kinase (6 kinases with 10 structures each).
+
+        Parameters
+        ----------
+        n_representatives : int
+            Maximum number of representatives per kinase.
+        n_selected : int
+            Number of representatives.
+        n_within_kinase_pairs : int
+            Number of within-kinase structure pairs.
+        """
+
+        representatives = KinaseRepresentatives.from_fingerprint_stack(
+            fingerprint_stack_dummy, n_representatives, tile_size=50
+        )
+
+        assert len(representatives.representative_ixs) == n_selected
+        assert representatives.n_within_kinase_pairs == n_within_kinase_pairs
+        assert representatives.n_structure_pairs == {
+            "full": 1770,
+            "reduced": n_within_kinase_pairs + n_selected * (n_selected - 1) // 2,
+        }
+        kinase_names = np.array(fingerprint_stack_dummy.kinase_names)
+        _, counts = np.unique(kinase_names[representatives.representative_ixs], return_counts=True)
+        assert counts.tolist() == [n_representatives] * 6
+
+        # Each structure is assigned to a representative of the same kinase
+        assert set(representatives.medoid_ixs) == set(representatives.representative_ixs)
+        assert np.array_equal(kinase_names[representatives.medoid_ixs], kinase_names)
+        medoids = representatives.get_medoids()
+        assert medoids.columns.tolist() == [
+            "structure_klifs_id",
+            "kinase_name",
+            "representative_structure_klifs_id",
+        ]
+
+        fingerprint_stack = representatives.get_fingerprint_stack(fingerprint_stack_dummy)
+        assert fingerprint_stack.n_fingerprints == n_selected
+        with pytest.raises(ValueError):
+            representatives.get_fingerprint_stack(fingerprint_stack_dummy.subset([0, 1]))
+
+    def test_from_fingerprint_stack_valueerror(self, fingerprint_stack_dummy):
+        """
+        Test if invalid number of representatives raises ValueError.
+        """
+
+        with pytest.raises(ValueError):
+            KinaseRepresentatives.from_fingerprint_stack(fingerprint_stack_dummy, 0)
+
+    @pytest.mark.parametrize("n_medoids", [1, 2, 3])
+    def test_get_medoids(self, n_medoids):
+        """
+        Test if medoids minimize the sum of distances to the nearest medoid (brute force).
+
+        Parameters
+        ----------
+        n_medoids : int
+            Number of medoids.
+        """
+
+        rng = np.random.default_rng(1)
+        points = rng.random((12, 2))
+        distance_matrix = np.linalg.norm(points[:, None] - points[None, :], axis=-1)
+
+        medoids = KinaseRepresentatives._get_medoids(distance_matrix, n_medoids)
+        costs = {
+            medoids_: distance_matrix[list(medoids_)].min(axis=0).sum()
+            for medoids_ in combinations(range(12), n_medoids)
+        }
+        assert np.isclose(distance_matrix[medoids].min(axis=0).sum(), min(costs.values()))
+
+    def test_get_kinase_matrix_deviation(self, fingerprint_stack_dummy):
+        """
+        Test deviation of kinase distances based on representatives from kinase distances based
+        on all structures.
+        """
+
+        accumulator_full = _get_kinase_distance_accumulator(fingerprint_stack_dummy)
+        deviations = {}
+        for n_representatives in [2, 10]:
+            representatives = KinaseRepresentatives.from_fingerprint_stack(
+                fingerprint_stack_dummy, n_representatives
+            )
+            accumulator = _get_kinase_distance_accumulator(
+                representatives.get_fingerprint_stack(fingerprint_stack_dummy)
+            )
+            deviations[n_representatives] = KinaseRepresentatives.get_kinase_matrix_deviation(
+                accumulator, accumulator_full, "mean"
+            )
+
+        assert deviations[10]["n_kinase_pairs"] == 21
+        assert deviations[10]["max_absolute_deviation"] == 0
+        assert 0 < deviations[2]["mean_absolute_deviation"] < 0.1
+        assert deviations[2]["correlation"] > 0.9
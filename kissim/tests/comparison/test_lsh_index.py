@@ -0,0 +1,148 @@
+"""
+Unit and regression test for the kissim.comparison.LshIndex class.
+"""
+
+import numpy as np
+import pytest
+
+from kissim.comparison import FingerprintStack, LshIndex, PrunedSearch
+from kissim.tests.comparison.fixures import fingerprint_stack_dummy
+
+
+class TestsLshIndex:
+    """
+    Test LshIndex class methods.
+    """
+
+    @pytest.mark.parametrize(
+        "feature_weights, n_tables, n_hyperplanes, n_signature_bits",
+        [(None, 8, 4, 12), ([0.0, 0.0, 1.0], 2, 20, 20), ([0.5, 0.5, 0.0], 1, 31, 62)],
+    )
+    def test_from_fingerprint_stack(
+        self, fingerprint_stack_dummy, feature_weights, n_tables, n_hyperplanes, n_signature_bits
+    ):
+        """
+        Test index attributes (hyperplanes per used feature type).
+
+        Parameters
+        ----------
+        feature_weights : None or list of float
+            Feature weights.
+        n_tables : int
+            Number of hash tables.
+        n_hyperplanes : int
+            Number of random hyperplanes per feature type and table.
+        n_signature_bits : int
+            Number of random hyperplanes per table.
+        """
+
+        index = LshIndex.from_fingerprint_stack(
+            fingerprint_stack_dummy,
+            feature_weights=feature_weights,
+            n_tables=n_tables,
+            n_hyperplanes=n_hyperplanes,
+        )
+
+        assert index.n_tables == n_tables
+        assert index.hyperplanes.shape == (n_tables, n_signature_bits, 1032)
+        assert index.signatures.shape == (fingerprint_stack_dummy.n_fingerprints, n_tables)
+        # Hyperplanes ignore features with zero weights
+        assert not index.hyperplanes[:, :, index.scales == 0].any()
+        # Each fingerprint is in one bucket per table
+        for buckets in index.buckets:
+            assert sorted(np.concatenate(list(buckets.values())).tolist()) == list(
+                range(fingerprint_stack_dummy.n_fingerprints)
+            )
+
+    @pytest.mark.parametrize("n_tables, n_hyperplanes", [(0, 4), (8, 0), (8, 21)])
+    def test_from_fingerprint_stack_valueerror(
+        self, fingerprint_stack_dummy, n_tables, n_hyperplanes
+    ):
+        """
+        Test if invalid numbers of tables or hyperplanes raise ValueError.
+        """
+
+        with pytest.raises(ValueError):
+            LshIndex.from_fingerprint_stack(
+                fingerprint_stack_dummy, n_tables=n_tables, n_hyperplanes=n_hyperplanes
+            )
+
+    def test_search(self, fingerprint_stack_dummy):
+        """
+        Test if search results are the exact most similar candidates, i.e. never better than
+        the exact search results.
+        """
+
+        index = LshIndex.from_fingerprint_stack(fingerprint_stack_dummy)
+        query_ixs = [0, 7, 33]
+        query_stack = fingerprint_stack_dummy.subset(query_ixs)
+        neighbor_ixs, distances = index.search(query_stack, 5)
+        _, distances_exact = PrunedSearch.from_fingerprint_stack(fingerprint_stack_dummy).search(
+            query_stack, 5
+        )
+
+        for i, query_ix in enumerate(query_ixs):
+            candidate_ixs = index.get_candidates(query_stack, i)
+            assert query_ix not in neighbor_ixs[i]
+            assert set(neighbor_ixs[i][neighbor_ixs[i] >= 0]) <= set(candidate_ixs)
+        is_found = neighbor_ixs >= 0
+        assert np.all(distances[is_found] >= distances_exact[is_found] - 1e-12)
+
+    def test_get_recall(self, fingerprint_stack_dummy):
+        """
+        Test recall (fingerprints of the same kinase are close in all features).
+        """
+
+        index = LshIndex.from_fingerprint_stack(fingerprint_stack_dummy)
+        recall = index.get_recall(n_neighbors=5, n_samples=20)
+        assert 0.5 < recall <= 1.0
+
+    def test_insert(self, fingerprint_stack_dummy):
+        """
+        Test if inserted fingerprints are indexed (and found as their own candidates).
+        """
+
+        index = LshIndex.from_fingerprint_stack(fingerprint_stack_dummy.subset(range(40)))
+        index.insert(fingerprint_stack_dummy.subset(range(40, 50)))
+        index.insert(fingerprint_stack_dummy.subset(range(50, 60)))
+
+        # Inserted fingerprints are stacked on access only
+        assert len(index._chunks) == 3
+        assert index.n_fingerprints == 60
+        assert index.fingerprint_stack.structure_klifs_ids == (
+            fingerprint_stack_dummy.structure_klifs_ids
+        )
+        assert index.signatures.shape == (60, index.n_tables)
+        for i in [45, 59]:
+            assert i in index.get_candidates(fingerprint_stack_dummy, i)
+
+        assert len(index._chunks) == 0
+
+        with pytest.raises(ValueError):
+            index.insert(fingerprint_stack_dummy.subset([10]))
+
+    def test_to_from_npz(self, fingerprint_stack_dummy, tmp_path):
+        """
+        Test if index gives the same search results after saving and loading.
+        """
+
+        index = LshIndex.from_fingerprint_stack(
+            fingerprint_stack_dummy, "scaled_cityblock", [0.5, 0.0, 0.5]
+        )
+        filepath = tmp_path / "index.npz"
+        index.to_npz(filepath)
+        index_loaded = LshIndex.from_npz(filepath)
+
+        assert index_loaded.distance_measure == "scaled_cityblock"
+        assert np.array_equal(index_loaded.signatures, index.signatures)
+        query_stack = fingerprint_stack_dummy.subset([3, 40])
+        for result_loaded, result in zip(
+            index_loaded.search(query_stack, 5), index.search(query_stack, 5)
+        ):
+            assert np.array_equal(result_loaded, result, equal_nan=True)
+
+        # Index file can be loaded as stacked fingerprints
+        fingerprint_stack = FingerprintStack.from_npz(filepath)
+        assert fingerprint_stack.structure_klifs_ids == (
+            fingerprint_stack_dummy.structure_klifs_ids
+        )
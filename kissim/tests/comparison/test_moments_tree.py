@@ -0,0 +1,128 @@
+"""
+Unit and regression test for the kissim.comparison.MomentsTree class.
+"""
+
+import numpy as np
+import pytest
+
+from kissim.comparison import MomentsTree, PrunedSearch
+from kissim.tests.comparison.fixures import fingerprint_stack_dummy
+
+
+class TestsMomentsTree:
+    """
+    Test MomentsTree class methods.
+    """
+
+    @pytest.mark.parametrize(
+        "distance_measure, feature_weights, n_neighbors, leaf_size",
+        [
+            ("scaled_euclidean", [0.0, 0.0, 1.0], 5, 4),
+            ("scaled_cityblock", [0.0, 0.0, 1.0], 1, 1),
+            ("scaled_euclidean", [0.0] * 12 + [0.5, 0.25, 0.25], 10, 16),
+            ("scaled_euclidean", [0.0, 0.0, 1.0], 100, 8),
+        ],
+    )
+    def test_search(
+        self, fingerprint_stack_dummy, distance_measure, feature_weights, n_neighbors, leaf_size
+    ):
+        """
+        Test if tree search results match an exact search (queries with and without NaN
+        moments).
+
+        Parameters
+        ----------
+        distance_measure : str
+            Distance measure.
+        feature_weights : list of float
+            Feature weights.
+        n_neighbors : int
+            Number of neighbors.
+        leaf_size : int
+            Maximum number of fingerprints per leaf.
+        """
+
+        query_stack = fingerprint_stack_dummy.subset([0, 7, 33, 59])
+        tree = MomentsTree.from_fingerprint_stack(
+            fingerprint_stack_dummy, distance_measure, feature_weights, leaf_size
+        )
+        neighbor_ixs, distances = tree.search(query_stack, n_neighbors)
+
+        search = PrunedSearch.from_fingerprint_stack(
+            fingerprint_stack_dummy,
+            distance_measure,
+            feature_weights,
+        )
+        neighbor_ixs_exact, distances_exact = search.search(query_stack, n_neighbors)
+
+        assert np.array_equal(neighbor_ixs, neighbor_ixs_exact)
+        assert np.allclose(distances, distances_exact, equal_nan=True)
+
+    def test_search_radius(self, fingerprint_stack_dummy):
+        """
+        Test if range search results match all fingerprints within the radius.
+        """
+
+        query_stack = fingerprint_stack_dummy.subset([3, 22])
+        tree = MomentsTree.from_fingerprint_stack(
+            fingerprint_stack_dummy, feature_weights=[0.0, 0.0, 1.0], leaf_size=4
+        )
+        radius = 0.06
+        results = tree.search_radius(query_stack, radius)
+
+        all_ixs = np.arange(fingerprint_stack_dummy.n_fingerprints)
+        for i, (neighbor_ixs, distances) in zip([3, 22], results):
+            distances_exact = tree._get_distances(
+                fingerprint_stack_dummy.moments[i], all_ixs, exact=True
+            )
+            neighbor_ixs_exact = all_ixs[(distances_exact <= radius) & (all_ixs != i)]
+            assert len(neighbor_ixs) > 0
+            assert np.array_equal(np.sort(neighbor_ixs), neighbor_ixs_exact)
+            assert (np.diff(distances) >= 0).all()
+
+    def test_search_sublinear(self, fingerprint_stack_dummy, monkeypatch):
+        """
+        Test if a k nearest neighbor search evaluates distances for a fraction of fingerprints
+        only (3000 fingerprints, i.e. dummy fingerprints with jittered moments).
+        """
+
+        rng = np.random.default_rng(0)
+        fingerprint_stack = fingerprint_stack_dummy.subset(np.tile(np.arange(60), 50))
+        fingerprint_stack.moments = fingerprint_stack.moments + 0.02 * rng.standard_normal(
+            fingerprint_stack.moments.shape
+        )
+
+        tree = MomentsTree.from_fingerprint_stack(
+            fingerprint_stack, feature_weights=[0.0, 0.0, 1.0], leaf_size=4
+        )
+        n_evaluated = []
+        get_distances = tree._get_distances
+
+        def get_distances_counted(query_moments, fingerprint_ixs, exact=False):
+            n_evaluated.append(len(fingerprint_ixs))
+            return get_distances(query_moments, fingerprint_ixs, exact)
+
+        monkeypatch.setattr(tree, "_get_distances", get_distances_counted)
+        tree.search(fingerprint_stack_dummy.subset([1]), 3)
+        assert sum(n_evaluated) < fingerprint_stack.n_fingerprints / 2
+
+    def test_from_fingerprint_stack_valueerror(self, fingerprint_stack_dummy):
+        """
+        Test if feature weights on other than moments features raise ValueError.
+        """
+
+        with pytest.raises(ValueError):
+            MomentsTree.from_fingerprint_stack(
+                fingerprint_stack_dummy, feature_weights=[0.5, 0, 0.5]
+            )
+
+    @pytest.mark.parametrize(
+        "feature_weights, is_applicable",
+        [(None, False), ([0, 0, 1], True), ([0.5, 0, 0.5], False), ([1 / 3] * 3, False)],
+    )
+    def test_is_applicable(self, feature_weights, is_applicable):
+        """
+        Test if feature weights are applicable to the tree (moments features only).
+        """
+
+        assert MomentsTree.is_applicable(feature_weights) == is_applicable
@@ -0,0 +1,101 @@
+"""
+Unit and regression test for the kissim.comparison.NearestNeighbors class.
+"""
+
+import numpy as np
+import pytest
+
+from kissim.comparison import FeatureDistancesArray, FingerprintStack, NearestNeighbors
+from kissim.comparison.utils import get_condensed_index, get_pair_tiles
+from kissim.tests.comparison.fixures import fingerprint_generator_dummy
+
+
+class TestsNearestNeighbors:
+    """
+    Test NearestNeighbors class methods.
+    """
+
+    @pytest.mark.parametrize("n_neighbors, n_chunks", [(1, 1), (3, 1), (3, 4), (12, 4)])
+    def test_update(self, n_neighbors, n_chunks):
+        """
+        Test if nearest neighbors (added in one or multiple chunks) match the nearest neighbors
+        from the full distance matrix.
+
+        Parameters
+        ----------
+        n_neighbors : int
+            Number of neighbors.
+        n_chunks : int
+            Number of chunks in which structure pair distances are added.
+        """
+
+        n_structures = 10
+        rng = np.random.default_rng(5)
+        structure_ixs1, structure_ixs2 = np.triu_indices(n_structures, k=1)
+        distances = rng.random(len(structure_ixs1))
+        distances[[2, 20]] = np.nan
+
+        nearest_neighbors = NearestNeighbors.from_structure_klifs_ids(
+            range(n_structures), n_neighbors
+        )
+        for chunk in np.array_split(rng.permutation(len(distances)), n_chunks):
+            nearest_neighbors.update(
+                structure_ixs1[chunk], structure_ixs2[chunk], distances[chunk]
+            )
+
+        distance_matrix = np.full((n_structures, n_structures), np.inf)
+        distance_matrix[structure_ixs1, structure_ixs2] = distances
+        distance_matrix[structure_ixs2, structure_ixs1] = distances
+        distance_matrix[np.isnan(distance_matrix)] = np.inf
+        for i in range(n_structures):
+            neighbor_ixs = np.argsort(distance_matrix[i], kind="stable")
+            neighbor_ixs = neighbor_ixs[np.isfinite(distance_matrix[i, neighbor_ixs])]
+            neighbor_ixs = neighbor_ixs[:n_neighbors]
+            n = len(neighbor_ixs)
+            assert np.array_equal(nearest_neighbors.neighbor_ixs[i, :n], neighbor_ixs)
+            assert np.allclose(
+                nearest_neighbors.distances[i, :n], distance_matrix[i, neighbor_ixs]
+            )
+            assert (nearest_neighbors.neighbor_ixs[i, n:] == -1).all()
+            assert np.isnan(nearest_neighbors.distances[i, n:]).all()
+
+    def test_from_structure_klifs_ids_valueerror(self):
+        """
+        Test if number of neighbors below 1 raises ValueError.
+        """
+
+        with pytest.raises(ValueError):
+            NearestNeighbors.from_structure_klifs_ids([1, 2], 0)
+
+    def test_from_feature_distances_arrays(self, fingerprint_generator_dummy):
+        """
+        Test if nearest neighbors collected tile by tile match the fingerprint distances of all
+        structure pairs.
+        """
+
+        fingerprint_stack = FingerprintStack.from_fingerprint_generator(
+            fingerprint_generator_dummy
+        )
+        tiles = FeatureDistancesArray.iter_tiles(
+            fingerprint_stack, "scaled_euclidean", get_pair_tiles(7, 4)
+        )
+        nearest_neighbors = NearestNeighbors.from_feature_distances_arrays(tiles, 2, [0.5, 0.5, 0])
+        distances = FeatureDistancesArray.from_fingerprint_stack(
+            fingerprint_stack
+        ).get_fingerprint_distances([0.5, 0.5, 0])
+
+        neighbors = nearest_neighbors.get_neighbors()
+        assert neighbors.columns.to_list() == [
+            "structure_klifs_id",
+            "rank",
+            "neighbor_structure_klifs_id",
+            "distance",
+        ]
+        for i, structure_klifs_id in enumerate(fingerprint_stack.structure_klifs_ids):
+            expected = np.array(
+                [distances[get_condensed_index(i, j, 7)] for j in range(7) if j != i]
+            )
+            expected = np.sort(expected[~np.isnan(expected)])[:2]
+            neighbors_by_structure = neighbors[neighbors.structure_klifs_id == structure_klifs_id]
+            assert neighbors_by_structure["rank"].to_list() == list(range(1, len(expected) + 1))
+            assert np.allclose(neighbors_by_structure["distance"], expected)
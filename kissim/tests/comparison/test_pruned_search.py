@@ -0,0 +1,118 @@
+"""
+Unit and regression test for the kissim.comparison.PrunedSearch class.
+"""
+
+import numpy as np
+import pytest
+
+from kissim.comparison import FeatureDistancesArray, FingerprintStack, PrunedSearch
+from kissim.tests.comparison.fixures import fingerprint_stack_dummy
+
+
+def _search_exhaustive(query_stack, fingerprint_stack, n_neighbors, distance_measure, weights):
+    """
+    Get the most similar fingerprints per query by comparing all query-database pairs.
+    """
+
+    n_queries = query_stack.n_fingerprints
+    feature_distances_array = FeatureDistancesArray.from_fingerprint_stack(
+        FingerprintStack.concatenate([query_stack, fingerprint_stack]),
+        distance_measure,
+        pair_tiles=FeatureDistancesArray.get_cross_pair_tiles(
+            n_queries, fingerprint_stack.n_fingerprints
+        ),
+    )
+    distances = feature_distances_array.get_fingerprint_distances(weights, distance_measure)
+    distances = distances.reshape(n_queries, fingerprint_stack.n_fingerprints)
+
+    neighbor_ixs, neighbor_distances = [], []
+    for i, structure_klifs_id in enumerate(query_stack.structure_klifs_ids):
+        is_candidate = ~np.isnan(distances[i]) & (
+            np.array(fingerprint_stack.structure_klifs_ids) != structure_klifs_id
+        )
+        candidate_ixs = np.flatnonzero(is_candidate)
+        candidate_ixs = candidate_ixs[np.argsort(distances[i, candidate_ixs], kind="stable")]
+        neighbor_ixs.append(candidate_ixs[:n_neighbors])
+        neighbor_distances.append(distances[i, candidate_ixs[:n_neighbors]])
+    return neighbor_ixs, neighbor_distances
+
+
+class TestsPrunedSearch:
+    """
+    Test PrunedSearch class methods.
+    """
+
+    @pytest.mark.parametrize(
+        "distance_measure, feature_weights, n_neighbors, batch_size",
+        [
+            ("scaled_euclidean", None, 5, 4),
+            ("scaled_euclidean", [0.5, 0.0, 0.5], 1, 1),
+            ("scaled_cityblock", [0.0, 0.0, 1.0], 10, 8),
+            ("scaled_euclidean", [1.0, 0.0, 0.0], 100, 16),
+        ],
+    )
+    def test_search(
+        self, fingerprint_stack_dummy, distance_measure, feature_weights, n_neighbors, batch_size
+    ):
+        """
+        Test if search results match an exhaustive search.
+
+        Parameters
+        ----------
+        distance_measure : str
+            Distance measure.
+        feature_weights : None or list of float
+            Feature weights.
+        n_neighbors : int
+            Number of neighbors.
+        batch_size : int
+            Number of candidates evaluated at once.
+        """
+
+        query_stack = fingerprint_stack_dummy.subset([0, 7, 33, 59])
+        search = PrunedSearch.from_fingerprint_stack(
+            fingerprint_stack_dummy, distance_measure, feature_weights
+        )
+        neighbor_ixs, distances = search.search(query_stack, n_neighbors, batch_size)
+
+        neighbor_ixs_exhaustive, distances_exhaustive = _search_exhaustive(
+            query_stack, fingerprint_stack_dummy, n_neighbors, distance_measure, feature_weights
+        )
+        for i in range(query_stack.n_fingerprints):
+            n = len(neighbor_ixs_exhaustive[i])
+            assert np.array_equal(neighbor_ixs[i, :n], neighbor_ixs_exhaustive[i])
+            assert np.allclose(distances[i, :n], distances_exhaustive[i])
+            assert (neighbor_ixs[i, n:] == -1).all()
+
+    @pytest.mark.parametrize("distance_measure", ["scaled_euclidean", "scaled_cityblock"])
+    def test_get_lower_bounds(self, fingerprint_stack_dummy, distance_measure):
+        """
+        Test if lower bounds do not exceed fingerprint distances and exceed the 5th smallest
+        distance for most fingerprints (i.e. prune most candidates in a top-5 search).
+
+        Parameters
+        ----------
+        distance_measure : str
+            Distance measure.
+        """
+
+        query_stack = fingerprint_stack_dummy.subset([1])
+        search = PrunedSearch.from_fingerprint_stack(fingerprint_stack_dummy, distance_measure)
+        lower_bounds = search.get_lower_bounds(query_stack)
+        distances = search._get_distances(
+            query_stack, np.arange(fingerprint_stack_dummy.n_fingerprints)
+        )
+
+        assert np.array_equal(np.isnan(lower_bounds), np.isnan(distances))
+        is_valid = ~np.isnan(distances)
+        assert (lower_bounds[is_valid] <= distances[is_valid] + 1e-12).all()
+        assert (lower_bounds > np.sort(distances[is_valid])[5]).mean() > 0.5
+
+    def test_search_valueerror(self, fingerprint_stack_dummy):
+        """
+        Test if number of neighbors below 1 raises ValueError.
+        """
+
+        search = PrunedSearch.from_fingerprint_stack(fingerprint_stack_dummy)
+        with pytest.raises(ValueError):
+            search.search(fingerprint_stack_dummy.subset([0]), 0)
@@ -0,0 +1,106 @@
+"""
+Unit and regression test for the kissim.comparison.SparseDistances class.
+"""
+
+import numpy as np
+import pytest
+
+from kissim.comparison import (
+    FeatureDistancesArray,
+    FingerprintDistanceGenerator,
+    SparseDistances,
+)
+from kissim.tests.comparison.fixures import fingerprint_stack_dummy
+
+
+class TestsSparseDistances:
+    """
+    Test SparseDistances class methods.
+    """
+
+    def test_update_from_feature_distances_array(self, fingerprint_stack_dummy):
+        """
+        Test if only structure pairs below or equal to the cutoff are kept (added tile by tile).
+        """
+
+        feature_distances_array = FeatureDistancesArray.from_fingerprint_stack(
+            fingerprint_stack_dummy
+        )
+        fingerprint_distance_generator = FingerprintDistanceGenerator()
+        fingerprint_distance_generator.from_feature_distances_array(feature_distances_array)
+        condensed = fingerprint_distance_generator.get_structure_distance_condensed()
+        max_distance = np.nanquantile(condensed, 0.1)
+
+        sparse_distances = SparseDistances.from_structure_klifs_ids(
+            fingerprint_stack_dummy.structure_klifs_ids,
+            fingerprint_stack_dummy.kinase_names,
+            max_distance,
+        )
+        for tile in FeatureDistancesArray.iter_from_fingerprint_stack(
+            fingerprint_stack_dummy, tile_size=100
+        ):
+            sparse_distances.update_from_feature_distances_array(tile)
+
+        is_kept = condensed <= max_distance
+        assert sparse_distances.n_pairs == is_kept.sum()
+        assert np.allclose(np.sort(sparse_distances.distances), np.sort(condensed[is_kept]))
+        assert (sparse_distances.structure_ixs1 < sparse_distances.structure_ixs2).all()
+
+        matrix = sparse_distances.get_csr_matrix()
+        assert matrix.shape == (60, 60)
+        assert matrix.nnz == 2 * is_kept.sum()
+        assert np.allclose((matrix - matrix.T).data, 0)
+
+        # Structures of feature distances must match (not only their number)
+        sparse_distances = SparseDistances.from_structure_klifs_ids(
+            fingerprint_stack_dummy.structure_klifs_ids[::-1],
+            fingerprint_stack_dummy.kinase_names[::-1],
+            max_distance,
+        )
+        with pytest.raises(ValueError):
+            sparse_distances.update_from_feature_distances_array(feature_distances_array)
+
+    def test_update(self):
+        """
+        Test if pairs above the cutoff, NaN distances, and self pairs are skipped and zero
+        distances are stored explicitly.
+        """
+
+        sparse_distances = SparseDistances.from_structure_klifs_ids([11, 12, 13], list("aab"), 0.5)
+        sparse_distances.update([2, 0, 1], [0, 1, 1], [0.5, 0.75, 0.0], [1.0, 1.0, 1.0])
+        sparse_distances.update([1, 0], [2, 2], [0.0, np.nan], [0.5, 0.0])
+
+        assert sparse_distances.structure_ixs1.tolist() == [0, 1]
+        assert sparse_distances.structure_ixs2.tolist() == [2, 2]
+        assert sparse_distances.distances.tolist() == [0.5, 0.0]
+
+        matrix = sparse_distances.get_coo_matrix()
+        assert matrix.nnz == 2
+        assert matrix.toarray().tolist() == [[0, 0, 0.5], [0, 0, 0], [0, 0, 0]]
+        matrix = sparse_distances.get_csr_matrix("coverage")
+        assert matrix.nnz == 4
+        assert matrix[2, 1] == 0.5
+
+        with pytest.raises(ValueError):
+            sparse_distances.get_coo_matrix("xxx")
+        with pytest.raises(ValueError):
+            SparseDistances.from_structure_klifs_ids([11, 12], ["a", "b"], None)
+
+    def test_to_from_npz(self, tmp_path):
+        """
+        Test if sparse distances are the same after saving and loading.
+        """
+
+        sparse_distances = SparseDistances.from_structure_klifs_ids([11, 12, 13], list("aab"), 0.5)
+        sparse_distances.update([2, 0], [1, 1], [0.25, 0.5], [1.0, 0.75])
+        filepath = tmp_path / "sparse.npz"
+        sparse_distances.to_npz(filepath)
+        sparse_distances_loaded = SparseDistances.from_npz(filepath)
+
+        assert sparse_distances_loaded.structure_klifs_ids == [11, 12, 13]
+        assert sparse_distances_loaded.kinase_names == ["a", "a", "b"]
+        assert sparse_distances_loaded.max_distance == 0.5
+        for name in "structure_ixs1 structure_ixs2 distances coverages".split():
+            assert np.array_equal(
+                getattr(sparse_distances_loaded, name), getattr(sparse_distances, name)
+            )
@@ -0,0 +1,90 @@
+"""
+Unit and regression test for the kissim.comparison.TwoStageSearch class.
+"""
+
+import numpy as np
+import pytest
+
+from kissim.comparison import PrunedSearch, TwoStageSearch
+from kissim.tests.comparison.fixures import fingerprint_stack_dummy
+
+
+class TestsTwoStageSearch:
+    """
+    Test TwoStageSearch class methods.
+    """
+
+    @pytest.mark.parametrize(
+        "screen_features, feature_weights",
+        [("moments", None), (["size", 13, "distances"], [0.5, 0.5, 0.0])],
+    )
+    def test_search_all_candidates(
+        self, fingerprint_stack_dummy, screen_features, feature_weights
+    ):
+        """
+        Test if search results match an exact search if all candidates are re-ranked.
+
+        Parameters
+        ----------
+        screen_features : str or list of str or int
+            Features used for the screen.
+        feature_weights : None or list of float
+            Feature weights.
+        """
+
+        query_stack = fingerprint_stack_dummy.subset([2, 7, 40])
+        search = TwoStageSearch.from_fingerprint_stack(
+            fingerprint_stack_dummy,
+            feature_weights=feature_weights,
+            screen_features=screen_features,
+            n_candidates=fingerprint_stack_dummy.n_fingerprints,
+        )
+        neighbor_ixs, distances = search.search(query_stack, 5)
+        neighbor_ixs_exact, distances_exact = PrunedSearch.from_fingerprint_stack(
+            fingerprint_stack_dummy, feature_weights=feature_weights
+        ).search(query_stack, 5)
+
+        assert np.array_equal(neighbor_ixs, neighbor_ixs_exact)
+        assert np.allclose(distances, distances_exact)
+
+    @pytest.mark.parametrize("n_candidates", [5, 20])
+    def test_get_recall(self, fingerprint_stack_dummy, n_candidates):
+        """
+        Test recall for few candidates (fingerprints of the same kinase are close in all
+        features, i.e. the screen with moments finds them).
+
+        Parameters
+        ----------
+        n_candidates : int
+            Number of candidates re-ranked with all features.
+        """
+
+        search = TwoStageSearch.from_fingerprint_stack(
+            fingerprint_stack_dummy, n_candidates=n_candidates
+        )
+        recall = search.get_recall(n_neighbors=5, n_samples=20)
+        assert 0.5 < recall <= 1.0
+
+    @pytest.mark.parametrize(
+        "screen_features, feature_ixs",
+        [
+            ("moments", [12, 13, 14]),
+            ("physicochemical", list(range(8))),
+            (["moment2", 0, "distances"], [0, 8, 9, 10, 11, 13]),
+        ],
+    )
+    def test_get_feature_ixs(self, screen_features, feature_ixs):
+        """
+        Test feature indices for feature types, names, and indices.
+        """
+
+        assert TwoStageSearch._get_feature_ixs(screen_features).tolist() == feature_ixs
+
+    @pytest.mark.parametrize("screen_features", ["xxx", 15])
+    def test_get_feature_ixs_valueerror(self, screen_features):
+        """
+        Test if unknown features raise ValueError.
+        """
+
+        with pytest.raises(ValueError):
+            TwoStageSearch._get_feature_ixs(screen_features)
@@ -0,0 +1,194 @@
+"""
+Unit and regression test for the kissim.comparison.utils module.
+"""
+
+from itertools import combinations, product
+
+import numpy as np
+import pytest
+
+from kissim.comparison import PrunedSearch, TwoStageSearch
+from kissim.comparison.utils import (
+    get_block_pair_tiles,
+    get_condensed_index,
+    get_neighbor_recall,
+    get_pair_list_tiles,
+    get_pair_tiles,
+    get_scaled_values,
+    get_search_recall,
+    get_square_indices,
+    get_value_means,
+    get_value_scales,
+)
+from kissim.tests.comparison.fixures import fingerprint_stack_dummy
+
+
+@pytest.mark.parametrize("n", [2, 3, 10, 101])
+def test_condensed_square_indices(n):
+    """
+    Test conversion between square and condensed indices (roundtrip and scipy order).
+
+    Parameters
+    ----------
+    n : int
+        Number of rows in square matrix.
+    """
+
+    pairs = np.array(list(combinations(range(n), 2)))
+    ks = get_condensed_index(pairs[:, 0], pairs[:, 1], n)
+    assert np.array_equal(ks, np.arange(len(pairs)))
+
+    i, j = get_square_indices(ks, n)
+    assert np.array_equal(i, pairs[:, 0])
+    assert np.array_equal(j, pairs[:, 1])
+
+    assert get_condensed_index(1, 0, n) == 0
+    assert get_square_indices(0, n) == (0, 1)
+
+
+@pytest.mark.parametrize("i, j, k, n", [(0, 0, None, 3), (None, None, 3, 3), (None, None, -1, 3)])
+def test_condensed_square_indices_valueerror(i, j, k, n):
+    """
+    Test if diagonal or out-of-range indices raise ValueError.
+    """
+
+    with pytest.raises(ValueError):
+        if k is None:
+            get_condensed_index(i, j, n)
+        else:
+            get_square_indices(k, n)
+
+
+@pytest.mark.parametrize("n, tile_size, n_tiles", [(0, 3, 0), (1, 3, 0), (5, 3, 4), (5, 10, 1)])
+def test_get_pair_tiles(n, tile_size, n_tiles):
+    """
+    Test if pair tiles cover all pairs in condensed order.
+
+    Parameters
+    ----------
+    n : int
+        Number of fingerprints.
+    tile_size : int
+        Maximum number of pairs per tile.
+    n_tiles : int
+        Number of tiles.
+    """
+
+    pair_tiles = list(get_pair_tiles(n, tile_size))
+    assert len(pair_tiles) == n_tiles
+
+    pairs = [(i, j) for ixs1, ixs2 in pair_tiles for i, j in zip(ixs1, ixs2)]
+    assert pairs == list(combinations(range(n), 2))
+
+
+@pytest.mark.parametrize(
+    "n1, n2, tile_size, n_tiles", [(0, 3, 2, 0), (3, 0, 2, 0), (2, 3, 4, 2), (2, 3, 10, 1)]
+)
+def test_get_block_pair_tiles(n1, n2, tile_size, n_tiles):
+    """
+    Test if block pair tiles cover all pairs between two sets in row-major order.
+
+    Parameters
+    ----------
+    n1 : int
+        Number of fingerprints in first set.
+    n2 : int
+        Number of fingerprints in second set.
+    tile_size : int
+        Maximum number of pairs per tile.
+    n_tiles : int
+        Number of tiles.
+    """
+
+    pair_tiles = list(get_block_pair_tiles(n1, n2, tile_size))
+    assert len(pair_tiles) == n_tiles
+
+    pairs = [(i, j) for ixs1, ixs2 in pair_tiles for i, j in zip(ixs1, ixs2)]
+    assert pairs == list(product(range(n1), range(n2)))
+
+
+@pytest.mark.parametrize("n_pairs, tile_size, n_tiles", [(0, 2, 0), (5, 2, 3), (5, 10, 1)])
+def test_get_pair_list_tiles(n_pairs, tile_size, n_tiles):
+    """
+    Test if pair list tiles cover all pairs in the given order.
+
+    Parameters
+    ----------
+    n_pairs : int
+        Number of pairs.
+    tile_size : int
+        Maximum number of pairs per tile.
+    n_tiles : int
+        Number of tiles.
+    """
+
+    ixs1 = np.arange(n_pairs)[::-1]
+    ixs2 = np.arange(n_pairs)
+
+    pair_tiles = list(get_pair_list_tiles(ixs1, ixs2, tile_size))
+    assert len(pair_tiles) == n_tiles
+
+    pairs = [(i, j) for ixs1, ixs2 in pair_tiles for i, j in zip(ixs1, ixs2)]
+    assert pairs == list(zip(range(n_pairs)[::-1], range(n_pairs)))
+
+
+@pytest.mark.parametrize(
+    "neighbor_ixs, neighbor_ixs_exact, recall",
+    [
+        ([[0, 1], [2, 3]], [[1, 0], [2, 4]], 0.75),
+        ([[0, -1], [2, -1]], [[1, 0], [2, -1]], 2 / 3),
+        ([[-1, -1]], [[-1, -1]], np.nan),
+    ],
+)
+def test_get_neighbor_recall(neighbor_ixs, neighbor_ixs_exact, recall):
+    """
+    Test recall of approximate nearest neighbors (missing neighbors are -1).
+    """
+
+    assert np.isclose(
+        get_neighbor_recall(np.array(neighbor_ixs), np.array(neighbor_ixs_exact)),
+        recall,
+        equal_nan=True,
+    )
+
+
+@pytest.mark.parametrize("feature_weights", [None, [1 / 3] * 3, [0.2] * 3 + [0.4 / 12] * 12])
+def test_get_search_recall(fingerprint_stack_dummy, feature_weights):
+    """
+    Test recall of searches that find all exact nearest neighbors (exact search itself and
+    two-stage search re-ranking all candidates).
+    """
+
+    exact_search = PrunedSearch.from_fingerprint_stack(
+        fingerprint_stack_dummy, feature_weights=feature_weights
+    )
+    search = TwoStageSearch.from_fingerprint_stack(
+        fingerprint_stack_dummy, feature_weights=feature_weights, n_candidates=60
+    )
+
+    assert get_search_recall(exact_search, exact_search, 5, 10) == 1.0
+    assert get_search_recall(search, exact_search, 5, 10) == 1.0
+    assert search.get_recall(5, 10) == 1.0
+
+
+def test_get_scaled_values(fingerprint_stack_dummy):
+    """
+    Test if means (block by block) ignore NaN values, and if scaled values are centered and NaN
+    values imputed with means.
+    """
+
+    values = fingerprint_stack_dummy.get_values()
+    means = get_value_means(fingerprint_stack_dummy, block_size=7)
+    assert np.allclose(means, np.nan_to_num(np.nanmean(values, axis=0)))
+
+    scales = get_value_scales(np.full(15, 1 / 15), fingerprint_stack_dummy.n_bits)
+    assert scales.shape == (1032,)
+    assert np.isclose(scales[0], 1 / 15 / 85)
+
+    scaled_values = get_scaled_values(fingerprint_stack_dummy, means, scales, 10, 20)
+    assert scaled_values.shape == (10, 1032)
+    assert not np.isnan(scaled_values).any()
+    expected = (values[10:20] - means) * scales
+    is_value = ~np.isnan(expected)
+    assert np.allclose(scaled_values[is_value], expected[is_value])
+    assert (scaled_values[~is_value] == 0).all()